@@ -132,27 +132,28 @@ NI_ObjectToLongSequence(PyObject *object, npy_intp **sequence)
 static PyObject *Py_Correlate1D(PyObject *obj, PyObject *args)
 {
     PyArrayObject *input = NULL, *output = NULL, *weights = NULL;
-    int axis, mode;
+    int axis, mode, workers = 1, single = 0;
     double cval;
 #if PY_VERSION_HEX < 0x02050000
-    long origin;
+    long origin, buffer_size = 0;
 #define FMT "l"
 #else
-    npy_intp origin;
+    npy_intp origin, buffer_size = 0;
 #define FMT "n"
 #endif
 
-    if (!PyArg_ParseTuple(args, "O&O&iO&id" FMT,
+    if (!PyArg_ParseTuple(args, "O&O&iO&id" FMT "|ii" FMT,
                           NI_ObjectToInputArray, &input,
                           NI_ObjectToInputArray, &weights, &axis,
                           NI_ObjectToOutputArray, &output, &mode, &cval,
-                          &origin))
+                          &origin, &workers, &single, &buffer_size))
         goto exit;
 
 #undef FMT
 
     if (!NI_Correlate1D(input, weights, axis, output,
-                                            (NI_ExtendMode)mode, cval, origin))
+                                            (NI_ExtendMode)mode, cval, origin, single,
+                        workers, buffer_size))
         goto exit;
 exit:
     Py_XDECREF(input);
@@ -161,21 +162,61 @@ exit:
     return PyErr_Occurred() ? NULL : Py_BuildValue("");
 }
 
+static PyObject *Py_NormalizedCorrelate1D(PyObject *obj, PyObject *args)
+{
+    PyArrayObject *input = NULL, *output = NULL, *weights = NULL;
+    PyArrayObject *iweights = NULL, *oweights = NULL;
+    int axis, mode, weighted, normalize, ignore_nan, workers = 1;
+    double cval;
+#if PY_VERSION_HEX < 0x02050000
+    long origin, buffer_size = 0;
+#define FMT "l"
+#else
+    npy_intp origin, buffer_size = 0;
+#define FMT "n"
+#endif
+
+    if (!PyArg_ParseTuple(args, "O&O&O&iO&O&id" FMT "iii|i" FMT,
+                          NI_ObjectToInputArray, &input,
+                          NI_ObjectToOptionalInputArray, &iweights,
+                          NI_ObjectToInputArray, &weights, &axis,
+                          NI_ObjectToOutputArray, &output,
+                          NI_ObjectToOptionalOutputArray, &oweights,
+                          &mode, &cval, &origin, &weighted, &normalize,
+                          &ignore_nan, &workers, &buffer_size))
+        goto exit;
+
+#undef FMT
+
+    if (!NI_NormalizedCorrelate1D(input, iweights, weights, axis, output,
+                                  oweights, (NI_ExtendMode)mode, cval,
+                                  origin, weighted, normalize, ignore_nan,
+                                  workers, buffer_size))
+        goto exit;
+exit:
+    Py_XDECREF(input);
+    Py_XDECREF(iweights);
+    Py_XDECREF(weights);
+    Py_XDECREF(output);
+    Py_XDECREF(oweights);
+    return PyErr_Occurred() ? NULL : Py_BuildValue("");
+}
+
 static PyObject *Py_Correlate(PyObject *obj, PyObject *args)
 {
     PyArrayObject *input = NULL, *output = NULL, *weights = NULL;
     npy_intp *origin = NULL;
-    int mode;
+    int mode, workers = 1;
     double cval;
 
-    if (!PyArg_ParseTuple(args, "O&O&O&idO&", NI_ObjectToInputArray, &input,
+    if (!PyArg_ParseTuple(args, "O&O&O&idO&|i", NI_ObjectToInputArray, &input,
                           NI_ObjectToInputArray, &weights,
                           NI_ObjectToOutputArray, &output,
                          &mode, &cval,
-                         NI_ObjectToLongSequence, &origin))
+                         NI_ObjectToLongSequence, &origin, &workers))
         goto exit;
     if (!NI_Correlate(input, weights, output, (NI_ExtendMode)mode, cval,
-                                        origin))
+                                        origin, workers))
         goto exit;
 exit:
     Py_XDECREF(input);
@@ -186,27 +227,112 @@ exit:
     return PyErr_Occurred() ? NULL : Py_BuildValue("");
 }
 
+static PyObject *Py_SeparableFilter(PyObject *obj, PyObject *args)
+{
+    PyArrayObject *input = NULL, *output = NULL, *weights = NULL;
+    PyObject *axes_object;
+    npy_intp *axes = NULL, *types = NULL, *sizes = NULL, *origins = NULL;
+    PyObject *terms_object = Py_None;
+    npy_intp *tile = NULL, *terms = NULL, npasses, nterms = 0;
+    int mode, workers = 1, magnitude = 0;
+    double cval;
+
+    if (!PyArg_ParseTuple(args, "O&OO&O&O&O&O&O&id|iOi",
+                          NI_ObjectToInputArray, &input, &axes_object,
+                          NI_ObjectToLongSequence, &types,
+                          NI_ObjectToLongSequence, &sizes,
+                          NI_ObjectToLongSequence, &origins,
+                          NI_ObjectToInputArray, &weights,
+                          NI_ObjectToLongSequence, &tile,
+                          NI_ObjectToOutputArray, &output,
+                          &mode, &cval, &workers, &terms_object,
+                          &magnitude))
+        goto exit;
+    npasses = NI_ObjectToLongSequenceAndLength(axes_object, &axes);
+    if (npasses < 0)
+        goto exit;
+    if (terms_object != Py_None) {
+        nterms = NI_ObjectToLongSequenceAndLength(terms_object, &terms);
+        if (nterms < 0)
+            goto exit;
+    }
+    if (!NI_SeparableFilter(input, (int)npasses, axes, types, sizes, origins,
+                            (double*)PyArray_DATA(weights), tile, output,
+                            (NI_ExtendMode)mode, cval, (int)nterms, terms,
+                            magnitude, workers))
+        goto exit;
+exit:
+    Py_XDECREF(input);
+    Py_XDECREF(weights);
+    Py_XDECREF(output);
+    if (axes)
+        free(axes);
+    if (types)
+        free(types);
+    if (sizes)
+        free(sizes);
+    if (origins)
+        free(origins);
+    if (tile)
+        free(tile);
+    if (terms)
+        free(terms);
+    return PyErr_Occurred() ? NULL : Py_BuildValue("");
+}
+
 static PyObject *Py_UniformFilter1D(PyObject *obj, PyObject *args)
 {
     PyArrayObject *input = NULL, *output = NULL;
-    int axis, mode;
+    int axis, mode, workers = 1, single = 0;
 #if PY_VERSION_HEX < 0x02050000
-    long filter_size, origin;
+    long filter_size, origin, buffer_size = 0;
 #define FMT "l"
 #else
-    npy_intp filter_size, origin;
+    npy_intp filter_size, origin, buffer_size = 0;
 #define FMT "n"
 #endif
     double cval;
 
-    if (!PyArg_ParseTuple(args, "O&" FMT "iO&id" FMT,
+    if (!PyArg_ParseTuple(args, "O&" FMT "iO&id" FMT "|ii" FMT,
                           NI_ObjectToInputArray, &input,
                           &filter_size, &axis,
                           NI_ObjectToOutputArray, &output,
-                          &mode, &cval, &origin))
+                          &mode, &cval, &origin, &workers, &single,
+                          &buffer_size))
         goto exit;
     if (!NI_UniformFilter1D(input, filter_size, axis, output,
-                            (NI_ExtendMode)mode, cval, origin))
+                            (NI_ExtendMode)mode, cval, origin, single,
+                            workers, buffer_size))
+        goto exit;
+exit:
+    Py_XDECREF(input);
+    Py_XDECREF(output);
+    return PyErr_Occurred() ? NULL : Py_BuildValue("");
+}
+
+static PyObject *Py_RecursiveGaussianFilter1D(PyObject *obj, PyObject *args)
+{
+    PyArrayObject *input = NULL, *output = NULL;
+    int axis, mode, order, workers = 1;
+    double sigma, cval;
+#if PY_VERSION_HEX < 0x02050000
+    long buffer_size = 0;
+#define FMT "l"
+#else
+    npy_intp buffer_size = 0;
+#define FMT "n"
+#endif
+
+    if (!PyArg_ParseTuple(args, "O&diiO&id|i" FMT,
+                          NI_ObjectToInputArray, &input,
+                          &sigma, &order, &axis,
+                          NI_ObjectToOutputArray, &output,
+                          &mode, &cval, &workers, &buffer_size))
+        goto exit;
+#undef FMT
+    if (!NI_RecursiveGaussianFilter1D(input, sigma, order, axis, output,
+                                      (NI_ExtendMode)mode, cval, workers,
+                                      buffer_size))
         goto exit;
 exit:
     Py_XDECREF(input);
@@ -217,25 +343,27 @@ exit:
 static PyObject *Py_MinOrMaxFilter1D(PyObject *obj, PyObject *args)
 {
     PyArrayObject *input = NULL, *output = NULL;
-    int axis, mode, minimum;
+    int axis, mode, minimum, workers = 1, single = 0;
 #if PY_VERSION_HEX < 0x02050000
-    long filter_size, origin;
+    long filter_size, origin, buffer_size = 0;
 #define FMT "l"
 #else
-    npy_intp filter_size, origin;
+    npy_intp filter_size, origin, buffer_size = 0;
 #define FMT "n"
 #endif
     double cval;
 
-    if (!PyArg_ParseTuple(args, "O&" FMT "iO&id" FMT "i",
+    if (!PyArg_ParseTuple(args, "O&" FMT "iO&id" FMT "i|ii" FMT,
                           NI_ObjectToInputArray, &input,
                           &filter_size, &axis,
                           NI_ObjectToOutputArray, &output,
-                          &mode, &cval, &origin, &minimum))
+                          &mode, &cval, &origin, &minimum, &workers,
+                          &single, &buffer_size))
         goto exit;
 #undef FMT
     if (!NI_MinOrMaxFilter1D(input, filter_size, axis, output,
-                                                            (NI_ExtendMode)mode, cval, origin, minimum))
+                                                            (NI_ExtendMode)mode, cval, origin, minimum,
+                             single, workers, buffer_size))
         goto exit;
 exit:
     Py_XDECREF(input);
@@ -248,20 +376,21 @@ static PyObject *Py_MinOrMaxFilter(PyObject *obj, PyObject *args)
     PyArrayObject *input = NULL, *output = NULL, *footprint = NULL;
     PyArrayObject *structure = NULL;
     npy_intp *origin = NULL;
-    int mode, minimum;
+    int mode, minimum, workers = 1;
     double cval;
 
-    if (!PyArg_ParseTuple(args, "O&O&O&O&idO&i",
+    if (!PyArg_ParseTuple(args, "O&O&O&O&idO&i|i",
                           NI_ObjectToInputArray, &input,
                           NI_ObjectToInputArray, &footprint,
                                         NI_ObjectToOptionalInputArray, &structure,
                           NI_ObjectToOutputArray, &output,
                           &mode, &cval,
                           NI_ObjectToLongSequence, &origin,
-                          &minimum))
+                          &minimum, &workers))
         goto exit;
     if (!NI_MinOrMaxFilter(input, footprint, structure, output,
-                                                (NI_ExtendMode)mode, cval, origin, minimum))
+                                                (NI_ExtendMode)mode, cval, origin, minimum,
+                             workers))
         goto exit;
 exit:
     Py_XDECREF(input);
@@ -276,22 +405,43 @@ exit:
 static PyObject *Py_RankFilter(PyObject *obj, PyObject *args)
 {
     PyArrayObject *input = NULL, *output = NULL, *footprint = NULL;
+    PyArrayObject *ranks = NULL;
     npy_intp *origin = NULL;
-    int mode, rank;
+    int mode, workers = 1;
     double cval;
+#if PY_VERSION_HEX < 0x02050000
+    long rank_stride = 0;
+#define FMT "l"
+#else
+    npy_intp rank_stride = 0;
+#define FMT "n"
+#endif
 
-    if (!PyArg_ParseTuple(args, "O&iO&O&idO&",
-                          NI_ObjectToInputArray, &input, &rank,
+    if (!PyArg_ParseTuple(args, "O&O&O&O&idO&|i" FMT,
+                          NI_ObjectToInputArray, &input,
+                          NI_ObjectToInputArray, &ranks,
                           NI_ObjectToInputArray, &footprint,
                           NI_ObjectToOutputArray, &output,
                           &mode, &cval,
-                                        NI_ObjectToLongSequence, &origin))
+                                        NI_ObjectToLongSequence, &origin,
+                          &workers, &rank_stride))
         goto exit;
-    if (!NI_RankFilter(input, rank, footprint, output, (NI_ExtendMode)mode,
-                                         cval, origin))
+
+#undef FMT
+
+    if (ranks->descr->type_num != NPY_INTP || !PyArray_ISCONTIGUOUS(ranks)) {
+        PyErr_SetString(PyExc_RuntimeError,
+                        "ranks must be a contiguous intp array");
+        goto exit;
+    }
+    if (!NI_RankFilter(input, (npy_intp*)PyArray_DATA(ranks),
+                       (int)PyArray_SIZE(ranks), footprint, output,
+                       rank_stride, (NI_ExtendMode)mode, cval, origin,
+                       workers))
         goto exit;
 exit:
     Py_XDECREF(input);
+    Py_XDECREF(ranks);
     Py_XDECREF(footprint);
     Py_XDECREF(output);
     if (origin)
@@ -333,28 +483,62 @@ exit:
     return PyErr_Occurred() ? 0 : 1;
 }
 
+/* Get the function and the data of a compiled filter callback, given as
+     a capsule, or as the address of the function as an integer. The user
+     data is given by its address, or is None to use the context of the
+     capsule. A capsule may use the Python C-API, and is called holding the
+     GIL, whereas a function given by its address, from a ctypes or cffi
+     pointer, is called without it, as set in nogil. Returns 1 if a
+     compiled callback was found, 0 if not, and -1 on error: */
+static int NI_CompiledCallback(PyObject *fnc, PyObject *user_data,
+                               void **func, void **data, int *nogil)
+{
+    *nogil = 0;
+    if (NpyCapsule_Check(fnc)) {
+        *func = NpyCapsule_AsVoidPtr(fnc);
+        *data = NpyCapsule_GetDesc(fnc);
+#ifndef NPY_PY3K
+    } else if (PyInt_Check(fnc) || PyLong_Check(fnc)) {
+#else
+    } else if (PyLong_Check(fnc)) {
+#endif
+        *func = PyLong_AsVoidPtr(fnc);
+        *data = NULL;
+        *nogil = 1;
+    } else {
+        return 0;
+    }
+    if (!PyErr_Occurred() && user_data && user_data != Py_None)
+        *data = PyLong_AsVoidPtr(user_data);
+    if (!PyErr_Occurred() && !*func)
+        PyErr_SetString(PyExc_ValueError, "function pointer is NULL");
+    return PyErr_Occurred() ? -1 : 1;
+}
+
 static PyObject *Py_GenericFilter1D(PyObject *obj, PyObject *args)
 {
     PyArrayObject *input = NULL, *output = NULL;
     PyObject *fnc = NULL, *extra_arguments = NULL, *extra_keywords = NULL;
+    PyObject *user_data = NULL;
     void *func = Py_Filter1DFunc, *data = NULL;
     NI_PythonCallbackData cbdata;
-    int axis, mode;
+    int axis, mode, compiled, nogil = 0;
 #if PY_VERSION_HEX < 0x02050000
-    long origin, filter_size;
+    long origin, filter_size, buffer_size = 0;
 #define FMT "l"
 #else
-    npy_intp origin, filter_size;
+    npy_intp origin, filter_size, buffer_size = 0;
 #define FMT "n"
 #endif
     double cval;
 
-    if (!PyArg_ParseTuple(args, "O&O" FMT "iO&id" FMT "OO",
+    if (!PyArg_ParseTuple(args, "O&O" FMT "iO&id" FMT "OO|" FMT "O",
                           NI_ObjectToInputArray, &input,
                           &fnc, &filter_size, &axis,
                           NI_ObjectToOutputArray, &output,
                           &mode, &cval, &origin,
-                          &extra_arguments, &extra_keywords))
+                          &extra_arguments, &extra_keywords, &buffer_size,
+                          &user_data))
         goto exit;
 #undef FMT
 
@@ -367,21 +551,24 @@ static PyObject *Py_GenericFilter1D(PyObject *obj, PyObject *args)
                                         "extra_keywords must be a dictionary");
         goto exit;
     }
-    if (NpyCapsule_Check(fnc)) {
-        func = NpyCapsule_AsVoidPtr(fnc);
-        data = NpyCapsule_GetDesc(fnc);
-    } else if (PyCallable_Check(fnc)) {
+    /* a compiled function is called directly: */
+    compiled = NI_CompiledCallback(fnc, user_data, &func, &data, &nogil);
+    if (compiled < 0)
+        goto exit;
+    if (!compiled) {
+        if (!PyCallable_Check(fnc)) {
+            PyErr_SetString(PyExc_RuntimeError,
+                            "function parameter is not callable");
+            goto exit;
+        }
         cbdata.function = fnc;
         cbdata.extra_arguments = extra_arguments;
         cbdata.extra_keywords = extra_keywords;
         data = (void*)&cbdata;
-    } else {
-        PyErr_SetString(PyExc_RuntimeError,
-                                        "function parameter is not callable");
-        goto exit;
     }
     if (!NI_GenericFilter1D(input, func, data, filter_size, axis, output,
-                            (NI_ExtendMode)mode, cval, origin))
+                            (NI_ExtendMode)mode, cval, origin, buffer_size,
+                            nogil))
         goto exit;
 exit:
     Py_XDECREF(input);
@@ -417,25 +604,80 @@ exit:
     return PyErr_Occurred() ? 0 : 1;
 }
 
+static int Py_FilterBlockFunc(double *buffer, npy_intp npix,
+                              npy_intp filter_size, double *results,
+                              void *data)
+{
+    PyArrayObject *py_buffer = NULL, *py_results = NULL;
+    PyObject *rv = NULL, *args = NULL, *tmp = NULL;
+    npy_intp ii, shape[2];
+    double *pr;
+    NI_PythonCallbackData *cbdata = (NI_PythonCallbackData*)data;
+
+    shape[0] = npix;
+    shape[1] = filter_size;
+    py_buffer = NA_NewArray(buffer, PyArray_DOUBLE, 2, shape);
+    if (!py_buffer)
+        goto exit;
+    tmp = Py_BuildValue("(O)", py_buffer);
+    if (!tmp)
+        goto exit;
+    args = PySequence_Concat(tmp, cbdata->extra_arguments);
+    if (!args)
+        goto exit;
+    rv = PyObject_Call(cbdata->function, args, cbdata->extra_keywords);
+    if (!rv)
+        goto exit;
+    py_results = (PyArrayObject*)PyArray_ContiguousFromAny(rv, PyArray_DOUBLE,
+                                                           0, 0);
+    if (!py_results)
+        goto exit;
+    if (PyArray_SIZE(py_results) != npix) {
+        PyErr_SetString(PyExc_ValueError,
+                        "function must return one value per element");
+        goto exit;
+    }
+    pr = (double*)PyArray_DATA(py_results);
+    for(ii = 0; ii < npix; ii++)
+        results[ii] = pr[ii];
+exit:
+    Py_XDECREF(py_buffer);
+    Py_XDECREF(py_results);
+    Py_XDECREF(rv);
+    Py_XDECREF(args);
+    Py_XDECREF(tmp);
+    return PyErr_Occurred() ? 0 : 1;
+}
+
 static PyObject *Py_GenericFilter(PyObject *obj, PyObject *args)
 {
     PyArrayObject *input = NULL, *output = NULL, *footprint = NULL;
     PyObject *fnc = NULL, *extra_arguments = NULL, *extra_keywords = NULL;
+    PyObject *user_data = NULL;
     void *func = Py_FilterFunc, *data = NULL;
     NI_PythonCallbackData cbdata;
-    int mode;
+    int mode, compiled, nogil = 0;
     npy_intp *origin = NULL;
     double cval;
+#if PY_VERSION_HEX < 0x02050000
+    long chunk_size = 0;
+#define FMT "l"
+#else
+    npy_intp chunk_size = 0;
+#define FMT "n"
+#endif
 
-    if (!PyArg_ParseTuple(args, "O&OO&O&idO&OO",
+    if (!PyArg_ParseTuple(args, "O&OO&O&idO&OO|O" FMT,
                           NI_ObjectToInputArray, &input,
                           &fnc,
                           NI_ObjectToInputArray, &footprint,
                           NI_ObjectToOutputArray, &output,
                           &mode, &cval,
                                                 NI_ObjectToLongSequence, &origin,
-                                                &extra_arguments, &extra_keywords))
+                                                &extra_arguments, &extra_keywords,
+                          &user_data, &chunk_size))
         goto exit;
+#undef FMT
     if (!PyTuple_Check(extra_arguments)) {
         PyErr_SetString(PyExc_RuntimeError, "extra_arguments must be a tuple");
         goto exit;
@@ -445,22 +687,32 @@ static PyObject *Py_GenericFilter(PyObject *obj, PyObject *args)
                                         "extra_keywords must be a dictionary");
         goto exit;
     }
-    if (NpyCapsule_Check(fnc)) {
-        func = NpyCapsule_AsVoidPtr(fnc);
-        data = NpyCapsule_GetDesc(fnc);
-    } else if (PyCallable_Check(fnc)) {
+    /* a compiled function is called directly: */
+    compiled = chunk_size > 0 ? 0 :
+                    NI_CompiledCallback(fnc, user_data, &func, &data, &nogil);
+    if (compiled < 0)
+        goto exit;
+    if (!compiled) {
+        if (!PyCallable_Check(fnc)) {
+            PyErr_SetString(PyExc_RuntimeError,
+                            "function parameter is not callable");
+            goto exit;
+        }
         cbdata.function = fnc;
         cbdata.extra_arguments = extra_arguments;
         cbdata.extra_keywords = extra_keywords;
         data = (void*)&cbdata;
-    } else {
-        PyErr_SetString(PyExc_RuntimeError,
-                                        "function parameter is not callable");
-        goto exit;
     }
-    if (!NI_GenericFilter(input, func, data, footprint, output,
-                                                (NI_ExtendMode)mode, cval, origin))
+    /* with a chunk size, the function is called with blocks of elements: */
+    if (chunk_size > 0) {
+        if (!NI_GenericFilterBlocks(input, Py_FilterBlockFunc, data,
+                                    footprint, output, (NI_ExtendMode)mode,
+                                    cval, origin, chunk_size))
+            goto exit;
+    } else if (!NI_GenericFilter(input, func, data, footprint, output,
+                                 (NI_ExtendMode)mode, cval, origin, nogil)) {
         goto exit;
+    }
 exit:
     Py_XDECREF(input);
     Py_XDECREF(output);
@@ -534,15 +786,25 @@ exit:
 static PyObject *Py_SplineFilter1D(PyObject *obj, PyObject *args)
 {
     PyArrayObject *input = NULL, *output = NULL;
-    int axis, order;
+    int axis, order, single = 0, workers = 1;
+#if PY_VERSION_HEX < 0x02050000
+    long buffer_size = 0;
+#define FMT "l"
+#else
+    npy_intp buffer_size = 0;
+#define FMT "n"
+#endif
 
-    if (!PyArg_ParseTuple(args, "O&iiO&",
+    if (!PyArg_ParseTuple(args, "O&iiO&|i" FMT "i",
                           NI_ObjectToInputArray, &input,
                           &order, &axis,
-                          NI_ObjectToOutputArray, &output))
+                          NI_ObjectToOutputArray, &output, &single,
+                          &buffer_size, &workers))
         goto exit;
+#undef FMT
 
-    if (!NI_SplineFilter1D(input, order, axis, output))
+    if (!NI_SplineFilter1D(input, order, axis, output, single, buffer_size,
+                           workers))
         goto exit;
 
 exit:
@@ -598,20 +860,22 @@ static PyObject *Py_GeometricTransform(PyObject *obj, PyObject *args)
     PyArrayObject *input = NULL, *output = NULL;
     PyArrayObject *coordinates = NULL, *matrix = NULL, *shift = NULL;
     PyObject *fnc = NULL, *extra_arguments = NULL, *extra_keywords = NULL;
-    int mode, order;
+    npy_intp *orders = NULL;
+    int mode, workers = 1, nogil = 1, orank = 0, irank = 0;
     double cval;
     void *func = NULL, *data = NULL;
     NI_PythonCallbackData cbdata;
 
-    if (!PyArg_ParseTuple(args, "O&OO&O&O&O&iidOO",
+    if (!PyArg_ParseTuple(args, "O&OO&O&O&O&O&idOO|i",
                           NI_ObjectToInputArray, &input,
                           &fnc,
                           NI_ObjectToOptionalInputArray, &coordinates,
                           NI_ObjectToOptionalInputArray, &matrix,
                           NI_ObjectToOptionalInputArray, &shift,
                           NI_ObjectToOutputArray, &output,
-                          &order, &mode, &cval,
-                          &extra_arguments, &extra_keywords))
+                          NI_ObjectToLongSequence, &orders,
+                          &mode, &cval,
+                          &extra_arguments, &extra_keywords, &workers))
         goto exit;
 
     if (fnc != Py_None) {
@@ -628,8 +892,27 @@ static PyObject *Py_GeometricTransform(PyObject *obj, PyObject *args)
         if (NpyCapsule_Check(fnc)) {
             func = NpyCapsule_AsVoidPtr(fnc);
             data = NpyCapsule_GetDesc(fnc);
+            /* the mappings of this module run without the GIL, others may
+               use the Python C-API: */
+            nogil = func == (void*)NI_PolynomialMap ||
+                    func == (void*)NI_GridMap;
+            if (func == (void*)NI_PolynomialMap) {
+                orank = ((NI_PolynomialMapping*)data)->orank;
+                irank = ((NI_PolynomialMapping*)data)->irank;
+            } else if (func == (void*)NI_GridMap) {
+                orank = ((NI_GridMapping*)data)->orank;
+                irank = ((NI_GridMapping*)data)->irank;
+            }
+            if (nogil && (orank != output->nd || irank != input->nd)) {
+                PyErr_Format(PyExc_RuntimeError, "the mapping maps %d output "
+                             "to %d input coordinates, but the output rank "
+                             "is %d and the input rank is %d", orank, irank,
+                             output->nd, input->nd);
+                goto exit;
+            }
         } else if (PyCallable_Check(fnc)) {
             func = Py_Map;
+            nogil = 0;
             cbdata.function = fnc;
             cbdata.extra_arguments = extra_arguments;
             cbdata.extra_keywords = extra_keywords;
@@ -642,7 +925,8 @@ static PyObject *Py_GeometricTransform(PyObject *obj, PyObject *args)
     }
 
     if (!NI_GeometricTransform(input, func, data, matrix, shift, coordinates,
-                                                    output, order, (NI_ExtendMode)mode, cval))
+                                                    output, orders, (NI_ExtendMode)mode, cval,
+                               workers, nogil))
         goto exit;
 
 exit:
@@ -651,26 +935,175 @@ exit:
     Py_XDECREF(coordinates);
     Py_XDECREF(matrix);
     Py_XDECREF(shift);
+    if (orders)
+        free(orders);
     return PyErr_Occurred() ? NULL : Py_BuildValue("");
 }
 
+#ifdef NPY_PY3K
+static void _FreeMapping(PyObject *obj)
+{
+    free(PyCapsule_GetContext(obj));
+}
+#else
+static void _FreeMapping(void *ptr, void *data)
+{
+    free(data);
+}
+#endif
+
+static PyObject *Py_PolynomialMapping(PyObject *obj, PyObject *args)
+{
+    PyArrayObject *coefficients = NULL, *exponents = NULL, *origins = NULL;
+    PyObject *cobj = NULL;
+    NI_PolynomialMapping *pm = NULL;
+    npy_intp nterms;
+    int ll, irank, orank;
+
+    if (!PyArg_ParseTuple(args, "O&O&O&",
+                          NI_ObjectToInputArray, &coefficients,
+                          NI_ObjectToInputArray, &exponents,
+                          NI_ObjectToInputArray, &origins))
+        goto exit;
+    if (coefficients->nd != 2 || exponents->nd != 2 || origins->nd != 1 ||
+        coefficients->descr->type_num != NPY_DOUBLE ||
+        exponents->descr->type_num != NPY_INTP ||
+        origins->descr->type_num != NPY_DOUBLE ||
+        !PyArray_ISCONTIGUOUS(coefficients) ||
+        !PyArray_ISCONTIGUOUS(exponents) || !PyArray_ISCONTIGUOUS(origins)) {
+        PyErr_SetString(PyExc_RuntimeError, "invalid mapping arrays");
+        goto exit;
+    }
+    irank = coefficients->dimensions[0];
+    nterms = coefficients->dimensions[1];
+    orank = origins->dimensions[0];
+    if (irank < 1 || irank > MAXDIM || orank < 1 || orank > MAXDIM ||
+        exponents->dimensions[0] != nterms ||
+        exponents->dimensions[1] != orank) {
+        PyErr_SetString(PyExc_RuntimeError, "invalid mapping shapes");
+        goto exit;
+    }
+    /* the mapping is copied into a single block, that the capsule frees: */
+    pm = (NI_PolynomialMapping*)malloc(sizeof(NI_PolynomialMapping) +
+                                       nterms * orank * sizeof(npy_intp) +
+                                       irank * nterms * sizeof(double));
+    if (!pm) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    pm->orank = orank;
+    pm->irank = irank;
+    pm->nterms = nterms;
+    pm->exponents = (npy_intp*)(pm + 1);
+    pm->coefficients = (double*)(pm->exponents + nterms * orank);
+    memcpy(pm->exponents, PyArray_DATA(exponents),
+           nterms * orank * sizeof(npy_intp));
+    memcpy(pm->coefficients, PyArray_DATA(coefficients),
+           irank * nterms * sizeof(double));
+    for(ll = 0; ll < orank; ll++)
+        pm->origins[ll] = ((double*)PyArray_DATA(origins))[ll];
+    cobj = NpyCapsule_FromVoidPtrAndDesc((void*)NI_PolynomialMap, pm,
+                                         _FreeMapping);
+    if (!cobj) {
+        free(pm);
+        PyErr_SetString(PyExc_RuntimeError, "cannot create the mapping");
+    }
+exit:
+    Py_XDECREF(coefficients);
+    Py_XDECREF(exponents);
+    Py_XDECREF(origins);
+    return cobj;
+}
+
+static PyObject *Py_GridMapping(PyObject *obj, PyObject *args)
+{
+    PyArrayObject *grid = NULL, *origins = NULL, *spacings = NULL;
+    PyObject *cobj = NULL;
+    NI_GridMapping *gm = NULL;
+    npy_intp size = 1;
+    int ll, order, orank;
+
+    if (!PyArg_ParseTuple(args, "O&O&O&i",
+                          NI_ObjectToInputArray, &grid,
+                          NI_ObjectToInputArray, &origins,
+                          NI_ObjectToInputArray, &spacings,
+                          &order))
+        goto exit;
+    orank = grid->nd - 1;
+    if (orank < 1 || orank > MAXDIM || grid->dimensions[0] < 1 ||
+        grid->dimensions[0] > MAXDIM || origins->nd != 1 ||
+        spacings->nd != 1 || origins->dimensions[0] != orank ||
+        spacings->dimensions[0] != orank ||
+        grid->descr->type_num != NPY_DOUBLE ||
+        origins->descr->type_num != NPY_DOUBLE ||
+        spacings->descr->type_num != NPY_DOUBLE ||
+        !PyArray_ISCONTIGUOUS(grid) || !PyArray_ISCONTIGUOUS(origins) ||
+        !PyArray_ISCONTIGUOUS(spacings)) {
+        PyErr_SetString(PyExc_RuntimeError, "invalid mapping arrays");
+        goto exit;
+    }
+    if (order < 1 || order > 5) {
+        PyErr_SetString(PyExc_RuntimeError, "spline order not supported");
+        goto exit;
+    }
+    for(ll = 0; ll < orank; ll++)
+        size *= grid->dimensions[ll + 1];
+    if (size < 1) {
+        PyErr_SetString(PyExc_RuntimeError, "invalid mapping shapes");
+        goto exit;
+    }
+    /* the mapping is copied into a single block, that the capsule frees: */
+    gm = (NI_GridMapping*)malloc(sizeof(NI_GridMapping) +
+                                 grid->dimensions[0] * size * sizeof(double));
+    if (!gm) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    gm->orank = orank;
+    gm->irank = grid->dimensions[0];
+    gm->order = order;
+    gm->size = size;
+    gm->grid = (double*)(gm + 1);
+    memcpy(gm->grid, PyArray_DATA(grid), gm->irank * size * sizeof(double));
+    for(ll = orank - 1; ll >= 0; ll--) {
+        gm->shape[ll] = grid->dimensions[ll + 1];
+        gm->strides[ll] = ll == orank - 1 ? 1 :
+                                  gm->strides[ll + 1] * gm->shape[ll + 1];
+        gm->origins[ll] = ((double*)PyArray_DATA(origins))[ll];
+        gm->spacings[ll] = ((double*)PyArray_DATA(spacings))[ll];
+    }
+    cobj = NpyCapsule_FromVoidPtrAndDesc((void*)NI_GridMap, gm,
+                                         _FreeMapping);
+    if (!cobj) {
+        free(gm);
+        PyErr_SetString(PyExc_RuntimeError, "cannot create the mapping");
+    }
+exit:
+    Py_XDECREF(grid);
+    Py_XDECREF(origins);
+    Py_XDECREF(spacings);
+    return cobj;
+}
+
 static PyObject *Py_ZoomShift(PyObject *obj, PyObject *args)
 {
     PyArrayObject *input = NULL, *output = NULL, *shift = NULL;
     PyArrayObject *zoom = NULL;
-    int mode, order;
+    npy_intp *orders = NULL;
+    int mode, workers = 1;
     double cval;
 
-    if (!PyArg_ParseTuple(args, "O&O&O&O&iid",
+    if (!PyArg_ParseTuple(args, "O&O&O&O&O&id|i",
                           NI_ObjectToInputArray, &input,
                           NI_ObjectToOptionalInputArray, &zoom,
                           NI_ObjectToOptionalInputArray, &shift,
                           NI_ObjectToOutputArray, &output,
-                          &order, &mode, &cval))
+                          NI_ObjectToLongSequence, &orders,
+                          &mode, &cval, &workers))
         goto exit;
 
-    if (!NI_ZoomShift(input, zoom, shift, output, order, (NI_ExtendMode)mode,
-                                        cval))
+    if (!NI_ZoomShift(input, zoom, shift, output, orders, (NI_ExtendMode)mode,
+                                        cval, workers))
         goto exit;
 
 exit:
@@ -678,6 +1111,8 @@ exit:
     Py_XDECREF(shift);
     Py_XDECREF(zoom);
     Py_XDECREF(output);
+    if (orders)
+        free(orders);
     return PyErr_Occurred() ? NULL : Py_BuildValue("");
 }
 
@@ -829,6 +1264,40 @@ exit:
     return PyErr_Occurred() ? NULL : Py_BuildValue("");
 }
 
+static PyObject *Py_IntegralImage(PyObject *obj, PyObject *args)
+{
+    PyArrayObject *table = NULL;
+
+    if (!PyArg_ParseTuple(args, "O&", NI_ObjectToIoArray, &table))
+        goto exit;
+    if (!NI_IntegralImage(table))
+        goto exit;
+exit:
+    Py_XDECREF(table);
+    return PyErr_Occurred() ? NULL : Py_BuildValue("");
+}
+
+static PyObject *Py_BoxSums(PyObject *obj, PyObject *args)
+{
+    PyArrayObject *table = NULL, *lows = NULL, *highs = NULL;
+    PyArrayObject *output = NULL;
+
+    if (!PyArg_ParseTuple(args, "O&O&O&O&",
+                          NI_ObjectToInputArray, &table,
+                          NI_ObjectToInputArray, &lows,
+                          NI_ObjectToInputArray, &highs,
+                          NI_ObjectToOutputArray, &output))
+        goto exit;
+    if (!NI_BoxSums(table, lows, highs, output))
+        goto exit;
+exit:
+    Py_XDECREF(table);
+    Py_XDECREF(lows);
+    Py_XDECREF(highs);
+    Py_XDECREF(output);
+    return PyErr_Occurred() ? NULL : Py_BuildValue("");
+}
+
 static PyObject *Py_DistanceTransformBruteForce(PyObject *obj,
                                                                                                 PyObject *args)
 {
@@ -981,13 +1450,26 @@ exit:
     return PyErr_Occurred() ? NULL : Py_BuildValue("");
 }
 
+static PyObject *Py_CacheBufferSize(PyObject *obj, PyObject *args)
+{
+    if (!PyArg_ParseTuple(args, ""))
+        return NULL;
+    return Py_BuildValue("n", NI_CacheBufferSize());
+}
+
 static PyMethodDef methods[] = {
     {"correlate1d",           (PyCFunction)Py_Correlate1D,
      METH_VARARGS, NULL},
+    {"normalized_correlate1d", (PyCFunction)Py_NormalizedCorrelate1D,
+     METH_VARARGS, NULL},
     {"correlate",             (PyCFunction)Py_Correlate,
      METH_VARARGS, NULL},
+    {"separable_filter",      (PyCFunction)Py_SeparableFilter,
+     METH_VARARGS, NULL},
     {"uniform_filter1d",      (PyCFunction)Py_UniformFilter1D,
      METH_VARARGS, NULL},
+    {"recursive_gaussian_filter1d", (PyCFunction)Py_RecursiveGaussianFilter1D,
+     METH_VARARGS, NULL},
     {"min_or_max_filter1d",   (PyCFunction)Py_MinOrMaxFilter1D,
         METH_VARARGS, NULL},
     {"min_or_max_filter",     (PyCFunction)Py_MinOrMaxFilter,
@@ -1008,12 +1490,20 @@ static PyMethodDef methods[] = {
         METH_VARARGS, NULL},
     {"zoom_shift",            (PyCFunction)Py_ZoomShift,
      METH_VARARGS, NULL},
+    {"polynomial_mapping",    (PyCFunction)Py_PolynomialMapping,
+     METH_VARARGS, NULL},
+    {"grid_mapping",          (PyCFunction)Py_GridMapping,
+     METH_VARARGS, NULL},
     {"label",                 (PyCFunction)Py_Label,
      METH_VARARGS, NULL},
     {"find_objects",          (PyCFunction)Py_FindObjects,
      METH_VARARGS, NULL},
     {"watershed_ift",         (PyCFunction)Py_WatershedIFT,
      METH_VARARGS, NULL},
+    {"integral_image",        (PyCFunction)Py_IntegralImage,
+     METH_VARARGS, NULL},
+    {"box_sums",              (PyCFunction)Py_BoxSums,
+     METH_VARARGS, NULL},
     {"distance_transform_bf", (PyCFunction)Py_DistanceTransformBruteForce,
      METH_VARARGS, NULL},
     {"distance_transform_op", (PyCFunction)Py_DistanceTransformOnePass,
@@ -1025,6 +1515,8 @@ static PyMethodDef methods[] = {
      METH_VARARGS, NULL},
     {"binary_erosion2",       (PyCFunction)Py_BinaryErosion2,
      METH_VARARGS, NULL},
+    {"cache_buffer_size",     (PyCFunction)Py_CacheBufferSize,
+     METH_VARARGS, NULL},
     {NULL, NULL, 0, NULL}
 };
 
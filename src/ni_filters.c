@@ -31,26 +31,222 @@
 
 #include "ni_support.h"
 #include "ni_filters.h"
+#include "numpy/npy_math.h"
 #include <stdlib.h>
 #include <math.h>
 
-#define BUFFER_SIZE 256000
+/* A function filtering one line of length elements, extended at both
+     sides as requested from _LineFilter, with work space of the
+     requested size: */
+typedef void (_LineFunction)(double*, double*, npy_intp, void*, double*);
 
-int NI_Correlate1D(PyArrayObject *input, PyArrayObject *weights,
-                                     int axis, PyArrayObject *output, NI_ExtendMode mode,
-                   double cval, npy_intp origin)
+/* The same for lines buffered in single precision: */
+typedef void (_FloatLineFunction)(float*, float*, npy_intp, void*, float*);
+
+typedef struct {
+    NI_LineBuffer iline_buffer, oline_buffer;
+    npy_intp lines, size1, size2, work_size;
+    _LineFunction *function;
+    _FloatLineFunction *float_function;
+    void *data;
+} _LineFilterData;
+
+static NI_ThreadStatus
+_LineFilterLines(void *data, npy_intp start, npy_intp stop)
 {
-    int symmetric = 0, more;
-    npy_intp ii, jj, ll, lines, length, size1, size2, filter_size;
-    double *ibuffer = NULL, *obuffer = NULL;
+    _LineFilterData *lf = (_LineFilterData*)data;
+    NI_LineBuffer iline_buffer = lf->iline_buffer;
+    NI_LineBuffer oline_buffer = lf->oline_buffer;
+    NI_ThreadStatus status = NI_THREAD_OK;
+    npy_intp kk, lines = lf->lines, length = iline_buffer.line_length;
+    size_t itemsize = lf->float_function ? sizeof(float) : sizeof(double);
+    char *ibuffer, *obuffer, *work;
+    int more;
+
+    if (lines > stop - start)
+        lines = stop - start;
+    ibuffer = (char*)malloc((lines * (length + lf->size1 + lf->size2) +
+                             lines * length + lf->work_size) * itemsize);
+    if (!ibuffer)
+        return NI_THREAD_NO_MEMORY;
+    obuffer = ibuffer + lines * (length + lf->size1 + lf->size2) * itemsize;
+    work = obuffer + lines * length * itemsize;
+    iline_buffer.buffer_data = ibuffer;
+    iline_buffer.buffer_lines = lines;
+    oline_buffer.buffer_data = obuffer;
+    oline_buffer.buffer_lines = lines;
+    NI_LineBufferRange(&iline_buffer, start, stop);
+    NI_LineBufferRange(&oline_buffer, start, stop);
+    /* iterate over the array lines of this range: */
+    do {
+        /* copy lines from array to buffer: */
+        if (!NI_ArrayToLineBuffer(&iline_buffer, &lines, &more)) {
+            status = NI_THREAD_TYPE_NOT_SUPPORTED;
+            break;
+        }
+        /* iterate over the lines in the buffers: */
+        if (lf->float_function) {
+            for(kk = 0; kk < lines; kk++)
+                lf->float_function(NI_GET_FLOAT_LINE(iline_buffer, kk),
+                                   NI_GET_FLOAT_LINE(oline_buffer, kk),
+                                   length, lf->data, (float*)work);
+        } else {
+            for(kk = 0; kk < lines; kk++)
+                lf->function(NI_GET_LINE(iline_buffer, kk),
+                             NI_GET_LINE(oline_buffer, kk), length, lf->data,
+                             (double*)work);
+        }
+        /* copy lines from buffer to array: */
+        if (!NI_LineBufferToArray(&oline_buffer)) {
+            status = NI_THREAD_TYPE_NOT_SUPPORTED;
+            break;
+        }
+    } while(more);
+    free(ibuffer);
+    return status;
+}
+
+/* Filter all lines of the input along the given axis with a function,
+     in up to the given number of threads. If float_function is given, the
+     lines are buffered and filtered in single precision. The input lines
+     of each thread are buffered in about buffer_size bytes, or in a size
+     fitting the caches if buffer_size is less than one: */
+static int
+_LineFilter(PyArrayObject *input, int axis, PyArrayObject *output,
+            npy_intp size1, npy_intp size2, NI_ExtendMode mode, double cval,
+            _LineFunction *function, _FloatLineFunction *float_function,
+            void *data, npy_intp work_size, int workers,
+            npy_intp buffer_size)
+{
+    _LineFilterData lf;
+    npy_intp line_size;
+    size_t itemsize = float_function ? sizeof(float) : sizeof(double);
+
+    if (!NI_InitLineBuffer(input, axis, size1, size2, 1, NULL, mode, cval,
+                           &(lf.iline_buffer)))
+        return 0;
+    if (!NI_InitLineBuffer(output, axis, 0, 0, 1, NULL, mode, 0.0,
+                           &(lf.oline_buffer)))
+        return 0;
+    if (float_function) {
+        lf.iline_buffer.buffer_type = tFloat32;
+        lf.oline_buffer.buffer_type = tFloat32;
+    }
+    /* the number of lines buffered by each thread: */
+    if (buffer_size < 1)
+        buffer_size = NI_CacheBufferSize();
+    line_size = itemsize * (lf.iline_buffer.line_length + size1 + size2);
+    lf.lines = line_size > 0 ? buffer_size / line_size : 1;
+    if (lf.lines < 1)
+        lf.lines = 1;
+    lf.size1 = size1;
+    lf.size2 = size2;
+    lf.work_size = work_size;
+    lf.function = float_function ? NULL : function;
+    lf.float_function = float_function;
+    lf.data = data;
+    return NI_RunThreads(_LineFilterLines, &lf, lf.iline_buffer.array_lines,
+                         workers);
+}
+
+typedef struct {
     Float64 *fw;
-    NI_LineBuffer iline_buffer, oline_buffer;
+    float *ffw;
+    npy_intp size1, size2;
+    int symmetric;
+} _Correlate1DData;
+
+static void
+_Correlate1DLine(double *iline, double *oline, npy_intp length, void *data,
+                 double *work)
+{
+    _Correlate1DData *cd = (_Correlate1DData*)data;
+    npy_intp ll, jj, size1 = cd->size1, size2 = cd->size2;
+    Float64 *fw = cd->fw;
+
+    iline += size1;
+    /* the correlation calculation: */
+    if (cd->symmetric > 0) {
+        for(ll = 0; ll < length; ll++) {
+            oline[ll] = iline[0] * fw[0];
+            for(jj = -size1 ; jj < 0; jj++)
+                oline[ll] += (iline[jj] + iline[-jj]) * fw[jj];
+            ++iline;
+        }
+    } else if (cd->symmetric < 0) {
+        for(ll = 0; ll < length; ll++) {
+            oline[ll] = iline[0] * fw[0];
+            for(jj = -size1 ; jj < 0; jj++)
+                oline[ll] += (iline[jj] - iline[-jj]) * fw[jj];
+            ++iline;
+        }
+    } else {
+        for(ll = 0; ll < length; ll++) {
+            oline[ll] = iline[size2] * fw[size2];
+            for(jj = -size1; jj < size2; jj++)
+                oline[ll] += iline[jj] * fw[jj];
+            ++iline;
+        }
+    }
+}
+
+/* In single precision, the products are summed in blocks of this many
+     elements, and the sums of the blocks are accumulated in double
+     precision, so that the rounding error does not grow with the size
+     of long kernels: */
+#define FLOAT_BLOCK_SIZE 16
+
+static void
+_Correlate1DFloatLine(float *iline, float *oline, npy_intp length,
+                      void *data, float *work)
+{
+    _Correlate1DData *cd = (_Correlate1DData*)data;
+    npy_intp ll, jj, kk, end, size1 = cd->size1, size2 = cd->size2;
+    float *fw = cd->ffw;
+
+    iline += size1;
+    if (cd->symmetric != 0) {
+        float sign = cd->symmetric > 0 ? 1.0f : -1.0f;
+        for(ll = 0; ll < length; ll++) {
+            double sum = iline[0] * fw[0];
+            for(jj = -size1; jj < 0; jj = end) {
+                float part = 0.0f;
+                end = jj + FLOAT_BLOCK_SIZE;
+                if (end > 0)
+                    end = 0;
+                for(kk = jj; kk < end; kk++)
+                    part += (iline[kk] + sign * iline[-kk]) * fw[kk];
+                sum += part;
+            }
+            oline[ll] = (float)sum;
+            ++iline;
+        }
+    } else {
+        for(ll = 0; ll < length; ll++) {
+            double sum = 0.0;
+            for(jj = -size1; jj <= size2; jj = end) {
+                float part = 0.0f;
+                end = jj + FLOAT_BLOCK_SIZE;
+                if (end > size2 + 1)
+                    end = size2 + 1;
+                for(kk = jj; kk < end; kk++)
+                    part += iline[kk] * fw[kk];
+                sum += part;
+            }
+            oline[ll] = (float)sum;
+            ++iline;
+        }
+    }
+}
+
+/* Return 1 if the weights are symmetric, -1 if they are anti-symmetric,
+     and 0 otherwise: */
+static int
+_Correlate1DSymmetry(Float64 *fw, npy_intp filter_size)
+{
+    int symmetric = 0;
+    npy_intp ii, size1 = filter_size / 2;
 
-    /* test for symmetry or anti-symmetry: */
-    filter_size = weights->dimensions[0];
-    size1 = filter_size / 2;
-    size2 = filter_size - size1 - 1;
-    fw = (void *)PyArray_DATA(weights);
     if (filter_size & 0x1) {
         symmetric = 1;
         for(ii = 1; ii <= filter_size / 2; ii++) {
@@ -69,64 +265,289 @@ int NI_Correlate1D(PyArrayObject *input, PyArrayObject *weights,
             }
         }
     }
-    /* allocate and initialize the line buffers: */
-    lines = -1;
-    if (!NI_AllocateLineBuffer(input, axis, size1 + origin, size2 - origin,
-                                                         &lines, BUFFER_SIZE, &ibuffer))
-        goto exit;
-    if (!NI_AllocateLineBuffer(output, axis, 0, 0, &lines, BUFFER_SIZE,
-                                                         &obuffer))
-        goto exit;
-    if (!NI_InitLineBuffer(input, axis, size1 + origin, size2 - origin,
-                                                            lines, ibuffer, mode, cval, &iline_buffer))
-        goto exit;
-    if (!NI_InitLineBuffer(output, axis, 0, 0, lines, obuffer, mode, 0.0,
-                                                 &oline_buffer))
-        goto exit;
-    length = input->nd > 0 ? input->dimensions[axis] : 1;
-    fw += size1;
-    /* iterate over all the array lines: */
+    return symmetric;
+}
+
+int NI_Correlate1D(PyArrayObject *input, PyArrayObject *weights,
+                                     int axis, PyArrayObject *output, NI_ExtendMode mode,
+                   double cval, npy_intp origin, int single, int workers,
+                   npy_intp buffer_size)
+{
+    int symmetric, result;
+    npy_intp ii, size1, size2, filter_size;
+    Float64 *fw;
+    float *ffw = NULL;
+    _Correlate1DData cd;
+
+    /* test for symmetry or anti-symmetry: */
+    filter_size = weights->dimensions[0];
+    size1 = filter_size / 2;
+    size2 = filter_size - size1 - 1;
+    fw = (void *)PyArray_DATA(weights);
+    symmetric = _Correlate1DSymmetry(fw, filter_size);
+    cd.fw = fw + size1;
+    cd.size1 = size1;
+    cd.size2 = size2;
+    cd.symmetric = symmetric;
+    if (single) {
+        ffw = (float*)malloc(filter_size * sizeof(float));
+        if (!ffw) {
+            PyErr_NoMemory();
+            return 0;
+        }
+        for(ii = 0; ii < filter_size; ii++)
+            ffw[ii] = (float)fw[ii];
+    }
+    cd.ffw = ffw ? ffw + size1 : NULL;
+    result = _LineFilter(input, axis, output, size1 + origin, size2 - origin,
+                         mode, cval, _Correlate1DLine,
+                         single ? _Correlate1DFloatLine : NULL, &cd, 0,
+                         workers, buffer_size);
+    if (ffw) free(ffw);
+    return result;
+}
+
+/* Normalized correlation filters lines of values together with lines of
+     their weights. The values are multiplied by their weights, and both
+     are correlated with the filter weights, giving the numerator and the
+     denominator of the normalized result. Values that are NaN can be
+     given zero weight. If the input values were already multiplied by
+     their weights in a previous pass, they are correlated as they are, so
+     that separable filters are applied by passing the numerator and the
+     denominator from one axis to the next, and dividing at the last. */
+
+typedef struct {
+    NI_LineBuffer ivalues, iweights, ovalues, oweights;
+    npy_intp lines, size1, size2;
+    _Correlate1DData cd;
+    int has_weights, has_oweights, weighted, normalize, ignore_nan;
+} _NormalizedData;
+
+/* Correlate a line of products and a line of weights together: */
+static void
+_NormalizedLine(double *pline, double *wline, double *nline, double *dline,
+                npy_intp length, _Correlate1DData *cd)
+{
+    npy_intp ll, jj, size1 = cd->size1, size2 = cd->size2;
+    Float64 *fw = cd->fw;
+
+    pline += size1;
+    wline += size1;
+    if (cd->symmetric > 0) {
+        for(ll = 0; ll < length; ll++) {
+            double n = pline[ll] * fw[0], d = wline[ll] * fw[0];
+            for(jj = -size1; jj < 0; jj++) {
+                n += (pline[ll + jj] + pline[ll - jj]) * fw[jj];
+                d += (wline[ll + jj] + wline[ll - jj]) * fw[jj];
+            }
+            nline[ll] = n;
+            dline[ll] = d;
+        }
+    } else {
+        for(ll = 0; ll < length; ll++) {
+            double n = 0.0, d = 0.0;
+            for(jj = -size1; jj <= size2; jj++) {
+                n += pline[ll + jj] * fw[jj];
+                d += wline[ll + jj] * fw[jj];
+            }
+            nline[ll] = n;
+            dline[ll] = d;
+        }
+    }
+}
+
+static NI_ThreadStatus
+_NormalizedLines(void *data, npy_intp start, npy_intp stop)
+{
+    _NormalizedData *nd = (_NormalizedData*)data;
+    NI_LineBuffer ivalues = nd->ivalues, iweights = nd->iweights;
+    NI_LineBuffer ovalues = nd->ovalues, oweights = nd->oweights;
+    NI_ThreadStatus status = NI_THREAD_OK;
+    npy_intp jj, kk, lines = nd->lines, length = ivalues.line_length;
+    npy_intp size = length + nd->size1 + nd->size2;
+    double *buffer, *products, *wline, *dline;
+    int more;
+
+    if (lines > stop - start)
+        lines = stop - start;
+    buffer = (double*)malloc((4 * lines * size + 3 * size) * sizeof(double));
+    if (!buffer)
+        return NI_THREAD_NO_MEMORY;
+    ivalues.buffer_data = buffer;
+    iweights.buffer_data = buffer + lines * size;
+    ovalues.buffer_data = buffer + 2 * lines * size;
+    oweights.buffer_data = buffer + 3 * lines * size;
+    products = buffer + 4 * lines * size;
+    wline = products + size;
+    dline = wline + size;
+    ivalues.buffer_lines = iweights.buffer_lines = lines;
+    ovalues.buffer_lines = oweights.buffer_lines = lines;
+    NI_LineBufferRange(&ivalues, start, stop);
+    NI_LineBufferRange(&ovalues, start, stop);
+    if (nd->has_weights)
+        NI_LineBufferRange(&iweights, start, stop);
+    if (nd->has_oweights)
+        NI_LineBufferRange(&oweights, start, stop);
     do {
-        /* copy lines from array to buffer: */
-        if (!NI_ArrayToLineBuffer(&iline_buffer, &lines, &more))
-            goto exit;
-        /* iterate over the lines in the buffers: */
-        for(ii = 0; ii < lines; ii++) {
-            /* get lines: */
-            double *iline = NI_GET_LINE(iline_buffer, ii) + size1;
-            double *oline = NI_GET_LINE(oline_buffer, ii);
-            /* the correlation calculation: */
-            if (symmetric > 0) {
-                for(ll = 0; ll < length; ll++) {
-                    oline[ll] = iline[0] * fw[0];
-                    for(jj = -size1 ; jj < 0; jj++)
-                        oline[ll] += (iline[jj] + iline[-jj]) * fw[jj];
-                    ++iline;
-                }
-            } else if (symmetric < 0) {
-                for(ll = 0; ll < length; ll++) {
-                    oline[ll] = iline[0] * fw[0];
-                    for(jj = -size1 ; jj < 0; jj++)
-                        oline[ll] += (iline[jj] - iline[-jj]) * fw[jj];
-                    ++iline;
-                }
+        if (!NI_ArrayToLineBuffer(&ivalues, &lines, &more) ||
+            (nd->has_weights &&
+             !NI_ArrayToLineBuffer(&iweights, &lines, &more))) {
+            status = NI_THREAD_TYPE_NOT_SUPPORTED;
+            break;
+        }
+        for(kk = 0; kk < lines; kk++) {
+            double *vl = NI_GET_LINE(ivalues, kk);
+            double *wl = nd->has_weights ? NI_GET_LINE(iweights, kk) : NULL;
+            double *nl = NI_GET_LINE(ovalues, kk);
+            double *dl = nd->has_oweights ? NI_GET_LINE(oweights, kk) : dline;
+            if (nd->weighted) {
+                _NormalizedLine(vl, wl, nl, dl, length, &(nd->cd));
             } else {
-                for(ll = 0; ll < length; ll++) {
-                    oline[ll] = iline[size2] * fw[size2];
-                    for(jj = -size1; jj < size2; jj++)
-                        oline[ll] += iline[jj] * fw[jj];
-                    ++iline;
+                for(jj = 0; jj < size; jj++) {
+                    double w = wl ? wl[jj] : 1.0;
+                    if (nd->ignore_nan && vl[jj] != vl[jj])
+                        w = 0.0;
+                    products[jj] = w != 0.0 ? vl[jj] * w : 0.0;
+                    wline[jj] = w;
                 }
+                _NormalizedLine(products, wline, nl, dl, length, &(nd->cd));
+            }
+            if (nd->normalize) {
+                for(jj = 0; jj < length; jj++)
+                    nl[jj] = dl[jj] != 0.0 ? nl[jj] / dl[jj] : NPY_NAN;
             }
         }
-        /* copy lines from buffer to array: */
-        if (!NI_LineBufferToArray(&oline_buffer))
-            goto exit;
+        if (!NI_LineBufferToArray(&ovalues) ||
+            (nd->has_oweights && !NI_LineBufferToArray(&oweights))) {
+            status = NI_THREAD_TYPE_NOT_SUPPORTED;
+            break;
+        }
     } while(more);
-exit:
-    if (ibuffer) free(ibuffer);
-    if (obuffer) free(obuffer);
-    return PyErr_Occurred() ? 0 : 1;
+    free(buffer);
+    return status;
+}
+
+int NI_NormalizedCorrelate1D(PyArrayObject *input, PyArrayObject *iweights,
+                             PyArrayObject *weights, int axis,
+                             PyArrayObject *output, PyArrayObject *oweights,
+                             NI_ExtendMode mode, double cval, npy_intp origin,
+                             int weighted, int normalize, int ignore_nan,
+                             int workers, npy_intp buffer_size)
+{
+    _NormalizedData nd;
+    npy_intp filter_size, size1, size2, line_size;
+
+    filter_size = weights->dimensions[0];
+    size1 = filter_size / 2;
+    size2 = filter_size - size1 - 1;
+    nd.cd.fw = (Float64*)PyArray_DATA(weights) + size1;
+    nd.cd.ffw = NULL;
+    nd.cd.size1 = size1;
+    nd.cd.size2 = size2;
+    nd.cd.symmetric = _Correlate1DSymmetry((Float64*)PyArray_DATA(weights),
+                                           filter_size);
+    nd.size1 = size1 + origin;
+    nd.size2 = size2 - origin;
+    /* the borders of the weights are extended with a weight of one in
+         the constant mode, so that all weights of one give the same
+         result as the plain correlation with normalized weights: */
+    if (!NI_InitLineBuffer(input, axis, nd.size1, nd.size2, 1, NULL, mode,
+                           cval, &(nd.ivalues)))
+        return 0;
+    if (iweights && !NI_InitLineBuffer(iweights, axis, nd.size1, nd.size2, 1,
+                                       NULL, mode, 1.0, &(nd.iweights)))
+        return 0;
+    if (!NI_InitLineBuffer(output, axis, 0, 0, 1, NULL, mode, 0.0,
+                           &(nd.ovalues)))
+        return 0;
+    if (oweights && !NI_InitLineBuffer(oweights, axis, 0, 0, 1, NULL, mode,
+                                       0.0, &(nd.oweights)))
+        return 0;
+    nd.has_weights = iweights != NULL;
+    nd.has_oweights = oweights != NULL;
+    nd.weighted = weighted;
+    nd.normalize = normalize;
+    nd.ignore_nan = ignore_nan;
+    /* the number of lines buffered by each thread: */
+    if (buffer_size < 1)
+        buffer_size = NI_CacheBufferSize();
+    line_size = 4 * sizeof(double) * (nd.ivalues.line_length + nd.size1 +
+                                      nd.size2);
+    nd.lines = line_size > 0 ? buffer_size / line_size : 1;
+    if (nd.lines < 1)
+        nd.lines = 1;
+    return NI_RunThreads(_NormalizedLines, &nd, nd.ivalues.array_lines,
+                         workers);
+}
+
+/* The state shared by the threads of filters that visit all points of
+     the input, with offsets to the footprint elements from a filter
+     iterator: */
+typedef struct {
+    PyArrayObject *input, *output;
+    NI_FilterIterator fi;
+    NI_Iterator ii, io;
+    npy_intp *offsets, filter_size, border_flag_value;
+    double cvalue;
+} _PointFilter;
+
+static int
+_InitPointFilter(PyArrayObject *input, Bool *pf, npy_intp *fshape,
+                 npy_intp filter_size, PyArrayObject *output,
+                 NI_ExtendMode mode, double cvalue, npy_intp *origins,
+                 _PointFilter *pt)
+{
+    pt->input = input;
+    pt->output = output;
+    pt->filter_size = filter_size;
+    pt->cvalue = cvalue;
+    pt->offsets = NULL;
+    /* initialize filter offsets: */
+    if (!NI_InitFilterOffsets(input, pf, fshape, origins, mode,
+                              &(pt->offsets), &(pt->border_flag_value),
+                              NULL))
+        return 0;
+    /* initialize filter iterator: */
+    if (!NI_InitFilterIterator(input->nd, fshape, filter_size,
+                               input->dimensions, origins, &(pt->fi)))
+        return 0;
+    /* initialize input element iterator: */
+    if (!NI_InitPointIterator(input, &(pt->ii)))
+        return 0;
+    /* initialize output element iterator: */
+    if (!NI_InitPointIterator(output, &(pt->io)))
+        return 0;
+    return 1;
+}
+
+/* Position the iterators of a thread and the pointers to the data and
+     the offsets at the point with the given index: */
+static void
+_StartPointFilter(_PointFilter *pt, npy_intp start, NI_Iterator *ii,
+                  NI_Iterator *io, char **pi, char **po, npy_intp **oo)
+{
+    npy_intp coordinates[MAXDIM];
+
+    *ii = pt->ii;
+    *io = pt->io;
+    NI_IteratorCoordinates(ii, start, coordinates);
+    NI_ITERATOR_GOTO(*ii, coordinates, (char *)PyArray_DATA(pt->input),
+                     *pi);
+    NI_ITERATOR_GOTO(*io, coordinates, (char *)PyArray_DATA(pt->output),
+                     *po);
+    NI_FILTER_GOTO(pt->fi, (*ii), pt->offsets, *oo);
+}
+
+/* the number of points visited by a point filter: */
+static npy_intp
+_PointFilterSize(_PointFilter *pt)
+{
+    int ll;
+    npy_intp size = 1;
+
+    for(ll = 0; ll < pt->input->nd; ll++)
+        size *= pt->input->dimensions[ll];
+    return size;
 }
 
 #define CASE_CORRELATE_POINT(_pi, _weights, _offsets, _filter_size, \
@@ -149,75 +570,28 @@ case t ## _type:                          \
     *(_type*)_po = (_type)_tmp;             \
     break
 
-int NI_Correlate(PyArrayObject* input, PyArrayObject* weights,
-                                                PyArrayObject* output, NI_ExtendMode mode,
-                 double cvalue, npy_intp *origins)
+typedef struct {
+    _PointFilter pt;
+    Float64 *weights;
+} _CorrelateData;
+
+static NI_ThreadStatus
+_CorrelatePoints(void *data, npy_intp start, npy_intp stop)
 {
-    Bool *pf = NULL;
-    npy_intp fsize, jj, kk, filter_size = 0, border_flag_value;
-    npy_intp *offsets = NULL, *oo, size;
-    NI_FilterIterator fi;
+    _CorrelateData *cd = (_CorrelateData*)data;
+    _PointFilter *pt = &(cd->pt);
     NI_Iterator ii, io;
+    npy_intp jj, *oo, filter_size = pt->filter_size;
+    npy_intp border_flag_value = pt->border_flag_value;
+    Float64 *ww = cd->weights;
+    double cvalue = pt->cvalue;
     char *pi, *po;
-    Float64 *pw;
-    Float64 *ww = NULL;
-    int ll;
 
-    /* get the the footprint: */
-    fsize = 1;
-    for(ll = 0; ll < weights->nd; ll++)
-        fsize *= weights->dimensions[ll];
-    pw = (Float64*)PyArray_DATA(weights);
-    pf = (Bool*)malloc(fsize * sizeof(Bool));
-    if (!pf) {
-        PyErr_NoMemory();
-        goto exit;
-    }
-    for(jj = 0; jj < fsize; jj++) {
-        if (fabs(pw[jj]) > DBL_EPSILON) {
-            pf[jj] = 1;
-            ++filter_size;
-        } else {
-            pf[jj] = 0;
-        }
-    }
-    /* copy the weights to contiguous memory: */
-    ww = (Float64*)malloc(filter_size * sizeof(Float64));
-    if (!ww) {
-        PyErr_NoMemory();
-        goto exit;
-    }
-    jj = 0;
-    for(kk = 0; kk < fsize; kk++) {
-        if (pf[kk]) {
-            ww[jj++] = pw[kk];
-        }
-    }
-    /* initialize filter offsets: */
-    if (!NI_InitFilterOffsets(input, pf, weights->dimensions, origins,
-                                                        mode, &offsets, &border_flag_value, NULL))
-        goto exit;
-    /* initialize filter iterator: */
-    if (!NI_InitFilterIterator(input->nd, weights->dimensions, filter_size,
-                                                         input->dimensions, origins, &fi))
-        goto exit;
-    /* initialize input element iterator: */
-    if (!NI_InitPointIterator(input, &ii))
-        goto exit;
-    /* initialize output element iterator: */
-    if (!NI_InitPointIterator(output, &io))
-        goto exit;
-    /* get data pointers an array size: */
-    pi = (void *)PyArray_DATA(input);
-    po = (void *)PyArray_DATA(output);
-    size = 1;
-    for(ll = 0; ll < input->nd; ll++)
-        size *= input->dimensions[ll];
+    _StartPointFilter(pt, start, &ii, &io, &pi, &po, &oo);
     /* iterator over the elements: */
-    oo = offsets;
-    for(jj = 0; jj < size; jj++) {
+    for(jj = start; jj < stop; jj++) {
         double tmp = 0.0;
-        switch (input->descr->type_num) {
+        switch (pt->input->descr->type_num) {
             CASE_CORRELATE_POINT(pi, ww, oo, filter_size, cvalue, Bool,
                                                      tmp, border_flag_value);
             CASE_CORRELATE_POINT(pi, ww, oo, filter_size, cvalue, UInt8,
@@ -243,10 +617,9 @@ int NI_Correlate(PyArrayObject* input, PyArrayObject* weights,
             CASE_CORRELATE_POINT(pi, ww, oo, filter_size, cvalue, Float64,
                                                      tmp, border_flag_value);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "array type not supported");
-            goto exit;
+            return NI_THREAD_TYPE_NOT_SUPPORTED;
         }
-        switch (output->descr->type_num) {
+        switch (pt->output->descr->type_num) {
             CASE_FILTER_OUT(po, tmp, Bool);
             CASE_FILTER_OUT(po, tmp, UInt8);
             CASE_FILTER_OUT(po, tmp, UInt16);
@@ -261,143 +634,449 @@ int NI_Correlate(PyArrayObject* input, PyArrayObject* weights,
             CASE_FILTER_OUT(po, tmp, Float32);
             CASE_FILTER_OUT(po, tmp, Float64);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "array type not supported");
-            goto exit;
+            return NI_THREAD_TYPE_NOT_SUPPORTED;
         }
-        NI_FILTER_NEXT2(fi, ii, io, oo, pi, po);
+        NI_FILTER_NEXT2(pt->fi, ii, io, oo, pi, po);
     }
-exit:
-    if (offsets) free(offsets);
-    if (ww) free(ww);
-    if (pf) free(pf);
-    return PyErr_Occurred() ? 0 : 1;
+    return NI_THREAD_OK;
 }
 
-int
-NI_UniformFilter1D(PyArrayObject *input, npy_intp filter_size,
-                                     int axis, PyArrayObject *output, NI_ExtendMode mode,
-                   double cval, npy_intp origin)
+int NI_Correlate(PyArrayObject* input, PyArrayObject* weights,
+                                                PyArrayObject* output, NI_ExtendMode mode,
+                 double cvalue, npy_intp *origins, int workers)
 {
-    npy_intp lines, kk, ll, length, size1, size2;
-    int more;
-    double *ibuffer = NULL, *obuffer = NULL;
-    NI_LineBuffer iline_buffer, oline_buffer;
+    Bool *pf = NULL;
+    npy_intp fsize, jj, kk, filter_size = 0;
+    Float64 *pw;
+    Float64 *ww = NULL;
+    _CorrelateData cd;
+    int ll;
 
-    size1 = filter_size / 2;
-    size2 = filter_size - size1 - 1;
-    /* allocate and initialize the line buffers: */
-    lines = -1;
-    if (!NI_AllocateLineBuffer(input, axis, size1 + origin, size2 - origin,
-                                                         &lines, BUFFER_SIZE, &ibuffer))
-        goto exit;
-    if (!NI_AllocateLineBuffer(output, axis, 0, 0, &lines, BUFFER_SIZE,
-                                                         &obuffer))
+    cd.pt.offsets = NULL;
+    /* get the the footprint: */
+    fsize = 1;
+    for(ll = 0; ll < weights->nd; ll++)
+        fsize *= weights->dimensions[ll];
+    pw = (Float64*)PyArray_DATA(weights);
+    pf = (Bool*)malloc(fsize * sizeof(Bool));
+    if (!pf) {
+        PyErr_NoMemory();
         goto exit;
-    if (!NI_InitLineBuffer(input, axis, size1 + origin, size2 - origin,
-                                                            lines, ibuffer, mode, cval, &iline_buffer))
+    }
+    for(jj = 0; jj < fsize; jj++) {
+        if (fabs(pw[jj]) > DBL_EPSILON) {
+            pf[jj] = 1;
+            ++filter_size;
+        } else {
+            pf[jj] = 0;
+        }
+    }
+    /* copy the weights to contiguous memory: */
+    ww = (Float64*)malloc(filter_size * sizeof(Float64));
+    if (!ww) {
+        PyErr_NoMemory();
         goto exit;
-    if (!NI_InitLineBuffer(output, axis, 0, 0, lines, obuffer, mode, 0.0,
-                                                 &oline_buffer))
+    }
+    jj = 0;
+    for(kk = 0; kk < fsize; kk++) {
+        if (pf[kk]) {
+            ww[jj++] = pw[kk];
+        }
+    }
+    if (!_InitPointFilter(input, pf, weights->dimensions, filter_size,
+                          output, mode, cvalue, origins, &(cd.pt)))
         goto exit;
-    length = input->nd > 0 ? input->dimensions[axis] : 1;
+    cd.weights = ww;
+    NI_RunThreads(_CorrelatePoints, &cd, _PointFilterSize(&(cd.pt)),
+                  workers);
+exit:
+    if (cd.pt.offsets) free(cd.pt.offsets);
+    if (ww) free(ww);
+    if (pf) free(pf);
+    return PyErr_Occurred() ? 0 : 1;
+}
 
-    /* iterate over all the array lines: */
-    do {
-        /* copy lines from array to buffer: */
-        if (!NI_ArrayToLineBuffer(&iline_buffer, &lines, &more))
-            goto exit;
-        /* iterate over the lines in the buffers: */
-        for(kk = 0; kk < lines; kk++) {
-            /* get lines: */
-            double *iline = NI_GET_LINE(iline_buffer, kk);
-            double *oline = NI_GET_LINE(oline_buffer, kk);
-            /* do the uniform filter: */
-            double tmp = 0.0;
-            double *l1 = iline;
-            double *l2 = iline + filter_size;
-            for(ll = 0; ll < filter_size; ll++)
-                tmp += iline[ll];
-            tmp /= (double)filter_size;
-            oline[0] = tmp;
-            for(ll = 1; ll < length; ll++) {
-                tmp += (*l2++ - *l1++) / (double)filter_size;
-                oline[ll] = tmp;
-            }
-        }
-        /* copy lines from buffer to array: */
-        if (!NI_LineBufferToArray(&oline_buffer))
-            goto exit;
-    } while(more);
+static void
+_UniformFilter1DLine(double *iline, double *oline, npy_intp length,
+                     void *data, double *work)
+{
+    npy_intp ll, filter_size = *(npy_intp*)data;
+    /* do the uniform filter: */
+    double tmp = 0.0;
+    double *l1 = iline;
+    double *l2 = iline + filter_size;
+    for(ll = 0; ll < filter_size; ll++)
+        tmp += iline[ll];
+    tmp /= (double)filter_size;
+    oline[0] = tmp;
+    for(ll = 1; ll < length; ll++) {
+        tmp += (*l2++ - *l1++) / (double)filter_size;
+        oline[ll] = tmp;
+    }
+}
 
- exit:
-    if (ibuffer) free(ibuffer);
-    if (obuffer) free(obuffer);
-    return PyErr_Occurred() ? 0 : 1;
+/* The running sum is kept in double precision: */
+static void
+_UniformFilter1DFloatLine(float *iline, float *oline, npy_intp length,
+                          void *data, float *work)
+{
+    npy_intp ll, filter_size = *(npy_intp*)data;
+    double tmp = 0.0;
+    float *l1 = iline;
+    float *l2 = iline + filter_size;
+    for(ll = 0; ll < filter_size; ll++)
+        tmp += iline[ll];
+    oline[0] = (float)(tmp / (double)filter_size);
+    for(ll = 1; ll < length; ll++) {
+        tmp += (double)*l2++ - (double)*l1++;
+        oline[ll] = (float)(tmp / (double)filter_size);
+    }
 }
 
 int
-NI_MinOrMaxFilter1D(PyArrayObject *input, npy_intp filter_size,
-                                        int axis, PyArrayObject *output, NI_ExtendMode mode,
-                    double cval, npy_intp origin, int minimum)
+NI_UniformFilter1D(PyArrayObject *input, npy_intp filter_size,
+                                     int axis, PyArrayObject *output, NI_ExtendMode mode,
+                   double cval, npy_intp origin, int single, int workers,
+                   npy_intp buffer_size)
 {
-    npy_intp lines, kk, jj, ll, length, size1, size2;
-    int more;
-    double *ibuffer = NULL, *obuffer = NULL;
-    NI_LineBuffer iline_buffer, oline_buffer;
+    npy_intp size1, size2;
 
     size1 = filter_size / 2;
     size2 = filter_size - size1 - 1;
-    /* allocate and initialize the line buffers: */
-    lines = -1;
-    if (!NI_AllocateLineBuffer(input, axis, size1 + origin, size2 - origin,
-                                                         &lines, BUFFER_SIZE, &ibuffer))
-        goto exit;
-    if (!NI_AllocateLineBuffer(output, axis, 0, 0, &lines, BUFFER_SIZE,
-                                                         &obuffer))
-        goto exit;
-    if (!NI_InitLineBuffer(input, axis, size1 + origin, size2 - origin,
-                                                             lines, ibuffer, mode, cval, &iline_buffer))
-        goto exit;
-    if (!NI_InitLineBuffer(output, axis, 0, 0, lines, obuffer, mode, 0.0,
-                                                 &oline_buffer))
-        goto exit;
+    return _LineFilter(input, axis, output, size1 + origin, size2 - origin,
+                       mode, cval, _UniformFilter1DLine,
+                       single ? _UniformFilter1DFloatLine : NULL,
+                       &filter_size, 0, workers, buffer_size);
+}
+
+/* Gaussian filtering with the fourth order recursive approximation of
+   R. Deriche, "Recursively implementing the Gaussian and its
+   derivatives", INRIA Research Report 1893 (1993). The kernel is
+   approximated for x >= 0 by a sum of two damped cosines and sines,
+   which is implemented as two complex first order filters in the
+   causal direction and two in the anti-causal direction, so that the
+   cost per element does not depend on sigma. The maximum error of the
+   kernel is about 5e-4 of its peak value. */
+
+typedef struct {
+    double zr[2], zi[2];   /* the poles */
+    double ar[2], ai[2];   /* the normalized weights of the poles */
+    double sr[2], si[2];   /* causal steady state gain: a / (1 - z) */
+    double tr[2], ti[2];   /* anti-causal steady state gain: a z / (1 - z) */
+} _DericheGaussian;
+
+static void
+_InitDericheGaussian(double sigma, _DericheGaussian *dg)
+{
+    static const double a[2] = {1.680, -0.6803}, c[2] = {3.735, -0.2598};
+    static const double b[2] = {1.783, 1.723}, w[2] = {0.6318, 1.997};
+    double norm = 0.0;
+    int kk;
+
+    for(kk = 0; kk < 2; kk++) {
+        double dr, di, dd, nr, ni;
+        dg->zr[kk] = exp(-b[kk] / sigma) * cos(w[kk] / sigma);
+        dg->zi[kk] = exp(-b[kk] / sigma) * sin(w[kk] / sigma);
+        dg->ar[kk] = a[kk];
+        dg->ai[kk] = -c[kk];
+        /* add the real part of a (1 + z) / (1 - z), the sum of the
+           kernel for this pole, to the normalization: */
+        dr = 1.0 - dg->zr[kk];
+        di = -dg->zi[kk];
+        dd = dr * dr + di * di;
+        nr = 1.0 + dg->zr[kk];
+        ni = dg->zi[kk];
+        norm += (dg->ar[kk] * ((nr * dr + ni * di) / dd) -
+                 dg->ai[kk] * ((ni * dr - nr * di) / dd));
+    }
+    for(kk = 0; kk < 2; kk++) {
+        double dr = 1.0 - dg->zr[kk], di = -dg->zi[kk];
+        double dd = dr * dr + di * di;
+        dg->ar[kk] /= norm;
+        dg->ai[kk] /= norm;
+        dg->sr[kk] = (dg->ar[kk] * dr + dg->ai[kk] * di) / dd;
+        dg->si[kk] = (dg->ai[kk] * dr - dg->ar[kk] * di) / dd;
+        dg->tr[kk] = dg->sr[kk] * dg->zr[kk] - dg->si[kk] * dg->zi[kk];
+        dg->ti[kk] = dg->sr[kk] * dg->zi[kk] + dg->si[kk] * dg->zr[kk];
+    }
+}
+
+/* Filter a line, which is assumed to continue with its first and last
+   values beyond its ends: */
+static void
+_DericheGaussianLine(double *iline, double *oline, npy_intp size,
+                     _DericheGaussian *dg)
+{
+    npy_intp ll;
+    int kk;
+    double pr[2], pi[2];
+
+    for(kk = 0; kk < 2; kk++) {
+        pr[kk] = dg->sr[kk] * iline[0];
+        pi[kk] = dg->si[kk] * iline[0];
+    }
+    for(ll = 0; ll < size; ll++) {
+        double tmp = 0.0;
+        for(kk = 0; kk < 2; kk++) {
+            double tr = dg->zr[kk] * pr[kk] - dg->zi[kk] * pi[kk];
+            double ti = dg->zr[kk] * pi[kk] + dg->zi[kk] * pr[kk];
+            pr[kk] = dg->ar[kk] * iline[ll] + tr;
+            pi[kk] = dg->ai[kk] * iline[ll] + ti;
+            tmp += pr[kk];
+        }
+        oline[ll] = tmp;
+    }
+    for(kk = 0; kk < 2; kk++) {
+        pr[kk] = dg->tr[kk] * iline[size - 1];
+        pi[kk] = dg->ti[kk] * iline[size - 1];
+    }
+    oline[size - 1] += pr[0] + pr[1];
+    for(ll = size - 2; ll >= 0; ll--) {
+        for(kk = 0; kk < 2; kk++) {
+            double tr = dg->ar[kk] * iline[ll + 1] + pr[kk];
+            double ti = dg->ai[kk] * iline[ll + 1] + pi[kk];
+            pr[kk] = dg->zr[kk] * tr - dg->zi[kk] * ti;
+            pi[kk] = dg->zr[kk] * ti + dg->zi[kk] * tr;
+        }
+        oline[ll] += pr[0] + pr[1];
+    }
+}
+
+typedef struct {
+    _DericheGaussian dg;
+    npy_intp extend;
+    int order;
+} _RecursiveGaussianData;
+
+static void
+_RecursiveGaussianLine(double *iline, double *oline, npy_intp length,
+                       void *data, double *tmp)
+{
+    _RecursiveGaussianData *rd = (_RecursiveGaussianData*)data;
+    npy_intp ll, extend = rd->extend, size = length + 2 * extend;
+    double *sline = tmp + extend;
+
+    _DericheGaussianLine(iline, tmp, size, &(rd->dg));
+    if (rd->order > 0) {
+        _DericheGaussianLine(tmp, iline, size, &(rd->dg));
+        sline = iline + extend;
+    }
+    switch (rd->order) {
+    case 1:
+        for(ll = 0; ll < length; ll++)
+            oline[ll] = (8.0 * (sline[ll + 1] - sline[ll - 1]) -
+                         sline[ll + 2] + sline[ll - 2]) / 12.0;
+        break;
+    case 2:
+        for(ll = 0; ll < length; ll++)
+            oline[ll] = (16.0 * (sline[ll + 1] + sline[ll - 1]) -
+                         30.0 * sline[ll] - sline[ll + 2] -
+                         sline[ll - 2]) / 12.0;
+        break;
+    case 3:
+        for(ll = 0; ll < length; ll++)
+            oline[ll] = (8.0 * (sline[ll + 2] - sline[ll - 2]) -
+                         13.0 * (sline[ll + 1] - sline[ll - 1]) -
+                         sline[ll + 3] + sline[ll - 3]) / 8.0;
+        break;
+    default:
+        for(ll = 0; ll < length; ll++)
+            oline[ll] = sline[ll];
+        break;
+    }
+}
+
+/* The lines are extended by 4 sigma on both sides, like the kernel of
+   the direct implementation, to let the filter settle before it reaches
+   the data. Derivatives are calculated by finite differences of fourth
+   order accuracy. Since the approximated kernel is not smooth at zero,
+   they are taken after filtering twice with sigma / sqrt(2). */
+int
+NI_RecursiveGaussianFilter1D(PyArrayObject *input, double sigma, int order,
+                             int axis, PyArrayObject *output,
+                             NI_ExtendMode mode, double cval, int workers,
+                             npy_intp buffer_size)
+{
+    npy_intp length;
+    _RecursiveGaussianData rd;
+
+    if (sigma < 0.5) {
+        PyErr_SetString(PyExc_RuntimeError, "sigma must be at least 0.5");
+        return 0;
+    }
+    if (order < 0 || order > 3) {
+        PyErr_SetString(PyExc_RuntimeError, "order must be 0, 1, 2 or 3");
+        return 0;
+    }
+    _InitDericheGaussian(order > 0 ? sigma / sqrt(2.0) : sigma, &(rd.dg));
+    rd.extend = (npy_intp)(4.0 * sigma + 0.5) + 3;
+    rd.order = order;
     length = input->nd > 0 ? input->dimensions[axis] : 1;
+    return _LineFilter(input, axis, output, rd.extend, rd.extend, mode, cval,
+                       _RecursiveGaussianLine, NULL, &rd,
+                       length + 2 * rd.extend, workers, buffer_size);
+}
 
-    /* iterate over all the array lines: */
-    do {
-        /* copy lines from array to buffer: */
-        if (!NI_ArrayToLineBuffer(&iline_buffer, &lines, &more))
-            goto exit;
-        /* iterate over the lines in the buffers: */
-        for(kk = 0; kk < lines; kk++) {
-            /* get lines: */
-            double *iline = NI_GET_LINE(iline_buffer, kk) + size1;
-            double *oline = NI_GET_LINE(oline_buffer, kk);
-            for(ll = 0; ll < length; ll++) {
-            /* find minimum or maximum filter: */
-                double val = iline[ll - size1];
-                for(jj = -size1 + 1; jj <= size2; jj++) {
-                    double tmp = iline[ll + jj];
-                    if (minimum) {
-                        if (tmp < val)
-                            val = tmp;
-                    } else {
-                        if (tmp > val)
-                            val = tmp;
-                    }
-                }
-                oline[ll] = val;
+/* The van Herk/Gil-Werman algorithm computes a running minimum or
+   maximum with three comparisons per element, independent of the
+   filter size. It is used for filters larger than this size: */
+#define VHGW_MIN_FILTER_SIZE 4
+
+/* Running minimum or maximum over an extended line of length
+   length + filter_size - 1. The line is divided into blocks of
+   filter_size elements, for which the running extrema are calculated
+   forwards (into fwd) and backwards (into bwd). Every window then
+   consists of the tail of one block and the head of the next: */
+#define VHGW_BLOCKS(_iline, _size, _filter_size, _fwd, _bwd, _op)         \
+{                                                                         \
+    npy_intp _ll, _start, _end;                                           \
+    for(_start = 0; _start < _size; _start += _filter_size) {             \
+        _end = _start + _filter_size;                                     \
+        if (_end > _size)                                                 \
+            _end = _size;                                                 \
+        (_fwd)[_start] = (_iline)[_start];                                \
+        for(_ll = _start + 1; _ll < _end; _ll++)                          \
+            (_fwd)[_ll] = _op((_iline)[_ll], (_fwd)[_ll - 1]);            \
+        (_bwd)[_end - 1] = (_iline)[_end - 1];                            \
+        for(_ll = _end - 2; _ll >= _start; _ll--)                         \
+            (_bwd)[_ll] = _op((_iline)[_ll], (_bwd)[_ll + 1]);            \
+    }                                                                     \
+}
+
+/* The direct comparisons, as in the smaller filters, give NaN if the
+   first value of a window is NaN, and otherwise ignore NaN values. For
+   lines that contain NaN values, the running extrema therefore ignore
+   them, and a window gives NaN only if its first value is NaN: */
+#define VHGW_LINE(_iline, _length, _filter_size, _oline, _fwd, _bwd, _op,  \
+                  _nanop)                                                 \
+{                                                                         \
+    npy_intp _ii, _size = (_length) + (_filter_size) - 1;                 \
+    int _nan = 0;                                                         \
+    for(_ii = 0; _ii < _size; _ii++)                                      \
+        _nan |= (_iline)[_ii] != (_iline)[_ii];                           \
+    if (_nan) {                                                           \
+        VHGW_BLOCKS(_iline, _size, _filter_size, _fwd, _bwd, _nanop);     \
+        for(_ii = 0; _ii < _length; _ii++)                                \
+            (_oline)[_ii] = (_iline)[_ii] != (_iline)[_ii] ?              \
+                (_iline)[_ii] :                                           \
+                _nanop((_fwd)[_ii + _filter_size - 1], (_bwd)[_ii]);      \
+    } else {                                                              \
+        VHGW_BLOCKS(_iline, _size, _filter_size, _fwd, _bwd, _op);        \
+        for(_ii = 0; _ii < _length; _ii++)                                \
+            (_oline)[_ii] = _op((_fwd)[_ii + _filter_size - 1],           \
+                                (_bwd)[_ii]);                             \
+    }                                                                     \
+}
+
+#define VHGW_MIN(_a, _b) ((_a) < (_b) ? (_a) : (_b))
+#define VHGW_MAX(_a, _b) ((_a) > (_b) ? (_a) : (_b))
+
+/* the minimum or maximum of two values, of which a NaN value is ignored,
+   unless both are NaN: */
+#define VHGW_NANMIN(_a, _b) ((_a) < (_b) || (_b) != (_b) ? (_a) : (_b))
+#define VHGW_NANMAX(_a, _b) ((_a) > (_b) || (_b) != (_b) ? (_a) : (_b))
+
+typedef struct {
+    npy_intp filter_size, size1, size2;
+    int minimum;
+} _MinOrMaxFilter1DData;
+
+static void
+_MinOrMaxFilter1DLine(double *iline, double *oline, npy_intp length,
+                      void *data, double *fwd)
+{
+    _MinOrMaxFilter1DData *md = (_MinOrMaxFilter1DData*)data;
+    npy_intp ll, jj, filter_size = md->filter_size;
+    npy_intp size1 = md->size1, size2 = md->size2;
+    int minimum = md->minimum;
+
+    if (filter_size >= VHGW_MIN_FILTER_SIZE) {
+        double *bwd = fwd + length + filter_size;
+        if (minimum) {
+            VHGW_LINE(iline, length, filter_size, oline, fwd, bwd,
+                      VHGW_MIN, VHGW_NANMIN);
+        } else {
+            VHGW_LINE(iline, length, filter_size, oline, fwd, bwd,
+                      VHGW_MAX, VHGW_NANMAX);
+        }
+        return;
+    }
+    iline += size1;
+    for(ll = 0; ll < length; ll++) {
+    /* find minimum or maximum filter: */
+        double val = iline[ll - size1];
+        for(jj = -size1 + 1; jj <= size2; jj++) {
+            double tmp = iline[ll + jj];
+            if (minimum) {
+                if (tmp < val)
+                    val = tmp;
+            } else {
+                if (tmp > val)
+                    val = tmp;
             }
         }
-        /* copy lines from buffer to array: */
-        if (!NI_LineBufferToArray(&oline_buffer))
-            goto exit;
-    } while(more);
+        oline[ll] = val;
+    }
+}
 
- exit:
-    if (ibuffer) free(ibuffer);
-    if (obuffer) free(obuffer);
-    return PyErr_Occurred() ? 0 : 1;
+static void
+_MinOrMaxFilter1DFloatLine(float *iline, float *oline, npy_intp length,
+                           void *data, float *fwd)
+{
+    _MinOrMaxFilter1DData *md = (_MinOrMaxFilter1DData*)data;
+    npy_intp ll, jj, filter_size = md->filter_size;
+    npy_intp size1 = md->size1, size2 = md->size2;
+    int minimum = md->minimum;
+
+    if (filter_size >= VHGW_MIN_FILTER_SIZE) {
+        float *bwd = fwd + length + filter_size;
+        if (minimum) {
+            VHGW_LINE(iline, length, filter_size, oline, fwd, bwd,
+                      VHGW_MIN, VHGW_NANMIN);
+        } else {
+            VHGW_LINE(iline, length, filter_size, oline, fwd, bwd,
+                      VHGW_MAX, VHGW_NANMAX);
+        }
+        return;
+    }
+    iline += size1;
+    for(ll = 0; ll < length; ll++) {
+        float val = iline[ll - size1];
+        for(jj = -size1 + 1; jj <= size2; jj++) {
+            float tmp = iline[ll + jj];
+            if (minimum) {
+                if (tmp < val)
+                    val = tmp;
+            } else {
+                if (tmp > val)
+                    val = tmp;
+            }
+        }
+        oline[ll] = val;
+    }
+}
+
+int
+NI_MinOrMaxFilter1D(PyArrayObject *input, npy_intp filter_size,
+                                        int axis, PyArrayObject *output, NI_ExtendMode mode,
+                    double cval, npy_intp origin, int minimum, int single,
+                    int workers, npy_intp buffer_size)
+{
+    npy_intp length, work_size = 0;
+    _MinOrMaxFilter1DData md;
+
+    md.filter_size = filter_size;
+    md.size1 = filter_size / 2;
+    md.size2 = filter_size - md.size1 - 1;
+    md.minimum = minimum;
+    length = input->nd > 0 ? input->dimensions[axis] : 1;
+    /* work space for the running extrema of the blocks: */
+    if (filter_size >= VHGW_MIN_FILTER_SIZE)
+        work_size = 2 * (length + filter_size);
+    return _LineFilter(input, axis, output, md.size1 + origin,
+                       md.size2 - origin, mode, cval, _MinOrMaxFilter1DLine,
+                       single ? _MinOrMaxFilter1DFloatLine : NULL, &md,
+                       work_size, workers, buffer_size);
 }
 
 
@@ -426,70 +1105,29 @@ case t ## _type:                                                  \
 }                                                                 \
 break
 
-int NI_MinOrMaxFilter(PyArrayObject* input, PyArrayObject* footprint,
-                PyArrayObject* structure, PyArrayObject* output,
-                      NI_ExtendMode mode, double cvalue, npy_intp *origins,
-                      int minimum)
+typedef struct {
+    _PointFilter pt;
+    double *ss;
+    int minimum;
+} _MinOrMaxData;
+
+static NI_ThreadStatus
+_MinOrMaxPoints(void *data, npy_intp start, npy_intp stop)
 {
-    Bool *pf = NULL;
-    npy_intp fsize, jj, kk, filter_size = 0, border_flag_value;
-    npy_intp *offsets = NULL, *oo, size;
-    NI_FilterIterator fi;
+    _MinOrMaxData *md = (_MinOrMaxData*)data;
+    _PointFilter *pt = &(md->pt);
     NI_Iterator ii, io;
+    npy_intp jj, *oo, filter_size = pt->filter_size;
+    npy_intp border_flag_value = pt->border_flag_value;
+    double cvalue = pt->cvalue, *ss = md->ss;
+    int minimum = md->minimum;
     char *pi, *po;
-    int ll;
-    double *ss = NULL;
-    Float64 *ps;
 
-    /* get the the footprint: */
-    fsize = 1;
-    for(ll = 0; ll < footprint->nd; ll++)
-        fsize *= footprint->dimensions[ll];
-    pf = (Bool*)PyArray_DATA(footprint);
-    for(jj = 0; jj < fsize; jj++) {
-        if (pf[jj]) {
-            ++filter_size;
-        }
-    }
-    /* get the structure: */
-    if (structure) {
-        ss = (double*)malloc(filter_size * sizeof(double));
-        if (!ss) {
-            PyErr_NoMemory();
-            goto exit;
-        }
-        /* copy the weights to contiguous memory: */
-        ps = (Float64*)PyArray_DATA(structure);
-        jj = 0;
-        for(kk = 0; kk < fsize; kk++)
-            if (pf[kk])
-                ss[jj++] = minimum ? -ps[kk] : ps[kk];
-    }
-    /* initialize filter offsets: */
-    if (!NI_InitFilterOffsets(input, pf, footprint->dimensions, origins,
-                                                        mode, &offsets, &border_flag_value, NULL))
-        goto exit;
-    /* initialize filter iterator: */
-    if (!NI_InitFilterIterator(input->nd, footprint->dimensions,
-                                                         filter_size, input->dimensions, origins, &fi))
-        goto exit;
-    /* initialize input element iterator: */
-    if (!NI_InitPointIterator(input, &ii))
-        goto exit;
-    /* initialize output element iterator: */
-    if (!NI_InitPointIterator(output, &io))
-        goto exit;
-    /* get data pointers an array size: */
-    pi = (void *)PyArray_DATA(input);
-    po = (void *)PyArray_DATA(output);
-    size = 1;
-    for(ll = 0; ll < input->nd; ll++)
-        size *= input->dimensions[ll];
+    _StartPointFilter(pt, start, &ii, &io, &pi, &po, &oo);
     /* iterator over the elements: */
-    oo = offsets;
-    for(jj = 0; jj < size; jj++) {
+    for(jj = start; jj < stop; jj++) {
         double tmp = 0.0;
-        switch (input->descr->type_num) {
+        switch (pt->input->descr->type_num) {
             CASE_MIN_OR_MAX_POINT(pi, oo, filter_size, cvalue, Bool,
                                                         minimum, tmp, border_flag_value, ss);
             CASE_MIN_OR_MAX_POINT(pi, oo, filter_size, cvalue, UInt8,
@@ -515,10 +1153,9 @@ int NI_MinOrMaxFilter(PyArrayObject* input, PyArrayObject* footprint,
             CASE_MIN_OR_MAX_POINT(pi, oo, filter_size, cvalue, Float64,
                                                         minimum, tmp, border_flag_value, ss);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "array type not supported");
-            goto exit;
+            return NI_THREAD_TYPE_NOT_SUPPORTED;
         }
-        switch (output->descr->type_num) {
+        switch (pt->output->descr->type_num) {
             CASE_FILTER_OUT(po, tmp, Bool);
             CASE_FILTER_OUT(po, tmp, UInt8);
             CASE_FILTER_OUT(po, tmp, UInt16);
@@ -533,80 +1170,26 @@ int NI_MinOrMaxFilter(PyArrayObject* input, PyArrayObject* footprint,
             CASE_FILTER_OUT(po, tmp, Float32);
             CASE_FILTER_OUT(po, tmp, Float64);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "array type not supported");
-            goto exit;
-        }
-        NI_FILTER_NEXT2(fi, ii, io, oo, pi, po);
-    }
-exit:
-    if (offsets) free(offsets);
-    if (ss) free(ss);
-    return PyErr_Occurred() ? 0 : 1;
-}
-
-static double NI_Select(double *buffer, int min, int max, int rank)
-{
-    int ii, jj;
-    double x, t;
-
-    if (min == max)
-        return buffer[min];
-
-    x = buffer[min];
-    ii = min - 1;
-    jj = max + 1;
-    for(;;) {
-        do
-            jj--;
-        while(buffer[jj] > x);
-        do
-            ii++;
-        while(buffer[ii] < x);
-        if (ii < jj) {
-            t = buffer[ii];
-            buffer[ii] = buffer[jj];
-            buffer[jj] = t;
-        } else {
-            break;
+            return NI_THREAD_TYPE_NOT_SUPPORTED;
         }
+        NI_FILTER_NEXT2(pt->fi, ii, io, oo, pi, po);
     }
-
-    ii = jj - min + 1;
-    if (rank < ii)
-        return NI_Select(buffer, min, jj, rank);
-    else
-        return NI_Select(buffer, jj + 1, max, rank - ii);
+    return NI_THREAD_OK;
 }
 
-#define CASE_RANK_POINT(_pi, _offsets, _filter_size, _cval, _type, \
-                                                _rank, _buffer, _res, _mv)                 \
-case t ## _type:                                                   \
-{                                                                  \
-    npy_intp _ii;                                                  \
-    for(_ii = 0; _ii < _filter_size; _ii++) {                        \
-        npy_intp _offset = _offsets[_ii];                          \
-        if (_offset == _mv)                                            \
-            _buffer[_ii] = (_type)_cval;                                 \
-        else                                                           \
-            _buffer[_ii] = *(_type*)(_pi + _offsets[_ii]);               \
-    }                                                                \
-    _res = (_type)NI_Select(_buffer, 0, _filter_size - 1, _rank);    \
-}                                                                  \
-break
-
-int NI_RankFilter(PyArrayObject* input, int rank,
-                                    PyArrayObject* footprint, PyArrayObject* output,
-                  NI_ExtendMode mode, double cvalue, npy_intp *origins)
+int NI_MinOrMaxFilter(PyArrayObject* input, PyArrayObject* footprint,
+                PyArrayObject* structure, PyArrayObject* output,
+                      NI_ExtendMode mode, double cvalue, npy_intp *origins,
+                      int minimum, int workers)
 {
-    npy_intp fsize, jj, filter_size = 0, border_flag_value;
-    npy_intp *offsets = NULL, *oo, size;
-    NI_FilterIterator fi;
-    NI_Iterator ii, io;
-    char *pi, *po;
     Bool *pf = NULL;
-    double *buffer = NULL;
+    npy_intp fsize, jj, kk, filter_size = 0;
     int ll;
+    double *ss = NULL;
+    Float64 *ps;
+    _MinOrMaxData md;
 
+    md.pt.offsets = NULL;
     /* get the the footprint: */
     fsize = 1;
     for(ll = 0; ll < footprint->nd; ll++)
@@ -617,111 +1200,1049 @@ int NI_RankFilter(PyArrayObject* input, int rank,
             ++filter_size;
         }
     }
-    /* buffer for rank calculation: */
-    buffer = (double*)malloc(filter_size * sizeof(double));
-    if (!buffer) {
-        PyErr_NoMemory();
-        goto exit;
-    }
-    /* iterator over the elements: */
-    oo = offsets;
-    /* initialize filter offsets: */
-    if (!NI_InitFilterOffsets(input, pf, footprint->dimensions, origins,
-                                                        mode, &offsets, &border_flag_value, NULL))
-        goto exit;
-    /* initialize filter iterator: */
-    if (!NI_InitFilterIterator(input->nd, footprint->dimensions,
-                                                         filter_size, input->dimensions, origins, &fi))
+    /* get the structure: */
+    if (structure) {
+        ss = (double*)malloc(filter_size * sizeof(double));
+        if (!ss) {
+            PyErr_NoMemory();
+            goto exit;
+        }
+        /* copy the weights to contiguous memory: */
+        ps = (Float64*)PyArray_DATA(structure);
+        jj = 0;
+        for(kk = 0; kk < fsize; kk++)
+            if (pf[kk])
+                ss[jj++] = minimum ? -ps[kk] : ps[kk];
+    }
+    if (!_InitPointFilter(input, pf, footprint->dimensions, filter_size,
+                          output, mode, cvalue, origins, &(md.pt)))
         goto exit;
-    /* initialize input element iterator: */
-    if (!NI_InitPointIterator(input, &ii))
+    md.ss = ss;
+    md.minimum = minimum;
+    NI_RunThreads(_MinOrMaxPoints, &md, _PointFilterSize(&(md.pt)),
+                  workers);
+exit:
+    if (md.pt.offsets) free(md.pt.offsets);
+    if (ss) free(ss);
+    return PyErr_Occurred() ? 0 : 1;
+}
+
+/* Select the elements of the given ascending ranks of the buffer
+     together: the buffer is partitioned around a pivot as by quickselect,
+     and each part is only searched further for the ranks that lie in it.
+     The values of the ranks are stored in values: */
+static void
+_SelectRanks(double *buffer, npy_intp min, npy_intp max, npy_intp *ranks,
+             int nranks, double *values)
+{
+    while (nranks > 0) {
+        npy_intp ii, jj;
+        int nleft = 0;
+        double x, t;
+
+        if (min == max) {
+            for(ii = 0; ii < nranks; ii++)
+                values[ii] = buffer[min];
+            return;
+        }
+        x = buffer[min];
+        ii = min - 1;
+        jj = max + 1;
+        for(;;) {
+            do
+                jj--;
+            while(buffer[jj] > x);
+            do
+                ii++;
+            while(buffer[ii] < x);
+            if (ii < jj) {
+                t = buffer[ii];
+                buffer[ii] = buffer[jj];
+                buffer[jj] = t;
+            } else {
+                break;
+            }
+        }
+        while (nleft < nranks && ranks[nleft] <= jj)
+            ++nleft;
+        if (nleft == nranks) {
+            max = jj;
+            continue;
+        }
+        if (nleft > 0)
+            _SelectRanks(buffer, min, jj, ranks, nleft, values);
+        ranks += nleft;
+        values += nleft;
+        nranks -= nleft;
+        min = jj + 1;
+    }
+}
+
+/* The estimated cost of selecting several ranks from the elements of a
+     footprint with _SelectRanks: each further rank only adds the search
+     of a part of the buffer. The sliding filters below are used if they
+     are cheaper for a single rank, since a single rank would use them in
+     a separate call, and their updates are shared by all ranks: */
+static double
+_SelectRanksCost(npy_intp filter_size, int nranks)
+{
+    return filter_size * (2.0 + log((double)nranks) / log(2.0));
+}
+
+/* Store the values of the ranks of an element, at the given offsets from
+     its position in the output: */
+static int
+_StoreRankValues(PyArrayObject *output, char *po, npy_intp *routs,
+                 double *values, int nranks)
+{
+    int kk;
+
+    for(kk = 0; kk < nranks; kk++) {
+        char *pr = po + routs[kk];
+        double tmp = values[kk];
+        switch (output->descr->type_num) {
+            CASE_FILTER_OUT(pr, tmp, Bool);
+            CASE_FILTER_OUT(pr, tmp, UInt8);
+            CASE_FILTER_OUT(pr, tmp, UInt16);
+            CASE_FILTER_OUT(pr, tmp, UInt32);
+#if HAS_UINT64
+            CASE_FILTER_OUT(pr, tmp, UInt64);
+#endif
+            CASE_FILTER_OUT(pr, tmp, Int8);
+            CASE_FILTER_OUT(pr, tmp, Int16);
+            CASE_FILTER_OUT(pr, tmp, Int32);
+            CASE_FILTER_OUT(pr, tmp, Int64);
+            CASE_FILTER_OUT(pr, tmp, Float32);
+            CASE_FILTER_OUT(pr, tmp, Float64);
+        default:
+            return 0;
+        }
+    }
+    return 1;
+}
+
+/* Rank filters can be calculated incrementally, by sliding the footprint
+     along a line and only updating the elements that enter and leave the
+     footprint. The following functions support iterating over the lines
+     of an array and finding the array offsets of the footprint elements,
+     using the virtual coordinates of the boundary extension along each
+     axis. */
+
+/* mark offsets that point outside the array in constant mode: */
+#define NI_FOOTPRINT_OUTSIDE NPY_MAX_INTP
+
+/* For each axis, map all positions that footprint elements can take
+     along the axis onto offsets in the array: */
+static int
+_InitFootprintMaps(PyArrayObject *input, npy_intp *fshape, npy_intp *origins,
+                   NI_ExtendMode mode, npy_intp **amaps)
+{
+    int ll;
+    npy_intp jj;
+
+    for(ll = 0; ll < input->nd; ll++)
+        amaps[ll] = NULL;
+    for(ll = 0; ll < input->nd; ll++) {
+        npy_intp len = input->dimensions[ll];
+        npy_intp nmap = len + fshape[ll] - 1;
+        npy_intp orgn = fshape[ll] / 2 + (origins ? origins[ll] : 0);
+        amaps[ll] = (npy_intp*)malloc(nmap * sizeof(npy_intp));
+        if (!amaps[ll]) {
+            PyErr_NoMemory();
+            return 0;
+        }
+        for(jj = 0; jj < nmap; jj++) {
+            npy_intp cc = NI_ExtendCoordinate(jj - orgn, len, mode);
+            amaps[ll][jj] = cc < 0 ? NI_FOOTPRINT_OUTSIDE :
+                                     cc * input->strides[ll];
+        }
+    }
+    return 1;
+}
+
+/* Calculate the offsets of the rows of the footprint along the sliding
+     axis, for the line at the given coordinates: */
+static void
+_FootprintRowOffsets(int nd, int axis, npy_intp *fshape, npy_intp **amaps,
+                     npy_intp *coordinates, npy_intp nrows,
+                     npy_intp *roffsets)
+{
+    int ll;
+    npy_intp kk, position[MAXDIM];
+
+    for(ll = 0; ll < nd; ll++)
+        position[ll] = 0;
+    for(kk = 0; kk < nrows; kk++) {
+        npy_intp offset = 0;
+        for(ll = 0; ll < nd; ll++) {
+            npy_intp oo;
+            if (ll == axis)
+                continue;
+            oo = amaps[ll][coordinates[ll] + position[ll]];
+            if (oo == NI_FOOTPRINT_OUTSIDE) {
+                offset = NI_FOOTPRINT_OUTSIDE;
+                break;
+            }
+            offset += oo;
+        }
+        roffsets[kk] = offset;
+        for(ll = nd - 1; ll >= 0; ll--) {
+            if (ll == axis)
+                continue;
+            if (position[ll] < fshape[ll] - 1) {
+                position[ll]++;
+                break;
+            } else {
+                position[ll] = 0;
+            }
+        }
+    }
+}
+
+/* Move the coordinates to the next line along the sliding axis, returns
+     zero if there are no more lines: */
+static int
+_NextFootprintLine(PyArrayObject *input, int axis, npy_intp *coordinates)
+{
+    int ll;
+
+    for(ll = input->nd - 1; ll >= 0; ll--) {
+        if (ll == axis)
+            continue;
+        if (coordinates[ll] < input->dimensions[ll] - 1) {
+            coordinates[ll]++;
+            return 1;
+        } else {
+            coordinates[ll] = 0;
+        }
+    }
+    return 0;
+}
+
+/* The coordinates of the line along the sliding axis with the given
+     index, and the number of lines: */
+static npy_intp
+_FootprintLineCoordinates(PyArrayObject *input, int axis, npy_intp index,
+                          npy_intp *coordinates)
+{
+    int ll;
+    npy_intp nlines = 1;
+
+    for(ll = input->nd - 1; ll >= 0; ll--) {
+        coordinates[ll] = 0;
+        if (ll == axis)
+            continue;
+        coordinates[ll] = index % input->dimensions[ll];
+        index /= input->dimensions[ll];
+        nlines *= input->dimensions[ll];
+    }
+    return nlines;
+}
+
+/* Rank filters of 8 and 16 bit unsigned integer data with a box shaped
+     footprint are calculated with a sliding histogram (Huang's
+     algorithm): moving the box one element along an axis only requires
+     removing and adding one slice of the footprint. The box slides along
+     its longest axis, preferring the last axis. The rank is found by
+     moving from its previous value through a two-level histogram, with
+     coarse bins of 256 values. */
+
+/* the axis along which the footprint slides: */
+static int
+_HistogramSlideAxis(PyArrayObject* input, npy_intp *fshape)
+{
+    int ll, axis = input->nd - 1;
+
+    for(ll = input->nd - 2; ll >= 0; ll--)
+        if (fshape[ll] > fshape[axis])
+            axis = ll;
+    return axis;
+}
+
+#define CASE_HISTOGRAM_UPDATE(_pi, _coffsets, _ncolumns, _loffset, _cbin, \
+                              _hist, _coarse, _rvalues, _below, _nranks, \
+                              _delta, _type)                            \
+case t ## _type:                                                        \
+{                                                                       \
+    npy_intp _cc, _bb;                                                  \
+    int _kk;                                                            \
+    for(_cc = 0; _cc < _ncolumns; _cc++) {                              \
+        if (_coffsets[_cc] == NI_FOOTPRINT_OUTSIDE ||                   \
+            _loffset == NI_FOOTPRINT_OUTSIDE)                           \
+            _bb = _cbin;                                                \
+        else                                                            \
+            _bb = *(_type*)(_pi + _coffsets[_cc] + _loffset);           \
+        _hist[_bb] += _delta;                                           \
+        _coarse[_bb >> 8] += _delta;                                    \
+        for(_kk = 0; _kk < _nranks; _kk++)                              \
+            if (_bb < _rvalues[_kk])                                    \
+                _below[_kk] += _delta;                                  \
+    }                                                                   \
+}                                                                       \
+break
+
+/* The histogram is used if updating it and searching the ranks is
+     estimated to be cheaper than selecting the ranks from all elements.
+     The histogram is shared by all ranks, each keeping its own position: */
+static int
+_UseHistogramRankFilter(PyArrayObject* input, npy_intp *fshape,
+                        npy_intp filter_size, int nranks)
+{
+    npy_intp nenter, search;
+    int axis = _HistogramSlideAxis(input, fshape);
+
+    if (input->descr->type_num == tUInt8) {
+        search = 4;
+    } else if (input->descr->type_num == tUInt16) {
+        search = 32;
+    } else {
+        return 0;
+    }
+    nenter = filter_size / fshape[axis];
+    return 3 * nenter + search < _SelectRanksCost(filter_size, 1) ||
+           (2 + nranks) * nenter + search * nranks <
+           _SelectRanksCost(filter_size, nranks);
+}
+
+typedef struct {
+    PyArrayObject *input, *output;
+    npy_intp *fshape, **amaps, ncolumns, nbins, cbin, *ranks, *routs;
+    int axis, nranks;
+} _HistogramRankData;
+
+static NI_ThreadStatus
+_HistogramRankLines(void *data, npy_intp start, npy_intp stop)
+{
+    _HistogramRankData *hd = (_HistogramRankData*)data;
+    PyArrayObject *input = hd->input, *output = hd->output;
+    int ll, rr, axis = hd->axis, nranks = hd->nranks;
+    npy_intp jj, kk, nn, length, nbins = hd->nbins, cbin = hd->cbin;
+    npy_intp ncolumns = hd->ncolumns, *fshape = hd->fshape;
+    npy_intp *ranks = hd->ranks, *routs = hd->routs, *rvalues, *below;
+    npy_intp *hist = NULL, *coarse, *coffsets, **amaps = hd->amaps;
+    npy_intp coordinates[MAXDIM];
+    double *values = NULL;
+    char *pi, *po;
+
+    hist = (npy_intp*)calloc(nbins + nbins / 256 + ncolumns + 2 * nranks,
+                             sizeof(npy_intp));
+    values = (double*)malloc(nranks * sizeof(double));
+    if (!hist || !values) {
+        free(hist);
+        free(values);
+        return NI_THREAD_NO_MEMORY;
+    }
+    coarse = hist + nbins;
+    /* offsets of the columns of the footprint along the sliding axis: */
+    coffsets = coarse + nbins / 256;
+    /* the value of each rank, and the number of elements below it: */
+    rvalues = coffsets + ncolumns;
+    below = rvalues + nranks;
+    length = input->dimensions[axis];
+    pi = (void *)PyArray_DATA(input);
+    _FootprintLineCoordinates(input, axis, start, coordinates);
+    /* iterate over the lines along the sliding axis: */
+    for(nn = start; nn < stop; nn++) {
+        /* calculate the column offsets for this line: */
+        _FootprintRowOffsets(input->nd, axis, fshape, amaps, coordinates,
+                             ncolumns, coffsets);
+        po = (void *)PyArray_DATA(output);
+        for(ll = 0; ll < input->nd; ll++)
+            po += coordinates[ll] * output->strides[ll];
+        /* fill the histogram with the first footprint position: */
+        for(jj = 0; jj < fshape[axis]; jj++) {
+            switch (input->descr->type_num) {
+                CASE_HISTOGRAM_UPDATE(pi, coffsets, ncolumns, amaps[axis][jj],
+                                      cbin, hist, coarse, rvalues, below,
+                                      nranks, 1, UInt8);
+                CASE_HISTOGRAM_UPDATE(pi, coffsets, ncolumns, amaps[axis][jj],
+                                      cbin, hist, coarse, rvalues, below,
+                                      nranks, 1, UInt16);
+            default:
+                break;
+            }
+        }
+        for(jj = 0; jj < length; jj++) {
+            for(rr = 0; rr < nranks; rr++) {
+                npy_intp rank = ranks[rr], rvalue = rvalues[rr];
+                npy_intp nbelow = below[rr];
+                /* move the rank value down or up to its new position: */
+                while (nbelow > rank) {
+                    if ((rvalue & 0xff) == 0 &&
+                            nbelow - coarse[(rvalue >> 8) - 1] > rank) {
+                        rvalue -= 256;
+                        nbelow -= coarse[rvalue >> 8];
+                    } else {
+                        --rvalue;
+                        nbelow -= hist[rvalue];
+                    }
+                }
+                while (nbelow + hist[rvalue] <= rank) {
+                    if ((rvalue & 0xff) == 0 &&
+                            nbelow + coarse[rvalue >> 8] <= rank) {
+                        nbelow += coarse[rvalue >> 8];
+                        rvalue += 256;
+                    } else {
+                        nbelow += hist[rvalue];
+                        ++rvalue;
+                    }
+                }
+                rvalues[rr] = rvalue;
+                below[rr] = nbelow;
+                values[rr] = (double)rvalue;
+            }
+            if (!_StoreRankValues(output, po, routs, values, nranks)) {
+                free(hist);
+                free(values);
+                return NI_THREAD_TYPE_NOT_SUPPORTED;
+            }
+            po += output->strides[axis];
+            /* slide the footprint, at the end of the line it is removed
+                 completely to leave an empty histogram: */
+            switch (input->descr->type_num) {
+                CASE_HISTOGRAM_UPDATE(pi, coffsets, ncolumns, amaps[axis][jj],
+                                      cbin, hist, coarse, rvalues, below,
+                                      nranks, -1, UInt8);
+                CASE_HISTOGRAM_UPDATE(pi, coffsets, ncolumns, amaps[axis][jj],
+                                      cbin, hist, coarse, rvalues, below,
+                                      nranks, -1, UInt16);
+            default:
+                break;
+            }
+            if (jj < length - 1) {
+                kk = jj + fshape[axis];
+                switch (input->descr->type_num) {
+                    CASE_HISTOGRAM_UPDATE(pi, coffsets, ncolumns,
+                                          amaps[axis][kk], cbin, hist, coarse,
+                                          rvalues, below, nranks, 1,
+                                          UInt8);
+                    CASE_HISTOGRAM_UPDATE(pi, coffsets, ncolumns,
+                                          amaps[axis][kk], cbin, hist, coarse,
+                                          rvalues, below, nranks, 1,
+                                          UInt16);
+                default:
+                    break;
+                }
+            }
+        }
+        for(jj = length; jj < length + fshape[axis] - 1; jj++) {
+            switch (input->descr->type_num) {
+                CASE_HISTOGRAM_UPDATE(pi, coffsets, ncolumns, amaps[axis][jj],
+                                      cbin, hist, coarse, rvalues, below,
+                                      nranks, -1, UInt8);
+                CASE_HISTOGRAM_UPDATE(pi, coffsets, ncolumns, amaps[axis][jj],
+                                      cbin, hist, coarse, rvalues, below,
+                                      nranks, -1, UInt16);
+            default:
+                break;
+            }
+        }
+        _NextFootprintLine(input, axis, coordinates);
+    }
+    free(hist);
+    free(values);
+    return NI_THREAD_OK;
+}
+
+static int
+_HistogramRankFilter(PyArrayObject* input, npy_intp *ranks, npy_intp *routs,
+                     int nranks, npy_intp *fshape, PyArrayObject* output,
+                     NI_ExtendMode mode, double cvalue, npy_intp *origins,
+                     int workers)
+{
+    int ll;
+    npy_intp size = 1, nlines, coordinates[MAXDIM];
+    npy_intp *amaps[MAXDIM];
+    _HistogramRankData hd;
+
+    hd.axis = _HistogramSlideAxis(input, fshape);
+    hd.ncolumns = 1;
+    for(ll = 0; ll < input->nd; ll++) {
+        amaps[ll] = NULL;
+        size *= input->dimensions[ll];
+        if (ll != hd.axis)
+            hd.ncolumns *= fshape[ll];
+    }
+    if (size == 0)
+        return 1;
+    if (input->descr->type_num == tUInt8) {
+        hd.nbins = 256;
+        hd.cbin = (UInt8)cvalue;
+    } else {
+        hd.nbins = 65536;
+        hd.cbin = (UInt16)cvalue;
+    }
+    if (!_InitFootprintMaps(input, fshape, origins, mode, amaps))
         goto exit;
-    /* initialize output element iterator: */
-    if (!NI_InitPointIterator(output, &io))
+    hd.input = input;
+    hd.output = output;
+    hd.fshape = fshape;
+    hd.amaps = amaps;
+    hd.ranks = ranks;
+    hd.routs = routs;
+    hd.nranks = nranks;
+    nlines = _FootprintLineCoordinates(input, hd.axis, 0, coordinates);
+    NI_RunThreads(_HistogramRankLines, &hd, nlines, workers);
+exit:
+    for(ll = 0; ll < input->nd; ll++)
+        if (amaps[ll]) free(amaps[ll]);
+    return PyErr_Occurred() ? 0 : 1;
+}
+
+/* Rank filters of floating point data are calculated by keeping the
+     elements of the footprint ordered in two heaps while it slides along
+     a line: a max-heap holding the rank + 1 lowest values, and a
+     min-heap holding the others. The rank value is then found at the top
+     of the max-heap. Each element of the footprint occupies a slot in the
+     heaps; moving the footprint one element along the line only replaces
+     the values of the slots of the elements that leave the footprint by
+     those that enter it, which takes O(log(filter_size)) operations per
+     element. For arbitrary footprints, the entering and leaving elements
+     are the ends of the runs of the footprint along the sliding axis. */
+
+/* Restore the heap order after the value of the slot at the given heap
+     position has changed. Slot positions are stored in where, as -1 - pos
+     for the min-heap: */
+static void
+_RankHeapSift(npy_intp *heap, npy_intp nheap, npy_intp pos, int is_max,
+              double *values, npy_intp *where)
+{
+    npy_intp slot = heap[pos];
+    double value = values[slot];
+
+    while (pos > 0) {
+        npy_intp parent = (pos - 1) / 2;
+        double pvalue = values[heap[parent]];
+        if (is_max ? value <= pvalue : value >= pvalue)
+            break;
+        heap[pos] = heap[parent];
+        where[heap[pos]] = is_max ? pos : -1 - pos;
+        pos = parent;
+    }
+    for(;;) {
+        npy_intp child = 2 * pos + 1;
+        double cvalue;
+        if (child >= nheap)
+            break;
+        cvalue = values[heap[child]];
+        if (child + 1 < nheap) {
+            double tmp = values[heap[child + 1]];
+            if (is_max ? tmp > cvalue : tmp < cvalue) {
+                ++child;
+                cvalue = tmp;
+            }
+        }
+        if (is_max ? cvalue <= value : cvalue >= value)
+            break;
+        heap[pos] = heap[child];
+        where[heap[pos]] = is_max ? pos : -1 - pos;
+        pos = child;
+    }
+    heap[pos] = slot;
+    where[slot] = is_max ? pos : -1 - pos;
+}
+
+/* Exchange the tops of the heaps if they are out of order: */
+static void
+_RankHeapBalance(npy_intp *lo, npy_intp nlo, npy_intp *hi, npy_intp nhi,
+                 double *values, npy_intp *where)
+{
+    if (nhi > 0 && values[lo[0]] > values[hi[0]]) {
+        npy_intp tmp = lo[0];
+        lo[0] = hi[0];
+        hi[0] = tmp;
+        _RankHeapSift(lo, nlo, 0, 1, values, where);
+        _RankHeapSift(hi, nhi, 0, 0, values, where);
+    }
+}
+
+/* The axis along which the footprint slides with the lowest number of
+     entering elements per step, preferring the last axis: */
+static int
+_HeapSlideAxis(int nd, Bool *pf, npy_intp *fshape, npy_intp *nenter)
+{
+    int ll, axis = nd - 1;
+    npy_intp jj, fsize = 1, fstrides[MAXDIM], position[MAXDIM];
+    npy_intp counts[MAXDIM];
+
+    for(ll = nd - 1; ll >= 0; ll--) {
+        fstrides[ll] = fsize;
+        fsize *= fshape[ll];
+        position[ll] = 0;
+        counts[ll] = 0;
+    }
+    for(jj = 0; jj < fsize; jj++) {
+        if (pf[jj])
+            for(ll = 0; ll < nd; ll++)
+                if (position[ll] + 1 >= fshape[ll] || !pf[jj + fstrides[ll]])
+                    ++counts[ll];
+        for(ll = nd - 1; ll >= 0; ll--) {
+            if (position[ll] < fshape[ll] - 1) {
+                position[ll]++;
+                break;
+            } else {
+                position[ll] = 0;
+            }
+        }
+    }
+    for(ll = nd - 2; ll >= 0; ll--)
+        if (counts[ll] < counts[axis])
+            axis = ll;
+    *nenter = counts[axis];
+    return axis;
+}
+
+/* Each rank keeps its own pair of heaps, sharing the values of the
+     slots, such that the heaps are used if they would be for a single
+     rank: */
+static int
+_UseHeapRankFilter(PyArrayObject* input, Bool *pf, npy_intp *fshape,
+                   npy_intp filter_size)
+{
+    npy_intp nenter;
+
+    if (input->descr->type_num != tFloat32 &&
+            input->descr->type_num != tFloat64)
+        return 0;
+    _HeapSlideAxis(input->nd, pf, fshape, &nenter);
+    return 4 * nenter < _SelectRanksCost(filter_size, 1);
+}
+
+#define CASE_FOOTPRINT_VALUE(_pi, _offset, _cval, _value, _type) \
+case t ## _type:                                                 \
+    _value = _offset == NI_FOOTPRINT_OUTSIDE ? _cval :           \
+                        (double)*(_type*)(_pi + _offset);        \
+    break
+
+typedef struct {
+    PyArrayObject *input, *output;
+    Bool *pf;
+    npy_intp *fshape, **amaps, *rbases, *changes;
+    npy_intp nrows, nenter, filter_size, fstride, *ranks, *routs;
+    double cvalue;
+    int axis, nranks;
+} _HeapRankData;
+
+static NI_ThreadStatus
+_HeapRankLines(void *data, npy_intp start, npy_intp stop)
+{
+    _HeapRankData *hd = (_HeapRankData*)data;
+    PyArrayObject *input = hd->input, *output = hd->output;
+    Bool *pf = hd->pf;
+    int ll, rk, axis = hd->axis, nranks = hd->nranks;
+    npy_intp jj, kk, nn, length, fa = hd->fshape[axis];
+    npy_intp nrows = hd->nrows, nenter = hd->nenter;
+    npy_intp filter_size = hd->filter_size, fstride = hd->fstride;
+    npy_intp *fshape = hd->fshape, **amaps = hd->amaps;
+    npy_intp *rbases = hd->rbases, *changes = hd->changes;
+    npy_intp *ranks = hd->ranks, *routs = hd->routs;
+    npy_intp *roffsets = NULL, *slots, *heaps, *nlo, *nhi, *free_slots;
+    npy_intp coordinates[MAXDIM];
+    double *values = NULL, *results, cvalue = hd->cvalue;
+    NI_ThreadStatus status = NI_THREAD_OK;
+    char *pi, *po;
+
+    roffsets = (npy_intp*)malloc((nrows * (fa + 1) +
+                                  3 * nranks * filter_size + 2 * nranks +
+                                  nenter) * sizeof(npy_intp));
+    values = (double*)malloc((filter_size + nranks) * sizeof(double));
+    if (!roffsets || !values) {
+        status = NI_THREAD_NO_MEMORY;
         goto exit;
-    /* get data pointers an array size: */
+    }
+    /* slots holds the heap slot of each footprint element, indexed by its
+         row and its position along the sliding axis modulo fa: */
+    slots = roffsets + nrows;
+    /* the max-heap, the min-heap and the heap positions of each rank: */
+    heaps = slots + nrows * fa;
+    nlo = heaps + 3 * nranks * filter_size;
+    nhi = nlo + nranks;
+    free_slots = nhi + nranks;
+    results = values + filter_size;
+    length = input->dimensions[axis];
     pi = (void *)PyArray_DATA(input);
-    po = (void *)PyArray_DATA(output);
-    size = 1;
-    for(ll = 0; ll < input->nd; ll++)
+    _FootprintLineCoordinates(input, axis, start, coordinates);
+    /* iterate over the lines along the sliding axis: */
+    for(nn = start; nn < stop; nn++) {
+        npy_intp rr, qq, slot = 0;
+        _FootprintRowOffsets(input->nd, axis, fshape, amaps, coordinates,
+                             nrows, roffsets);
+        po = (void *)PyArray_DATA(output);
+        for(ll = 0; ll < input->nd; ll++)
+            po += coordinates[ll] * output->strides[ll];
+        /* build the heaps for the first footprint position, filling the
+             max-heap first and moving its top to the min-heap once it holds
+             rank + 1 elements: */
+        for(rk = 0; rk < nranks; rk++)
+            nlo[rk] = nhi[rk] = 0;
+        for(rr = 0; rr < nrows; rr++) {
+            for(qq = 0; qq < fa; qq++) {
+                npy_intp offset;
+                if (!pf[rbases[rr] + qq * fstride])
+                    continue;
+                offset = roffsets[rr] == NI_FOOTPRINT_OUTSIDE ||
+                         amaps[axis][qq] == NI_FOOTPRINT_OUTSIDE ?
+                         NI_FOOTPRINT_OUTSIDE : roffsets[rr] + amaps[axis][qq];
+                switch (input->descr->type_num) {
+                    CASE_FOOTPRINT_VALUE(pi, offset, cvalue, values[slot],
+                                         Float32);
+                    CASE_FOOTPRINT_VALUE(pi, offset, cvalue, values[slot],
+                                         Float64);
+                default:
+                    status = NI_THREAD_TYPE_NOT_SUPPORTED;
+                    goto exit;
+                }
+                slots[rr * fa + qq] = slot;
+                for(rk = 0; rk < nranks; rk++) {
+                    npy_intp *lo = heaps + 3 * rk * filter_size;
+                    npy_intp *hi = lo + filter_size, *where = hi + filter_size;
+                    lo[nlo[rk]] = slot;
+                    _RankHeapSift(lo, nlo[rk] + 1, nlo[rk], 1, values, where);
+                    if (++nlo[rk] > ranks[rk] + 1) {
+                        hi[nhi[rk]] = lo[0];
+                        lo[0] = lo[--nlo[rk]];
+                        _RankHeapSift(lo, nlo[rk], 0, 1, values, where);
+                        _RankHeapSift(hi, nhi[rk] + 1, nhi[rk], 0, values,
+                                      where);
+                        ++nhi[rk];
+                    }
+                }
+                ++slot;
+            }
+        }
+        for(jj = 0; jj < length; jj++) {
+            npy_intp *enter = changes, *leave = changes + 2 * nenter;
+            for(rk = 0; rk < nranks; rk++)
+                results[rk] = values[heaps[3 * rk * filter_size]];
+            if (!_StoreRankValues(output, po, routs, results, nranks)) {
+                status = NI_THREAD_TYPE_NOT_SUPPORTED;
+                goto exit;
+            }
+            po += output->strides[axis];
+            if (jj == length - 1)
+                break;
+            /* collect the slots of the leaving elements before they are
+                 reused, since an entering element may map to the same
+                 entry of the slot table: */
+            for(kk = 0; kk < nenter; kk++) {
+                rr = leave[2 * kk];
+                qq = (jj + leave[2 * kk + 1]) % fa;
+                free_slots[kk] = slots[rr * fa + qq];
+            }
+            for(kk = 0; kk < nenter; kk++) {
+                npy_intp offset, pos;
+                rr = enter[2 * kk];
+                pos = jj + 1 + enter[2 * kk + 1];
+                slot = free_slots[kk];
+                slots[rr * fa + pos % fa] = slot;
+                offset = roffsets[rr] == NI_FOOTPRINT_OUTSIDE ||
+                         amaps[axis][pos] == NI_FOOTPRINT_OUTSIDE ?
+                         NI_FOOTPRINT_OUTSIDE : roffsets[rr] + amaps[axis][pos];
+                switch (input->descr->type_num) {
+                    CASE_FOOTPRINT_VALUE(pi, offset, cvalue, values[slot],
+                                         Float32);
+                    CASE_FOOTPRINT_VALUE(pi, offset, cvalue, values[slot],
+                                         Float64);
+                default:
+                    break;
+                }
+                for(rk = 0; rk < nranks; rk++) {
+                    npy_intp *lo = heaps + 3 * rk * filter_size;
+                    npy_intp *hi = lo + filter_size, *where = hi + filter_size;
+                    if (where[slot] >= 0)
+                        _RankHeapSift(lo, nlo[rk], where[slot], 1, values,
+                                      where);
+                    else
+                        _RankHeapSift(hi, nhi[rk], -1 - where[slot], 0,
+                                      values, where);
+                    _RankHeapBalance(lo, nlo[rk], hi, nhi[rk], values, where);
+                }
+            }
+        }
+        _NextFootprintLine(input, axis, coordinates);
+    }
+exit:
+    if (roffsets) free(roffsets);
+    if (values) free(values);
+    return status;
+}
+
+static int
+_HeapRankFilter(PyArrayObject* input, npy_intp *ranks, npy_intp *routs,
+                int nranks, Bool *pf, npy_intp *fshape, PyArrayObject* output,
+                NI_ExtendMode mode, double cvalue, npy_intp *origins,
+                int workers)
+{
+    int ll;
+    npy_intp jj, kk, nrows = 1, nenter, fa, size = 1, nlines;
+    npy_intp filter_size = 0, fsize = 1, fstride = 1;
+    npy_intp *rbases = NULL, *changes;
+    npy_intp *amaps[MAXDIM], coordinates[MAXDIM];
+    int axis = _HeapSlideAxis(input->nd, pf, fshape, &nenter);
+    _HeapRankData hd;
+
+    for(ll = 0; ll < input->nd; ll++) {
+        amaps[ll] = NULL;
         size *= input->dimensions[ll];
+        fsize *= fshape[ll];
+        if (ll != axis)
+            nrows *= fshape[ll];
+        if (ll > axis)
+            fstride *= fshape[ll];
+    }
+    if (size == 0)
+        return 1;
+    for(jj = 0; jj < fsize; jj++)
+        if (pf[jj])
+            ++filter_size;
+    fa = fshape[axis];
+    if (!_InitFootprintMaps(input, fshape, origins, mode, amaps))
+        goto exit;
+    rbases = (npy_intp*)malloc((nrows + 4 * nenter) * sizeof(npy_intp));
+    if (!rbases) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    changes = rbases + nrows;
+    /* find the footprint elements that enter and leave, stored as
+         (row, position along the axis) pairs: */
+    {
+        npy_intp ne = 0, nl = 0, position[MAXDIM];
+        npy_intp *enter = changes, *leave = changes + 2 * nenter;
+        for(ll = 0; ll < input->nd; ll++)
+            position[ll] = 0;
+        for(jj = 0; jj < nrows; jj++) {
+            Bool *pr;
+            /* the footprint index of the first element of this row: */
+            rbases[jj] = 0;
+            kk = 1;
+            for(ll = input->nd - 1; ll >= 0; ll--) {
+                rbases[jj] += position[ll] * kk;
+                kk *= fshape[ll];
+            }
+            pr = pf + rbases[jj];
+            for(kk = 0; kk < fa; kk++) {
+                if (!pr[kk * fstride])
+                    continue;
+                if (kk + 1 >= fa || !pr[(kk + 1) * fstride]) {
+                    enter[2 * ne] = jj;
+                    enter[2 * ne++ + 1] = kk;
+                }
+                if (kk == 0 || !pr[(kk - 1) * fstride]) {
+                    leave[2 * nl] = jj;
+                    leave[2 * nl++ + 1] = kk;
+                }
+            }
+            for(ll = input->nd - 1; ll >= 0; ll--) {
+                if (ll == axis)
+                    continue;
+                if (position[ll] < fshape[ll] - 1) {
+                    position[ll]++;
+                    break;
+                } else {
+                    position[ll] = 0;
+                }
+            }
+        }
+    }
+    hd.input = input;
+    hd.output = output;
+    hd.pf = pf;
+    hd.fshape = fshape;
+    hd.amaps = amaps;
+    hd.rbases = rbases;
+    hd.changes = changes;
+    hd.nrows = nrows;
+    hd.nenter = nenter;
+    hd.filter_size = filter_size;
+    hd.fstride = fstride;
+    hd.cvalue = cvalue;
+    hd.axis = axis;
+    hd.ranks = ranks;
+    hd.routs = routs;
+    hd.nranks = nranks;
+    nlines = _FootprintLineCoordinates(input, axis, 0, coordinates);
+    NI_RunThreads(_HeapRankLines, &hd, nlines, workers);
+exit:
+    for(ll = 0; ll < input->nd; ll++)
+        if (amaps[ll]) free(amaps[ll]);
+    if (rbases) free(rbases);
+    return PyErr_Occurred() ? 0 : 1;
+}
+
+#define CASE_RANK_POINT(_pi, _offsets, _filter_size, _cval, _type, \
+                        _buffer, _mv)                              \
+case t ## _type:                                                   \
+{                                                                  \
+    npy_intp _ii;                                                  \
+    for(_ii = 0; _ii < _filter_size; _ii++) {                      \
+        npy_intp _offset = _offsets[_ii];                          \
+        if (_offset == _mv)                                        \
+            _buffer[_ii] = (_type)_cval;                           \
+        else                                                       \
+            _buffer[_ii] = *(_type*)(_pi + _offsets[_ii]);         \
+    }                                                              \
+}                                                                  \
+break
+
+typedef struct {
+    _PointFilter pt;
+    npy_intp *ranks, *routs;
+    int nranks;
+} _RankData;
+
+static NI_ThreadStatus
+_RankPoints(void *data, npy_intp start, npy_intp stop)
+{
+    _RankData *rd = (_RankData*)data;
+    _PointFilter *pt = &(rd->pt);
+    NI_Iterator ii, io;
+    npy_intp jj, *oo, filter_size = pt->filter_size;
+    npy_intp border_flag_value = pt->border_flag_value;
+    double cvalue = pt->cvalue, *buffer, *values;
+    int nranks = rd->nranks;
+    char *pi, *po;
+
+    /* buffer for rank calculation, followed by the values of the ranks: */
+    buffer = (double*)malloc((filter_size + nranks) * sizeof(double));
+    if (!buffer)
+        return NI_THREAD_NO_MEMORY;
+    values = buffer + filter_size;
+    _StartPointFilter(pt, start, &ii, &io, &pi, &po, &oo);
     /* iterator over the elements: */
-    oo = offsets;
-    for(jj = 0; jj < size; jj++) {
-        double tmp = 0.0;
-        switch (input->descr->type_num) {
+    for(jj = start; jj < stop; jj++) {
+        switch (pt->input->descr->type_num) {
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, Bool,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, UInt8,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, UInt16,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, UInt32,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
 #if HAS_UINT64
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, UInt64,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
 #endif
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, Int8,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, Int16,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, Int32,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, Int64,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, Float32,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
             CASE_RANK_POINT(pi, oo, filter_size, cvalue, Float64,
-                                            rank, buffer, tmp, border_flag_value);
+                            buffer, border_flag_value);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "array type not supported");
-            goto exit;
+            free(buffer);
+            return NI_THREAD_TYPE_NOT_SUPPORTED;
         }
-        switch (output->descr->type_num) {
-            CASE_FILTER_OUT(po, tmp, Bool);
-            CASE_FILTER_OUT(po, tmp, UInt8);
-            CASE_FILTER_OUT(po, tmp, UInt16);
-            CASE_FILTER_OUT(po, tmp, UInt32);
-#if HAS_UINT64
-            CASE_FILTER_OUT(po, tmp, UInt64);
-#endif
-            CASE_FILTER_OUT(po, tmp, Int8);
-            CASE_FILTER_OUT(po, tmp, Int16);
-            CASE_FILTER_OUT(po, tmp, Int32);
-            CASE_FILTER_OUT(po, tmp, Int64);
-            CASE_FILTER_OUT(po, tmp, Float32);
-            CASE_FILTER_OUT(po, tmp, Float64);
-        default:
-            PyErr_SetString(PyExc_RuntimeError, "array type not supported");
-            goto exit;
+        _SelectRanks(buffer, 0, filter_size - 1, rd->ranks, nranks, values);
+        if (!_StoreRankValues(pt->output, po, rd->routs, values, nranks)) {
+            free(buffer);
+            return NI_THREAD_TYPE_NOT_SUPPORTED;
+        }
+        NI_FILTER_NEXT2(pt->fi, ii, io, oo, pi, po);
+    }
+    free(buffer);
+    return NI_THREAD_OK;
+}
+
+/* The output of rank ranks[kk] is stored at an offset of kk * rank_stride
+     bytes from the position of an element in the output array, such that
+     several ranks are selected from each footprint at once: */
+int NI_RankFilter(PyArrayObject* input, npy_intp *ranks, int nranks,
+                  PyArrayObject* footprint, PyArrayObject* output,
+                  npy_intp rank_stride, NI_ExtendMode mode, double cvalue,
+                  npy_intp *origins, int workers)
+{
+    npy_intp fsize, jj, filter_size = 0;
+    Bool *pf = NULL;
+    _RankData rd;
+    int ll, kk;
+
+    rd.pt.offsets = NULL;
+    /* sort the ranks, keeping the offsets of their outputs: */
+    rd.ranks = (npy_intp*)malloc(2 * nranks * sizeof(npy_intp));
+    if (!rd.ranks) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    rd.routs = rd.ranks + nranks;
+    rd.nranks = nranks;
+    for(kk = 0; kk < nranks; kk++) {
+        for(ll = kk; ll > 0 && rd.ranks[ll - 1] > ranks[kk]; ll--) {
+            rd.ranks[ll] = rd.ranks[ll - 1];
+            rd.routs[ll] = rd.routs[ll - 1];
+        }
+        rd.ranks[ll] = ranks[kk];
+        rd.routs[ll] = kk * rank_stride;
+    }
+    /* get the the footprint: */
+    fsize = 1;
+    for(ll = 0; ll < footprint->nd; ll++)
+        fsize *= footprint->dimensions[ll];
+    pf = (Bool*)PyArray_DATA(footprint);
+    for(jj = 0; jj < fsize; jj++) {
+        if (pf[jj]) {
+            ++filter_size;
         }
-        NI_FILTER_NEXT2(fi, ii, io, oo, pi, po);
     }
+    /* use a sliding histogram for box shaped footprints, if the data
+         type allows it: */
+    if (filter_size == fsize && input->nd > 0 &&
+            _UseHistogramRankFilter(input, footprint->dimensions, filter_size,
+                                    nranks)) {
+        _HistogramRankFilter(input, rd.ranks, rd.routs, nranks,
+                             footprint->dimensions, output, mode, cvalue,
+                             origins, workers);
+        goto exit;
+    }
+    /* keep the footprint ordered while sliding for floating point data,
+         if few elements change per step: */
+    if (input->nd > 0 &&
+            _UseHeapRankFilter(input, pf, footprint->dimensions,
+                               filter_size)) {
+        _HeapRankFilter(input, rd.ranks, rd.routs, nranks, pf,
+                        footprint->dimensions, output, mode, cvalue,
+                        origins, workers);
+        goto exit;
+    }
+    if (!_InitPointFilter(input, pf, footprint->dimensions, filter_size,
+                          output, mode, cvalue, origins, &(rd.pt)))
+        goto exit;
+    NI_RunThreads(_RankPoints, &rd, _PointFilterSize(&(rd.pt)), workers);
 exit:
-    if (offsets) free(offsets);
-    if (buffer) free(buffer);
+    if (rd.pt.offsets) free(rd.pt.offsets);
+    if (rd.ranks) free(rd.ranks);
     return PyErr_Occurred() ? 0 : 1;
 }
 
 int NI_GenericFilter1D(PyArrayObject *input,
             int (*function)(double*, npy_intp, double*, npy_intp, void*),
             void* data, npy_intp filter_size, int axis, PyArrayObject *output,
-            NI_ExtendMode mode, double cval, npy_intp origin)
+            NI_ExtendMode mode, double cval, npy_intp origin,
+            npy_intp buffer_size, int nogil)
 {
-    int more;
+    int more, err = 0;
     npy_intp ii, lines, length, size1, size2;
     double *ibuffer = NULL, *obuffer = NULL;
     NI_LineBuffer iline_buffer, oline_buffer;
+    NPY_BEGIN_THREADS_DEF;
 
     /* allocate and initialize the line buffers: */
     size1 = filter_size / 2;
     size2 = filter_size - size1 - 1;
+    if (buffer_size < 1)
+        buffer_size = NI_CacheBufferSize();
     lines = -1;
     if (!NI_AllocateLineBuffer(input, axis, size1 + origin, size2 - origin,
-                                                         &lines, BUFFER_SIZE, &ibuffer))
+                                                         &lines, buffer_size, &ibuffer))
         goto exit;
-    if (!NI_AllocateLineBuffer(output, axis, 0, 0, &lines, BUFFER_SIZE,
+    if (!NI_AllocateLineBuffer(output, axis, 0, 0, &lines, buffer_size,
                                                          &obuffer))
         goto exit;
     if (!NI_InitLineBuffer(input, axis, size1 + origin, size2 - origin,
@@ -731,35 +2252,46 @@ int NI_GenericFilter1D(PyArrayObject *input,
                                                  &oline_buffer))
         goto exit;
     length = input->nd > 0 ? input->dimensions[axis] : 1;
+    /* only a function that does not call Python runs without the GIL: */
+    if (nogil)
+        NPY_BEGIN_THREADS;
     /* iterate over all the array lines: */
     do {
         /* copy lines from array to buffer: */
-        if (!NI_ArrayToLineBuffer(&iline_buffer, &lines, &more))
+        if (!NI_ArrayToLineBuffer(&iline_buffer, &lines, &more)) {
+            err = 1;
             goto exit;
+        }
         /* iterate over the lines in the buffers: */
         for(ii = 0; ii < lines; ii++) {
             /* get lines: */
             double *iline = NI_GET_LINE(iline_buffer, ii);
             double *oline = NI_GET_LINE(oline_buffer, ii);
             if (!function(iline, length + size1 + size2, oline, length, data)) {
-                if (!PyErr_Occurred())
-                    PyErr_SetString(PyExc_RuntimeError,
-                                                    "unknown error in line processing function");
+                err = 2;
                 goto exit;
             }
         }
         /* copy lines from buffer to array: */
-        if (!NI_LineBufferToArray(&oline_buffer))
+        if (!NI_LineBufferToArray(&oline_buffer)) {
+            err = 1;
             goto exit;
+        }
     } while(more);
 exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "array type not supported");
+    else if (err == 2 && !PyErr_Occurred())
+        PyErr_SetString(PyExc_RuntimeError,
+                        "unknown error in line processing function");
     if (ibuffer) free(ibuffer);
     if (obuffer) free(obuffer);
     return PyErr_Occurred() ? 0 : 1;
 }
 
 #define CASE_FILTER_POINT(_pi, _offsets, _filter_size, _cvalue, _type, \
-                                                    _res, _mv, _function, _data, _buffer)        \
+                          _res, _mv, _function, _data, _buffer, _err)  \
 case t ## _type:                                                       \
 {                                                                      \
     npy_intp _ii, _offset;                                             \
@@ -771,10 +2303,8 @@ case t ## _type:                                                       \
             _buffer[_ii] = (double)*(_type*)(_pi + _offset);                 \
     }                                                                    \
     if (!_function(_buffer, _filter_size, &_res, _data)) {               \
-        if (!PyErr_Occurred())                                             \
-            PyErr_SetString(PyExc_RuntimeError,                              \
-                                            "unknown error in filter function");             \
-            goto exit;                                                       \
+        _err = 2;                                                          \
+        goto exit;                                                         \
     }                                                                    \
 }                                                                      \
 break
@@ -783,7 +2313,7 @@ break
 int NI_GenericFilter(PyArrayObject* input,
             int (*function)(double*, npy_intp, double*, void*), void *data,
             PyArrayObject* footprint, PyArrayObject* output,
-            NI_ExtendMode mode, double cvalue, npy_intp *origins)
+            NI_ExtendMode mode, double cvalue, npy_intp *origins, int nogil)
 {
     Bool *pf = NULL;
     npy_intp fsize, jj, filter_size = 0, border_flag_value;
@@ -792,7 +2322,8 @@ int NI_GenericFilter(PyArrayObject* input,
     NI_Iterator ii, io;
     char *pi, *po;
     double *buffer = NULL;
-    int ll;
+    int ll, err = 0;
+    NPY_BEGIN_THREADS_DEF;
 
     /* get the the footprint: */
     fsize = 1;
@@ -829,39 +2360,101 @@ int NI_GenericFilter(PyArrayObject* input,
         PyErr_NoMemory();
         goto exit;
     }
+    /* only a function that does not call Python runs without the GIL: */
+    if (nogil)
+        NPY_BEGIN_THREADS;
     /* iterate over the elements: */
     oo = offsets;
     for(jj = 0; jj < size; jj++) {
         double tmp = 0.0;
         switch (input->descr->type_num) {
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, Bool,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, UInt8,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, UInt16,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, UInt32,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
 #if HAS_UINT64
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, UInt64,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
 #endif
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, Int8,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, Int16,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, Int32,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, Int64,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, Float32,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
             CASE_FILTER_POINT(pi, oo, filter_size, cvalue, Float64,
-                                                tmp, border_flag_value, function, data, buffer);
+                                                tmp, border_flag_value, function, data, buffer, err);
+        default:
+            err = 1;
+            goto exit;
+        }
+        switch (output->descr->type_num) {
+            CASE_FILTER_OUT(po, tmp, Bool);
+            CASE_FILTER_OUT(po, tmp, UInt8);
+            CASE_FILTER_OUT(po, tmp, UInt16);
+            CASE_FILTER_OUT(po, tmp, UInt32);
+#if HAS_UINT64
+            CASE_FILTER_OUT(po, tmp, UInt64);
+#endif
+            CASE_FILTER_OUT(po, tmp, Int8);
+            CASE_FILTER_OUT(po, tmp, Int16);
+            CASE_FILTER_OUT(po, tmp, Int32);
+            CASE_FILTER_OUT(po, tmp, Int64);
+            CASE_FILTER_OUT(po, tmp, Float32);
+            CASE_FILTER_OUT(po, tmp, Float64);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "array type not supported");
+            err = 1;
             goto exit;
         }
+        NI_FILTER_NEXT2(fi, ii, io, oo, pi, po);
+    }
+exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "array type not supported");
+    else if (err == 2 && !PyErr_Occurred())
+        PyErr_SetString(PyExc_RuntimeError, "unknown error in filter function");
+    if (offsets) free(offsets);
+    if (buffer) free(buffer);
+    return PyErr_Occurred() ? 0 : 1;
+}
+
+/* The block version of the generic filter collects the neighbourhoods of
+   up to chunk_size elements in the rows of a buffer, and calls the
+   function once per block, which returns one value per element. */
+
+#define CASE_FILTER_FILL(_pi, _offsets, _filter_size, _cvalue, _type, \
+                         _mv, _buffer)                                \
+case t ## _type:                                                      \
+{                                                                     \
+    npy_intp _ii, _offset;                                            \
+    for(_ii = 0; _ii < _filter_size; _ii++) {                         \
+        _offset = _offsets[_ii];                                      \
+        if (_offset == _mv)                                           \
+            _buffer[_ii] = (double)_cvalue;                           \
+        else                                                          \
+            _buffer[_ii] = (double)*(_type*)(_pi + _offset);          \
+    }                                                                 \
+}                                                                     \
+break
+
+static int
+_StoreFilterBlock(PyArrayObject *output, char **pointers, double *results,
+                  npy_intp npix)
+{
+    npy_intp kk;
+
+    for(kk = 0; kk < npix; kk++) {
+        char *po = pointers[kk];
+        double tmp = results[kk];
         switch (output->descr->type_num) {
             CASE_FILTER_OUT(po, tmp, Bool);
             CASE_FILTER_OUT(po, tmp, UInt8);
@@ -877,13 +2470,810 @@ int NI_GenericFilter(PyArrayObject* input,
             CASE_FILTER_OUT(po, tmp, Float32);
             CASE_FILTER_OUT(po, tmp, Float64);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "array type not supported");
+            return 0;
+        }
+    }
+    return 1;
+}
+
+int NI_GenericFilterBlocks(PyArrayObject* input,
+            int (*function)(double*, npy_intp, npy_intp, double*, void*),
+            void *data, PyArrayObject* footprint, PyArrayObject* output,
+            NI_ExtendMode mode, double cvalue, npy_intp *origins,
+            npy_intp chunk_size)
+{
+    Bool *pf = NULL;
+    npy_intp fsize, jj, filter_size = 0, border_flag_value, npix = 0;
+    npy_intp *offsets = NULL, *oo, size;
+    NI_FilterIterator fi;
+    NI_Iterator ii, io;
+    char *pi, *po, **pointers = NULL;
+    double *buffer = NULL, *results = NULL, *pb;
+    int ll, err = 0;
+
+    /* get the the footprint: */
+    fsize = 1;
+    for(ll = 0; ll < footprint->nd; ll++)
+        fsize *= footprint->dimensions[ll];
+    pf = (Bool*)PyArray_DATA(footprint);
+    for(jj = 0; jj < fsize; jj++) {
+        if (pf[jj])
+            ++filter_size;
+    }
+    /* initialize filter offsets: */
+    if (!NI_InitFilterOffsets(input, pf, footprint->dimensions, origins,
+                              mode, &offsets, &border_flag_value, NULL))
+        goto exit;
+    /* initialize filter iterator: */
+    if (!NI_InitFilterIterator(input->nd, footprint->dimensions,
+                               filter_size, input->dimensions, origins, &fi))
+        goto exit;
+    /* initialize input element iterator: */
+    if (!NI_InitPointIterator(input, &ii))
+        goto exit;
+    /* initialize output element iterator: */
+    if (!NI_InitPointIterator(output, &io))
+        goto exit;
+    /* get data pointers an array size: */
+    pi = (void *)PyArray_DATA(input);
+    po = (void *)PyArray_DATA(output);
+    size = 1;
+    for(ll = 0; ll < input->nd; ll++)
+        size *= input->dimensions[ll];
+    if (chunk_size < 1)
+        chunk_size = 1;
+    if (chunk_size > size)
+        chunk_size = size > 0 ? size : 1;
+    /* buffers for the neighbourhoods, the results and output pointers: */
+    buffer = (double*)malloc(chunk_size * filter_size * sizeof(double));
+    results = (double*)malloc(chunk_size * sizeof(double));
+    pointers = (char**)malloc(chunk_size * sizeof(char*));
+    if (!buffer || !results || !pointers) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    /* iterate over the elements: */
+    oo = offsets;
+    for(jj = 0; jj < size; jj++) {
+        pb = buffer + npix * filter_size;
+        switch (input->descr->type_num) {
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, Bool,
+                             border_flag_value, pb);
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, UInt8,
+                             border_flag_value, pb);
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, UInt16,
+                             border_flag_value, pb);
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, UInt32,
+                             border_flag_value, pb);
+#if HAS_UINT64
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, UInt64,
+                             border_flag_value, pb);
+#endif
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, Int8,
+                             border_flag_value, pb);
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, Int16,
+                             border_flag_value, pb);
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, Int32,
+                             border_flag_value, pb);
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, Int64,
+                             border_flag_value, pb);
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, Float32,
+                             border_flag_value, pb);
+            CASE_FILTER_FILL(pi, oo, filter_size, cvalue, Float64,
+                             border_flag_value, pb);
+        default:
+            err = 1;
             goto exit;
         }
+        pointers[npix++] = po;
+        /* process the block when it is full, or at the last element: */
+        if (npix == chunk_size || jj == size - 1) {
+            if (!function(buffer, npix, filter_size, results, data)) {
+                err = 2;
+                goto exit;
+            }
+            if (!_StoreFilterBlock(output, pointers, results, npix)) {
+                err = 1;
+                goto exit;
+            }
+            npix = 0;
+        }
         NI_FILTER_NEXT2(fi, ii, io, oo, pi, po);
     }
 exit:
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "array type not supported");
+    else if (err == 2 && !PyErr_Occurred())
+        PyErr_SetString(PyExc_RuntimeError, "unknown error in filter function");
     if (offsets) free(offsets);
     if (buffer) free(buffer);
+    if (results) free(results);
+    if (pointers) free(pointers);
+    return PyErr_Occurred() ? 0 : 1;
+}
+
+/* Separable filters are usually calculated by filtering the whole array
+   along each axis in turn, which streams the array through memory once
+   per axis. The following functions instead filter tiles of the array
+   along all axes before storing them in the output. Each tile is
+   loaded with the borders needed by all passes, and stored as a
+   contiguous block, in which the lines along an axis are processed
+   together, with the elements of the following axes as the contiguous
+   inner dimension. The arithmetic of each pass is the same as that of
+   the one-dimensional filters, and the intermediate results are rounded
+   to the output type, so that the results are identical. */
+
+#define CASE_SEPARABLE_LOAD(_pi, _amap, _length, _cval, _pb, _type) \
+case t ## _type:                                                     \
+{                                                                    \
+    npy_intp _ii;                                                    \
+    for(_ii = 0; _ii < _length; _ii++)                               \
+        _pb[_ii] = _amap[_ii] == NI_FOOTPRINT_OUTSIDE ? _cval :      \
+                            (double)*(_type*)(_pi + _amap[_ii]);     \
+}                                                                    \
+break
+
+#define CASE_SEPARABLE_STORE(_po, _stride, _length, _pb, _type) \
+case t ## _type:                                                \
+{                                                               \
+    npy_intp _ii;                                               \
+    char *_pl = _po;                                            \
+    for(_ii = 0; _ii < _length; _ii++) {                        \
+        *(_type*)_pl = (_type)_pb[_ii];                         \
+        _pl += _stride;                                         \
+    }                                                           \
+}                                                               \
+break
+
+#define CASE_SEPARABLE_ROUND(_buffer, _size, _type) \
+case t ## _type:                                    \
+{                                                   \
+    npy_intp _ii;                                   \
+    for(_ii = 0; _ii < _size; _ii++)                \
+        _buffer[_ii] = (double)(_type)_buffer[_ii]; \
+}                                                   \
+break
+
+/* round the values in a buffer to the given type, as if they were stored
+   in an array of that type: */
+static void
+_SeparableRound(double *buffer, npy_intp size, int type_num)
+{
+    switch (type_num) {
+        CASE_SEPARABLE_ROUND(buffer, size, Bool);
+        CASE_SEPARABLE_ROUND(buffer, size, UInt8);
+        CASE_SEPARABLE_ROUND(buffer, size, UInt16);
+        CASE_SEPARABLE_ROUND(buffer, size, UInt32);
+#if HAS_UINT64
+        CASE_SEPARABLE_ROUND(buffer, size, UInt64);
+#endif
+        CASE_SEPARABLE_ROUND(buffer, size, Int8);
+        CASE_SEPARABLE_ROUND(buffer, size, Int16);
+        CASE_SEPARABLE_ROUND(buffer, size, Int32);
+        CASE_SEPARABLE_ROUND(buffer, size, Int64);
+        CASE_SEPARABLE_ROUND(buffer, size, Float32);
+    default:
+        break;
+    }
+}
+
+/* copy the part of a block with the given extents that starts at the
+   given offsets into a block with smaller extents: */
+static void
+_SeparableCrop(double *in, npy_intp *iextents, double *out,
+               npy_intp *oextents, npy_intp *offsets, int nd)
+{
+    npy_intp jj, kk, nlines = 1, position[MAXDIM];
+    int ll;
+
+    for(ll = 0; ll < nd - 1; ll++) {
+        nlines *= oextents[ll];
+        position[ll] = 0;
+    }
+    for(jj = 0; jj < nlines; jj++) {
+        double *pi;
+        npy_intp index = 0;
+        for(ll = 0; ll < nd; ll++)
+            index = index * iextents[ll] + offsets[ll] +
+                    (ll < nd - 1 ? position[ll] : 0);
+        pi = in + index;
+        for(kk = 0; kk < oextents[nd - 1]; kk++)
+            out[kk] = pi[kk];
+        out += oextents[nd - 1];
+        for(ll = nd - 2; ll >= 0; ll--) {
+            if (position[ll] < oextents[ll] - 1) {
+                position[ll]++;
+                break;
+            } else {
+                position[ll] = 0;
+            }
+        }
+    }
+}
+
+static void
+_SeparableCorrelate(double *in, double *out, npy_intp outer,
+                    npy_intp length, npy_intp inner, double *fw,
+                    npy_intp size1, npy_intp size2, int symmetric)
+{
+    npy_intp oo, ll, jj, kk, ilength = length + size1 + size2;
+
+    for(oo = 0; oo < outer; oo++) {
+        if (inner == 1) {
+            /* a line along the last axis, as in NI_Correlate1D: */
+            double *iline = in + oo * ilength + size1;
+            double *oline = out + oo * length;
+            if (symmetric > 0) {
+                for(ll = 0; ll < length; ll++) {
+                    oline[ll] = iline[0] * fw[0];
+                    for(jj = -size1 ; jj < 0; jj++)
+                        oline[ll] += (iline[jj] + iline[-jj]) * fw[jj];
+                    ++iline;
+                }
+            } else if (symmetric < 0) {
+                for(ll = 0; ll < length; ll++) {
+                    oline[ll] = iline[0] * fw[0];
+                    for(jj = -size1 ; jj < 0; jj++)
+                        oline[ll] += (iline[jj] - iline[-jj]) * fw[jj];
+                    ++iline;
+                }
+            } else {
+                for(ll = 0; ll < length; ll++) {
+                    oline[ll] = iline[size2] * fw[size2];
+                    for(jj = -size1; jj < size2; jj++)
+                        oline[ll] += iline[jj] * fw[jj];
+                    ++iline;
+                }
+            }
+            continue;
+        }
+        for(ll = 0; ll < length; ll++) {
+            double *pi = in + (oo * ilength + ll + size1) * inner;
+            double *po = out + (oo * length + ll) * inner;
+            if (symmetric > 0) {
+                for(kk = 0; kk < inner; kk++)
+                    po[kk] = pi[kk] * fw[0];
+                for(jj = -size1; jj < 0; jj++)
+                    for(kk = 0; kk < inner; kk++)
+                        po[kk] += (pi[kk + jj * inner] +
+                                   pi[kk - jj * inner]) * fw[jj];
+            } else if (symmetric < 0) {
+                for(kk = 0; kk < inner; kk++)
+                    po[kk] = pi[kk] * fw[0];
+                for(jj = -size1; jj < 0; jj++)
+                    for(kk = 0; kk < inner; kk++)
+                        po[kk] += (pi[kk + jj * inner] -
+                                   pi[kk - jj * inner]) * fw[jj];
+            } else {
+                for(kk = 0; kk < inner; kk++)
+                    po[kk] = pi[kk + size2 * inner] * fw[size2];
+                for(jj = -size1; jj < size2; jj++)
+                    for(kk = 0; kk < inner; kk++)
+                        po[kk] += pi[kk + jj * inner] * fw[jj];
+            }
+        }
+    }
+}
+
+static void
+_SeparableUniform(double *in, double *out, npy_intp outer, npy_intp length,
+                  npy_intp inner, npy_intp filter_size, double *tmp)
+{
+    npy_intp oo, ll, kk, ilength = length + filter_size - 1;
+
+    for(oo = 0; oo < outer; oo++) {
+        double *pi = in + oo * ilength * inner;
+        double *po = out + oo * length * inner;
+        for(kk = 0; kk < inner; kk++)
+            tmp[kk] = 0.0;
+        for(ll = 0; ll < filter_size; ll++)
+            for(kk = 0; kk < inner; kk++)
+                tmp[kk] += pi[ll * inner + kk];
+        for(kk = 0; kk < inner; kk++) {
+            tmp[kk] /= (double)filter_size;
+            po[kk] = tmp[kk];
+        }
+        for(ll = 1; ll < length; ll++) {
+            double *p1 = pi + (ll - 1) * inner;
+            double *p2 = pi + (ll - 1 + filter_size) * inner;
+            for(kk = 0; kk < inner; kk++) {
+                tmp[kk] += (p2[kk] - p1[kk]) / (double)filter_size;
+                po[ll * inner + kk] = tmp[kk];
+            }
+        }
+    }
+}
+
+#define SEPARABLE_VHGW_BLOCKS(_pi, _size, _inner, _filter_size, _fwd,  \
+                              _bwd, _op)                               \
+{                                                                      \
+    npy_intp _ll, _kk, _start, _end;                                   \
+    for(_start = 0; _start < (_size); _start += (_filter_size)) {      \
+        _end = _start + (_filter_size);                                \
+        if (_end > (_size))                                            \
+            _end = (_size);                                            \
+        for(_kk = 0; _kk < (_inner); _kk++)                            \
+            (_fwd)[_start * (_inner) + _kk] =                          \
+                                (_pi)[_start * (_inner) + _kk];        \
+        for(_ll = _start + 1; _ll < _end; _ll++)                       \
+            for(_kk = 0; _kk < (_inner); _kk++)                        \
+                (_fwd)[_ll * (_inner) + _kk] =                         \
+                        _op((_pi)[_ll * (_inner) + _kk],               \
+                            (_fwd)[(_ll - 1) * (_inner) + _kk]);       \
+        for(_kk = 0; _kk < (_inner); _kk++)                            \
+            (_bwd)[(_end - 1) * (_inner) + _kk] =                      \
+                            (_pi)[(_end - 1) * (_inner) + _kk];        \
+        for(_ll = _end - 2; _ll >= _start; _ll--)                      \
+            for(_kk = 0; _kk < (_inner); _kk++)                        \
+                (_bwd)[_ll * (_inner) + _kk] =                         \
+                        _op((_pi)[_ll * (_inner) + _kk],               \
+                            (_bwd)[(_ll + 1) * (_inner) + _kk]);       \
+    }                                                                  \
+}
+
+/* a minimum or maximum pass, with the same treatment of NaN values as
+   VHGW_LINE: */
+#define SEPARABLE_MIN_OR_MAX(_pi, _po, _length, _inner, _filter_size,  \
+                             _fwd, _bwd, _op, _nanop)                  \
+{                                                                      \
+    npy_intp _ll, _kk;                                                 \
+    npy_intp _size = (_length) + (_filter_size) - 1;                   \
+    if ((_filter_size) < VHGW_MIN_FILTER_SIZE) {                       \
+        for(_ll = 0; _ll < (_length); _ll++) {                         \
+            double *_pl = (_po) + _ll * (_inner);                      \
+            double *_pj = (_pi) + _ll * (_inner);                      \
+            npy_intp _jj;                                              \
+            for(_kk = 0; _kk < (_inner); _kk++)                        \
+                _pl[_kk] = _pj[_kk];                                   \
+            for(_jj = 1; _jj < (_filter_size); _jj++) {                \
+                _pj += (_inner);                                       \
+                for(_kk = 0; _kk < (_inner); _kk++)                    \
+                    _pl[_kk] = _op(_pj[_kk], _pl[_kk]);                \
+            }                                                          \
+        }                                                              \
+    } else {                                                           \
+        int _nan = 0;                                                  \
+        for(_ll = 0; _ll < _size * (_inner); _ll++)                    \
+            _nan |= (_pi)[_ll] != (_pi)[_ll];                          \
+        if (_nan) {                                                    \
+            SEPARABLE_VHGW_BLOCKS(_pi, _size, _inner, _filter_size,    \
+                                  _fwd, _bwd, _nanop);                 \
+            for(_ll = 0; _ll < (_length) * (_inner); _ll++)            \
+                (_po)[_ll] = (_pi)[_ll] != (_pi)[_ll] ? (_pi)[_ll] :   \
+                    _nanop((_fwd)[_ll + ((_filter_size) - 1) * (_inner)], \
+                           (_bwd)[_ll]);                               \
+        } else {                                                       \
+            SEPARABLE_VHGW_BLOCKS(_pi, _size, _inner, _filter_size,    \
+                                  _fwd, _bwd, _op);                    \
+            for(_ll = 0; _ll < (_length) * (_inner); _ll++)            \
+                (_po)[_ll] =                                           \
+                    _op((_fwd)[_ll + ((_filter_size) - 1) * (_inner)], \
+                        (_bwd)[_ll]);                                  \
+        }                                                              \
+    }                                                                  \
+}
+
+/* A minimum or maximum filter pass, computed directly for small filters
+   and with the van Herk/Gil-Werman algorithm for larger filters, with
+   the forward and backward running extrema stored in fwd and bwd: */
+static void
+_SeparableMinOrMax(double *in, double *out, npy_intp outer,
+                   npy_intp length, npy_intp inner, npy_intp filter_size,
+                   int minimum, double *fwd, double *bwd)
+{
+    npy_intp oo, ilength = length + filter_size - 1;
+
+    for(oo = 0; oo < outer; oo++) {
+        double *pi = in + oo * ilength * inner;
+        double *po = out + oo * length * inner;
+        if (minimum)
+            SEPARABLE_MIN_OR_MAX(pi, po, length, inner, filter_size,
+                                 fwd, bwd, VHGW_MIN, VHGW_NANMIN)
+        else
+            SEPARABLE_MIN_OR_MAX(pi, po, length, inner, filter_size,
+                                 fwd, bwd, VHGW_MAX, VHGW_NANMAX)
+    }
+}
+
+typedef struct {
+    PyArrayObject *input, *output;
+    int npasses, nterms, magnitude;
+    npy_intp *axes, *types, *sizes, *tile, *terms, block;
+    npy_intp fshape[MAXDIM], ntiles[MAXDIM], *amaps[MAXDIM];
+    double *pw[MAXDIM * MAXDIM];
+    int symmetric[MAXDIM * MAXDIM];
+    NI_ExtendMode mode;
+    double cval;
+} _SeparableData;
+
+static NI_ThreadStatus
+_SeparableTiles(void *data, npy_intp first, npy_intp last_tile)
+{
+    _SeparableData *sd = (_SeparableData*)data;
+    PyArrayObject *input = sd->input, *output = sd->output;
+    int ll, pp, tt, nd = input->nd, nterms = sd->nterms, *symmetric;
+    int fused = nterms > 1 || sd->magnitude;
+    npy_intp jj, kk, nn, *axes = sd->axes, *types = sd->types;
+    npy_intp *sizes = sd->sizes, *tile = sd->tile, *fshape = sd->fshape;
+    npy_intp **amaps = sd->amaps, block = sd->block, *terms = sd->terms;
+    npy_intp start[MAXDIM], lengths[MAXDIM], extents[MAXDIM];
+    npy_intp position[MAXDIM], textents[MAXDIM], toffsets[MAXDIM];
+    double *buffer, *buf1, *buf2, *fwd, *bwd, *loaded, *sum = NULL;
+    double **pw = sd->pw, cval = sd->cval;
+    NI_ExtendMode mode = sd->mode;
+    NI_ThreadStatus status = NI_THREAD_OK;
+    char *pi, *po;
+
+    symmetric = sd->symmetric;
+    /* several terms, or a magnitude, are filtered from a copy of the
+       loaded tile, and summed: */
+    buffer = (double*)malloc((fused ? 6 : 4) * block * sizeof(double));
+    if (!buffer)
+        return NI_THREAD_NO_MEMORY;
+    buf1 = buffer;
+    loaded = buffer + 4 * block;
+    if (fused)
+        sum = loaded + block;
+    /* iterate over the tiles of this range: */
+    for(nn = first; nn < last_tile; nn++) {
+        npy_intp nlines = 1, last, index = nn, tsize = 1;
+        double *pb;
+        for(ll = nd - 1; ll >= 0; ll--) {
+            start[ll] = (index % sd->ntiles[ll]) * tile[ll];
+            index /= sd->ntiles[ll];
+        }
+        for(ll = 0; ll < nd; ll++) {
+            lengths[ll] = input->dimensions[ll] - start[ll];
+            if (lengths[ll] > tile[ll])
+                lengths[ll] = tile[ll];
+            extents[ll] = lengths[ll] + fshape[ll] - 1;
+            position[ll] = 0;
+            if (ll < nd - 1)
+                nlines *= extents[ll];
+        }
+        /* load the tile and its borders, line by line along the last
+           axis: */
+        pi = (void *)PyArray_DATA(input);
+        last = extents[nd - 1];
+        pb = fused ? loaded : buffer;
+        for(jj = 0; jj < nlines; jj++) {
+            npy_intp offset = 0;
+            for(ll = 0; ll < nd - 1; ll++) {
+                npy_intp oo = amaps[ll][start[ll] + position[ll]];
+                if (oo == NI_FOOTPRINT_OUTSIDE) {
+                    offset = NI_FOOTPRINT_OUTSIDE;
+                    break;
+                }
+                offset += oo;
+            }
+            if (offset == NI_FOOTPRINT_OUTSIDE) {
+                for(kk = 0; kk < last; kk++)
+                    pb[kk] = cval;
+            } else {
+                npy_intp *amap = amaps[nd - 1] + start[nd - 1];
+                switch (input->descr->type_num) {
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        Bool);
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        UInt8);
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        UInt16);
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        UInt32);
+#if HAS_UINT64
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        UInt64);
+#endif
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        Int8);
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        Int16);
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        Int32);
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        Int64);
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        Float32);
+                    CASE_SEPARABLE_LOAD(pi + offset, amap, last, cval, pb,
+                                        Float64);
+                default:
+                    status = NI_THREAD_TYPE_NOT_SUPPORTED;
+                    goto exit;
+                }
+            }
+            pb += last;
+            for(ll = nd - 2; ll >= 0; ll--) {
+                if (position[ll] < extents[ll] - 1) {
+                    position[ll]++;
+                    break;
+                } else {
+                    position[ll] = 0;
+                }
+            }
+        }
+        for(ll = 0; ll < nd; ll++)
+            tsize *= lengths[ll];
+        for(tt = 0, pp = 0; tt < nterms; tt++) {
+            npy_intp pend = pp + terms[tt];
+            buf1 = buffer;
+            buf2 = buf1 + block;
+            fwd = buf2 + block;
+            bwd = fwd + block;
+            /* the extents of the tile for the passes of this term, which are
+               cropped from the loaded tile if its borders are larger: */
+            for(ll = 0; ll < nd; ll++) {
+                textents[ll] = lengths[ll];
+                toffsets[ll] = 0;
+            }
+            for(kk = pp; kk < pend; kk++)
+                textents[axes[kk]] += sizes[kk] - 1;
+            for(ll = 0; ll < nd; ll++)
+                toffsets[ll] = (extents[ll] - textents[ll]) / 2;
+            if (fused)
+                _SeparableCrop(loaded, extents, buf1, textents, toffsets, nd);
+            /* filter the tile along the axis of each pass: */
+            for(; pp < pend; pp++) {
+                int axis = axes[pp];
+                npy_intp outer = 1, inner = 1, bsize;
+                double *tmp;
+                for(ll = 0; ll < axis; ll++)
+                    outer *= textents[ll];
+                for(ll = axis + 1; ll < nd; ll++)
+                    inner *= textents[ll];
+                switch (types[pp]) {
+                case 0:
+                    _SeparableCorrelate(buf1, buf2, outer, lengths[axis],
+                                        inner, pw[pp], sizes[pp] / 2,
+                                        sizes[pp] - sizes[pp] / 2 - 1,
+                                        symmetric[pp]);
+                    break;
+                case 1:
+                    _SeparableUniform(buf1, buf2, outer, lengths[axis], inner,
+                                      sizes[pp], fwd);
+                    break;
+                case 2:
+                case 3:
+                    _SeparableMinOrMax(buf1, buf2, outer, lengths[axis], inner,
+                                       sizes[pp], types[pp] == 2, fwd, bwd);
+                    break;
+                default:
+                    break;
+                }
+                textents[axis] = lengths[axis];
+                tmp = buf1;
+                buf1 = buf2;
+                buf2 = tmp;
+                /* round to the output type, as if the pass was stored in the
+                   output: */
+                bsize = outer * lengths[axis] * inner;
+                if (pp == pend - 1) {
+                    if (fused)
+                        _SeparableRound(buf1, bsize, output->descr->type_num);
+                    continue;
+                }
+                _SeparableRound(buf1, bsize, output->descr->type_num);
+                /* in constant mode, the borders along the following axes are
+                   again filled with cval, as if the next pass extended the
+                   stored result: */
+                if (mode == NI_EXTEND_CONSTANT) {
+                    for(ll = axis + 1; ll < nd; ll++) {
+                        npy_intp lo = 1, li = 1, oo, ii;
+                        if (fshape[ll] == 1)
+                            continue;
+                        for(kk = 0; kk < ll; kk++)
+                            lo *= textents[kk];
+                        for(kk = ll + 1; kk < nd; kk++)
+                            li *= textents[kk];
+                        for(ii = 0; ii < textents[ll]; ii++) {
+                            if (amaps[ll][start[ll] + toffsets[ll] + ii] !=
+                                    NI_FOOTPRINT_OUTSIDE)
+                                continue;
+                            for(oo = 0; oo < lo; oo++) {
+                                double *pc = buf1 +
+                                             (oo * textents[ll] + ii) * li;
+                                for(kk = 0; kk < li; kk++)
+                                    pc[kk] = cval;
+                            }
+                        }
+                    }
+                }
+            }
+            /* add the term, or its square, to the sum, rounding to the output
+               type as if the sum was accumulated in the output: */
+            if (fused) {
+                if (sd->magnitude) {
+                    for(jj = 0; jj < tsize; jj++)
+                        buf1[jj] *= buf1[jj];
+                    _SeparableRound(buf1, tsize, output->descr->type_num);
+                }
+                if (tt == 0) {
+                    for(jj = 0; jj < tsize; jj++)
+                        sum[jj] = buf1[jj];
+                } else {
+                    for(jj = 0; jj < tsize; jj++)
+                        sum[jj] += buf1[jj];
+                    _SeparableRound(sum, tsize, output->descr->type_num);
+                }
+            }
+        }
+        if (fused) {
+            if (sd->magnitude)
+                for(jj = 0; jj < tsize; jj++)
+                    sum[jj] = sqrt(sum[jj]);
+            buf1 = sum;
+        }
+        /* store the tile in the output: */
+        po = (void *)PyArray_DATA(output);
+        for(ll = 0; ll < nd; ll++) {
+            po += start[ll] * output->strides[ll];
+            position[ll] = 0;
+        }
+        pb = buf1;
+        nlines = 1;
+        for(ll = 0; ll < nd - 1; ll++)
+            nlines *= lengths[ll];
+        for(jj = 0; jj < nlines; jj++) {
+            npy_intp stride = output->strides[nd - 1];
+            switch (output->descr->type_num) {
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb, Bool);
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb, UInt8);
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb,
+                                     UInt16);
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb,
+                                     UInt32);
+#if HAS_UINT64
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb,
+                                     UInt64);
+#endif
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb, Int8);
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb, Int16);
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb, Int32);
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb, Int64);
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb,
+                                     Float32);
+                CASE_SEPARABLE_STORE(po, stride, lengths[nd - 1], pb,
+                                     Float64);
+            default:
+                status = NI_THREAD_TYPE_NOT_SUPPORTED;
+                goto exit;
+            }
+            pb += lengths[nd - 1];
+            for(ll = nd - 2; ll >= 0; ll--) {
+                if (position[ll] < lengths[ll] - 1) {
+                    position[ll]++;
+                    po += output->strides[ll];
+                    break;
+                } else {
+                    po -= position[ll] * output->strides[ll];
+                    position[ll] = 0;
+                }
+            }
+        }
+    }
+exit:
+    free(buffer);
+    return status;
+}
+
+int
+NI_SeparableFilter(PyArrayObject *input, int npasses, npy_intp *axes,
+                   npy_intp *types, npy_intp *sizes, npy_intp *origins,
+                   double *weights, npy_intp *tile, PyArrayObject *output,
+                   NI_ExtendMode mode, double cval, int nterms,
+                   npy_intp *terms, int magnitude, int workers)
+{
+    int ll, pp, tt, nd = input->nd;
+    npy_intp jj, size = 1, ntiles = 1, first = 0, single = npasses;
+    npy_intp forigins[MAXDIM], *fshape, **amaps;
+    int *symmetric;
+    double **pw;
+    _SeparableData sd;
+
+    fshape = sd.fshape;
+    amaps = sd.amaps;
+    symmetric = sd.symmetric;
+    pw = sd.pw;
+    for(ll = 0; ll < nd; ll++) {
+        amaps[ll] = NULL;
+        fshape[ll] = 1;
+        forigins[ll] = 0;
+        size *= input->dimensions[ll];
+    }
+    /* the passes form a single term, unless they are split into terms
+       that are summed: */
+    if (!terms) {
+        nterms = 1;
+        terms = &single;
+    }
+    for(tt = 0, jj = 0; tt < nterms; tt++) {
+        if (terms[tt] < 1) {
+            PyErr_SetString(PyExc_RuntimeError, "invalid terms");
+            goto exit;
+        }
+        jj += terms[tt];
+    }
+    if (jj != npasses || npasses > MAXDIM * MAXDIM) {
+        PyErr_SetString(PyExc_RuntimeError, "invalid terms");
+        goto exit;
+    }
+    /* the filter of each pass: */
+    for(pp = 0, tt = 0; pp < npasses; pp++) {
+        npy_intp size1 = sizes[pp] / 2;
+        if (pp == first + terms[tt]) {
+            first = pp;
+            ++tt;
+        }
+        if (axes[pp] < 0 || axes[pp] >= nd ||
+                (pp > first && axes[pp] <= axes[pp - 1])) {
+            PyErr_SetString(PyExc_RuntimeError, "invalid pass axes");
+            goto exit;
+        }
+        if (sizes[pp] < 1 || size1 + origins[pp] < 0 ||
+                size1 + origins[pp] > sizes[pp]) {
+            PyErr_SetString(PyExc_RuntimeError, "invalid pass size");
+            goto exit;
+        }
+        /* the borders of the terms are centered in those of the tile: */
+        if (nterms > 1 && (!(sizes[pp] & 0x1) || origins[pp] != 0)) {
+            PyErr_SetString(PyExc_RuntimeError,
+                            "summed terms need centered odd sized passes");
+            goto exit;
+        }
+        if (types[pp] < 0 || types[pp] > 3) {
+            PyErr_SetString(PyExc_RuntimeError, "invalid pass type");
+            goto exit;
+        }
+        if (sizes[pp] > fshape[axes[pp]])
+            fshape[axes[pp]] = sizes[pp];
+        forigins[axes[pp]] = origins[pp];
+        pw[pp] = weights + size1;
+        weights += sizes[pp];
+        /* test for symmetry or anti-symmetry, as NI_Correlate1D: */
+        symmetric[pp] = 0;
+        if (types[pp] == 0 && (sizes[pp] & 0x1)) {
+            symmetric[pp] = 1;
+            for(jj = 1; jj <= size1; jj++) {
+                if (fabs(pw[pp][jj] - pw[pp][-jj]) > DBL_EPSILON) {
+                    symmetric[pp] = 0;
+                    break;
+                }
+            }
+            if (symmetric[pp] == 0) {
+                symmetric[pp] = -1;
+                for(jj = 1; jj <= size1; jj++) {
+                    if (fabs(pw[pp][jj] + pw[pp][-jj]) > DBL_EPSILON) {
+                        symmetric[pp] = 0;
+                        break;
+                    }
+                }
+            }
+        }
+    }
+    if (size == 0 || npasses == 0)
+        return 1;
+    sd.block = 1;
+    for(ll = 0; ll < nd; ll++) {
+        sd.block *= tile[ll] + fshape[ll] - 1;
+        sd.ntiles[ll] = (input->dimensions[ll] + tile[ll] - 1) / tile[ll];
+        ntiles *= sd.ntiles[ll];
+    }
+    if (!_InitFootprintMaps(input, fshape, forigins, mode, amaps))
+        goto exit;
+    sd.input = input;
+    sd.output = output;
+    sd.npasses = npasses;
+    sd.nterms = nterms;
+    sd.terms = terms;
+    sd.magnitude = magnitude;
+    sd.axes = axes;
+    sd.types = types;
+    sd.sizes = sizes;
+    sd.tile = tile;
+    sd.mode = mode;
+    sd.cval = cval;
+    NI_RunThreads(_SeparableTiles, &sd, ntiles, workers);
+exit:
+    for(ll = 0; ll < nd; ll++)
+        if (amaps[ll]) free(amaps[ll]);
     return PyErr_Occurred() ? 0 : 1;
 }
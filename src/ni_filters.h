@@ -33,22 +33,39 @@
 #define NI_FILTERS_H
 
 int NI_Correlate1D(PyArrayObject*, PyArrayObject*, int, PyArrayObject*,
-                   NI_ExtendMode, double, npy_intp);
+                   NI_ExtendMode, double, npy_intp, int, int, npy_intp);
 int NI_Correlate(PyArrayObject*, PyArrayObject*, PyArrayObject*,
-                 NI_ExtendMode, double, npy_intp*);
+                 NI_ExtendMode, double, npy_intp*, int);
+int NI_NormalizedCorrelate1D(PyArrayObject*, PyArrayObject*, PyArrayObject*,
+                             int, PyArrayObject*, PyArrayObject*,
+                             NI_ExtendMode, double, npy_intp, int, int, int,
+                             int, npy_intp);
 int NI_UniformFilter1D(PyArrayObject*, npy_intp, int, PyArrayObject*,
-                       NI_ExtendMode, double, npy_intp);
+                       NI_ExtendMode, double, npy_intp, int, int, npy_intp);
+int NI_RecursiveGaussianFilter1D(PyArrayObject*, double, int, int,
+                                 PyArrayObject*, NI_ExtendMode, double, int,
+                                 npy_intp);
 int NI_MinOrMaxFilter1D(PyArrayObject*, npy_intp, int, PyArrayObject*,
-                        NI_ExtendMode, double, npy_intp, int);
+                        NI_ExtendMode, double, npy_intp, int, int, int,
+                        npy_intp);
 int NI_MinOrMaxFilter(PyArrayObject*, PyArrayObject*, PyArrayObject*,
                       PyArrayObject*, NI_ExtendMode, double, npy_intp*,
-                                            int);
-int NI_RankFilter(PyArrayObject*, int, PyArrayObject*, PyArrayObject*,
-                                    NI_ExtendMode, double, npy_intp*);
+                                            int, int);
+int NI_RankFilter(PyArrayObject*, npy_intp*, int, PyArrayObject*,
+                  PyArrayObject*, npy_intp, NI_ExtendMode, double, npy_intp*,
+                  int);
 int NI_GenericFilter1D(PyArrayObject*, int (*)(double*, npy_intp,
                        double*, npy_intp, void*), void*, npy_intp, int,
-                       PyArrayObject*, NI_ExtendMode, double, npy_intp);
+                       PyArrayObject*, NI_ExtendMode, double, npy_intp,
+                       npy_intp, int);
 int NI_GenericFilter(PyArrayObject*, int (*)(double*, npy_intp, double*,
                                          void*), void*, PyArrayObject*, PyArrayObject*,
-                     NI_ExtendMode, double, npy_intp*);
+                     NI_ExtendMode, double, npy_intp*, int);
+int NI_GenericFilterBlocks(PyArrayObject*, int (*)(double*, npy_intp,
+                           npy_intp, double*, void*), void*,
+                           PyArrayObject*, PyArrayObject*, NI_ExtendMode,
+                           double, npy_intp*, npy_intp);
+int NI_SeparableFilter(PyArrayObject*, int, npy_intp*, npy_intp*, npy_intp*,
+                       npy_intp*, double*, npy_intp*, PyArrayObject*,
+                       NI_ExtendMode, double, int, npy_intp*, int, int);
 #endif
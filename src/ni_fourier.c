@@ -189,7 +189,8 @@ int NI_FourierFilter(PyArrayObject *input, PyArrayObject* parameter_array,
     double *parameters = NULL, **params = NULL;
     npy_intp kk, hh, size;
     Float64 *iparameters = (void *)PyArray_DATA(parameter_array);
-    int ll;
+    int ll, err = 0;
+    NPY_BEGIN_THREADS_DEF;
 
     /* precalculate the parameters: */
     parameters = (double*)malloc(input->nd * sizeof(double));
@@ -318,6 +319,7 @@ int NI_FourierFilter(PyArrayObject *input, PyArrayObject* parameter_array,
     size = 1;
     for(ll = 0; ll < input->nd; ll++)
         size *= input->dimensions[ll];
+    NPY_BEGIN_THREADS;
     /* iterator over the elements: */
     for(hh = 0; hh < size; hh++) {
         double tmp = 1.0;
@@ -367,14 +369,14 @@ int NI_FourierFilter(PyArrayObject *input, PyArrayObject* parameter_array,
                 CASE_FOURIER_FILTER_RC(pi, tmp, tmp_r, tmp_i, Complex64);
                 CASE_FOURIER_FILTER_RC(pi, tmp, tmp_r, tmp_i, Complex128);
             default:
-                PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+                err = 1;
                 goto exit;
             }
             switch (output->descr->type_num) {
                 CASE_FOURIER_OUT_CC(po, tmp_r, tmp_i, Complex64);
                 CASE_FOURIER_OUT_CC(po, tmp_r, tmp_i, Complex128);
             default:
-                PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+                err = 1;
                 goto exit;
             }
         } else {
@@ -393,7 +395,7 @@ int NI_FourierFilter(PyArrayObject *input, PyArrayObject* parameter_array,
                 CASE_FOURIER_FILTER_RR(pi, tmp, Float32)
                 CASE_FOURIER_FILTER_RR(pi, tmp, Float64)
             default:
-                PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+                err = 1;
                 goto exit;
             }
             switch (output->descr->type_num) {
@@ -402,7 +404,7 @@ int NI_FourierFilter(PyArrayObject *input, PyArrayObject* parameter_array,
                 CASE_FOURIER_OUT_RC(po, tmp, Complex64);
                 CASE_FOURIER_OUT_RC(po, tmp, Complex128);
             default:
-                PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+                err = 1;
                 goto exit;
             }
         }
@@ -410,6 +412,9 @@ int NI_FourierFilter(PyArrayObject *input, PyArrayObject* parameter_array,
     }
 
  exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "data type not supported");
     if (parameters) free(parameters);
     if (params) {
         for(kk = 0; kk < input->nd; kk++)
@@ -440,7 +445,8 @@ int NI_FourierShift(PyArrayObject *input, PyArrayObject* shift_array,
     double *shifts = NULL, **params = NULL;
     npy_intp kk, hh, size;
     Float64 *ishifts = (void *)PyArray_DATA(shift_array);
-    int ll;
+    int ll, err = 0;
+    NPY_BEGIN_THREADS_DEF;
 
     /* precalculate the shifts: */
     shifts = (double*)malloc(input->nd * sizeof(double));
@@ -500,6 +506,7 @@ int NI_FourierShift(PyArrayObject *input, PyArrayObject* shift_array,
     size = 1;
     for(ll = 0; ll < input->nd; ll++)
         size *= input->dimensions[ll];
+    NPY_BEGIN_THREADS;
     /* iterator over the elements: */
     for(hh = 0; hh < size; hh++) {
         double tmp = 0.0, sint, cost, r = 0.0, i = 0.0;
@@ -525,20 +532,23 @@ int NI_FourierShift(PyArrayObject *input, PyArrayObject* shift_array,
             CASE_FOURIER_SHIFT_C(pi, r, i, cost, sint, Complex64)
             CASE_FOURIER_SHIFT_C(pi, r, i, cost, sint, Complex128)
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
         switch (output->descr->type_num) {
             CASE_FOURIER_OUT_CC(po, r, i, Complex64);
             CASE_FOURIER_OUT_CC(po, r, i, Complex128);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
         NI_ITERATOR_NEXT2(ii, io, pi, po);
     }
 
  exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "data type not supported");
     if (shifts) free(shifts);
     if (params) {
         for(kk = 0; kk < input->nd; kk++)
@@ -195,115 +195,176 @@ map_coordinate(double in, npy_intp len, int mode)
     return in;
 }
 
-#define BUFFER_SIZE 256000
 #define TOLERANCE 1e-15
 
+/* spline filter of one line, in place. The sums are calculated in
+     double precision, also if the line is stored in single precision: */
+#define SPLINE_FILTER_LINE(_ln, _len, _weight, _pole, _npoles)          \
+{                                                                       \
+    npy_intp _ll;                                                       \
+    int _hh;                                                            \
+    for(_ll = 0; _ll < _len; _ll++)                                     \
+        _ln[_ll] *= _weight;                                            \
+    for(_hh = 0; _hh < _npoles; _hh++) {                                \
+        double _p = _pole[_hh];                                         \
+        int _max = (int)ceil(log(TOLERANCE) / log(fabs(_p)));           \
+        if (_max < _len) {                                              \
+            double _zn = _p;                                            \
+            double _sum = _ln[0];                                       \
+            for(_ll = 1; _ll < _max; _ll++) {                           \
+                _sum += _zn * _ln[_ll];                                 \
+                _zn *= _p;                                              \
+            }                                                           \
+            _ln[0] = _sum;                                              \
+        } else {                                                        \
+            double _zn = _p;                                            \
+            double _iz = 1.0 / _p;                                      \
+            double _z2n = pow(_p, (double)(_len - 1));                  \
+            double _sum = _ln[0] + _z2n * _ln[_len - 1];                \
+            _z2n *= _z2n * _iz;                                         \
+            for(_ll = 1; _ll <= _len - 2; _ll++) {                      \
+                _sum += (_zn + _z2n) * _ln[_ll];                        \
+                _zn *= _p;                                              \
+                _z2n *= _iz;                                            \
+            }                                                           \
+            _ln[0] = _sum / (1.0 - _zn * _zn);                          \
+        }                                                               \
+        for(_ll = 1; _ll < _len; _ll++)                                 \
+            _ln[_ll] += _p * _ln[_ll - 1];                              \
+        _ln[_len - 1] = (_p / (_p * _p - 1.0)) *                        \
+                        (_ln[_len - 1] + _p * _ln[_len - 2]);           \
+        for(_ll = _len - 2; _ll >= 0; _ll--)                            \
+            _ln[_ll] = _p * (_ln[_ll + 1] - _ln[_ll]);                  \
+    }                                                                   \
+}
+
+typedef struct {
+    NI_LineBuffer iline_buffer, oline_buffer;
+    npy_intp lines;
+    double weight, pole[2];
+    int npoles, single;
+} _SplineFilterData;
+
+/* filter the lines of a range in place, in a buffer of this thread: */
+static NI_ThreadStatus
+_SplineFilterLines(void *data, npy_intp start, npy_intp stop)
+{
+    _SplineFilterData *sf = (_SplineFilterData*)data;
+    NI_LineBuffer iline_buffer = sf->iline_buffer;
+    NI_LineBuffer oline_buffer = sf->oline_buffer;
+    NI_ThreadStatus status = NI_THREAD_OK;
+    npy_intp kk, lines = sf->lines, len = iline_buffer.line_length;
+    double weight = sf->weight, *pole = sf->pole;
+    int npoles = sf->npoles, more;
+    char *buffer;
+
+    if (lines > stop - start)
+        lines = stop - start;
+    buffer = (char*)malloc(lines * len * (sf->single ? sizeof(float) :
+                                                       sizeof(double)));
+    if (!buffer)
+        return NI_THREAD_NO_MEMORY;
+    iline_buffer.buffer_data = buffer;
+    iline_buffer.buffer_lines = lines;
+    oline_buffer.buffer_data = buffer;
+    oline_buffer.buffer_lines = lines;
+    NI_LineBufferRange(&iline_buffer, start, stop);
+    NI_LineBufferRange(&oline_buffer, start, stop);
+    /* iterate over the array lines of this range: */
+    do {
+        /* copy lines from array to buffer: */
+        if (!NI_ArrayToLineBuffer(&iline_buffer, &lines, &more)) {
+            status = NI_THREAD_TYPE_NOT_SUPPORTED;
+            break;
+        }
+        /* iterate over the lines in the buffer: */
+        if (len > 1) {
+            for(kk = 0; kk < lines; kk++) {
+                if (sf->single) {
+                    float *ln = NI_GET_FLOAT_LINE(iline_buffer, kk);
+                    SPLINE_FILTER_LINE(ln, len, weight, pole, npoles);
+                } else {
+                    double *ln = NI_GET_LINE(iline_buffer, kk);
+                    SPLINE_FILTER_LINE(ln, len, weight, pole, npoles);
+                }
+            }
+        }
+        /* copy lines from buffer to array: */
+        if (!NI_LineBufferToArray(&oline_buffer)) {
+            status = NI_THREAD_TYPE_NOT_SUPPORTED;
+            break;
+        }
+    } while(more);
+    free(buffer);
+    return status;
+}
+
 /* one-dimensional spline filter: */
 int NI_SplineFilter1D(PyArrayObject *input, int order, int axis,
-                                            PyArrayObject *output)
+                                            PyArrayObject *output, int single,
+                      npy_intp buffer_size, int workers)
 {
-    int hh, npoles = 0, more;
-    npy_intp kk, ll, lines, len;
-    double *buffer = NULL, weight, pole[2];
-    NI_LineBuffer iline_buffer, oline_buffer;
+    int hh;
+    npy_intp len;
+    _SplineFilterData sf;
 
     len = input->nd > 0 ? input->dimensions[axis] : 1;
     if (len < 1)
         goto exit;
 
     /* these are used in the spline filter calculation below: */
+    sf.npoles = 0;
     switch (order) {
     case 2:
-        npoles = 1;
-        pole[0] = sqrt(8.0) - 3.0;
+        sf.npoles = 1;
+        sf.pole[0] = sqrt(8.0) - 3.0;
         break;
     case 3:
-        npoles = 1;
-        pole[0] = sqrt(3.0) - 2.0;
+        sf.npoles = 1;
+        sf.pole[0] = sqrt(3.0) - 2.0;
         break;
     case 4:
-        npoles = 2;
-        pole[0] = sqrt(664.0 - sqrt(438976.0)) + sqrt(304.0) - 19.0;
-        pole[1] = sqrt(664.0 + sqrt(438976.0)) - sqrt(304.0) - 19.0;
+        sf.npoles = 2;
+        sf.pole[0] = sqrt(664.0 - sqrt(438976.0)) + sqrt(304.0) - 19.0;
+        sf.pole[1] = sqrt(664.0 + sqrt(438976.0)) - sqrt(304.0) - 19.0;
         break;
     case 5:
-        npoles = 2;
-        pole[0] = sqrt(67.5 - sqrt(4436.25)) + sqrt(26.25) - 6.5;
-        pole[1] = sqrt(67.5 + sqrt(4436.25)) - sqrt(26.25) - 6.5;
+        sf.npoles = 2;
+        sf.pole[0] = sqrt(67.5 - sqrt(4436.25)) + sqrt(26.25) - 6.5;
+        sf.pole[1] = sqrt(67.5 + sqrt(4436.25)) - sqrt(26.25) - 6.5;
         break;
     default:
         break;
     }
 
-    weight = 1.0;
-    for(hh = 0; hh < npoles; hh++)
-        weight *= (1.0 - pole[hh]) * (1.0 - 1.0 / pole[hh]);
+    sf.weight = 1.0;
+    for(hh = 0; hh < sf.npoles; hh++)
+        sf.weight *= (1.0 - sf.pole[hh]) * (1.0 - 1.0 / sf.pole[hh]);
 
-    /* allocate an initialize the line buffer, only a single one is used,
-         because the calculation is in-place: */
-    lines = -1;
-    if (!NI_AllocateLineBuffer(input, axis, 0, 0, &lines, BUFFER_SIZE,
-                                                         &buffer))
-        goto exit;
-    if (!NI_InitLineBuffer(input, axis, 0, 0, lines, buffer,
-                                                 NI_EXTEND_DEFAULT, 0.0, &iline_buffer))
+    /* initialize the line buffers, each thread uses a single one for
+       input and output, because the calculation is in-place: */
+    if (!NI_InitLineBuffer(input, axis, 0, 0, 1, NULL, NI_EXTEND_DEFAULT,
+                           0.0, &sf.iline_buffer))
         goto exit;
-    if (!NI_InitLineBuffer(output, axis, 0, 0, lines, buffer,
-                                                 NI_EXTEND_DEFAULT, 0.0, &oline_buffer))
+    if (!NI_InitLineBuffer(output, axis, 0, 0, 1, NULL, NI_EXTEND_DEFAULT,
+                           0.0, &sf.oline_buffer))
         goto exit;
-
-    /* iterate over all the array lines: */
-    do {
-        /* copy lines from array to buffer: */
-        if (!NI_ArrayToLineBuffer(&iline_buffer, &lines, &more))
-            goto exit;
-        /* iterate over the lines in the buffer: */
-        for(kk = 0; kk < lines; kk++) {
-            /* get line: */
-            double *ln = NI_GET_LINE(iline_buffer, kk);
-            /* spline filter: */
-            if (len > 1) {
-                for(ll = 0; ll < len; ll++)
-                    ln[ll] *= weight;
-                for(hh = 0; hh < npoles; hh++) {
-                    double p = pole[hh];
-                    int max = (int)ceil(log(TOLERANCE) / log(fabs(p)));
-                    if (max < len) {
-                        double zn = p;
-                        double sum = ln[0];
-                        for(ll = 1; ll < max; ll++) {
-                            sum += zn * ln[ll];
-                            zn *= p;
-                        }
-                        ln[0] = sum;
-                    } else {
-                        double zn = p;
-                        double iz = 1.0 / p;
-                        double z2n = pow(p, (double)(len - 1));
-                        double sum = ln[0] + z2n * ln[len - 1];
-                        z2n *= z2n * iz;
-                        for(ll = 1; ll <= len - 2; ll++) {
-                            sum += (zn + z2n) * ln[ll];
-                            zn *= p;
-                            z2n *= iz;
-                        }
-                        ln[0] = sum / (1.0 - zn * zn);
-                    }
-                    for(ll = 1; ll < len; ll++)
-                        ln[ll] += p * ln[ll - 1];
-                    ln[len-1] = (p / (p * p - 1.0)) * (ln[len-1] + p * ln[len-2]);
-                    for(ll = len - 2; ll >= 0; ll--)
-                        ln[ll] = p * (ln[ll + 1] - ln[ll]);
-                }
-            }
-        }
-        /* copy lines from buffer to array: */
-        if (!NI_LineBufferToArray(&oline_buffer))
-            goto exit;
-    } while(more);
+    sf.single = single;
+    if (single) {
+        sf.iline_buffer.buffer_type = tFloat32;
+        sf.oline_buffer.buffer_type = tFloat32;
+    }
+    /* the number of lines buffered by each thread: */
+    if (buffer_size < 1)
+        buffer_size = NI_CacheBufferSize();
+    sf.lines = buffer_size / (len * (single ? sizeof(float) :
+                                              sizeof(double)));
+    if (sf.lines < 1)
+        sf.lines = 1;
+    NI_RunThreads(_SplineFilterLines, &sf, sf.iline_buffer.array_lines,
+                  workers);
 
  exit:
-    if (buffer) free(buffer);
     return PyErr_Occurred() ? 0 : 1;
 }
 
@@ -344,130 +405,81 @@ case t ## _type:                            \
     *(_type*)_po = (_type)_t;                 \
     break;
 
-int
-NI_GeometricTransform(PyArrayObject *input, int (*map)(npy_intp*, double*,
-                int, int, void*), void* map_data, PyArrayObject* matrix_ar,
-                PyArrayObject* shift_ar, PyArrayObject *coordinates,
-                PyArrayObject *output, int order, int mode, double cval)
+typedef struct {
+    PyArrayObject *input, *output, *coordinates;
+    int (*map)(npy_intp*, double*, int, int, void*);
+    void *map_data;
+    Float64 *matrix, *shift;
+    npy_intp *orders, *fcoordinates, *foffsets, filter_size, cstride;
+    NI_Iterator io, ic;
+    int mode;
+    double cval;
+} _GeometricData;
+
+/* transform the output points of a range, with the spline buffers of this
+   thread: */
+static NI_ThreadStatus
+_GeometricTransformPoints(void *data, npy_intp first, npy_intp last)
 {
+    _GeometricData *gd = (_GeometricData*)data;
+    PyArrayObject *input = gd->input, *output = gd->output;
+    PyArrayObject *coordinates = gd->coordinates;
     char *po, *pi, *pc = NULL;
-    npy_intp **edge_offsets = NULL, **data_offsets = NULL, filter_size;
-    npy_intp ftmp[MAXDIM], *fcoordinates = NULL, *foffsets = NULL;
-    npy_intp cstride = 0, kk, hh, ll, jj, *idxs = NULL;
-    npy_intp size;
-    double **splvals = NULL, icoor[MAXDIM];
+    npy_intp *edge_offsets[MAXDIM], *data_offsets[MAXDIM];
+    npy_intp *orders = gd->orders, *fcoordinates = gd->fcoordinates;
+    npy_intp *foffsets = gd->foffsets, filter_size = gd->filter_size;
+    npy_intp cstride = gd->cstride, kk, hh, ll, jj, *idxs = NULL;
+    npy_intp aoffsets[MAXDIM], ocoor[MAXDIM];
     npy_intp idimensions[MAXDIM], istrides[MAXDIM];
-    NI_Iterator io, ic;
-    Float64 *matrix = matrix_ar ? (Float64*)PyArray_DATA(matrix_ar) : NULL;
-    Float64 *shift = shift_ar ? (Float64*)PyArray_DATA(shift_ar) : NULL;
-    int irank = 0, orank, qq;
+    double *splvals[MAXDIM], *fweights, *buffer;
+    double icoor[MAXDIM], pcoor[MAXDIM], cval = gd->cval;
+    NI_Iterator io = gd->io, ic = gd->ic;
+    Float64 *matrix = gd->matrix, *shift = gd->shift;
+    int irank = input->nd, orank = output->nd, mode = gd->mode;
+    int cached = 0, weighted = 0, aconstant[MAXDIM];
+    NI_ThreadStatus status = NI_THREAD_OK;
 
-    for(kk = 0; kk < input->nd; kk++) {
+    for(kk = 0; kk < irank; kk++) {
         idimensions[kk] = input->dimensions[kk];
         istrides[kk] = input->strides[kk];
     }
-    irank = input->nd;
-    orank = output->nd;
-
-    /* if the mapping is from array coordinates: */
-    if (coordinates) {
-        /* initialze a line iterator along the first axis: */
-        if (!NI_InitPointIterator(coordinates, &ic))
-            goto exit;
-        cstride = ic.strides[0];
-        if (!NI_LineIterator(&ic, 0))
-            goto exit;
-        pc = (void *)(PyArray_DATA(coordinates));
-    }
-
-    /* offsets used at the borders: */
-    edge_offsets = (npy_intp**)malloc(irank * sizeof(npy_intp*));
-    data_offsets = (npy_intp**)malloc(irank * sizeof(npy_intp*));
-    if (!edge_offsets || !data_offsets) {
-        PyErr_NoMemory();
-        goto exit;
-    }
-    for(jj = 0; jj < irank; jj++)
-        data_offsets[jj] = NULL;
-    for(jj = 0; jj < irank; jj++) {
-        data_offsets[jj] = (npy_intp*)malloc((order + 1) * sizeof(npy_intp));
-        if (!data_offsets[jj]) {
-            PyErr_NoMemory();
-            goto exit;
-        }
-    }
-    /* will hold the spline coefficients: */
-    splvals = (double**)malloc(irank * sizeof(double*));
-    if (!splvals) {
-        PyErr_NoMemory();
-        goto exit;
-    }
-    for(jj = 0; jj < irank; jj++)
-        splvals[jj] = NULL;
-    for(jj = 0; jj < irank; jj++) {
-        splvals[jj] = (double*)malloc((order + 1) * sizeof(double));
-        if (!splvals[jj]) {
-            PyErr_NoMemory();
-            goto exit;
-        }
-    }
-
-    filter_size = 1;
-    for(jj = 0; jj < irank; jj++)
-        filter_size *= order + 1;
-    idxs = (npy_intp*)malloc(filter_size * sizeof(idxs));
-    if (!idxs) {
-        PyErr_NoMemory();
-        goto exit;
-    }
+    /* the offsets used at the borders, the spline coefficients, the
+       products of the spline coefficients of all axes, and the offsets of
+       the filter: */
+    jj = 0;
+    for(hh = 0; hh < irank; hh++)
+        jj += orders[hh] + 1;
+    buffer = (double*)malloc(jj * (sizeof(double) + sizeof(npy_intp)) +
+                             filter_size * (sizeof(double) +
+                                            sizeof(npy_intp)));
+    if (!buffer)
+        return NI_THREAD_NO_MEMORY;
+    fweights = buffer;
+    splvals[0] = fweights + filter_size;
+    for(hh = 1; hh < irank; hh++)
+        splvals[hh] = splvals[hh - 1] + orders[hh - 1] + 1;
+    idxs = (npy_intp*)(splvals[irank - 1] + orders[irank - 1] + 1);
+    data_offsets[0] = idxs + filter_size;
+    for(hh = 1; hh < irank; hh++)
+        data_offsets[hh] = data_offsets[hh - 1] + orders[hh - 1] + 1;
 
-    /* initialize output iterator: */
-    if (!NI_InitPointIterator(output, &io))
-        goto exit;
-
-    /* get data pointers: */
+    /* go to the first point of the range: */
     pi = (void *)PyArray_DATA(input);
-    po = (void *)PyArray_DATA(output);
-
-    /* make a table of all possible coordinates within the spline filter: */
-    fcoordinates = (npy_intp*)malloc(irank * filter_size * sizeof(npy_intp));
-    /* make a table of all offsets within the spline filter: */
-    foffsets = (npy_intp*)malloc(filter_size * sizeof(npy_intp));
-    if (!fcoordinates || !foffsets) {
-        PyErr_NoMemory();
-        goto exit;
-    }
-    for(jj = 0; jj < irank; jj++)
-        ftmp[jj] = 0;
-    kk = 0;
-    for(hh = 0; hh < filter_size; hh++) {
-        for(jj = 0; jj < irank; jj++)
-            fcoordinates[jj + hh * irank] = ftmp[jj];
-        foffsets[hh] = kk;
-        for(jj = irank - 1; jj >= 0; jj--) {
-            if (ftmp[jj] < order) {
-                ftmp[jj]++;
-                kk += istrides[jj];
-                break;
-            } else {
-                ftmp[jj] = 0;
-                kk -= istrides[jj] * order;
-            }
-        }
-    }
+    NI_IteratorCoordinates(&io, first, ocoor);
+    NI_ITERATOR_GOTO(io, ocoor, (char *)PyArray_DATA(output), po);
+    if (coordinates)
+        NI_ITERATOR_GOTO(ic, ocoor, (char *)PyArray_DATA(coordinates), pc);
 
-    size = 1;
-    for(qq = 0; qq < output->nd; qq++)
-        size *= output->dimensions[qq];
-    for(kk = 0; kk < size; kk++) {
+    for(kk = first; kk < last; kk++) {
         double t = 0.0;
-        int constant = 0, edge = 0, offset = 0;
-        if (map) {
-            /* call mappint functions: */
-            if (!map(io.coordinates, icoor, orank, irank, map_data)) {
-                if (!PyErr_Occurred())
-                    PyErr_SetString(PyExc_RuntimeError,
-                                                    "unknown error in mapping function");
+        npy_intp offset = 0;
+        int constant = 0, edge = 0;
+        if (gd->map) {
+            /* call mappint functions, that must acquire the GIL if they
+                 call Python: */
+            if (!gd->map(io.coordinates, icoor, orank, irank,
+                         gd->map_data)) {
+                status = NI_THREAD_CALLBACK_FAILED;
                 goto exit;
             }
         } else if (matrix) {
@@ -497,64 +509,94 @@ NI_GeometricTransform(PyArrayObject *input, int (*map)(npy_intp*, double*,
                 CASE_MAP_COORDINATES(p, icoor, irank, cstride, Float32);
                 CASE_MAP_COORDINATES(p, icoor, irank, cstride, Float64);
             default:
-                PyErr_SetString(PyExc_RuntimeError,
-                                                "coordinate array data type not supported");
+                status = NI_THREAD_TYPE_NOT_SUPPORTED;
                 goto exit;
             }
         }
-        /* iterate over axes: */
+        /* iterate over axes, calculating the filter location and spline
+           coefficients only along the axes where the coordinate changed
+           since the previous point, such as the axes of a rotation plane
+           while the other axes are iterated: */
         for(hh = 0; hh < irank; hh++) {
+            double cc;
+            int start, order = orders[hh];
+            if (cached && icoor[hh] == pcoor[hh])
+                continue;
+            pcoor[hh] = icoor[hh];
+            if (order > 0)
+                weighted = 0;
             /* if the input coordinate is outside the borders, map it: */
-            double cc = map_coordinate(icoor[hh], idimensions[hh], mode);
-            if (cc > -1.0) {
-                /* find the filter location along this axis: */
-                int start;
-                if (order & 1) {
-                    start = (int)floor(cc) - order / 2;
-                } else {
-                    start = (int)floor(cc + 0.5) - order / 2;
-                }
-                /* get the offset to the start of the filter: */
-                offset += istrides[hh] * start;
-                if (start < 0 || start + order >= idimensions[hh]) {
-                    /* implement border mapping, if outside border: */
-                    edge = 1;
-                    edge_offsets[hh] = data_offsets[hh];
-                    for(ll = 0; ll <= order; ll++) {
-                        int idx = start + ll;
-                        int len = idimensions[hh];
-                        if (len <= 1) {
-                            idx = 0;
-                        } else {
-                            int s2 = 2 * len - 2;
-                            if (idx < 0) {
-                                idx = s2 * (int)(-idx / s2) + idx;
-                                idx = idx <= 1 - len ? idx + s2 : -idx;
-                            } else if (idx >= len) {
-                                idx -= s2 * (int)(idx / s2);
-                                if (idx >= len)
-                                    idx = s2 - idx;
-                            }
+            cc = map_coordinate(icoor[hh], idimensions[hh], mode);
+            aconstant[hh] = cc <= -1.0;
+            if (aconstant[hh])
+                continue;
+            /* find the filter location along this axis: */
+            if (order & 1) {
+                start = (int)floor(cc) - order / 2;
+            } else {
+                start = (int)floor(cc + 0.5) - order / 2;
+            }
+            /* get the offset to the start of the filter: */
+            aoffsets[hh] = istrides[hh] * start;
+            if (start < 0 || start + order >= idimensions[hh]) {
+                /* implement border mapping, if outside border: */
+                edge_offsets[hh] = data_offsets[hh];
+                for(ll = 0; ll <= order; ll++) {
+                    int idx = start + ll;
+                    int len = idimensions[hh];
+                    if (len <= 1) {
+                        idx = 0;
+                    } else {
+                        int s2 = 2 * len - 2;
+                        if (idx < 0) {
+                            idx = s2 * (int)(-idx / s2) + idx;
+                            idx = idx <= 1 - len ? idx + s2 : -idx;
+                        } else if (idx >= len) {
+                            idx -= s2 * (int)(idx / s2);
+                            if (idx >= len)
+                                idx = s2 - idx;
                         }
-                        /* calculate and store the offests at this edge: */
-                        edge_offsets[hh][ll] = istrides[hh] * (idx - start);
                     }
-                } else {
-                    /* we are not at the border, use precalculated offsets: */
-                    edge_offsets[hh] = NULL;
+                    /* calculate and store the offests at this edge: */
+                    edge_offsets[hh][ll] = istrides[hh] * (idx - start);
                 }
-                spline_coefficients(cc, order, splvals[hh]);
             } else {
+                /* we are not at the border, use precalculated offsets: */
+                edge_offsets[hh] = NULL;
+            }
+            if (order > 0)
+                spline_coefficients(cc, order, splvals[hh]);
+            else
+                splvals[hh][0] = 1.0;
+        }
+        cached = 1;
+        for(hh = 0; hh < irank; hh++) {
+            if (aconstant[hh]) {
                 /* we use the constant border condition: */
                 constant = 1;
                 break;
             }
+            offset += aoffsets[hh];
+            if (edge_offsets[hh])
+                edge = 1;
+        }
+        /* the products of the spline coefficients of all axes: */
+        if (!constant && !weighted) {
+            npy_intp *ff = fcoordinates;
+            for(hh = 0; hh < filter_size; hh++) {
+                double weight = splvals[0][ff[0]];
+                for(ll = 1; ll < irank; ll++)
+                    weight *= splvals[ll][ff[ll]];
+                fweights[hh] = weight;
+                ff += irank;
+            }
+            weighted = 1;
         }
 
         if (!constant) {
             npy_intp *ff = fcoordinates;
             for(hh = 0; hh < filter_size; hh++) {
-                int idx = 0;
+                npy_intp idx = 0;
                 if (edge) {
                     for(ll = 0; ll < irank; ll++) {
                         if (edge_offsets[ll])
@@ -571,7 +613,6 @@ NI_GeometricTransform(PyArrayObject *input, int (*map)(npy_intp*, double*,
             }
         }
         if (!constant) {
-            npy_intp *ff = fcoordinates;
             t = 0.0;
             for(hh = 0; hh < filter_size; hh++) {
                 double coeff = 0.0;
@@ -590,16 +631,11 @@ NI_GeometricTransform(PyArrayObject *input, int (*map)(npy_intp*, double*,
                     CASE_INTERP_COEFF(coeff, pi, idxs[hh], Float32);
                     CASE_INTERP_COEFF(coeff, pi, idxs[hh], Float64);
                 default:
-                    PyErr_SetString(PyExc_RuntimeError,
-                                                    "data type not supported");
+                    status = NI_THREAD_TYPE_NOT_SUPPORTED;
                     goto exit;
                 }
                 /* calculate the interpolated value: */
-                for(ll = 0; ll < irank; ll++)
-                    if (order > 0)
-                        coeff *= splvals[ll][ff[ll]];
-                t += coeff;
-                ff += irank;
+                t += coeff * fweights[hh];
             }
         } else {
             t = cval;
@@ -621,7 +657,7 @@ NI_GeometricTransform(PyArrayObject *input, int (*map)(npy_intp*, double*,
             CASE_INTERP_OUT(po, t, Float32);
             CASE_INTERP_OUT(po, t, Float64);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            status = NI_THREAD_TYPE_NOT_SUPPORTED;
             goto exit;
         }
         if (coordinates) {
@@ -632,39 +668,243 @@ NI_GeometricTransform(PyArrayObject *input, int (*map)(npy_intp*, double*,
     }
 
  exit:
-    if (edge_offsets)
-        free(edge_offsets);
-    if (data_offsets) {
-        for(jj = 0; jj < irank; jj++)
-            free(data_offsets[jj]);
-        free(data_offsets);
+    free(buffer);
+    return status;
+}
+
+int
+NI_GeometricTransform(PyArrayObject *input, int (*map)(npy_intp*, double*,
+                int, int, void*), void* map_data, PyArrayObject* matrix_ar,
+                PyArrayObject* shift_ar, PyArrayObject *coordinates,
+                PyArrayObject *output, npy_intp *orders, int mode, double cval,
+                int workers, int nogil)
+{
+    npy_intp ftmp[MAXDIM], *fcoordinates = NULL, *foffsets = NULL;
+    npy_intp kk, hh, jj, filter_size, size;
+    _GeometricData gd;
+    int irank = input->nd, qq;
+
+    gd.input = input;
+    gd.output = output;
+    gd.coordinates = coordinates;
+    gd.map = map;
+    gd.map_data = map_data;
+    gd.matrix = matrix_ar ? (Float64*)PyArray_DATA(matrix_ar) : NULL;
+    gd.shift = shift_ar ? (Float64*)PyArray_DATA(shift_ar) : NULL;
+    gd.orders = orders;
+    gd.mode = mode;
+    gd.cval = cval;
+    gd.cstride = 0;
+
+    /* if the mapping is from array coordinates: */
+    if (coordinates) {
+        /* initialze a line iterator along the first axis: */
+        if (!NI_InitPointIterator(coordinates, &gd.ic))
+            goto exit;
+        gd.cstride = gd.ic.strides[0];
+        if (!NI_LineIterator(&gd.ic, 0))
+            goto exit;
     }
-    if (splvals) {
+
+    /* initialize output iterator: */
+    if (!NI_InitPointIterator(output, &gd.io))
+        goto exit;
+
+    filter_size = 1;
+    for(jj = 0; jj < irank; jj++)
+        filter_size *= orders[jj] + 1;
+
+    /* make a table of all possible coordinates within the spline filter: */
+    fcoordinates = (npy_intp*)malloc(irank * filter_size * sizeof(npy_intp));
+    /* make a table of all offsets within the spline filter: */
+    foffsets = (npy_intp*)malloc(filter_size * sizeof(npy_intp));
+    if (!fcoordinates || !foffsets) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    for(jj = 0; jj < irank; jj++)
+        ftmp[jj] = 0;
+    kk = 0;
+    for(hh = 0; hh < filter_size; hh++) {
         for(jj = 0; jj < irank; jj++)
-            free(splvals[jj]);
-        free(splvals);
+            fcoordinates[jj + hh * irank] = ftmp[jj];
+        foffsets[hh] = kk;
+        for(jj = irank - 1; jj >= 0; jj--) {
+            if (ftmp[jj] < orders[jj]) {
+                ftmp[jj]++;
+                kk += input->strides[jj];
+                break;
+            } else {
+                ftmp[jj] = 0;
+                kk -= input->strides[jj] * orders[jj];
+            }
+        }
     }
+    gd.fcoordinates = fcoordinates;
+    gd.foffsets = foffsets;
+    gd.filter_size = filter_size;
+
+    size = 1;
+    for(qq = 0; qq < output->nd; qq++)
+        size *= output->dimensions[qq];
+    /* a mapping that may call Python is called from this thread, holding
+       the GIL: */
+    if (nogil)
+        NI_RunThreads(_GeometricTransformPoints, &gd, size, workers);
+    else
+        NI_RunHoldingGIL(_GeometricTransformPoints, &gd, size);
+
+ exit:
     if (foffsets)
         free(foffsets);
     if (fcoordinates)
         free(fcoordinates);
-    if (idxs)
-        free(idxs);
     return PyErr_Occurred() ? 0 : 1;
 }
 
+typedef struct {
+    PyArrayObject *input, *output;
+    npy_intp **zeros, **offsets, ***edge_offsets, *orders;
+    npy_intp *fcoordinates, *foffsets, filter_size;
+    double ***splvals, cval;
+    NI_Iterator io;
+} _ZoomShiftData;
+
+/* zoom or shift the output points of a range: */
+static NI_ThreadStatus
+_ZoomShiftPoints(void *data, npy_intp first, npy_intp last)
+{
+    _ZoomShiftData *zd = (_ZoomShiftData*)data;
+    PyArrayObject *input = zd->input, *output = zd->output;
+    npy_intp **zeros = zd->zeros, **offsets = zd->offsets;
+    npy_intp ***edge_offsets = zd->edge_offsets, *orders = zd->orders;
+    npy_intp *fcoordinates = zd->fcoordinates, *foffsets = zd->foffsets;
+    npy_intp filter_size = zd->filter_size, jj, hh, kk, *idxs;
+    npy_intp istrides[MAXDIM], coordinates[MAXDIM];
+    double ***splvals = zd->splvals, cval = zd->cval;
+    NI_Iterator io = zd->io;
+    NI_ThreadStatus status = NI_THREAD_OK;
+    int rank = input->nd;
+    char *po, *pi;
+
+    for(jj = 0; jj < rank; jj++)
+        istrides[jj] = input->strides[jj];
+    idxs = (npy_intp*)malloc(filter_size * sizeof(npy_intp));
+    if (!idxs)
+        return NI_THREAD_NO_MEMORY;
+    pi = (void *)PyArray_DATA(input);
+    NI_IteratorCoordinates(&io, first, coordinates);
+    NI_ITERATOR_GOTO(io, coordinates, (char *)PyArray_DATA(output), po);
+    for(kk = first; kk < last; kk++) {
+        double t = 0.0;
+        npy_intp oo = 0;
+        int edge = 0, zero = 0;
+
+        for(hh = 0; hh < rank; hh++) {
+            if (zeros && zeros[hh][io.coordinates[hh]]) {
+                /* we use constant border condition */
+                zero = 1;
+                break;
+            }
+            oo += offsets[hh][io.coordinates[hh]];
+            if (edge_offsets[hh][io.coordinates[hh]])
+                edge = 1;
+        }
+
+        if (!zero) {
+            npy_intp *ff = fcoordinates;
+            for(hh = 0; hh < filter_size; hh++) {
+                npy_intp idx = 0;
+                if (edge) {
+                        /* use precalculated edge offsets: */
+                    for(jj = 0; jj < rank; jj++) {
+                        if (edge_offsets[jj][io.coordinates[jj]])
+                            idx += edge_offsets[jj][io.coordinates[jj]][ff[jj]];
+                        else
+                            idx += ff[jj] * istrides[jj];
+                    }
+                    idx += oo;
+                } else {
+                    /* use normal offsets: */
+                    idx += oo + foffsets[hh];
+                }
+                idxs[hh] = idx;
+                ff += rank;
+            }
+        }
+        if (!zero) {
+            npy_intp *ff = fcoordinates;
+            t = 0.0;
+            for(hh = 0; hh < filter_size; hh++) {
+                double coeff = 0.0;
+                switch(input->descr->type_num) {
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Bool);
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], UInt8);
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], UInt16);
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], UInt32);
+#if HAS_UINT64
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], UInt64);
+#endif
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Int8);
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Int16);
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Int32);
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Int64);
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Float32);
+                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Float64);
+                default:
+                    status = NI_THREAD_TYPE_NOT_SUPPORTED;
+                    goto exit;
+                }
+                /* calculate interpolated value: */
+                for(jj = 0; jj < rank; jj++)
+                    if (orders[jj] > 0)
+                        coeff *= splvals[jj][io.coordinates[jj]][ff[jj]];
+                t += coeff;
+                ff += rank;
+            }
+        } else {
+            t = cval;
+        }
+        /* store output: */
+        switch (output->descr->type_num) {
+            CASE_INTERP_OUT(po, t, Bool);
+            CASE_INTERP_OUT_UINT(po, t, UInt8, 0, MAX_UINT8);
+            CASE_INTERP_OUT_UINT(po, t, UInt16, 0, MAX_UINT16);
+            CASE_INTERP_OUT_UINT(po, t, UInt32, 0, MAX_UINT32);
+#if HAS_UINT64
+            /* FIXME */
+            CASE_INTERP_OUT_UINT(po, t, UInt64, 0, MAX_UINT32);
+#endif
+            CASE_INTERP_OUT_INT(po, t, Int8, MIN_INT8, MAX_INT8);
+            CASE_INTERP_OUT_INT(po, t, Int16, MIN_INT16, MAX_INT16);
+            CASE_INTERP_OUT_INT(po, t, Int32, MIN_INT32, MAX_INT32);
+            CASE_INTERP_OUT_INT(po, t, Int64, MIN_INT64, MAX_INT64);
+            CASE_INTERP_OUT(po, t, Float32);
+            CASE_INTERP_OUT(po, t, Float64);
+        default:
+            status = NI_THREAD_TYPE_NOT_SUPPORTED;
+            goto exit;
+        }
+        NI_ITERATOR_NEXT(io, po);
+    }
+
+ exit:
+    free(idxs);
+    return status;
+}
+
 int NI_ZoomShift(PyArrayObject *input, PyArrayObject* zoom_ar,
                                  PyArrayObject* shift_ar, PyArrayObject *output,
-                                 int order, int mode, double cval)
+                                 npy_intp *orders, int mode, double cval,
+                 int workers)
 {
-    char *po, *pi;
     npy_intp **zeros = NULL, **offsets = NULL, ***edge_offsets = NULL;
     npy_intp ftmp[MAXDIM], *fcoordinates = NULL, *foffsets = NULL;
     npy_intp jj, hh, kk, filter_size, odimensions[MAXDIM];
-    npy_intp idimensions[MAXDIM], istrides[MAXDIM], *idxs = NULL;
+    npy_intp idimensions[MAXDIM], istrides[MAXDIM];
     npy_intp size;
     double ***splvals = NULL;
-    NI_Iterator io;
+    _ZoomShiftData zd;
     Float64 *zooms = zoom_ar ? (Float64*)PyArray_DATA(zoom_ar) : NULL;
     Float64 *shifts = shift_ar ? (Float64*)PyArray_DATA(shift_ar) : NULL;
     int rank = 0, qq;
@@ -726,6 +966,7 @@ int NI_ZoomShift(PyArrayObject *input, PyArrayObject* zoom_ar,
     /* precalculate offsets, and offsets at the edge: */
     for(jj = 0; jj < rank; jj++) {
         double shift = 0.0, zoom = 0.0;
+        int order = orders[jj];
         if (shifts)
             shift = shifts[jj];
         if (zooms)
@@ -788,19 +1029,10 @@ int NI_ZoomShift(PyArrayObject *input, PyArrayObject* zoom_ar,
 
     filter_size = 1;
     for(jj = 0; jj < rank; jj++)
-        filter_size *= order + 1;
-    idxs = (npy_intp*)malloc(filter_size * sizeof(idxs));
-    if (!idxs) {
-        PyErr_NoMemory();
-        goto exit;
-    }
-
-    if (!NI_InitPointIterator(output, &io))
+        filter_size *= orders[jj] + 1;
+    if (!NI_InitPointIterator(output, &zd.io))
         goto exit;
 
-    pi = (void *)PyArray_DATA(input);
-    po = (void *)PyArray_DATA(output);
-
     /* store all coordinates and offsets with filter: */
     fcoordinates = (npy_intp*)malloc(rank * filter_size * sizeof(npy_intp));
     foffsets = (npy_intp*)malloc(filter_size * sizeof(npy_intp));
@@ -817,111 +1049,31 @@ int NI_ZoomShift(PyArrayObject *input, PyArrayObject* zoom_ar,
             fcoordinates[jj + hh * rank] = ftmp[jj];
         foffsets[hh] = kk;
         for(jj = rank - 1; jj >= 0; jj--) {
-            if (ftmp[jj] < order) {
+            if (ftmp[jj] < orders[jj]) {
                 ftmp[jj]++;
                 kk += istrides[jj];
                 break;
             } else {
                 ftmp[jj] = 0;
-                kk -= istrides[jj] * order;
+                kk -= istrides[jj] * orders[jj];
             }
         }
     }
     size = 1;
     for(qq = 0; qq < output->nd; qq++)
         size *= output->dimensions[qq];
-    for(kk = 0; kk < size; kk++) {
-        double t = 0.0;
-        int edge = 0, oo = 0, zero = 0;
-
-        for(hh = 0; hh < rank; hh++) {
-            if (zeros && zeros[hh][io.coordinates[hh]]) {
-                /* we use constant border condition */
-                zero = 1;
-                break;
-            }
-            oo += offsets[hh][io.coordinates[hh]];
-            if (edge_offsets[hh][io.coordinates[hh]])
-                edge = 1;
-        }
-
-        if (!zero) {
-            npy_intp *ff = fcoordinates;
-            for(hh = 0; hh < filter_size; hh++) {
-                int idx = 0;
-                if (edge) {
-                        /* use precalculated edge offsets: */
-                    for(jj = 0; jj < rank; jj++) {
-                        if (edge_offsets[jj][io.coordinates[jj]])
-                            idx += edge_offsets[jj][io.coordinates[jj]][ff[jj]];
-                        else
-                            idx += ff[jj] * istrides[jj];
-                    }
-                    idx += oo;
-                } else {
-                    /* use normal offsets: */
-                    idx += oo + foffsets[hh];
-                }
-                idxs[hh] = idx;
-                ff += rank;
-            }
-        }
-        if (!zero) {
-            npy_intp *ff = fcoordinates;
-            t = 0.0;
-            for(hh = 0; hh < filter_size; hh++) {
-                double coeff = 0.0;
-                switch(input->descr->type_num) {
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Bool);
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], UInt8);
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], UInt16);
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], UInt32);
-#if HAS_UINT64
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], UInt64);
-#endif
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Int8);
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Int16);
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Int32);
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Int64);
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Float32);
-                    CASE_INTERP_COEFF(coeff, pi, idxs[hh], Float64);
-                default:
-                    PyErr_SetString(PyExc_RuntimeError,
-                                                    "data type not supported");
-                    goto exit;
-                }
-                /* calculate interpolated value: */
-                for(jj = 0; jj < rank; jj++)
-                    if (order > 0)
-                        coeff *= splvals[jj][io.coordinates[jj]][ff[jj]];
-                t += coeff;
-                ff += rank;
-            }
-        } else {
-            t = cval;
-        }
-        /* store output: */
-        switch (output->descr->type_num) {
-            CASE_INTERP_OUT(po, t, Bool);
-            CASE_INTERP_OUT_UINT(po, t, UInt8, 0, MAX_UINT8);
-            CASE_INTERP_OUT_UINT(po, t, UInt16, 0, MAX_UINT16);
-            CASE_INTERP_OUT_UINT(po, t, UInt32, 0, MAX_UINT32);
-#if HAS_UINT64
-            /* FIXME */
-            CASE_INTERP_OUT_UINT(po, t, UInt64, 0, MAX_UINT32);
-#endif
-            CASE_INTERP_OUT_INT(po, t, Int8, MIN_INT8, MAX_INT8);
-            CASE_INTERP_OUT_INT(po, t, Int16, MIN_INT16, MAX_INT16);
-            CASE_INTERP_OUT_INT(po, t, Int32, MIN_INT32, MAX_INT32);
-            CASE_INTERP_OUT_INT(po, t, Int64, MIN_INT64, MAX_INT64);
-            CASE_INTERP_OUT(po, t, Float32);
-            CASE_INTERP_OUT(po, t, Float64);
-        default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
-            goto exit;
-        }
-        NI_ITERATOR_NEXT(io, po);
-    }
+    zd.input = input;
+    zd.output = output;
+    zd.zeros = zeros;
+    zd.offsets = offsets;
+    zd.edge_offsets = edge_offsets;
+    zd.orders = orders;
+    zd.fcoordinates = fcoordinates;
+    zd.foffsets = foffsets;
+    zd.filter_size = filter_size;
+    zd.splvals = splvals;
+    zd.cval = cval;
+    NI_RunThreads(_ZoomShiftPoints, &zd, size, workers);
 
  exit:
     if (zeros) {
@@ -962,7 +1114,142 @@ int NI_ZoomShift(PyArrayObject *input, PyArrayObject* zoom_ar,
         free(foffsets);
     if (fcoordinates)
         free(fcoordinates);
-    if (idxs)
-        free(idxs);
     return PyErr_Occurred() ? 0 : 1;
 }
+
+/* map the output coordinates to a sum of polynomial terms for each input
+   coordinate: */
+int
+NI_PolynomialMap(npy_intp *ocoor, double *icoor, int orank, int irank,
+                 void *data)
+{
+    NI_PolynomialMapping *pm = (NI_PolynomialMapping*)data;
+    npy_intp kk, ee, *exponents = pm->exponents;
+    double *coefficients = pm->coefficients, x[MAXDIM], term;
+    int hh, ll;
+
+    if (orank != pm->orank || irank != pm->irank)
+        return 0;
+    for(ll = 0; ll < orank; ll++)
+        x[ll] = (double)ocoor[ll] - pm->origins[ll];
+    for(hh = 0; hh < irank; hh++)
+        icoor[hh] = 0.0;
+    for(kk = 0; kk < pm->nterms; kk++) {
+        term = 1.0;
+        for(ll = 0; ll < orank; ll++)
+            for(ee = 0; ee < exponents[ll]; ee++)
+                term *= x[ll];
+        for(hh = 0; hh < irank; hh++)
+            icoor[hh] += coefficients[hh * pm->nterms + kk] * term;
+        exponents += orank;
+    }
+    return 1;
+}
+
+/* interpolate all input coordinates at a position within the grid, with
+   the taps beyond the edges mirrored: */
+static void
+_grid_value(NI_GridMapping *gm, double *g, double *values)
+{
+    int hh, ll, order = gm->order;
+    npy_intp kk, start, idx, len, offsets[MAXDIM][6], taps[MAXDIM];
+    double weights[MAXDIM][6], w;
+
+    for(hh = 0; hh < gm->irank; hh++)
+        values[hh] = 0.0;
+    for(ll = 0; ll < gm->orank; ll++) {
+        len = gm->shape[ll];
+        if (order & 1) {
+            start = (npy_intp)floor(g[ll]) - order / 2;
+        } else {
+            start = (npy_intp)floor(g[ll] + 0.5) - order / 2;
+        }
+        spline_coefficients(g[ll], order, weights[ll]);
+        for(kk = 0; kk <= order; kk++) {
+            idx = start + kk;
+            if (len == 1) {
+                idx = 0;
+            } else {
+                npy_intp s2 = 2 * len - 2;
+                if (idx < 0)
+                    idx = -idx;
+                idx -= s2 * (idx / s2);
+                if (idx >= len)
+                    idx = s2 - idx;
+            }
+            offsets[ll][kk] = idx * gm->strides[ll];
+        }
+        taps[ll] = 0;
+    }
+    for(;;) {
+        idx = 0;
+        w = 1.0;
+        for(ll = 0; ll < gm->orank; ll++) {
+            idx += offsets[ll][taps[ll]];
+            w *= weights[ll][taps[ll]];
+        }
+        for(hh = 0; hh < gm->irank; hh++)
+            values[hh] += w * gm->grid[hh * gm->size + idx];
+        for(ll = gm->orank - 1; ll >= 0; ll--) {
+            if (taps[ll] < order) {
+                taps[ll]++;
+                break;
+            }
+            taps[ll] = 0;
+        }
+        if (ll < 0)
+            break;
+    }
+}
+
+/* interpolate the grid from the given axis on, extrapolating beyond the
+   edges linearly, with the slope between the edge and its neighbour: */
+static void
+_grid_extrapolate(NI_GridMapping *gm, double *g, int axis, double *values)
+{
+    double x, edge, inner, tmp[MAXDIM];
+    int hh;
+
+    if (axis == gm->orank) {
+        _grid_value(gm, g, values);
+        return;
+    }
+    x = g[axis];
+    edge = gm->shape[axis] - 1;
+    if (x >= 0.0 && x <= edge) {
+        _grid_extrapolate(gm, g, axis + 1, values);
+        return;
+    }
+    if (x < 0.0) {
+        edge = 0.0;
+        inner = 1.0;
+    } else {
+        inner = edge - 1.0;
+    }
+    g[axis] = edge;
+    _grid_extrapolate(gm, g, axis + 1, values);
+    if (gm->shape[axis] > 1) {
+        g[axis] = inner;
+        _grid_extrapolate(gm, g, axis + 1, tmp);
+        for(hh = 0; hh < gm->irank; hh++)
+            values[hh] += (x - edge) / (edge - inner) * (values[hh] - tmp[hh]);
+    }
+    g[axis] = x;
+}
+
+/* map the output coordinates to input coordinates interpolated from a
+   grid: */
+int
+NI_GridMap(npy_intp *ocoor, double *icoor, int orank, int irank, void *data)
+{
+    NI_GridMapping *gm = (NI_GridMapping*)data;
+    double g[MAXDIM];
+    int ll;
+
+    if (orank != gm->orank || irank != gm->irank)
+        return 0;
+    for(ll = 0; ll < orank; ll++)
+        g[ll] = ((double)ocoor[ll] - gm->origins[ll]) / gm->spacings[ll];
+    _grid_extrapolate(gm, g, 0, icoor);
+    return 1;
+}
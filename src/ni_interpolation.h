@@ -32,12 +32,32 @@
 #ifndef NI_INTERPOLATION_H
 #define NI_INTERPOLATION_H
 
-int NI_SplineFilter1D(PyArrayObject*, int, int, PyArrayObject*);
+int NI_SplineFilter1D(PyArrayObject*, int, int, PyArrayObject*, int,
+                      npy_intp, int);
 int NI_GeometricTransform(PyArrayObject*, int (*)(npy_intp*, double*, int, int,
                                                     void*), void*, PyArrayObject*, PyArrayObject*,
-                                                    PyArrayObject*, PyArrayObject*, int, int,
-                                                    double);
+                                                    PyArrayObject*, PyArrayObject*, npy_intp*,
+                                                    int, double, int, int);
 int NI_ZoomShift(PyArrayObject*, PyArrayObject*, PyArrayObject*,
-                                 PyArrayObject*, int, int, double);
+                                 PyArrayObject*, npy_intp*, int, double, int);
+
+/* a polynomial mapping of the output coordinates, relative to the
+   origins, to the input coordinates: */
+typedef struct {
+    int orank, irank;
+    npy_intp nterms, *exponents;
+    double *coefficients, origins[MAXDIM];
+} NI_PolynomialMapping;
+
+/* a mapping that interpolates a grid of input coordinates, placed at the
+   origins of the output axes at the given spacings: */
+typedef struct {
+    int orank, irank, order;
+    npy_intp shape[MAXDIM], strides[MAXDIM], size;
+    double *grid, origins[MAXDIM], spacings[MAXDIM];
+} NI_GridMapping;
+
+int NI_PolynomialMap(npy_intp*, double*, int, int, void*);
+int NI_GridMap(npy_intp*, double*, int, int, void*);
 
 #endif
@@ -49,7 +49,7 @@ case t ## _type:                   \
 int NI_Label(PyArrayObject* input, PyArrayObject* strct,
                          npy_intp *max_label, PyArrayObject* output)
 {
-    int kk;
+    int kk, err = 0;
     npy_intp jj, ll, ssize, size, filter_size, *offsets = NULL;
     npy_intp mask_value, *oo;
     Bool *ps, *footprint = NULL;
@@ -58,6 +58,7 @@ int NI_Label(PyArrayObject* input, PyArrayObject* strct,
     NI_FilterIterator fi;
     NI_Iterator ii, io;
     _index_pair *pairs = NULL;
+    NPY_BEGIN_THREADS_DEF;
 
     /* structure size */
     ssize = 1;
@@ -91,6 +92,7 @@ int NI_Label(PyArrayObject* input, PyArrayObject* strct,
         goto exit;
     /* set all elements in the output corresponding to non-zero elements
          in input to -1: */
+    NPY_BEGIN_THREADS;
     for(jj = 0; jj < size; jj++) {
         Int32 *p = (Int32*)po;
         switch (input->descr->type_num) {
@@ -108,11 +110,12 @@ int NI_Label(PyArrayObject* input, PyArrayObject* strct,
         CASE_LABEL(p, pi, Float32);
         CASE_LABEL(p, pi, Float64);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
         NI_ITERATOR_NEXT2(ii, io, pi, po);
     }
+    NPY_END_THREADS;
 
     /* calculate the filter offsets: */
     if (!NI_InitFilterOffsets(output, footprint, strct->dimensions, NULL,
@@ -125,6 +128,7 @@ int NI_Label(PyArrayObject* input, PyArrayObject* strct,
     /* reset output iterator: */
     NI_ITERATOR_RESET(io);
     po = (void *)PyArray_DATA(output);
+    NPY_BEGIN_THREADS;
     /* iterator over the elements: */
     oo = offsets;
     for(jj = 0; jj < size; jj++) {
@@ -141,7 +145,7 @@ int NI_Label(PyArrayObject* input, PyArrayObject* strct,
                             /* we have two objects that must be merged later: */
                             _index_pair* tp = (_index_pair*)malloc(sizeof(_index_pair));
                             if (!tp) {
-                                PyErr_NoMemory();
+                                err = 2;
                                 goto exit;
                             }
                             tp->next = pairs;
@@ -176,7 +180,7 @@ int NI_Label(PyArrayObject* input, PyArrayObject* strct,
         Int32 counter;
         index_map = (Int32*)malloc(index * sizeof(Int32));
         if (!index_map) {
-            PyErr_NoMemory();
+            err = 2;
             goto exit;
         }
         for(jj = 0; jj < index; jj++)
@@ -239,6 +243,11 @@ int NI_Label(PyArrayObject* input, PyArrayObject* strct,
         }
     }
  exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+    else if (err == 2)
+        PyErr_NoMemory();
     if (offsets) free(offsets);
     if (index_map) free(index_map);
     while (pairs) {
@@ -285,10 +294,11 @@ break
 int NI_FindObjects(PyArrayObject* input, npy_intp max_label,
                                      npy_intp* regions)
 {
-    int kk;
+    int kk, err = 0;
     npy_intp size, jj;
     NI_Iterator ii;
     char *pi;
+    NPY_BEGIN_THREADS_DEF;
 
     /* get input data, size and iterator: */
     pi = (void *)PyArray_DATA(input);
@@ -304,6 +314,7 @@ int NI_FindObjects(PyArrayObject* input, npy_intp max_label,
         for(jj = 0; jj < max_label; jj++)
             regions[jj] = -1;
     }
+    NPY_BEGIN_THREADS;
     /* iterate over all points: */
     for(jj = 0 ; jj < size; jj++) {
         switch (input->descr->type_num) {
@@ -329,12 +340,15 @@ int NI_FindObjects(PyArrayObject* input, npy_intp max_label,
                                                      max_label, ii, Int64);
             break;
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
         NI_ITERATOR_NEXT(ii, pi);
     }
  exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "data type not supported");
     return PyErr_Occurred() ? 0 : 1;
 }
 
@@ -868,7 +882,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
                                         PyArrayObject* strct, PyArrayObject* output)
 {
     char *pl, *pm, *pi;
-    int ll;
+    int ll, err = 0;
     npy_intp size, jj, hh, kk, maxval;
     npy_intp strides[WS_MAXDIM], coordinates[WS_MAXDIM];
     npy_intp *nstrides = NULL, nneigh, ssize;
@@ -876,6 +890,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
     NI_WatershedElement *temp = NULL, **first = NULL, **last = NULL;
     Bool *ps = NULL;
     NI_Iterator mi, ii, li;
+    NPY_BEGIN_THREADS_DEF;
 
     i_contiguous = PyArray_ISCONTIGUOUS(input);
     o_contiguous = PyArray_ISCONTIGUOUS(output);
@@ -898,6 +913,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
     pi = (void *)PyArray_DATA(input);
     if (!NI_InitPointIterator(input, &ii))
         goto exit;
+    NPY_BEGIN_THREADS;
     /* Initialization and find the maximum of the input. */
     maxval = 0;
     for(jj = 0; jj < size; jj++) {
@@ -906,7 +922,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
         CASE_GET_INPUT(ival, pi, UInt8);
         CASE_GET_INPUT(ival, pi, UInt16);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
         temp[jj].index = jj;
@@ -922,7 +938,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
     last = (NI_WatershedElement**)malloc((maxval + 1) *
                                                                              sizeof(NI_WatershedElement*));
     if (!first || !last) {
-        PyErr_NoMemory();
+        err = 2;
         goto exit;
     }
     for(hh = 0; hh <= maxval; hh++) {
@@ -953,7 +969,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
         CASE_GET_LABEL(label, pm, Int32);
         CASE_GET_LABEL(label, pm, Int64);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
         switch(output->descr->type_num) {
@@ -968,7 +984,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
         CASE_PUT_LABEL(label, pl, Int32);
         CASE_PUT_LABEL(label, pl, Int64);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
         NI_ITERATOR_NEXT2(mi, li, pm, pl);
@@ -1020,7 +1036,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
             ++nneigh;
     nstrides = (npy_intp*)malloc(nneigh * sizeof(npy_intp));
     if (!nstrides) {
-        PyErr_NoMemory();
+        err = 2;
         goto exit;
     }
     strides[input->nd - 1] = 1;
@@ -1087,8 +1103,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
                                                  input->nd, i_contiguous, p_idx, v_idx, pi,
                                                  vval, pval, UInt16);
                         default:
-                            PyErr_SetString(PyExc_RuntimeError,
-                                                            "data type not supported");
+                            err = 1;
                             goto exit;
                         }
                         /* Calculate cost: */
@@ -1124,8 +1139,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
                             CASE_WINDEX2(v_index, strides, output->strides, input->nd,
                                                      idx, o_contiguous, label, pl, Int64);
                             default:
-                                PyErr_SetString(PyExc_RuntimeError,
-                                                                "data type not supported");
+                                err = 1;
                                 goto exit;
                             }
                             switch(output->descr->type_num) {
@@ -1148,8 +1162,7 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
                             CASE_WINDEX3(p_index, strides, output->strides, input->nd,
                                                      idx, o_contiguous, label, pl, Int64);
                             default:
-                                PyErr_SetString(PyExc_RuntimeError,
-                                                                "data type not supported");
+                                err = 1;
                                 goto exit;
                             }
                             /* If the neighbor is in a queue, remove it: */
@@ -1189,6 +1202,11 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
         }
     }
  exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+    else if (err == 2)
+        PyErr_NoMemory();
     if (temp)
         free(temp);
     if (first)
@@ -1199,3 +1217,166 @@ int NI_WatershedIFT(PyArrayObject* input, PyArrayObject* markers,
         free(nstrides);
     return PyErr_Occurred() ? 0 : 1;
 }
+
+/* Summed area tables are calculated in place, in a table that has one
+   more element along each axis than the input, with the input stored
+   after a leading row of zeros along each axis. The sums are
+   accumulated along each axis in turn, with Kahan compensation for
+   floating point tables. */
+
+static npy_intp _ArraySize(PyArrayObject *array)
+{
+    npy_intp size = 1;
+    int ll;
+
+    for(ll = 0; ll < array->nd; ll++)
+        size *= array->dimensions[ll];
+    return size;
+}
+
+int NI_IntegralImage(PyArrayObject *table)
+{
+    npy_intp size, outer, length, inner, oo, ii, kk;
+    double *comp = NULL;
+    int axis, err = 0;
+    NPY_BEGIN_THREADS_DEF;
+
+    if (!PyArray_ISCARRAY(table)) {
+        PyErr_SetString(PyExc_RuntimeError, "table must be contiguous");
+        goto exit;
+    }
+    size = _ArraySize(table);
+    if (size == 0)
+        goto exit;
+    comp = (double*)malloc(size * sizeof(double));
+    if (!comp) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    NPY_BEGIN_THREADS;
+    for(axis = 0; axis < table->nd; axis++) {
+        length = table->dimensions[axis];
+        inner = 1;
+        for(ii = axis + 1; ii < table->nd; ii++)
+            inner *= table->dimensions[ii];
+        outer = size / (length * inner);
+        switch (table->descr->type_num) {
+        case tFloat64:
+        {
+            double *pt = (double*)PyArray_DATA(table);
+            for(oo = 0; oo < outer; oo++) {
+                for(kk = 0; kk < inner; kk++)
+                    comp[kk] = 0.0;
+                for(ii = 1; ii < length; ii++) {
+                    double *pc = pt + ii * inner, *pp = pc - inner;
+                    for(kk = 0; kk < inner; kk++) {
+                        double y = pc[kk] - comp[kk];
+                        double t = pp[kk] + y;
+                        comp[kk] = (t - pp[kk]) - y;
+                        pc[kk] = t;
+                    }
+                }
+                pt += length * inner;
+            }
+        }
+        break;
+        case tInt64:
+        {
+            Int64 *pt = (Int64*)PyArray_DATA(table);
+            for(oo = 0; oo < outer; oo++) {
+                for(ii = 1; ii < length; ii++) {
+                    Int64 *pc = pt + ii * inner, *pp = pc - inner;
+                    for(kk = 0; kk < inner; kk++)
+                        pc[kk] += pp[kk];
+                }
+                pt += length * inner;
+            }
+        }
+        break;
+        default:
+            err = 1;
+            goto exit;
+        }
+    }
+exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+    if (comp)
+        free(comp);
+    return PyErr_Occurred() ? 0 : 1;
+}
+
+#define CASE_BOX_SUMS(_pt, _strides, _lows, _highs, _nboxes, _rank, \
+                      _output, _type)                                \
+case t ## _type:                                                     \
+{                                                                    \
+    npy_intp _jj, _kk, _offset;                                      \
+    int _ll, _sign;                                                  \
+    for(_jj = 0; _jj < _nboxes; _jj++) {                             \
+        _type _sum = 0;                                              \
+        npy_intp *_pl = _lows + _jj * _rank;                         \
+        npy_intp *_ph = _highs + _jj * _rank;                        \
+        for(_kk = 0; _kk < ((npy_intp)1 << _rank); _kk++) {          \
+            _offset = 0;                                             \
+            _sign = 1;                                               \
+            for(_ll = 0; _ll < _rank; _ll++) {                       \
+                if (_kk & ((npy_intp)1 << _ll)) {                    \
+                    _offset += _ph[_ll] * _strides[_ll];             \
+                } else {                                             \
+                    _offset += _pl[_ll] * _strides[_ll];             \
+                    _sign = -_sign;                                  \
+                }                                                    \
+            }                                                        \
+            if (_sign > 0)                                           \
+                _sum += *(_type*)(_pt + _offset);                    \
+            else                                                     \
+                _sum -= *(_type*)(_pt + _offset);                    \
+        }                                                            \
+        ((_type*)_output)[_jj] = _sum;                               \
+    }                                                                \
+}                                                                    \
+break
+
+/* The sums over boxes, given by their lower (inclusive) and upper
+   (exclusive) corners, are taken from the corners of the box in a
+   summed area table. */
+
+int NI_BoxSums(PyArrayObject *table, PyArrayObject *lows,
+               PyArrayObject *highs, PyArrayObject *output)
+{
+    npy_intp nboxes, *pl, *ph, *strides;
+    char *pt, *po;
+    int rank, err = 0;
+    NPY_BEGIN_THREADS_DEF;
+
+    rank = table->nd;
+    nboxes = _ArraySize(output);
+    if (!PyArray_ISCARRAY(lows) || !PyArray_ISCARRAY(highs) ||
+        !PyArray_ISCARRAY(output) || _ArraySize(lows) != nboxes * rank ||
+        _ArraySize(highs) != nboxes * rank ||
+        lows->descr->type_num != NPY_INTP ||
+        highs->descr->type_num != NPY_INTP ||
+        output->descr->type_num != table->descr->type_num) {
+        PyErr_SetString(PyExc_RuntimeError, "box arrays not correct");
+        goto exit;
+    }
+    pt = (void *)PyArray_DATA(table);
+    po = (void *)PyArray_DATA(output);
+    pl = (npy_intp*)PyArray_DATA(lows);
+    ph = (npy_intp*)PyArray_DATA(highs);
+    strides = PyArray_STRIDES(table);
+    NPY_BEGIN_THREADS;
+    switch (table->descr->type_num) {
+        CASE_BOX_SUMS(pt, strides, pl, ph, nboxes, rank, po, Float64);
+        CASE_BOX_SUMS(pt, strides, pl, ph, nboxes, rank, po, Int64);
+    default:
+        err = 1;
+        goto exit;
+    }
+exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+    return PyErr_Occurred() ? 0 : 1;
+}
@@ -57,4 +57,9 @@ int NI_Statistics(PyArrayObject*, PyArrayObject*, npy_intp, npy_intp,
 int NI_WatershedIFT(PyArrayObject*, PyArrayObject*, PyArrayObject*, 
                                         PyArrayObject*);
 
+int NI_IntegralImage(PyArrayObject*);
+
+int NI_BoxSums(PyArrayObject*, PyArrayObject*, PyArrayObject*,
+               PyArrayObject*);
+
 #endif
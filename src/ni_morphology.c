@@ -91,12 +91,13 @@ int NI_BinaryErosion(PyArrayObject* input, PyArrayObject* strct,
 {
     npy_intp struct_size = 0, *offsets = NULL, size, *oo, jj;
     npy_intp ssize, block_size = 0, *current = NULL, border_flag_value;
-    int kk, true, false, msk_value;
+    int kk, true, false, msk_value, err = 0;
     NI_Iterator ii, io, mi;
     NI_FilterIterator fi;
     Bool *ps, out = 0;
     char *pi, *po, *pm = NULL;
     NI_CoordinateBlock *block = NULL;
+    NPY_BEGIN_THREADS_DEF;
 
     ps = (Bool*)PyArray_DATA(strct);
     ssize = 1;
@@ -149,6 +150,7 @@ int NI_BinaryErosion(PyArrayObject* input, PyArrayObject* strct,
         if (!*coordinate_list)
             goto exit;
     }
+    NPY_BEGIN_THREADS;
     /* iterator over the elements: */
     oo = offsets;
     *changed = 0;
@@ -171,8 +173,8 @@ int NI_BinaryErosion(PyArrayObject* input, PyArrayObject* strct,
             CASE_GET_MASK(msk_value, pm, Float32);
             CASE_GET_MASK(msk_value, pm, Float64);
             default:
-                PyErr_SetString(PyExc_RuntimeError, "data type not supported");
-                return 0;
+                err = 1;
+                goto exit;
             }
         }
         switch (input->descr->type_num) {
@@ -212,7 +214,7 @@ int NI_BinaryErosion(PyArrayObject* input, PyArrayObject* strct,
                                                 bdr_value, border_flag_value, center_is_true,
                                                 true, false, pchange);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
         switch (output->descr->type_num) {
@@ -230,7 +232,7 @@ int NI_BinaryErosion(PyArrayObject* input, PyArrayObject* strct,
         CASE_OUTPUT(po, out, Float32);
         CASE_OUTPUT(po, out, Float64);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
         if (pchange) {
@@ -238,6 +240,10 @@ int NI_BinaryErosion(PyArrayObject* input, PyArrayObject* strct,
             if (coordinate_list) {
                 if (block == NULL ||  block->size == block_size) {
                     block = NI_CoordinateListAddBlock(*coordinate_list);
+                    if (!block) {
+                        err = 2;
+                        goto exit;
+                    }
                     current = block->coordinates;
                 }
                 for(kk = 0; kk < input->nd; kk++)
@@ -253,6 +259,11 @@ int NI_BinaryErosion(PyArrayObject* input, PyArrayObject* strct,
     }
 
  exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+    else if (err == 2)
+        PyErr_NoMemory();
     if (offsets)
         free(offsets);
     if (PyErr_Occurred()) {
@@ -270,7 +281,7 @@ int NI_BinaryErosion(PyArrayObject* input, PyArrayObject* strct,
                                                     _pi, _oo, _irank, _list1, _list2,            \
                                                     _current_coors1, _current_coors2, _block1,   \
                                                     _block2, _bf_value, _true, _false, _type,    \
-                                                    _mklist)                                     \
+                                                    _mklist, _err)                               \
 case t ## _type:                                                       \
 {                                                                      \
     npy_intp _hh, _kk;                                                        \
@@ -281,6 +292,10 @@ case t ## _type:                                                       \
                 npy_intp *_tc = &(_coordinate_offsets[(_oo + _hh) * _irank]); \
                 if (_block2 == NULL || _block2->size == _list2->block_size) {  \
                     _block2 = NI_CoordinateListAddBlock(_list2);                 \
+                    if (!_block2) {                                              \
+                        _err = 2;                                                  \
+                        goto exit;                                                 \
+                    }                                                            \
                     _current_coors2 = _block2->coordinates;                      \
                 }                                                              \
                 for(_kk = 0; _kk < _irank; _kk++)                              \
@@ -301,13 +316,14 @@ int NI_BinaryErosion2(PyArrayObject* array, PyArrayObject* strct,
     npy_intp *coordinate_offsets = NULL, size = 0;
     npy_intp *current_coordinates1 = NULL, *current_coordinates2 = NULL;
     npy_intp kk, border_flag_value, current = 0;
-    int true, false;
+    int true, false, err = 0;
     NI_Iterator ii, mi;
     NI_FilterIterator fi, ci;
     Bool *ps;
     char *pi, *ibase, *pm = NULL;
     NI_CoordinateBlock *block1 = NULL, *block2 = NULL;
     NI_CoordinateList *list1 = NULL, *list2 = NULL;
+    NPY_BEGIN_THREADS_DEF;
 
     ps = (Bool*)PyArray_DATA(strct);
     ssize = 1;
@@ -346,12 +362,22 @@ int NI_BinaryErosion2(PyArrayObject* array, PyArrayObject* strct,
         false = 0;
     }
 
+    list1 = NI_InitCoordinateList((*iclist)->block_size, (*iclist)->rank);
+    list2 = NI_InitCoordinateList((*iclist)->block_size, (*iclist)->rank);
+    if (!list1 || !list2)
+        goto exit;
+    if (NI_CoordinateListStealBlocks(list2, *iclist))
+        goto exit;
+
     if (mask) {
         /* iterator, data pointer and type of mask array: */
         if (!NI_InitPointIterator(mask, &mi))
-            return 0;
+            goto exit;
         pm = (void *)PyArray_DATA(mask);
+    }
 
+    NPY_BEGIN_THREADS;
+    if (mask) {
         size = 1;
         for(kk = 0; kk < array->nd; kk++)
             size *= array->dimensions[kk];
@@ -369,20 +395,15 @@ int NI_BinaryErosion2(PyArrayObject* array, PyArrayObject* strct,
                 pi = (void *)PyArray_DATA(array);
     }
 
-    list1 = NI_InitCoordinateList((*iclist)->block_size, (*iclist)->rank);
-    list2 = NI_InitCoordinateList((*iclist)->block_size, (*iclist)->rank);
-    if (!list1 || !list2)
-        goto exit;
-    if (NI_CoordinateListStealBlocks(list2, *iclist))
-        goto exit;
     block2 = list2->blocks;
     jj = 0;
     while(block1 || block2) {
         int mklist = 1;
         if (!block1) {
             if (niter <= 0 || jj < niter) {
-                if (NI_CoordinateListStealBlocks(list1, list2))
-                    goto exit;
+                /* list1 is empty here, move the blocks of list2 to it: */
+                list1->blocks = list2->blocks;
+                list2->blocks = NULL;
                 block1 = list1->blocks;
                 block2 = NULL;
                 current_coordinates1 = block1->coordinates;
@@ -400,51 +421,51 @@ int NI_BinaryErosion2(PyArrayObject* array, PyArrayObject* strct,
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, Bool, mklist);
+                                            border_flag_value, true, false, Bool, mklist, err);
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, UInt8, mklist);
+                                            border_flag_value, true, false, UInt8, mklist, err);
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, UInt16, mklist);
+                                            border_flag_value, true, false, UInt16, mklist, err);
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, UInt32, mklist);
+                                            border_flag_value, true, false, UInt32, mklist, err);
 #if HAS_UINT64
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, UInt64, mklist);
+                                            border_flag_value, true, false, UInt64, mklist, err);
 #endif
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, Int8, mklist);
+                                            border_flag_value, true, false, Int8, mklist, err);
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, Int16, mklist);
+                                            border_flag_value, true, false, Int16, mklist, err);
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, Int32, mklist);
+                                            border_flag_value, true, false, Int32, mklist, err);
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, Int64, mklist);
+                                            border_flag_value, true, false, Int64, mklist, err);
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, Float32, mklist);
+                                            border_flag_value, true, false, Float32, mklist, err);
         CASE_ERODE_POINT2(struct_size, offsets, coordinate_offsets, pi,
                                             oo, array->nd, list1, list2, current_coordinates1,
                                             current_coordinates2, block1, block2,
-                                            border_flag_value, true, false, Float64, mklist);
+                                            border_flag_value, true, false, Float64, mklist, err);
         default:
-            PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+            err = 1;
             goto exit;
         }
 
@@ -474,6 +495,11 @@ int NI_BinaryErosion2(PyArrayObject* array, PyArrayObject* strct,
     }
 
  exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError, "data type not supported");
+    else if (err == 2)
+        PyErr_NoMemory();
     if (offsets)
         free(offsets);
     if (coordinate_offsets)
@@ -504,11 +530,12 @@ int NI_DistanceTransformBruteForce(PyArrayObject* input, int metric,
                                                                      PyArrayObject* features)
 {
     npy_intp size, jj, min_index = 0;
-    int kk;
+    int kk, err = 0;
     NI_BorderElement *border_elements = NULL, *temp;
     NI_Iterator ii, di, fi;
     char *pi, *pd = NULL, *pf = NULL;
     Float64 *sampling = sampling_arr ? (void *)PyArray_DATA(sampling_arr) : NULL;
+    NPY_BEGIN_THREADS_DEF;
 
     /* check the output arrays: */
     if (distances) {
@@ -531,17 +558,22 @@ int NI_DistanceTransformBruteForce(PyArrayObject* input, int metric,
     if (!NI_InitPointIterator(input, &ii))
         goto exit;
 
+    NPY_BEGIN_THREADS;
     for(jj = 0; jj < size; jj++) {
         if (*(Int8*)pi < 0) {
             temp = (NI_BorderElement*)malloc(sizeof(NI_BorderElement));
             if (!temp) {
-                PyErr_NoMemory();
+                err = 2;
                 goto exit;
             }
             temp->next = border_elements;
             border_elements = temp;
             temp->index = jj;
             temp->coordinates = (npy_intp*)malloc(input->nd * sizeof(npy_intp));
+            if (!temp->coordinates) {
+                err = 2;
+                goto exit;
+            }
             for(kk = 0; kk < input->nd; kk++)
                     temp->coordinates[kk] = ii.coordinates[kk];
         }
@@ -638,11 +670,16 @@ int NI_DistanceTransformBruteForce(PyArrayObject* input, int metric,
         }
         break;
     default:
-        PyErr_SetString(PyExc_RuntimeError,  "distance metric not supported");
+        err = 1;
         goto exit;
     }
 
  exit:
+    NPY_END_THREADS;
+    if (err == 1)
+        PyErr_SetString(PyExc_RuntimeError,  "distance metric not supported");
+    else if (err == 2)
+        PyErr_NoMemory();
     while (border_elements) {
         temp = border_elements;
         border_elements = border_elements->next;
@@ -665,6 +702,7 @@ int NI_DistanceTransformOnePass(PyArrayObject *strct,
     char *pd;
     NI_FilterIterator si, ti;
     NI_Iterator di, fi;
+    NPY_BEGIN_THREADS_DEF;
 
     ssize = 1;
     for(kk = 0; kk < strct->nd; kk++)
@@ -717,6 +755,7 @@ int NI_DistanceTransformOnePass(PyArrayObject *strct,
                                                      filter_size, distances->dimensions, NULL, &ti))
             goto exit;
     }
+    NPY_BEGIN_THREADS;
     /* iterator over the elements: */
     oo = offsets;
     if (features)
@@ -749,6 +788,7 @@ int NI_DistanceTransformOnePass(PyArrayObject *strct,
         }
         NI_FILTER_NEXT(si, di, oo, pd);
     }
+    NPY_END_THREADS;
 
  exit:
     if (offsets) free(offsets);
@@ -918,6 +958,7 @@ int NI_EuclideanFeatureTransform(PyArrayObject* input,
     npy_intp *tmp = NULL, **f = NULL, *g = NULL;
     char *pi, *pf;
     Float64 *sampling = sampling_arr ? ((void *)PyArray_DATA(sampling_arr)) : NULL;
+    NPY_BEGIN_THREADS_DEF;
 
     pi = (void *)PyArray_DATA(input);
     pf = (void *)PyArray_DATA(features);
@@ -939,8 +980,10 @@ int NI_EuclideanFeatureTransform(PyArrayObject* input,
         f[jj] = tmp + jj * input->nd;
 
     /* First call of recursive feature transform */
+    NPY_BEGIN_THREADS;
     _ComputeFT(pi, pf, input->dimensions, input->strides, features->strides,
                          input->nd, input->nd - 1, coor, f, g, features, sampling);
+    NPY_END_THREADS;
 
  exit:
     if (f)
@@ -78,6 +78,20 @@ int NI_LineIterator(NI_Iterator *iterator, int axis)
     return NI_SubspaceIterator(iterator, ~axes);
 }
 
+/* calculate the coordinates of the point with the given index in the
+     iteration order of an iterator: */
+void NI_IteratorCoordinates(NI_Iterator *iterator, npy_intp index,
+                            npy_intp *coordinates)
+{
+    int ii;
+
+    for(ii = iterator->rank_m1; ii >= 0; ii--) {
+        npy_intp size = iterator->dimensions[ii] + 1;
+        coordinates[ii] = index % size;
+        index /= size;
+    }
+}
+
 
 /******************************************************************/
 /* Line buffers */
@@ -175,6 +189,32 @@ int NI_InitLineBuffer(PyArrayObject *array, int axis, npy_intp size1,
         return 0;
     if (!NI_LineIterator(&(buffer->iterator), axis))
         return 0;
+    /* check the type and the mode here, since the buffer may be used
+         where Python exceptions cannot be raised: */
+    if (extend_mode < NI_EXTEND_FIRST || extend_mode > NI_EXTEND_LAST) {
+        PyErr_SetString(PyExc_RuntimeError, "mode not supported");
+        return 0;
+    }
+    switch (NI_CanonicalType(PyArray_DESCR(array)->type_num)) {
+    case tBool:
+    case tUInt8:
+    case tUInt16:
+    case tUInt32:
+#if HAS_UINT64
+    case tUInt64:
+#endif
+    case tInt8:
+    case tInt16:
+    case tInt32:
+    case tInt64:
+    case tFloat32:
+    case tFloat64:
+        break;
+    default:
+        PyErr_Format(PyExc_RuntimeError, "array type %d not supported",
+                     PyArray_DESCR(array)->type_num);
+        return 0;
+    }
     line_length = array->nd > 0 ? array->dimensions[axis] : 1;
     if (line_length > 0)
         array_lines = line_length > 0 ? size / line_length : 1;
@@ -183,6 +223,7 @@ int NI_InitLineBuffer(PyArrayObject *array, int axis, npy_intp size1,
     buffer->buffer_data = buffer_data;
     buffer->buffer_lines = buffer_lines;
     buffer->array_type = NI_CanonicalType(PyArray_DESCR(array)->type_num);
+    buffer->buffer_type = tFloat64;
     buffer->array_lines = array_lines;
     buffer->next_line = 0;
     buffer->size1 = size1;
@@ -319,6 +360,28 @@ int NI_ExtendLine(double *line, npy_intp length, npy_intp size1,
 }
 
 
+/* Extend a single precision line in memory. The borders are usually
+     short, so the elements are mapped one by one: */
+int NI_ExtendFloatLine(float *line, npy_intp length, npy_intp size1,
+                       npy_intp size2, NI_ExtendMode mode,
+                       double constant_value)
+{
+    npy_intp ll, cc;
+    float *first = line + size1;
+
+    if (mode < NI_EXTEND_FIRST || mode > NI_EXTEND_LAST)
+        return 0;
+    for(ll = 0; ll < size1; ll++) {
+        cc = NI_ExtendCoordinate(ll - size1, length, mode);
+        line[ll] = cc < 0 ? (float)constant_value : first[cc];
+    }
+    for(ll = 0; ll < size2; ll++) {
+        cc = NI_ExtendCoordinate(length + ll, length, mode);
+        first[length + ll] = cc < 0 ? (float)constant_value : first[cc];
+    }
+    return 1;
+}
+
 #define CASE_COPY_DATA_TO_LINE(_pi, _po, _length, _stride, _type) \
 case t ## _type:                                                  \
 {                                                                 \
@@ -336,10 +399,13 @@ int NI_ArrayToLineBuffer(NI_LineBuffer *buffer,
                          npy_intp *number_of_lines, int *more)
 {
     double *pb = buffer->buffer_data;
+    float *pf = buffer->buffer_data;
     char *pa;
     npy_intp length = buffer->line_length;
+    int single = buffer->buffer_type == tFloat32;
 
     pb += buffer->size1;
+    pf += buffer->size1;
     *number_of_lines = 0;
     /* fill until all lines in the array have been processed, or until
          the buffer is full: */
@@ -347,38 +413,70 @@ int NI_ArrayToLineBuffer(NI_LineBuffer *buffer,
                  *number_of_lines < buffer->buffer_lines) {
         pa = buffer->array_data;
         /* copy the data from the array to the buffer: */
-        switch (buffer->array_type) {
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Bool);
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, UInt8);
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, UInt16);
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, UInt32);
+        if (single) {
+            switch (buffer->array_type) {
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, Bool);
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, UInt8);
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, UInt16);
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, UInt32);
 #if HAS_UINT64
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, UInt64);
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, UInt64);
 #endif
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Int8);
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Int16);
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Int32);
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Int64);
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Float32);
-            CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Float64);
-        default:
-            PyErr_Format(PyExc_RuntimeError, "array type %d not supported",
-                         buffer->array_type);
-            return 0;
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, Int8);
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, Int16);
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, Int32);
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, Int64);
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, Float32);
+                CASE_COPY_DATA_TO_LINE(pa, pf, length, buffer->line_stride, Float64);
+            default:
+                PyErr_Format(PyExc_RuntimeError, "array type %d not supported",
+                             buffer->array_type);
+                return 0;
+            }
+        } else {
+            switch (buffer->array_type) {
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Bool);
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, UInt8);
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, UInt16);
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, UInt32);
+#if HAS_UINT64
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, UInt64);
+#endif
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Int8);
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Int16);
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Int32);
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Int64);
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Float32);
+                CASE_COPY_DATA_TO_LINE(pa, pb, length, buffer->line_stride, Float64);
+            default:
+                PyErr_Format(PyExc_RuntimeError, "array type %d not supported",
+                             buffer->array_type);
+                return 0;
+            }
         }
         /* goto next line in the array: */
         NI_ITERATOR_NEXT(buffer->iterator, buffer->array_data);
         /* implement boundary conditions to the line: */
-        if (buffer->size1 + buffer->size2 > 0)
-            if (!NI_ExtendLine(pb - buffer->size1, length, buffer->size1,
-                                                 buffer->size2, buffer->extend_mode,
-                                                 buffer->extend_value))
-                return 0;
+        if (buffer->size1 + buffer->size2 > 0) {
+            if (single) {
+                if (!NI_ExtendFloatLine(pf - buffer->size1, length,
+                                        buffer->size1, buffer->size2,
+                                        buffer->extend_mode,
+                                        buffer->extend_value))
+                    return 0;
+            } else {
+                if (!NI_ExtendLine(pb - buffer->size1, length, buffer->size1,
+                                   buffer->size2, buffer->extend_mode,
+                                   buffer->extend_value))
+                    return 0;
+            }
+        }
         /* The number of the array lines copied: */
         ++(buffer->next_line);
         /* keep track of (and return) the number of lines in the buffer: */
         ++(*number_of_lines);
         pb += buffer->line_length + buffer->size1 + buffer->size2;
+        pf += buffer->line_length + buffer->size1 + buffer->size2;
     }
     /* if not all array lines were processed, *more is set true: */
     *more = buffer->next_line < buffer->array_lines;
@@ -400,33 +498,57 @@ break
 int NI_LineBufferToArray(NI_LineBuffer *buffer)
 {
     double *pb = buffer->buffer_data;
+    float *pf = buffer->buffer_data;
     char *pa;
     npy_intp jj, length = buffer->line_length;
+    int single = buffer->buffer_type == tFloat32;
 
     pb += buffer->size1;
+    pf += buffer->size1;
     for(jj = 0; jj < buffer->buffer_lines; jj++) {
         /* if all array lines are copied return: */
         if (buffer->next_line == buffer->array_lines)
             break;
         pa = buffer->array_data;
         /* copy data from the buffer to the array: */
-        switch (buffer->array_type) {
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Bool);
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, UInt8);
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, UInt16);
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, UInt32);
+        if (single) {
+            switch (buffer->array_type) {
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, Bool);
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, UInt8);
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, UInt16);
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, UInt32);
 #if HAS_UINT64
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, UInt64);
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, UInt64);
 #endif
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Int8);
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Int16);
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Int32);
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Int64);
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Float32);
-            CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Float64);
-        default:
-            PyErr_SetString(PyExc_RuntimeError, "array type not supported");
-            return 0;
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, Int8);
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, Int16);
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, Int32);
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, Int64);
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, Float32);
+                CASE_COPY_LINE_TO_DATA(pf, pa, length, buffer->line_stride, Float64);
+            default:
+                PyErr_SetString(PyExc_RuntimeError, "array type not supported");
+                return 0;
+            }
+        } else {
+            switch (buffer->array_type) {
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Bool);
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, UInt8);
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, UInt16);
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, UInt32);
+#if HAS_UINT64
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, UInt64);
+#endif
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Int8);
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Int16);
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Int32);
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Int64);
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Float32);
+                CASE_COPY_LINE_TO_DATA(pb, pa, length, buffer->line_stride, Float64);
+            default:
+                PyErr_SetString(PyExc_RuntimeError, "array type not supported");
+                return 0;
+            }
         }
         /* move to the next line in the array: */
         NI_ITERATOR_NEXT(buffer->iterator, buffer->array_data);
@@ -434,10 +556,26 @@ int NI_LineBufferToArray(NI_LineBuffer *buffer)
         ++(buffer->next_line);
         /* move the buffer data pointer to the next line: */
         pb += buffer->line_length + buffer->size1 + buffer->size2;
+        pf += buffer->line_length + buffer->size1 + buffer->size2;
     }
     return 1;
 }
 
+/* Restrict a line buffer to the array lines from start up to stop. The
+     buffer must not have been used yet: */
+void NI_LineBufferRange(NI_LineBuffer *buffer, npy_intp start,
+                        npy_intp stop)
+{
+    npy_intp coordinates[MAXDIM];
+    char *base = buffer->array_data;
+
+    NI_IteratorCoordinates(&(buffer->iterator), start, coordinates);
+    NI_ITERATOR_GOTO(buffer->iterator, coordinates, base,
+                     buffer->array_data);
+    buffer->next_line = start;
+    buffer->array_lines = stop;
+}
+
 /******************************************************************/
 /* Multi-dimensional filter support functions */
 /******************************************************************/
@@ -478,6 +616,90 @@ NI_InitFilterIterator(int rank, npy_intp *filter_shape,
     return 1;
 }
 
+/* Map a coordinate that may lie outside of an axis of length len back
+     onto the axis, according to the boundary mode. In constant mode,
+     coordinates outside of the axis are mapped to -1: */
+npy_intp NI_ExtendCoordinate(npy_intp cc, npy_intp len, NI_ExtendMode mode)
+{
+    switch (mode) {
+    case NI_EXTEND_MIRROR:
+        if (cc < 0) {
+            if (len <= 1) {
+                cc = 0;
+            } else {
+                npy_intp sz2 = 2 * len - 2;
+                cc = sz2 * (-cc / sz2) + cc;
+                cc = cc <= 1 - len ? cc + sz2 : -cc;
+            }
+        } else if (cc >= len) {
+            if (len <= 1) {
+                cc = 0;
+            } else {
+                npy_intp sz2 = 2 * len - 2;
+                cc -= sz2 * (cc / sz2);
+                if (cc >= len)
+                    cc = sz2 - cc;
+            }
+        }
+        break;
+    case NI_EXTEND_REFLECT:
+        if (cc < 0) {
+            if (len <= 1) {
+                cc = 0;
+            } else {
+                npy_intp sz2 = 2 * len;
+                if (cc < -sz2)
+                    cc = sz2 * (-cc / sz2) + cc;
+                if (cc < 0)
+                    cc = cc < -len ? cc + sz2 : -cc - 1;
+            }
+        } else if (cc >= len) {
+            if (len <= 1) {
+                cc = 0;
+            } else {
+                npy_intp sz2 = 2 * len;
+                cc -= sz2 * (cc / sz2);
+                if (cc >= len)
+                    cc = sz2 - cc - 1;
+            }
+        }
+        break;
+    case NI_EXTEND_WRAP:
+        if (cc < 0) {
+            if (len <= 1) {
+                cc = 0;
+            } else {
+                npy_intp sz = len;
+                cc += sz * (-cc / sz);
+                if (cc < 0)
+                    cc += sz;
+            }
+        } else if (cc >= len) {
+            if (len <= 1) {
+                cc = 0;
+            } else {
+                npy_intp sz = len;
+                cc -= sz * (cc / sz);
+            }
+        }
+        break;
+    case NI_EXTEND_NEAREST:
+        if (cc < 0) {
+            cc = 0;
+        } else if (cc >= len) {
+            cc = len - 1;
+        }
+        break;
+    case NI_EXTEND_CONSTANT:
+        if (cc < 0 || cc >= len)
+            cc = -1;
+        break;
+    default:
+        break;
+    }
+    return cc;
+}
+
 /* Calculate the offsets to the filter points, for all border regions and
      the interior of the array: */
 int NI_InitFilterOffsets(PyArrayObject *array, Bool *footprint,
@@ -544,6 +766,10 @@ int NI_InitFilterOffsets(PyArrayObject *array, Bool *footprint,
     /* the flag to indicate that we are outside the border must have a
          value that is larger than any possible offset: */
     *border_flag_value = max_size * max_stride + 1;
+    if (mode < NI_EXTEND_FIRST || mode > NI_EXTEND_LAST) {
+        PyErr_SetString(PyExc_RuntimeError, "boundary mode not supported");
+        goto exit;
+    }
     /* calculate all possible offsets to elements in the filter kernel,
          for all regions in the array (interior and border regions): */
     po = *offsets;
@@ -563,82 +789,9 @@ int NI_InitFilterOffsets(PyArrayObject *array, Bool *footprint,
                     npy_intp cc = coordinates[ii] - orgn + position[ii];
                     npy_intp len = ashape[ii];
                     /* apply boundary conditions, if necessary: */
-                    switch (mode) {
-                    case NI_EXTEND_MIRROR:
-                        if (cc < 0) {
-                            if (len <= 1) {
-                                cc = 0;
-                            } else {
-                                int sz2 = 2 * len - 2;
-                                cc = sz2 * (int)(-cc / sz2) + cc;
-                                cc = cc <= 1 - len ? cc + sz2 : -cc;
-                            }
-                        } else if (cc >= len) {
-                            if (len <= 1) {
-                                cc = 0;
-                            } else {
-                                int sz2 = 2 * len - 2;
-                                cc -= sz2 * (int)(cc / sz2);
-                                if (cc >= len)
-                                    cc = sz2 - cc;
-                            }
-                        }
-                        break;
-                    case NI_EXTEND_REFLECT:
-                        if (cc < 0) {
-                            if (len <= 1) {
-                                cc = 0;
-                            } else {
-                                int sz2 = 2 * len;
-                                if (cc < -sz2)
-                                    cc = sz2 * (int)(-cc / sz2) + cc;
-                                cc = cc < -len ? cc + sz2 : -cc - 1;
-                            }
-                        } else if (cc >= len) {
-                            if (len <= 1) {cc = 0;
-                            } else {
-                                int sz2 = 2 * len;
-                                cc -= sz2 * (int)(cc / sz2);
-                                if (cc >= len)
-                                    cc = sz2 - cc - 1;
-                            }
-                        }
-                        break;
-                    case NI_EXTEND_WRAP:
-                        if (cc < 0) {
-                            if (len <= 1) {
-                                cc = 0;
-                            } else {
-                                int sz = len;
-                                cc += sz * (int)(-cc / sz);
-                                if (cc < 0)
-                                    cc += sz;
-                            }
-                        } else if (cc >= len) {
-                            if (len <= 1) {
-                                cc = 0;
-                            } else {
-                                int sz = len;
-                                cc -= sz * (int)(cc / sz);
-                            }
-                        }
-                        break;
-                    case NI_EXTEND_NEAREST:
-                        if (cc < 0) {
-                            cc = 0;
-                        } else if (cc >= len) {
-                            cc = len - 1;
-                        }
-                        break;
-                    case NI_EXTEND_CONSTANT:
-                        if (cc < 0 || cc >= len)
-                            cc = *border_flag_value;
-                        break;
-                    default:
-                    PyErr_SetString(PyExc_RuntimeError,
-                                                                                    "boundary mode not supported");
-                        goto exit;
-                    }
+                    cc = NI_ExtendCoordinate(cc, len, mode);
+                    if (cc < 0)
+                        cc = *border_flag_value;
 
                     /* calculate offset along current axis: */
                     if (cc == *border_flag_value) {
@@ -702,6 +855,293 @@ int NI_InitFilterOffsets(PyArrayObject *array, Bool *footprint,
     }
 }
 
+/******************************************************************/
+/* Threads */
+/******************************************************************/
+
+typedef struct {
+    NI_ThreadFunction *function;
+    void *data;
+    npy_intp start, stop;
+    NI_ThreadStatus status;
+} NI_Thread;
+
+#ifdef _WIN32
+
+#include <windows.h>
+#include <process.h>
+
+typedef HANDLE NI_ThreadHandle;
+
+static unsigned __stdcall _NI_ThreadMain(void *arg)
+{
+    NI_Thread *thread = (NI_Thread*)arg;
+    thread->status = thread->function(thread->data, thread->start,
+                                      thread->stop);
+    return 0;
+}
+
+static int _NI_StartThread(NI_ThreadHandle *handle, NI_Thread *thread)
+{
+    *handle = (HANDLE)_beginthreadex(NULL, 0, _NI_ThreadMain, thread, 0,
+                                     NULL);
+    return *handle != 0;
+}
+
+static void _NI_JoinThread(NI_ThreadHandle handle)
+{
+    WaitForSingleObject(handle, INFINITE);
+    CloseHandle(handle);
+}
+
+#else
+
+#include <pthread.h>
+
+typedef pthread_t NI_ThreadHandle;
+
+static void *_NI_ThreadMain(void *arg)
+{
+    NI_Thread *thread = (NI_Thread*)arg;
+    thread->status = thread->function(thread->data, thread->start,
+                                      thread->stop);
+    return NULL;
+}
+
+static int _NI_StartThread(NI_ThreadHandle *handle, NI_Thread *thread)
+{
+    return pthread_create(handle, NULL, _NI_ThreadMain, thread) == 0;
+}
+
+static void _NI_JoinThread(NI_ThreadHandle handle)
+{
+    pthread_join(handle, NULL);
+}
+
+#endif
+
+/* Raise the exception of the status returned by a thread function: */
+static void _NI_RaiseThreadStatus(NI_ThreadStatus status)
+{
+    switch (status) {
+    case NI_THREAD_OK:
+        break;
+    case NI_THREAD_NO_MEMORY:
+        PyErr_NoMemory();
+        break;
+    case NI_THREAD_CALLBACK_FAILED:
+        /* a callback running in the calling thread may have raised: */
+        if (!PyErr_Occurred())
+            PyErr_SetString(PyExc_RuntimeError,
+                            "unknown error in callback function");
+        break;
+    default:
+        PyErr_SetString(PyExc_RuntimeError, "array type not supported");
+        break;
+    }
+}
+
+/* Divide a task of size items in contiguous ranges, and process them
+     with the given number of threads. The first range is processed by
+     the calling thread, and so are the ranges of threads that cannot be
+     started. Since each range is processed exactly as it would be by a
+     single thread, the result does not depend on the number of threads,
+     as long as the function only writes the results of its own items.
+     The GIL is released while the function runs: */
+int NI_RunThreads(NI_ThreadFunction *function, void *data, npy_intp size,
+                  int workers)
+{
+    NI_Thread *threads = NULL;
+    NI_ThreadHandle *handles = NULL;
+    char *started = NULL;
+    NI_ThreadStatus status = NI_THREAD_OK;
+    npy_intp chunk, remainder, start = 0;
+    int ii;
+    NPY_BEGIN_THREADS_DEF;
+
+    if (size <= 0)
+        return 1;
+    if (workers > size)
+        workers = (int)size;
+    if (workers <= 1) {
+        NPY_BEGIN_THREADS;
+        status = function(data, 0, size);
+        goto exit;
+    }
+    threads = (NI_Thread*)malloc(workers * sizeof(NI_Thread));
+    handles = (NI_ThreadHandle*)malloc(workers * sizeof(NI_ThreadHandle));
+    started = (char*)calloc(workers, sizeof(char));
+    if (!threads || !handles || !started) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    /* the first size % workers ranges get one more item: */
+    chunk = size / workers;
+    remainder = size % workers;
+    for(ii = 0; ii < workers; ii++) {
+        threads[ii].function = function;
+        threads[ii].data = data;
+        threads[ii].start = start;
+        start += ii < remainder ? chunk + 1 : chunk;
+        threads[ii].stop = start;
+        threads[ii].status = NI_THREAD_OK;
+    }
+    NPY_BEGIN_THREADS;
+    for(ii = 1; ii < workers; ii++)
+        started[ii] = _NI_StartThread(&handles[ii], &threads[ii]);
+    for(ii = 0; ii < workers; ii++) {
+        if (!started[ii])
+            threads[ii].status = function(data, threads[ii].start,
+                                          threads[ii].stop);
+    }
+    for(ii = 1; ii < workers; ii++)
+        if (started[ii])
+            _NI_JoinThread(handles[ii]);
+    for(ii = 0; ii < workers; ii++)
+        if (threads[ii].status != NI_THREAD_OK)
+            status = threads[ii].status;
+ exit:
+    NPY_END_THREADS;
+    _NI_RaiseThreadStatus(status);
+    if (threads) free(threads);
+    if (handles) free(handles);
+    if (started) free(started);
+    return PyErr_Occurred() ? 0 : 1;
+}
+
+/* Process all items of a task in the calling thread, holding the GIL,
+     for functions that may call Python: */
+int NI_RunHoldingGIL(NI_ThreadFunction *function, void *data, npy_intp size)
+{
+    if (size > 0)
+        _NI_RaiseThreadStatus(function(data, 0, size));
+    return PyErr_Occurred() ? 0 : 1;
+}
+
+/******************************************************************/
+/* Buffer sizes */
+/******************************************************************/
+
+/* the limits of the buffer sizes derived from the caches: */
+#define NI_MIN_BUFFER_SIZE (64 * 1024)
+#define NI_MAX_BUFFER_SIZE (8 * 1024 * 1024)
+
+#ifdef _WIN32
+
+/* Return the size of the largest data cache of the given level, or 0
+     if it is not known: */
+static npy_intp _NI_CacheSize(int level)
+{
+    SYSTEM_LOGICAL_PROCESSOR_INFORMATION *info;
+    DWORD ii, length = 0;
+    npy_intp size = 0;
+
+    if (GetLogicalProcessorInformation(NULL, &length) ||
+        GetLastError() != ERROR_INSUFFICIENT_BUFFER)
+        return 0;
+    info = (SYSTEM_LOGICAL_PROCESSOR_INFORMATION*)malloc(length);
+    if (!info)
+        return 0;
+    if (GetLogicalProcessorInformation(info, &length)) {
+        for(ii = 0; ii < length / sizeof(*info); ii++) {
+            if (info[ii].Relationship == RelationCache &&
+                info[ii].Cache.Level == level &&
+                info[ii].Cache.Type != CacheInstruction &&
+                (npy_intp)info[ii].Cache.Size > size)
+                size = info[ii].Cache.Size;
+        }
+    }
+    free(info);
+    return size;
+}
+
+#else
+
+#include <unistd.h>
+#include <stdio.h>
+
+/* Return the size of the largest data cache of the given level, or 0
+     if it is not known: */
+static npy_intp _NI_CacheSize(int level)
+{
+    npy_intp size = 0;
+    int ii;
+
+#if defined(_SC_LEVEL2_CACHE_SIZE) && defined(_SC_LEVEL3_CACHE_SIZE)
+    size = sysconf(level == 2 ? _SC_LEVEL2_CACHE_SIZE :
+                                _SC_LEVEL3_CACHE_SIZE);
+    if (size > 0)
+        return size;
+    size = 0;
+#endif
+    /* otherwise look for the cache on Linux: */
+    for(ii = 0; ii < 8; ii++) {
+        char path[64], type[32];
+        FILE *file;
+        int clevel = 0;
+        long csize = 0;
+        char unit = 'K';
+
+        sprintf(path, "/sys/devices/system/cpu/cpu0/cache/index%d/level", ii);
+        file = fopen(path, "r");
+        if (!file)
+            break;
+        if (fscanf(file, "%d", &clevel) != 1)
+            clevel = 0;
+        fclose(file);
+        if (clevel != level)
+            continue;
+        sprintf(path, "/sys/devices/system/cpu/cpu0/cache/index%d/type", ii);
+        file = fopen(path, "r");
+        if (!file)
+            continue;
+        if (fscanf(file, "%31s", type) != 1)
+            type[0] = 0;
+        fclose(file);
+        if (type[0] == 'I')
+            continue;
+        sprintf(path, "/sys/devices/system/cpu/cpu0/cache/index%d/size", ii);
+        file = fopen(path, "r");
+        if (!file)
+            continue;
+        if (fscanf(file, "%ld%c", &csize, &unit) < 1)
+            csize = 0;
+        fclose(file);
+        if (unit == 'K')
+            csize *= 1024;
+        else if (unit == 'M')
+            csize *= 1024 * 1024;
+        if (csize > size)
+            size = csize;
+    }
+    return size;
+}
+
+#endif
+
+/* The input and output line buffers of a thread should fit together in
+     its level 2 cache, so each gets half of it. If only the level 3
+     cache is known, it is assumed to be shared by several cores. The
+     size is determined once: */
+npy_intp NI_CacheBufferSize(void)
+{
+    static npy_intp buffer_size = 0;
+
+    if (buffer_size == 0) {
+        npy_intp size = _NI_CacheSize(2) / 2;
+        if (size <= 0)
+            size = _NI_CacheSize(3) / 8;
+        if (size <= 0)
+            size = NI_DEFAULT_BUFFER_SIZE;
+        if (size < NI_MIN_BUFFER_SIZE)
+            size = NI_MIN_BUFFER_SIZE;
+        if (size > NI_MAX_BUFFER_SIZE)
+            size = NI_MAX_BUFFER_SIZE;
+        buffer_size = size;
+    }
+    return buffer_size;
+}
+
 NI_CoordinateList* NI_InitCoordinateList(int size, int rank)
 {
     NI_CoordinateList *list = \
@@ -733,30 +1173,24 @@ int NI_CoordinateListStealBlocks(NI_CoordinateList *list1,
     return 0;
 }
 
+/* Add a block to a coordinate list, or return NULL if there is not
+     enough memory. No exception is raised, so that this can be called
+     without holding the GIL: */
 NI_CoordinateBlock* NI_CoordinateListAddBlock(NI_CoordinateList *list)
 {
     NI_CoordinateBlock* block = NULL;
     block = (NI_CoordinateBlock*)malloc(sizeof(NI_CoordinateBlock));
-    if (!block) {
-        PyErr_NoMemory();
-        goto exit;
-    }
+    if (!block)
+        return NULL;
     block->coordinates = (npy_intp*)malloc(list->block_size * list->rank *
                                                            sizeof(npy_intp));
     if (!block->coordinates) {
-        PyErr_NoMemory();
-        goto exit;
+        free(block);
+        return NULL;
     }
     block->next = list->blocks;
     list->blocks = block;
     block->size = 0;
-
-exit:
-    if (PyErr_Occurred()) {
-        if (block)
-            free(block);
-        return NULL;
-    }
     return block;
 }
 
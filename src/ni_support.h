@@ -78,6 +78,10 @@ int NI_SubspaceIterator(NI_Iterator*, UInt32);
 /* initialize iteration over array lines: */
 int NI_LineIterator(NI_Iterator*, int);
 
+/* calculate the coordinates of the point with the given index in the
+     iteration order of an iterator: */
+void NI_IteratorCoordinates(NI_Iterator*, npy_intp, npy_intp*);
+
 /* reset an iterator */
 #define NI_ITERATOR_RESET(iterator)              \
 {                                                \
@@ -155,20 +159,26 @@ int NI_LineIterator(NI_Iterator*, int);
 
 /* the linebuffer structure: */
 typedef struct {
-    double *buffer_data;
+    void *buffer_data;
     npy_intp buffer_lines, line_length, line_stride;
     npy_intp size1, size2, array_lines, next_line;
     NI_Iterator iterator;
     char* array_data;
     NumarrayType array_type;
+    NumarrayType buffer_type;  /* tFloat64, or tFloat32 for single precision */
     NI_ExtendMode extend_mode;
     double extend_value;
 } NI_LineBuffer;
 
 /* Get the next line being processed: */
 #define NI_GET_LINE(_buffer, _line)                                      \
-    ((_buffer).buffer_data + (_line) * ((_buffer).line_length +            \
+    ((double*)(_buffer).buffer_data + (_line) * ((_buffer).line_length +   \
                                                                             (_buffer).size1 + (_buffer).size2))
+
+/* Get the next line being processed from a single precision buffer: */
+#define NI_GET_FLOAT_LINE(_buffer, _line)                                \
+    ((float*)(_buffer).buffer_data + (_line) * ((_buffer).line_length +    \
+                                                (_buffer).size1 + (_buffer).size2))
 /* Allocate line buffer data */
 int NI_AllocateLineBuffer(PyArrayObject*, int, npy_intp, npy_intp,
                            npy_intp*, npy_intp, double**);
@@ -180,12 +190,19 @@ int NI_InitLineBuffer(PyArrayObject*, int, npy_intp, npy_intp, npy_intp,
 /* Extend a line in memory to implement boundary conditions: */
 int NI_ExtendLine(double*, npy_intp, npy_intp, npy_intp, NI_ExtendMode, double);
 
+/* Extend a single precision line in memory: */
+int NI_ExtendFloatLine(float*, npy_intp, npy_intp, npy_intp, NI_ExtendMode,
+                       double);
+
 /* Copy a line from an array to a buffer: */
 int NI_ArrayToLineBuffer(NI_LineBuffer*, npy_intp*, int*);
 
 /* Copy a line from a buffer to an array: */
 int NI_LineBufferToArray(NI_LineBuffer*);
 
+/* Restrict a line buffer to the array lines from start up to stop: */
+void NI_LineBufferRange(NI_LineBuffer*, npy_intp, npy_intp);
+
 /******************************************************************/
 /* Multi-dimensional filter support functions */
 /******************************************************************/
@@ -200,6 +217,10 @@ typedef struct {
 int NI_InitFilterIterator(int, npy_intp*, npy_intp, npy_intp*,
                           npy_intp*, NI_FilterIterator*);
 
+/* Map a coordinate outside of an axis back onto the axis, according to
+     the boundary mode; returns -1 if it maps outside in constant mode: */
+npy_intp NI_ExtendCoordinate(npy_intp, npy_intp, NI_ExtendMode);
+
 /* Calculate the offsets to the filter points, for all border regions and
      the interior of the array: */
 int NI_InitFilterOffsets(PyArrayObject*, Bool*, npy_intp*,
@@ -283,7 +304,9 @@ int NI_InitFilterOffsets(PyArrayObject*, Bool*, npy_intp*,
 }
 
 /* Move the pointer to the filter offsets according to the given
-    coordinates: */
+    coordinates, as NI_FILTER_NEXT would have moved it. If the footprint
+    is longer than the array along an axis, the pointer moves with every
+    step along that axis: */
 #define NI_FILTER_GOTO(iteratorf, iterator, fbase, pointerf) \
 {                                                            \
     int _ii;                                                   \
@@ -293,7 +316,7 @@ int NI_InitFilterOffsets(PyArrayObject*, Bool*, npy_intp*,
         npy_intp _pp = iterator.coordinates[_ii];             \
         npy_intp b1 = (iteratorf).bound1[_ii];                \
         npy_intp b2 = (iteratorf).bound2[_ii];                \
-        if (_pp < b1) {                                          \
+        if (_pp < b1 || b2 < b1) {                               \
                 _jj = _pp;                                           \
         } else if (_pp > b2 && b2 >= b1) {                       \
                 _jj = _pp + b1 - b2;                                 \
@@ -304,6 +327,40 @@ int NI_InitFilterOffsets(PyArrayObject*, Bool*, npy_intp*,
     }                                                          \
 }
 
+/******************************************************************/
+/* Threads */
+/******************************************************************/
+
+/* Functions running in threads other than the calling thread cannot
+     raise Python exceptions, so they return one of these instead: */
+typedef enum {
+    NI_THREAD_OK = 0,
+    NI_THREAD_NO_MEMORY,
+    NI_THREAD_TYPE_NOT_SUPPORTED,
+    NI_THREAD_CALLBACK_FAILED
+} NI_ThreadStatus;
+
+/* A function processing the items of a task from start up to stop: */
+typedef NI_ThreadStatus (NI_ThreadFunction)(void*, npy_intp, npy_intp);
+
+/* Divide a task of the given number of items in contiguous ranges, and
+     process them with the given number of threads: */
+int NI_RunThreads(NI_ThreadFunction*, void*, npy_intp, int);
+
+/* Process all items of a task in the calling thread, holding the GIL: */
+int NI_RunHoldingGIL(NI_ThreadFunction*, void*, npy_intp);
+
+/******************************************************************/
+/* Buffer sizes */
+/******************************************************************/
+
+/* The size in bytes of the line buffers, if the sizes of the caches of
+     the processor cannot be determined: */
+#define NI_DEFAULT_BUFFER_SIZE 256000
+
+/* Return a size of the line buffers that fits the caches: */
+npy_intp NI_CacheBufferSize(void);
+
 typedef struct {
     npy_intp *coordinates;
         int size;
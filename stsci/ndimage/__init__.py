@@ -36,6 +36,7 @@ from .interpolation import *
 from .measurements import *
 from .morphology import *
 from .io import *
+from .tiled import *
 
 from .info import __doc__
 
@@ -31,8 +31,14 @@
 from __future__ import division
 
 import sys
+import numbers
 import numpy
 
+try:
+    import ctypes
+except ImportError:
+    ctypes = None
+
 if sys.version_info[0] > 2:
     string_types = str
     number_types = (int, float)
@@ -76,7 +82,7 @@ def _get_output(output, input, shape=None):
     if output is None:
         output = numpy.zeros(shape, dtype = input.dtype.name)
         return_value = output
-    elif isinstance(output, (type(type), type(numpy.zeros((4,)).dtype))):
+    elif isinstance(output, (type(type), numpy.dtype)):
         output = numpy.zeros(shape, dtype = output)
         return_value = output
     elif isinstance(output, string_types):
@@ -89,9 +95,171 @@ def _get_output(output, input, shape=None):
         return_value = None
     return output, return_value
 
+def _get_workers(workers, default):
+    """Return the number of threads requested by a workers argument: the
+    default if it is None, and the number of processors if it is -1.
+    """
+    if workers is None:
+        workers = default
+    if workers == -1:
+        try:
+            import multiprocessing
+            workers = multiprocessing.cpu_count()
+        except (ImportError, NotImplementedError):
+            workers = 1
+    workers = int(workers)
+    if workers < 1:
+        raise ValueError('workers must be a positive integer or -1')
+    return workers
+
+def _get_buffer_size(buffer_size, default):
+    """Return the size in bytes of the line buffers requested by a
+    buffer_size argument: the default if it is None, or 0 if that is None
+    too, which lets the filter derive the size from the caches.
+    """
+    if buffer_size is None:
+        buffer_size = default
+    if buffer_size is None:
+        return 0
+    buffer_size = int(buffer_size)
+    if buffer_size < 1:
+        raise ValueError('buffer_size must be a positive integer')
+    return buffer_size
+
+def _get_single(precision):
+    """Return whether a filter calculates in single precision, as
+    requested by a precision argument: only if it is 'single', since the
+    default of None selects double precision.
+    """
+    if precision is None or precision == 'double':
+        return False
+    elif precision == 'single':
+        return True
+    else:
+        raise ValueError("precision must be None, 'single' or 'double'")
+
+def _is_cffi(obj):
+    return type(obj).__module__ == '_cffi_backend'
+
+def _ctypes_function_address(function, line):
+    """Return the address of a ctypes function pointer, after checking its
+    signature if it is declared, or None if function is not one.
+    """
+    if ctypes is None or not isinstance(function, ctypes._CFuncPtr):
+        return None
+    if function.argtypes is not None:
+        doubles = ctypes.POINTER(ctypes.c_double)
+        intp = numpy.ctypeslib.c_intp
+        expected = [doubles, intp, doubles] + [intp] * line
+        argtypes = list(function.argtypes)
+        if (function.restype is not ctypes.c_int or
+            len(argtypes) != len(expected) + 1 or
+            argtypes[:-1] != expected or
+            not (argtypes[-1] is ctypes.c_void_p or
+                 issubclass(argtypes[-1], ctypes._Pointer))):
+            raise ValueError('compiled function has the wrong signature')
+    return ctypes.cast(function, ctypes.c_void_p).value
+
+def _cffi_function_address(function, line):
+    """Return the address of a cffi function pointer, after checking its
+    signature, or None if function is not one.
+    """
+    if not _is_cffi(function):
+        return None
+    import cffi
+    ffi = cffi.FFI()
+    ctype = ffi.typeof(function)
+    if ctype.kind != 'function':
+        raise ValueError('compiled function is not a function pointer')
+    args = ctype.args
+    intp = numpy.dtype(numpy.intp).itemsize
+    if (ctype.result.cname != 'int' or len(args) != 4 + line or
+        args[0].cname != 'double *' or args[2].cname != 'double *' or
+        args[-1].kind != 'pointer' or
+        [ffi.sizeof(aa) for aa in args[1:-1:2]] != [intp] * (1 + line)):
+        raise ValueError('compiled function has the wrong signature')
+    return int(ffi.cast('uintptr_t', function))
+
+def _pointer_address(data):
+    """Return the address given by an integer, or by a ctypes or cffi
+    pointer or object.
+    """
+    if isinstance(data, numbers.Integral):
+        return int(data)
+    if ctypes is not None:
+        if isinstance(data, (ctypes.c_void_p, ctypes._Pointer)):
+            return ctypes.cast(data, ctypes.c_void_p).value or 0
+        if isinstance(data, (ctypes._SimpleCData, ctypes.Structure,
+                             ctypes.Union, ctypes.Array)):
+            return ctypes.addressof(data)
+    if _is_cffi(data):
+        import cffi
+        return int(cffi.FFI().cast('uintptr_t', data))
+    raise TypeError('user_data must be an address, or a ctypes or cffi '
+                    'pointer')
+
+def _get_callback(function, user_data, line=False):
+    """Return a filter function and its user data in the form passed to
+    the generic filters: compiled functions given as ctypes or cffi
+    function pointers are passed by their address, and so is the user
+    data. The signature of a compiled function must be
+    int(double*, npy_intp, double*, void*), or
+    int(double*, npy_intp, double*, npy_intp, void*) for a line filter.
+    """
+    address = _ctypes_function_address(function, line)
+    if address is None:
+        address = _cffi_function_address(function, line)
+    if address is not None:
+        function = address
+    elif type(function).__name__ != 'PyCapsule':
+        if not callable(function):
+            raise RuntimeError('function parameter is not callable')
+        if user_data is not None:
+            raise ValueError('user_data requires a compiled function')
+    if user_data is not None:
+        user_data = _pointer_address(user_data)
+    return function, user_data
+
 def _check_axis(axis, rank):
     if axis < 0:
         axis += rank
     if axis < 0 or axis >= rank:
         raise ValueError('invalid axis')
     return axis
+
+def _check_axes(axes, rank):
+    """Return the axes given by an axes argument as a tuple of valid axes,
+    in the given order, or all axes if it is None.
+    """
+    if axes is None:
+        return tuple(range(rank))
+    if isinstance(axes, numbers.Integral):
+        axes = (axes,)
+    axes = tuple([_check_axis(int(axis), rank) for axis in axes])
+    if len(set(axes)) != len(axes):
+        raise ValueError('axes must be unique')
+    return axes
+
+def _expand_sequence(input, axes, rank, default):
+    """Normalize a sequence given for the axes to a sequence for all axes
+    of the given rank, with the default value along the other axes.
+    """
+    normalized = [default] * rank
+    for axis, value in zip(axes, _normalize_sequence(input, len(axes))):
+        normalized[axis] = value
+    return normalized
+
+def _expand_footprint(footprint, axes, rank):
+    """Expand a footprint given for the axes to all axes of the given
+    rank, with a length of one along the other axes. A footprint that
+    does not have one dimension for each axis is returned unchanged.
+    """
+    footprint = numpy.asarray(footprint)
+    if footprint.ndim != len(axes) or len(axes) == rank and \
+       list(axes) == list(range(rank)):
+        return footprint
+    footprint = footprint.transpose(numpy.argsort(axes))
+    shape = [1] * rank
+    for axis, length in zip(sorted(axes), footprint.shape):
+        shape[axis] = length
+    return footprint.reshape(shape)
@@ -79,6 +79,50 @@ _extra_arguments_doc = \
 _extra_keywords_doc = \
 """extra_keywords : dict, optional
     dict of extra keyword arguments to pass to passed function"""
+_user_data_doc = \
+"""user_data : int or ctypes or cffi pointer, optional
+    The data passed to a compiled function, given by its address or by a
+    pointer to it. Default is the context of a PyCapsule, or NULL"""
+_workers_doc = \
+"""workers : int, optional
+    The number of threads used to calculate the filter, or -1 to use
+    one thread per processor. The result does not depend on the number
+    of threads. Default is ``default_workers``, which is 1"""
+_precision_doc = \
+"""precision : {None, 'single', 'double'}, optional
+    The precision in which the lines are buffered and filtered. In
+    single precision, half the memory is moved, and long sums are
+    accumulated in double precision, but the filters of several axes
+    are not applied tile by tile, which is usually slower. Default is
+    None, which selects double precision."""
+_buffer_size_doc = \
+"""buffer_size : int, optional
+    The size in bytes of the buffer in which each thread holds the lines
+    being filtered. Default is ``default_buffer_size``, which is None to
+    derive the size from the caches of the processor"""
+_mask_doc = \
+"""mask : array, optional
+    The weights of the input elements, such as a boolean array that is
+    False at bad elements. The result is then normalized by the filtered
+    weights, so that elements of zero weight are ignored, and it is NaN
+    where all weights are zero. Normalized filters calculate in double
+    precision, and store the result in a floating point output. Default
+    is None"""
+_nan_policy_doc = \
+"""nan_policy : {'propagate', 'ignore'}, optional
+    If 'ignore', elements of the input that are NaN are given zero
+    weight, as if they were masked, and the result is normalized.
+    Default is 'propagate'"""
+_return_weights_doc = \
+"""return_weights : bool, optional
+    If True, the result is normalized and returned together with the
+    filtered weights, as a tuple of two arrays. Default is False"""
+_axes_doc = \
+"""axes : int or sequence of ints, optional
+    The axes along which to filter. The other axes are batch axes, along
+    which the elements are filtered independently, in the same call.
+    Values given for each axis, such as sizes, footprints and origins,
+    are given for these axes only. Default is None, for all axes"""
 
 docdict = {
     'input':_input_doc,
@@ -90,13 +134,96 @@ docdict = {
     'origin':_origin_doc,
     'extra_arguments':_extra_arguments_doc,
     'extra_keywords':_extra_keywords_doc,
+    'user_data':_user_data_doc,
+    'workers':_workers_doc,
+    'precision':_precision_doc,
+    'buffer_size':_buffer_size_doc,
+    'mask':_mask_doc,
+    'nan_policy':_nan_policy_doc,
+    'return_weights':_return_weights_doc,
+    'axes':_axes_doc,
     }
 
 docfiller = doccer.filldoc(docdict)
 
+# the number of threads used by the filters if their workers argument is
+# None:
+default_workers = 1
+
+# the size in bytes of the line buffers of the one-dimensional filters if
+# their buffer_size argument is None. If it is None too, the size is
+# derived from the caches of the processor. See tune_buffer_size:
+default_buffer_size = None
+
+
+def _normalized(mask, nan_policy, return_weights):
+    """Return whether a filter must be normalized by filtered weights."""
+    if nan_policy not in ('propagate', 'ignore'):
+        raise ValueError("nan_policy must be 'propagate' or 'ignore'")
+    return mask is not None or nan_policy == 'ignore' or return_weights
+
+
+def _normalized_filter(input, passes, output, mask, nan_policy,
+                       return_weights, mode, cval, workers, buffer_size):
+    """Apply one-dimensional correlations, given as (axis, weights, origin)
+    tuples, to the input values multiplied by the mask, and to the mask,
+    and divide the results. The numerator and the denominator are passed
+    from one axis to the next, and only divided after the last.
+    """
+    if numpy.iscomplexobj(input):
+        raise TypeError('Complex type not supported')
+    if mask is not None:
+        mask = numpy.asarray(mask)
+        if mask.shape != input.shape:
+            raise RuntimeError('mask and input must have equal shape')
+    if output is None and input.dtype.kind != 'f':
+        output = numpy.float64
+    output, return_value = _ni_support._get_output(output, input)
+    if output.dtype.kind != 'f':
+        raise RuntimeError('normalized filters need a floating point output')
+    workers = _ni_support._get_workers(workers, default_workers)
+    buffer_size = _ni_support._get_buffer_size(buffer_size,
+                                               default_buffer_size)
+    mode = _ni_support._extend_mode_to_code(mode)
+    result = output
+    if input.ndim == 0:
+        input, output = input.reshape(1), output.reshape(1)
+        if mask is not None:
+            mask = mask.reshape(1)
+    if len(passes) == 0:
+        passes = [(0, [1.0], 0)]
+    # the numerator and denominator of the intermediate passes are held
+    # in the outputs if possible:
+    if output.dtype == numpy.float64:
+        numerator = output
+    elif len(passes) > 1:
+        numerator = numpy.zeros(input.shape, numpy.float64)
+    else:
+        numerator = None
+    denominator = numpy.zeros(input.shape, numpy.float64)
+    values, weights, weighted = input, mask, False
+    for ii, (axis, ww, origin) in enumerate(passes):
+        ww = numpy.asarray(ww, dtype=numpy.float64)
+        if ((len(ww) // 2 + origin < 0) or
+            (len(ww) // 2 + origin > len(ww))):
+            raise ValueError('invalid origin')
+        last = ii == len(passes) - 1
+        _nd_image.normalized_correlate1d(
+            values, weights, ww, axis, output if last else numerator,
+            denominator if return_weights or not last else None, mode, cval,
+            origin, weighted, last, nan_policy == 'ignore', workers,
+            buffer_size)
+        values, weights, weighted = numerator, denominator, True
+    if return_weights:
+        return result, denominator.reshape(result.shape)
+    return return_value
+
+
 @docfiller
 def correlate1d(input, weights, axis = -1, output = None, mode = "reflect",
-                cval = 0.0, origin = 0):
+                cval = 0.0, origin = 0, workers = None, precision = None,
+                buffer_size = None, mask = None, nan_policy = "propagate",
+                return_weights = False):
     """Calculate a one-dimensional correlation along the given axis.
 
     The lines of the array along the given axis are correlated with the
@@ -112,29 +239,44 @@ def correlate1d(input, weights, axis = -1, output = None, mode = "reflect",
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(precision)s
+    %(buffer_size)s
+    %(mask)s
+    %(nan_policy)s
+    %(return_weights)s
     """
     input = numpy.asarray(input)
     if numpy.iscomplexobj(input):
         raise TypeError('Complex type not supported')
-    output, return_value = _ni_support._get_output(output, input)
     weights = numpy.asarray(weights, dtype=numpy.float64)
     if weights.ndim != 1 or weights.shape[0] < 1:
         raise RuntimeError('no filter weights given')
     if not weights.flags.contiguous:
         weights = weights.copy()
     axis = _ni_support._check_axis(axis, input.ndim)
+    if _normalized(mask, nan_policy, return_weights):
+        return _normalized_filter(input, [(axis, weights, origin)], output,
+                                  mask, nan_policy, return_weights, mode,
+                                  cval, workers, buffer_size)
+    output, return_value = _ni_support._get_output(output, input)
+    workers = _ni_support._get_workers(workers, default_workers)
+    single = _ni_support._get_single(precision)
+    buffer_size = _ni_support._get_buffer_size(buffer_size,
+                                               default_buffer_size)
     if ((len(weights) // 2 + origin < 0) or
         (len(weights) // 2 + origin > len(weights))):
         raise ValueError('invalid origin')
     mode = _ni_support._extend_mode_to_code(mode)
     _nd_image.correlate1d(input, weights, axis, output, mode, cval,
-                          origin)
+                          origin, workers, single, buffer_size)
     return return_value
 
 
 @docfiller
 def convolve1d(input, weights, axis = -1, output = None, mode = "reflect",
-               cval = 0.0, origin = 0):
+               cval = 0.0, origin = 0, workers = None, precision = None,
+               buffer_size = None):
     """Calculate a one-dimensional convolution along the given axis.
 
     The lines of the array along the given axis are convolved with the
@@ -150,36 +292,162 @@ def convolve1d(input, weights, axis = -1, output = None, mode = "reflect",
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(precision)s
+    %(buffer_size)s
     """
     weights = weights[::-1]
     origin = -origin
     if not len(weights) & 1:
         origin -= 1
-    return correlate1d(input, weights, axis, output, mode, cval, origin)
+    return correlate1d(input, weights, axis, output, mode, cval, origin,
+                       workers, precision, buffer_size)
 
 
-@docfiller
-def gaussian_filter1d(input, sigma, axis = -1, order = 0, output = None,
-                      mode = "reflect", cval = 0.0):
-    """One-dimensional Gaussian filter.
+# maximum number of elements, including borders, of the tiles in which
+# separable filters are applied along all axes. Tiles of arrays with three
+# dimensions span whole lines, and may be four times as large:
+_SEPARABLE_TILE_SIZE = 1 << 16
 
-    Parameters
-    ----------
-    %(input)s
-    sigma : scalar
-        standard deviation for Gaussian kernel
-    %(axis)s
-    order : {0, 1, 2, 3}, optional
-        An order of 0 corresponds to convolution with a Gaussian
-        kernel. An order of 1, 2, or 3 corresponds to convolution with
-        the first, second or third derivatives of a Gaussian. Higher
-        order derivatives are not implemented
-    %(output)s
-    %(mode)s
-    %(cval)s
+# minimum number of elements of the arrays that separable filters are
+# applied to tile by tile, since smaller arrays stay in cache anyway:
+_SEPARABLE_MIN_SIZE = 1 << 20
+
+# maximum work of applying separable filters tile by tile, relative to
+# that of the separate one-dimensional filters, at which the tiles are
+# still faster, since they are filtered in cache:
+_MAX_TILED_WORK = 1.2
+
+# approximate cost of a pass of a separable filter applied tile by tile,
+# relative to the cost of a one-dimensional filter through the array:
+_TILED_PASS_COST = 0.6
+
+_SEPARABLE_PASS_TYPES = {'correlate': 0, 'uniform': 1, 'minimum': 2,
+                         'maximum': 3}
+
+
+def _separable_tile_shape(shape, sizes, costs):
+    """Return the shape of the tiles used to apply filters of the given
+    sizes along all axes, or None if the borders of the tiles would add
+    too much work, or if the array is small enough to stay in cache. The
+    costs give the work per element of the passes along each axis.
+    Arrays of three dimensions are only tiled along their outer axes,
+    since borders along all axes would dominate the work, and arrays of
+    more dimensions are not tiled.
+    """
+    ndim = len(shape)
+    nelements = numpy.prod(shape, dtype=numpy.float64)
+    if (ndim == 0 or ndim > 3 or nelements == 0 or
+        nelements < _SEPARABLE_MIN_SIZE):
+        return None
+    outer = ndim - 1 if ndim > 2 else ndim
+    limit = _SEPARABLE_TILE_SIZE if ndim <= 2 else 4 * _SEPARABLE_TILE_SIZE
+    tile = list(shape)
+    while True:
+        size = 1
+        for tt, ff in zip(tile, sizes):
+            size *= tt + ff - 1
+        largest = numpy.argmax(tile[:outer])
+        if size <= limit or tile[largest] <= 1:
+            break
+        tile[largest] = (tile[largest] + 1) // 2
+    # loading a tile with its borders, and filtering it along each axis,
+    # with the borders that the following axes still need:
+    extents = [tt + ff - 1 for tt, ff in zip(tile, sizes)]
+    tiled = float(size)
+    for axis in range(ndim):
+        tiled += (costs[axis] *
+                  numpy.prod(tile[:axis + 1], dtype=numpy.float64) *
+                  numpy.prod(extents[axis + 1:], dtype=numpy.float64))
+    for ss, tt in zip(shape, tile):
+        tiled *= -(-ss // tt)
+    # loading the lines along each axis with their borders, and filtering
+    # them:
+    separate = 0.0
+    for axis in range(ndim):
+        if costs[axis] > 0:
+            separate += nelements / shape[axis] * (
+                shape[axis] * (costs[axis] + 1) + sizes[axis] - 1)
+    if tiled > _MAX_TILED_WORK * separate:
+        return None
+    return tile
+
+
+def _separable_filter(input, output, passes, mode, cval, workers,
+                      terms = None, magnitude = False):
+    """Apply one-dimensional filters along several axes, tile by tile.
+    The passes are given as (axis, type, weights, origin) tuples for
+    increasing axes. If terms is given, the passes are split into terms
+    of the given numbers of passes, each for increasing axes, which are
+    filtered from the same tiles and summed, or, if magnitude is True,
+    combined into the square root of the sum of their squares. Returns
+    False if the filters were not applied, because the separate
+    one-dimensional filters are expected to be as efficient.
+    """
+    if ((terms is None and len(passes) < 2) or numpy.iscomplexobj(output)
+        or numpy.may_share_memory(input, output)):
+        return False
+    sizes = [1] * input.ndim
+    costs = [0] * input.ndim
+    for axis, type, weights, origin in passes:
+        sizes[axis] = max(sizes[axis], len(weights))
+        # the running sums and extrema take a few operations per element:
+        costs[axis] += len(weights) if type == 'correlate' else 3
+        if (len(weights) // 2 + origin < 0) or (len(weights) // 2 + origin >
+                                                len(weights)):
+            raise ValueError('invalid origin')
+        if terms is not None and (origin != 0 or not len(weights) & 1):
+            return False
+    tile = _separable_tile_shape(input.shape, sizes, costs)
+    if tile is None:
+        return False
+    weights = numpy.concatenate([numpy.asarray(ww, dtype=numpy.float64)
+                                 for _, _, ww, _ in passes])
+    mode = _ni_support._extend_mode_to_code(mode)
+    _nd_image.separable_filter(input, [pp[0] for pp in passes],
+                               [_SEPARABLE_PASS_TYPES[pp[1]] for pp in passes],
+                               [len(pp[2]) for pp in passes],
+                               [pp[3] for pp in passes], weights, tile,
+                               output, mode, cval, workers, terms,
+                               int(magnitude))
+    return True
+
+
+def _fused_derivatives(input, output, terms, mode, cval, workers,
+                       magnitude):
+    """Store the sum of the derivatives given as lists of passes for
+    _separable_filter in the output, or their magnitude, computing all
+    derivatives from the same tiles of the input. Returns False if the
+    derivatives cannot be fused, or if the tiles would be slower than
+    separate filters, as for small arrays, or for large kernels along all
+    axes of three-dimensional arrays. The derivatives are then filtered
+    one by one, which needs a temporary array as large as the output.
+    """
+    if (len(terms) < 1 or min([len(term) for term in terms]) < 1 or
+        numpy.iscomplexobj(input)):
+        return False
+    passes = [pp for term in terms for pp in term]
+    return _separable_filter(input, output, passes, mode, cval, workers,
+                             [len(term) for term in terms], magnitude)
+
+
+def _gaussian_derivative_terms(sigmas, axes, order):
+    """Return the passes of the Gaussian derivatives of the given order
+    along each of the axes, for _fused_derivatives.
+    """
+    terms = []
+    for axis in axes:
+        terms.append([(ii, 'correlate',
+                       _gaussian_kernel1d(sigma, order if ii == axis else 0),
+                       0) for ii, sigma in enumerate(sigmas)
+                      if sigma > 1e-15])
+    return terms
+
+
+def _gaussian_kernel1d(sigma, order):
+    """Return the weights of a one-dimensional Gaussian kernel, or of one
+    of its derivatives.
     """
-    if order not in list(range(4)):
-        raise ValueError('Order outside 0..3 not implemented')
     sd = float(sigma)
     # make the length of the filter equal to 4 times the standard
     # deviations:
@@ -219,12 +487,83 @@ def gaussian_filter1d(input, sigma, axis = -1, order = 0, output = None,
             tmp = (3.0 - x * x / sd) * x * weights[lw + ii] / sd2
             weights[lw + ii] = -tmp
             weights[lw - ii] = tmp
-    return correlate1d(input, weights, axis, output, mode, cval, 0)
+    return weights
+
+
+@docfiller
+def gaussian_filter1d(input, sigma, axis = -1, order = 0, output = None,
+                      mode = "reflect", cval = 0.0, method = "direct",
+                      workers = None, precision = None, buffer_size = None):
+    """One-dimensional Gaussian filter.
+
+    Parameters
+    ----------
+    %(input)s
+    sigma : scalar
+        standard deviation for Gaussian kernel
+    %(axis)s
+    order : {0, 1, 2, 3}, optional
+        An order of 0 corresponds to convolution with a Gaussian
+        kernel. An order of 1, 2, or 3 corresponds to convolution with
+        the first, second or third derivatives of a Gaussian. Higher
+        order derivatives are not implemented
+    %(output)s
+    %(mode)s
+    %(cval)s
+    method : {'direct', 'recursive'}, optional
+        The ``method`` parameter selects the implementation. 'direct'
+        correlates with the Gaussian kernel truncated at 4 standard
+        deviations, at a cost proportional to sigma. 'recursive' uses a
+        recursive approximation, at a cost independent of sigma. Default
+        is 'direct'.
+    %(workers)s
+    %(precision)s
+        The recursive method always calculates in double precision.
+    %(buffer_size)s
+
+    Notes
+    -----
+    The recursive method approximates the Gaussian following Deriche,
+    and takes derivatives by finite differences. Relative to the peak of
+    the kernel of each order, the maximum errors of its impulse response
+    are below 6e-4 for order 0, 4e-3 for order 1, 6e-3 for order 2 and
+    2e-2 for order 3. The errors of the derivatives are largest at a
+    sigma of 3 for orders 1 and 3, and grow towards these bounds with
+    sigma for order 2. The direct method is used instead for sigma below 0.5, or below 3
+    for derivatives. Both methods extend the input by 4 standard
+    deviations, but beyond that the recursive method continues with the
+    last extended values, whereas the kernel of the direct method is
+    truncated.
+    """
+    if order not in list(range(4)):
+        raise ValueError('Order outside 0..3 not implemented')
+    if method not in ('direct', 'recursive'):
+        raise RuntimeError('Gaussian filter method not supported')
+    if method == 'recursive' and sigma >= (3.0 if order > 0 else 0.5):
+        input = numpy.asarray(input)
+        if numpy.iscomplexobj(input):
+            raise TypeError('Complex type not supported')
+        output, return_value = _ni_support._get_output(output, input)
+        workers = _ni_support._get_workers(workers, default_workers)
+        buffer_size = _ni_support._get_buffer_size(buffer_size,
+                                                   default_buffer_size)
+        axis = _ni_support._check_axis(axis, input.ndim)
+        mode = _ni_support._extend_mode_to_code(mode)
+        _nd_image.recursive_gaussian_filter1d(input, float(sigma), order,
+                                              axis, output, mode, cval,
+                                              workers, buffer_size)
+        return return_value
+    weights = _gaussian_kernel1d(sigma, order)
+    return correlate1d(input, weights, axis, output, mode, cval, 0, workers,
+                       precision, buffer_size)
 
 
 @docfiller
 def gaussian_filter(input, sigma, order = 0, output = None,
-                  mode = "reflect", cval = 0.0):
+                  mode = "reflect", cval = 0.0, method = "direct",
+                  workers = None, precision = None, mask = None,
+                  nan_policy = "propagate", return_weights = False,
+                  axes = None):
     """Multi-dimensional Gaussian filter.
 
     Parameters
@@ -245,6 +584,20 @@ def gaussian_filter(input, sigma, order = 0, output = None,
     %(output)s
     %(mode)s
     %(cval)s
+    method : {'direct', 'recursive'}, optional
+        The ``method`` parameter selects the implementation of the
+        one-dimensional filters, see `gaussian_filter1d`. Default is
+        'direct'.
+    %(workers)s
+    %(precision)s
+        In single precision, the filter is applied along one axis at a
+        time.
+    %(mask)s
+        Only filters of order 0 can be normalized, and they always use
+        the direct method.
+    %(nan_policy)s
+    %(return_weights)s
+    %(axes)s
 
     Notes
     -----
@@ -256,18 +609,33 @@ def gaussian_filter(input, sigma, order = 0, output = None,
     precision.
     """
     input = numpy.asarray(input)
-    output, return_value = _ni_support._get_output(output, input)
-    orders = _ni_support._normalize_sequence(order, input.ndim)
+    axes = _ni_support._check_axes(axes, input.ndim)
+    orders = _ni_support._expand_sequence(order, axes, input.ndim, 0)
     if not set(orders).issubset(set(range(4))):
         raise ValueError('Order outside 0..4 not implemented')
-    sigmas = _ni_support._normalize_sequence(sigma, input.ndim)
+    sigmas = _ni_support._expand_sequence(sigma, axes, input.ndim, 0.0)
     axes = list(range(input.ndim))
     axes = [(axes[ii], sigmas[ii], orders[ii])
                         for ii in range(len(axes)) if sigmas[ii] > 1e-15]
+    if _normalized(mask, nan_policy, return_weights):
+        if max(orders + [0]) > 0:
+            raise ValueError('Only filters of order 0 can be normalized')
+        passes = [(axis, _gaussian_kernel1d(sigma, 0), 0)
+                  for axis, sigma, order in axes]
+        return _normalized_filter(input, passes, output, mask, nan_policy,
+                                  return_weights, mode, cval, workers, None)
+    output, return_value = _ni_support._get_output(output, input)
+    workers = _ni_support._get_workers(workers, default_workers)
+    if (method == 'direct' and not numpy.iscomplexobj(input) and
+        not _ni_support._get_single(precision)):
+        passes = [(axis, 'correlate', _gaussian_kernel1d(sigma, order), 0)
+                  for axis, sigma, order in axes]
+        if _separable_filter(input, output, passes, mode, cval, workers):
+            return return_value
     if len(axes) > 0:
         for axis, sigma, order in axes:
             gaussian_filter1d(input, sigma, axis, order, output,
-                              mode, cval)
+                              mode, cval, method, workers, precision)
             input = output
     else:
         output[...] = input[...]
@@ -275,7 +643,8 @@ def gaussian_filter(input, sigma, order = 0, output = None,
 
 
 @docfiller
-def prewitt(input, axis = -1, output = None, mode = "reflect", cval = 0.0):
+def prewitt(input, axis = -1, output = None, mode = "reflect", cval = 0.0,
+            workers = None):
     """Calculate a Prewitt filter.
 
     Parameters
@@ -285,19 +654,21 @@ def prewitt(input, axis = -1, output = None, mode = "reflect", cval = 0.0):
     %(output)s
     %(mode)s
     %(cval)s
+    %(workers)s
     """
     input = numpy.asarray(input)
     axis = _ni_support._check_axis(axis, input.ndim)
     output, return_value = _ni_support._get_output(output, input)
-    correlate1d(input, [-1, 0, 1], axis, output, mode, cval, 0)
+    correlate1d(input, [-1, 0, 1], axis, output, mode, cval, 0, workers)
     axes = [ii for ii in range(input.ndim) if ii != axis]
     for ii in axes:
-        correlate1d(output, [1, 1, 1], ii, output, mode, cval, 0,)
+        correlate1d(output, [1, 1, 1], ii, output, mode, cval, 0, workers)
     return return_value
 
 
 @docfiller
-def sobel(input, axis = -1, output = None, mode = "reflect", cval = 0.0):
+def sobel(input, axis = -1, output = None, mode = "reflect", cval = 0.0,
+          workers = None):
     """Calculate a Sobel filter.
 
     Parameters
@@ -307,14 +678,15 @@ def sobel(input, axis = -1, output = None, mode = "reflect", cval = 0.0):
     %(output)s
     %(mode)s
     %(cval)s
+    %(workers)s
     """
     input = numpy.asarray(input)
     axis = _ni_support._check_axis(axis, input.ndim)
     output, return_value = _ni_support._get_output(output, input)
-    correlate1d(input, [-1, 0, 1], axis, output, mode, cval, 0)
+    correlate1d(input, [-1, 0, 1], axis, output, mode, cval, 0, workers)
     axes = [ii for ii in range(input.ndim) if ii != axis]
     for ii in axes:
-        correlate1d(output, [1, 2, 1], ii, output, mode, cval, 0)
+        correlate1d(output, [1, 2, 1], ii, output, mode, cval, 0, workers)
     return return_value
 
 
@@ -322,7 +694,7 @@ def sobel(input, axis = -1, output = None, mode = "reflect", cval = 0.0):
 def generic_laplace(input, derivative2, output = None, mode = "reflect",
                     cval = 0.0,
                     extra_arguments = (),
-                    extra_keywords = None):
+                    extra_keywords = None, axes = None):
     """Calculate a multidimensional laplace filter using the provided
     second derivative function.
 
@@ -339,18 +711,21 @@ def generic_laplace(input, derivative2, output = None, mode = "reflect",
     %(cval)s
     %(extra_keywords)s
     %(extra_arguments)s
+    %(axes)s
     """
     if extra_keywords is None:
         extra_keywords = {}
     input = numpy.asarray(input)
     output, return_value = _ni_support._get_output(output, input)
-    axes = list(range(input.ndim))
+    axes = list(_ni_support._check_axes(axes, input.ndim))
     if len(axes) > 0:
         derivative2(input, axes[0], output, mode, cval,
                     *extra_arguments, **extra_keywords)
+        if len(axes) > 1:
+            tmp = numpy.empty(output.shape, output.dtype)
         for ii in range(1, len(axes)):
-            tmp = derivative2(input, axes[ii], output.dtype, mode, cval,
-                              *extra_arguments, **extra_keywords)
+            derivative2(input, axes[ii], tmp, mode, cval,
+                        *extra_arguments, **extra_keywords)
             output += tmp
     else:
         output[...] = input[...]
@@ -358,7 +733,8 @@ def generic_laplace(input, derivative2, output = None, mode = "reflect",
 
 
 @docfiller
-def laplace(input, output = None, mode = "reflect", cval = 0.0):
+def laplace(input, output = None, mode = "reflect", cval = 0.0,
+            workers = None, axes = None):
     """Calculate a multidimensional laplace filter using an estimation
     for the second derivative based on differences.
 
@@ -368,15 +744,26 @@ def laplace(input, output = None, mode = "reflect", cval = 0.0):
     %(output)s
     %(mode)s
     %(cval)s
+    %(workers)s
+    %(axes)s
     """
+    input = numpy.asarray(input)
+    output, return_value = _ni_support._get_output(output, input)
+    axes = _ni_support._check_axes(axes, input.ndim)
+    workers = _ni_support._get_workers(workers, default_workers)
+    terms = [[(axis, 'correlate', [1, -2, 1], 0)] for axis in axes]
+    if _fused_derivatives(input, output, terms, mode, cval, workers, False):
+        return return_value
     def derivative2(input, axis, output, mode, cval):
-        return correlate1d(input, [1, -2, 1], axis, output, mode, cval, 0)
-    return generic_laplace(input, derivative2, output, mode, cval)
+        return correlate1d(input, [1, -2, 1], axis, output, mode, cval, 0,
+                           workers)
+    generic_laplace(input, derivative2, output, mode, cval, axes = axes)
+    return return_value
 
 
 @docfiller
 def gaussian_laplace(input, sigma, output = None, mode = "reflect",
-                     cval = 0.0):
+                     cval = 0.0, workers = None, axes = None):
     """Calculate a multidimensional laplace filter using gaussian
     second derivatives.
 
@@ -390,20 +777,31 @@ def gaussian_laplace(input, sigma, output = None, mode = "reflect",
     %(output)s
     %(mode)s
     %(cval)s
+    %(workers)s
+    %(axes)s
     """
     input = numpy.asarray(input)
+    output, return_value = _ni_support._get_output(output, input)
+    axes = _ni_support._check_axes(axes, input.ndim)
+    sigma = _ni_support._expand_sequence(sigma, axes, input.ndim, 0.0)
+    workers = _ni_support._get_workers(workers, default_workers)
+    terms = _gaussian_derivative_terms(sigma, axes, 2)
+    if _fused_derivatives(input, output, terms, mode, cval, workers, False):
+        return return_value
     def derivative2(input, axis, output, mode, cval, sigma):
         order = [0] * input.ndim
         order[axis] = 2
-        return gaussian_filter(input, sigma, order, output, mode, cval)
-    return generic_laplace(input, derivative2, output, mode, cval,
-                           extra_arguments = (sigma,))
+        return gaussian_filter(input, sigma, order, output, mode, cval,
+                               workers=workers)
+    generic_laplace(input, derivative2, output, mode, cval,
+                    extra_arguments = (sigma,), axes = axes)
+    return return_value
 
 
 @docfiller
 def generic_gradient_magnitude(input, derivative, output = None,
                 mode = "reflect", cval = 0.0,
-                extra_arguments = (), extra_keywords = None):
+                extra_arguments = (), extra_keywords = None, axes = None):
     """Calculate a gradient magnitude using the provided function for
     the gradient.
 
@@ -424,22 +822,41 @@ def generic_gradient_magnitude(input, derivative, output = None,
     %(cval)s
     %(extra_keywords)s
     %(extra_arguments)s
+    %(axes)s
     """
     if extra_keywords is None:
         extra_keywords = {}
     input = numpy.asarray(input)
     output, return_value = _ni_support._get_output(output, input)
-    axes = list(range(input.ndim))
+    axes = list(_ni_support._check_axes(axes, input.ndim))
+    # the derivative of sobel and prewitt is taken before smoothing, which
+    # can only be reordered if the borders are not filled with cval:
+    if (derivative in (sobel, prewitt) and not extra_arguments and
+        not extra_keywords and mode != 'constant'):
+        smooth = [1, 2, 1] if derivative is sobel else [1, 1, 1]
+        terms = [[(ii, 'correlate', [-1, 0, 1] if ii == axis else smooth, 0)
+                  for ii in range(input.ndim)] for axis in axes]
+        workers = _ni_support._get_workers(None, default_workers)
+        if _fused_derivatives(input, output, terms, mode, cval, workers,
+                              True):
+            return return_value
     if len(axes) > 0:
         derivative(input, axes[0], output, mode, cval,
                    *extra_arguments, **extra_keywords)
         numpy.multiply(output, output, output)
+        if len(axes) > 1:
+            tmp = numpy.empty(output.shape, output.dtype)
         for ii in range(1, len(axes)):
-            tmp = derivative(input, axes[ii], output.dtype, mode, cval,
-                             *extra_arguments, **extra_keywords)
+            derivative(input, axes[ii], tmp, mode, cval,
+                       *extra_arguments, **extra_keywords)
             numpy.multiply(tmp, tmp, tmp)
             output += tmp
-        numpy.sqrt(output, output)
+        if output.dtype.kind in 'biu':
+            # the root of an integer output is taken in floating point,
+            # and truncated as the fused filters do:
+            output[...] = numpy.sqrt(output, dtype=numpy.float64)
+        else:
+            numpy.sqrt(output, output)
     else:
         output[...] = input[...]
     return return_value
@@ -447,7 +864,7 @@ def generic_gradient_magnitude(input, derivative, output = None,
 
 @docfiller
 def gaussian_gradient_magnitude(input, sigma, output = None,
-                mode = "reflect", cval = 0.0):
+                mode = "reflect", cval = 0.0, workers = None, axes = None):
     """Calculate a multidimensional gradient magnitude using gaussian
     derivatives.
 
@@ -461,23 +878,557 @@ def gaussian_gradient_magnitude(input, sigma, output = None,
     %(output)s
     %(mode)s
     %(cval)s
+    %(workers)s
+    %(axes)s
     """
     input = numpy.asarray(input)
+    output, return_value = _ni_support._get_output(output, input)
+    axes = _ni_support._check_axes(axes, input.ndim)
+    sigma = _ni_support._expand_sequence(sigma, axes, input.ndim, 0.0)
+    workers = _ni_support._get_workers(workers, default_workers)
+    terms = _gaussian_derivative_terms(sigma, axes, 1)
+    if _fused_derivatives(input, output, terms, mode, cval, workers, True):
+        return return_value
     def derivative(input, axis, output, mode, cval, sigma):
         order = [0] * input.ndim
         order[axis] = 1
-        return gaussian_filter(input, sigma, order, output, mode, cval)
-    return generic_gradient_magnitude(input, derivative, output, mode,
-                            cval, extra_arguments = (sigma,))
+        return gaussian_filter(input, sigma, order, output, mode, cval,
+                               workers=workers)
+    generic_gradient_magnitude(input, derivative, output, mode, cval,
+                               extra_arguments = (sigma,), axes = axes)
+    return return_value
+
+
+def _gaussian_bank(input, sigmas, orders, outputs, mode, cval, method,
+                   workers, precision):
+    """Calculate the Gaussian filters of the given orders into the
+    corresponding outputs, sharing the passes along the leading axes
+    between orders that agree on those axes.
+    """
+    axes = [ii for ii in range(input.ndim) if sigmas[ii] > 1e-15]
+    if _ni_support._get_single(precision):
+        dtype = numpy.float32
+        tiled = False
+    else:
+        dtype = numpy.float64
+        tiled = method == 'direct'
+
+    def group_orders(members, axis):
+        groups = []
+        for ii in members:
+            for group in groups:
+                if orders[group[0]][axis] == orders[ii][axis]:
+                    group.append(ii)
+                    break
+            else:
+                groups.append([ii])
+        return groups
+
+    def cost(members, depth):
+        # the cost, in passes through the array, of sharing the pass along
+        # this axis, and of applying the remaining passes tile by tile:
+        if depth == len(axes):
+            return 0.0, False
+        groups = group_orders(members, axes[depth])
+        shared = len(groups) + sum([cost(group, depth + 1)[0]
+                                    for group in groups])
+        remaining = len(axes) - depth
+        if tiled and remaining > 1:
+            separate = len(members) * _TILED_PASS_COST * remaining
+            if separate <= shared:
+                return separate, True
+        return shared, False
+
+    def bank(data, depth, members):
+        if depth == len(axes):
+            for ii in members:
+                outputs[ii][...] = data
+            return
+        if cost(members, depth)[1]:
+            for ii in members:
+                passes = [(aa, 'correlate',
+                           _gaussian_kernel1d(sigmas[aa], orders[ii][aa]), 0)
+                          for aa in axes[depth:]]
+                if not _separable_filter(data, outputs[ii], passes, mode,
+                                         cval, workers):
+                    break
+            else:
+                return
+        axis = axes[depth]
+        for group in group_orders(members, axis):
+            order = orders[group[0]][axis]
+            if depth == len(axes) - 1:
+                # the last pass is stored in the outputs directly:
+                gaussian_filter1d(data, sigmas[axis], axis, order,
+                                  outputs[group[0]], mode, cval, method,
+                                  workers, precision)
+                for ii in group[1:]:
+                    outputs[ii][...] = outputs[group[0]]
+            else:
+                tmp = gaussian_filter1d(data, sigmas[axis], axis, order,
+                                        dtype, mode, cval, method, workers,
+                                        precision)
+                bank(tmp, depth + 1, group)
+
+    bank(input, 0, list(range(len(orders))))
+
+
+@docfiller
+def gaussian_filter_bank(input, sigma, orders, output = None,
+                         mode = "reflect", cval = 0.0, method = "direct",
+                         workers = None, precision = None):
+    """Calculate several Gaussian filters of different orders at once.
+
+    Parameters
+    ----------
+    %(input)s
+    sigma : scalar or sequence of scalars
+        The standard deviations of the Gaussian filter are given for
+        each axis as a sequence, or as a single number, in which case
+        it is equal for all axes.
+    orders : sequence
+        The orders of the filters to calculate. Each is given as for
+        `gaussian_filter`, as a sequence of integers in 0..3 with one
+        element for each axis, or as a single number.
+    output : array or dtype, optional
+        The array of shape ``(len(orders),) + input.shape`` in which to
+        place the stacked results, or its dtype. By default, the output
+        is of the input type if that is a floating point type, and of
+        type float64 otherwise.
+    %(mode)s
+    %(cval)s
+    method : {'direct', 'recursive'}, optional
+        The ``method`` parameter selects the implementation of the
+        one-dimensional filters, see `gaussian_filter1d`. Default is
+        'direct'.
+    %(workers)s
+    %(precision)s
+
+    Notes
+    -----
+    The filters are applied along one axis at a time, in order. Filters
+    whose orders are the same along the leading axes share the passes
+    along those axes, so that, for instance, the smoothed image, its
+    gradient and its Hessian take fewer passes than if each was
+    calculated with `gaussian_filter`. The intermediate results are
+    stored in double precision, or in single precision if that is
+    selected.
+    """
+    input = numpy.asarray(input)
+    if numpy.iscomplexobj(input):
+        raise TypeError('Complex type not supported')
+    orders = [_ni_support._normalize_sequence(order, input.ndim)
+              for order in orders]
+    if len(orders) == 0:
+        raise RuntimeError('no filter orders provided')
+    for order in orders:
+        if not set(order).issubset(set(range(4))):
+            raise ValueError('Order outside 0..3 not implemented')
+    if output is None and input.dtype.kind != 'f':
+        output = numpy.float64
+    output, return_value = _ni_support._get_output(
+        output, input, shape=(len(orders),) + input.shape)
+    workers = _ni_support._get_workers(workers, default_workers)
+    sigmas = _ni_support._normalize_sequence(sigma, input.ndim)
+    _gaussian_bank(input, sigmas, orders, list(output), mode, cval, method,
+                   workers, precision)
+    return return_value
+
+
+def _symmetric_output(output, input):
+    """Return the output of a symmetric matrix valued filter, of shape
+    ``(input.ndim, input.ndim) + input.shape``.
+    """
+    if output is None and input.dtype.kind != 'f':
+        output = numpy.float64
+    return _ni_support._get_output(output, input,
+                                   shape=(input.ndim,) * 2 + input.shape)
+
+
+@docfiller
+def hessian(input, sigma, output = None, mode = "reflect", cval = 0.0,
+            method = "direct", workers = None, precision = None):
+    """Calculate the Hessian matrix using Gaussian second derivatives.
+
+    Parameters
+    ----------
+    %(input)s
+    sigma : scalar or sequence of scalars
+        The standard deviations of the Gaussian filter are given for
+        each axis as a sequence, or as a single number, in which case
+        it is equal for all axes.
+    output : array or dtype, optional
+        The array of shape ``(input.ndim, input.ndim) + input.shape`` in
+        which to place the output, or its dtype. By default, the output
+        is of the input type if that is a floating point type, and of
+        type float64 otherwise.
+    %(mode)s
+    %(cval)s
+    method : {'direct', 'recursive'}, optional
+        The ``method`` parameter selects the implementation of the
+        one-dimensional filters, see `gaussian_filter1d`. Default is
+        'direct'.
+    %(workers)s
+    %(precision)s
+
+    Notes
+    -----
+    The element ``[i, j]`` of the output holds the second derivative
+    along axes ``i`` and ``j``. The components are calculated with
+    `gaussian_filter_bank`, and the matrix is symmetric.
+    """
+    input = numpy.asarray(input)
+    if numpy.iscomplexobj(input):
+        raise TypeError('Complex type not supported')
+    output, return_value = _symmetric_output(output, input)
+    workers = _ni_support._get_workers(workers, default_workers)
+    sigmas = _ni_support._normalize_sequence(sigma, input.ndim)
+    pairs = [(ii, jj) for ii in range(input.ndim)
+             for jj in range(ii, input.ndim)]
+    orders = []
+    for ii, jj in pairs:
+        order = [0] * input.ndim
+        order[ii] += 1
+        order[jj] += 1
+        orders.append(order)
+    if len(orders) > 0:
+        _gaussian_bank(input, sigmas, orders,
+                       [output[ii, jj] for ii, jj in pairs], mode, cval,
+                       method, workers, precision)
+    for ii, jj in pairs:
+        if ii != jj:
+            output[jj, ii] = output[ii, jj]
+    return return_value
+
+
+@docfiller
+def structure_tensor(input, sigma, rho, output = None, mode = "reflect",
+                     cval = 0.0, method = "direct", workers = None,
+                     precision = None):
+    """Calculate the structure tensor using Gaussian derivatives.
+
+    Parameters
+    ----------
+    %(input)s
+    sigma : scalar or sequence of scalars
+        The standard deviations of the Gaussian derivative filters that
+        calculate the gradient, for each axis or for all axes.
+    rho : scalar or sequence of scalars
+        The standard deviations of the Gaussian filter that integrates
+        the products of the gradient components, for each axis or for all
+        axes.
+    output : array or dtype, optional
+        The array of shape ``(input.ndim, input.ndim) + input.shape`` in
+        which to place the output, or its dtype. By default, the output
+        is of the input type if that is a floating point type, and of
+        type float64 otherwise.
+    %(mode)s
+    %(cval)s
+    method : {'direct', 'recursive'}, optional
+        The ``method`` parameter selects the implementation of the
+        one-dimensional filters, see `gaussian_filter1d`. Default is
+        'direct'.
+    %(workers)s
+    %(precision)s
+
+    Notes
+    -----
+    The element ``[i, j]`` of the output holds the product of the
+    gradient components along axes ``i`` and ``j``, smoothed with a
+    Gaussian of standard deviation `rho`. The gradient is calculated
+    with `gaussian_filter_bank`, and the matrix is symmetric.
+    """
+    input = numpy.asarray(input)
+    if numpy.iscomplexobj(input):
+        raise TypeError('Complex type not supported')
+    output, return_value = _symmetric_output(output, input)
+    workers = _ni_support._get_workers(workers, default_workers)
+    sigmas = _ni_support._normalize_sequence(sigma, input.ndim)
+    if input.ndim == 0:
+        return return_value
+    orders = []
+    for ii in range(input.ndim):
+        order = [0] * input.ndim
+        order[ii] = 1
+        orders.append(order)
+    if _ni_support._get_single(precision):
+        dtype = numpy.float32
+    else:
+        dtype = numpy.float64
+    gradient = numpy.zeros((input.ndim,) + input.shape, dtype=dtype)
+    _gaussian_bank(input, sigmas, orders, list(gradient), mode, cval,
+                   method, workers, precision)
+    for ii in range(input.ndim):
+        for jj in range(ii, input.ndim):
+            gaussian_filter(gradient[ii] * gradient[jj], rho,
+                            output=output[ii, jj], mode=mode, cval=cval,
+                            method=method, workers=workers,
+                            precision=precision)
+            if ii != jj:
+                output[jj, ii] = output[ii, jj]
+    return return_value
+
+
+# maximum number of elements of the FFT tiles used by correlate and
+# convolve, which bounds the memory used by the FFT method:
+_FFT_TILE_SIZE = 1 << 20
+
+
+def _next_fast_length(n):
+    """Return the smallest length of at least n that has no prime factors
+    larger than 5, for which FFTs are efficient.
+    """
+    best = 2 * n
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            length = p35
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            p35 *= 3
+        p5 *= 5
+    return max(best, 1)
+
+
+def _extend_indices(start, stop, length, mode):
+    """Map the coordinates start..stop-1 along an axis of the given length
+    onto the array according to the boundary mode. Coordinates that lie
+    outside in constant mode are mapped onto -1.
+    """
+    idx = numpy.arange(start, stop)
+    if mode == 'constant':
+        idx[(idx < 0) | (idx >= length)] = -1
+    elif length <= 1:
+        idx[:] = 0
+    elif mode == 'nearest':
+        idx = idx.clip(0, length - 1)
+    elif mode == 'wrap':
+        idx = idx % length
+    elif mode == 'reflect':
+        idx = idx % (2 * length)
+        idx = numpy.where(idx < length, idx, 2 * length - 1 - idx)
+    elif mode == 'mirror':
+        idx = idx % (2 * length - 2)
+        idx = numpy.where(idx < length, idx, 2 * length - 2 - idx)
+    return idx
+
+
+def _fft_tile_shape(shape, wshape):
+    """Return the shape of the output tiles and of the FFTs used to
+    correlate an array of the given shape with a kernel of shape wshape.
+    """
+    tile = list(shape)
+    while True:
+        size = 1
+        for tt, ww in zip(tile, wshape):
+            size *= tt + ww - 1
+        largest = numpy.argmax(tile)
+        if size <= _FFT_TILE_SIZE or tile[largest] <= 1:
+            break
+        tile[largest] = (tile[largest] + 1) // 2
+    fshape = [_next_fast_length(tt + ww - 1) for tt, ww in zip(tile, wshape)]
+    tile = [min(ff - ww + 1, ss) for ff, ww, ss in zip(fshape, wshape, shape)]
+    return tile, fshape
+
+
+def _fft_cost(input, weights):
+    """Return the estimated cost of correlating with the FFT method, in
+    units of multiply-adds of the direct method.
+    """
+    tile, fshape = _fft_tile_shape(input.shape, weights.shape)
+    ntiles = 1
+    for ss, tt in zip(input.shape, tile):
+        ntiles *= -(-ss // tt)
+    fsize = numpy.prod(fshape, dtype=numpy.float64)
+    # a forward and an inverse transform per tile:
+    return 5.0 * ntiles * fsize * (math.log(fsize, 2) + 1)
+
+
+def _separable_kernels(weights, tol, threshold=None):
+    """Decompose weights into a sum of outer products of one-dimensional
+    kernels, by recursive singular value decompositions of its unfoldings
+    along the first axis. Singular values below tol times the largest one
+    are ignored. Returns a list of terms, each a list of one-dimensional
+    kernels for all axes.
+    """
+    if weights.ndim == 1:
+        return [[weights]]
+    u, s, vt = numpy.linalg.svd(weights.reshape(weights.shape[0], -1),
+                                full_matrices=False)
+    if threshold is None:
+        threshold = tol * s[0]
+    terms = []
+    for ii in range(len(s)):
+        if s[ii] <= threshold:
+            break
+        rest = (s[ii] * vt[ii]).reshape(weights.shape[1:])
+        for term in _separable_kernels(rest, tol, threshold):
+            terms.append([numpy.ascontiguousarray(u[:, ii])] + term)
+    return terms
+
+
+def _choose_method(input, weights, dtype, tol):
+    """Return the fastest method to correlate input with weights, and the
+    separable decomposition of the weights if that method is chosen.
+    Non-finite input values would spread over whole tiles or lines with
+    the other methods, so the direct method is chosen for such input.
+    """
+    if (numpy.dtype(dtype).kind != 'f' or input.size == 0 or
+        input.ndim == 0):
+        return 'direct', None
+    if input.dtype.kind == 'f' and not numpy.isfinite(input).all():
+        return 'direct', None
+    # a multiply-add per non-zero weight for each element:
+    costs = {'direct': input.size * numpy.count_nonzero(
+        numpy.abs(weights) > numpy.finfo(numpy.float64).eps)}
+    costs['fft'] = _fft_cost(input, weights)
+    terms = None
+    if weights.ndim > 1:
+        terms = _separable_kernels(weights, tol)
+        # one pass for each axis and term, with some overhead per pass:
+        costs['separable'] = input.size * len(terms) * sum(
+            [len(ww) + 12 for ww in terms[0]])
+    method = min(costs, key=costs.get)
+    return method, terms if method == 'separable' else None
+
+
+def choose_correlate_method(input, weights, output = None, tol = 1e-10):
+    """
+    Return the method that correlate and convolve choose in 'auto' mode.
+
+    Parameters
+    ----------
+    input : array-like
+        input array to filter
+    weights : ndarray
+        array of weights, same number of dimensions as input
+    output : array or dtype, optional
+        The output array or its type, the input type by default.
+    tol : float, optional
+        Relative tolerance on the singular values of the weights used to
+        detect separable kernels. Default is 1e-10.
+
+    Returns
+    -------
+    method : {'direct', 'fft', 'separable'}
+        The method that is expected to be fastest. This is always
+        'direct' if the input contains NaN or infinite values, since the
+        other methods would spread these to other elements.
+
+    """
+    input = numpy.asarray(input)
+    weights = numpy.asarray(weights, dtype=numpy.float64)
+    if output is None:
+        dtype = input.dtype
+    elif isinstance(output, numpy.ndarray):
+        dtype = output.dtype
+    else:
+        dtype = numpy.dtype(output)
+    return _choose_method(input, weights, dtype, tol)[0]
+
+
+def _snap_to_integers(result, tolerance):
+    """Remove rounding errors of results that should be integers, before
+    they are truncated into an integer output as the direct method does.
+    """
+    rounded = numpy.round(result)
+    close = numpy.abs(result - rounded) <= tolerance
+    result[close] = rounded[close]
+
+
+def _integer_tolerance(input, weights, cval):
+    """Return the rounding error below which results are snapped to
+    integers, relative to the largest magnitude of a result.
+    """
+    largest = numpy.abs(input).max() if input.size else 0.0
+    return 1e-10 * numpy.abs(weights).sum() * max(largest, abs(cval), 1.0)
+
+
+def _correlate_fft(input, weights, output, mode, cval, origins):
+    """Correlate using FFTs of overlapping tiles (overlap-save). The tiles
+    are taken from the input extended according to the boundary mode, so
+    that the result matches the direct method up to rounding errors.
+    """
+    wshape = weights.shape
+    tile, fshape = _fft_tile_shape(input.shape, wshape)
+    flipped = weights[tuple([slice(None, None, -1)] * weights.ndim)]
+    wfft = numpy.fft.rfftn(flipped, fshape)
+    if output.dtype.kind in 'biu':
+        tolerance = _integer_tolerance(input, weights, cval)
+    for start in numpy.ndindex(*[-(-ss // tt) for ss, tt
+                                 in zip(input.shape, tile)]):
+        start = [ii * tt for ii, tt in zip(start, tile)]
+        stop = [min(ii + tt, ss) for ii, tt, ss
+                in zip(start, tile, input.shape)]
+        # take the tile and the borders needed by the kernel from the
+        # extended input, without copying more than the tile:
+        indices = []
+        for axis in range(input.ndim):
+            orgn = wshape[axis] // 2 + origins[axis]
+            indices.append(_extend_indices(start[axis] - orgn,
+                                           stop[axis] - orgn +
+                                           wshape[axis] - 1,
+                                           input.shape[axis], mode))
+        data = numpy.asarray(input[numpy.ix_(*[idx.clip(0) for idx
+                                               in indices])],
+                             dtype=numpy.float64)
+        if mode == 'constant':
+            for axis, idx in enumerate(indices):
+                outside = [slice(None)] * input.ndim
+                outside[axis] = idx < 0
+                data[tuple(outside)] = cval
+        result = numpy.fft.irfftn(numpy.fft.rfftn(data, fshape) * wfft,
+                                  fshape)
+        result = result[tuple([slice(ww - 1, ww - 1 + ee - ss) for
+                               ww, ss, ee in zip(wshape, start, stop)])]
+        if output.dtype.kind in 'biu':
+            _snap_to_integers(result, tolerance)
+        output[tuple([slice(ss, ee) for ss, ee in zip(start, stop)])] = result
+
+
+def _correlate_separable(input, weights, terms, output, mode, cval,
+                         origins, workers):
+    """Correlate with a sum of separable kernels, by one-dimensional
+    correlations along each axis. In constant mode, cval is subtracted
+    from the input first, so that the passes can extend the intermediate
+    results with zeros.
+    """
+    data = numpy.asarray(input, dtype=numpy.float64)
+    if mode == 'constant' and cval != 0.0:
+        data = data - cval
+    code = _ni_support._extend_mode_to_code(mode)
+    result = numpy.zeros(input.shape, dtype=numpy.float64)
+    tmp1 = numpy.zeros(input.shape, dtype=numpy.float64)
+    tmp2 = numpy.zeros(input.shape, dtype=numpy.float64)
+    for term in terms:
+        source = data
+        for axis in range(input.ndim):
+            _nd_image.correlate1d(source, term[axis], axis, tmp1, code, 0.0,
+                                  origins[axis], workers)
+            source = tmp1
+            tmp1, tmp2 = tmp2, tmp1
+        result += source
+    if mode == 'constant' and cval != 0.0:
+        result += cval * weights.sum()
+    if output.dtype.kind in 'biu':
+        _snap_to_integers(result, _integer_tolerance(input, weights, cval))
+    output[...] = result
 
 
 def _correlate_or_convolve(input, weights, output, mode, cval, origin,
-                           convolution):
+                           convolution, method='direct', tol=1e-10,
+                           workers=None, axes=None):
     input = numpy.asarray(input)
     if numpy.iscomplexobj(int):
         raise TypeError('Complex type not supported')
-    origins = _ni_support._normalize_sequence(origin, input.ndim)
+    if method not in ('direct', 'fft', 'separable', 'auto'):
+        raise RuntimeError('correlation method not supported')
+    axes = _ni_support._check_axes(axes, input.ndim)
+    origins = _ni_support._expand_sequence(origin, axes, input.ndim, 0)
     weights = numpy.asarray(weights, dtype=numpy.float64)
+    weights = _ni_support._expand_footprint(weights, axes, input.ndim)
     wshape = [ii for ii in weights.shape if ii > 0]
     if len(wshape) != input.ndim:
         raise RuntimeError('filter weights array has incorrect shape.')
@@ -493,14 +1444,28 @@ def _correlate_or_convolve(input, weights, output, mode, cval, origin,
     if not weights.flags.contiguous:
         weights = weights.copy()
     output, return_value = _ni_support._get_output(output, input)
-    mode = _ni_support._extend_mode_to_code(mode)
-    _nd_image.correlate(input, weights, output, mode, cval, origins)
+    workers = _ni_support._get_workers(workers, default_workers)
+    code = _ni_support._extend_mode_to_code(mode)
+    terms = None
+    if method == 'auto':
+        method, terms = _choose_method(input, weights, output.dtype, tol)
+    elif method == 'separable' and input.ndim > 1:
+        terms = _separable_kernels(weights, tol)
+    if method == 'fft' and input.size > 0 and input.ndim > 0:
+        _correlate_fft(input, weights, output, mode, cval, origins)
+    elif terms:
+        _correlate_separable(input, weights, terms, output, mode, cval,
+                             origins, workers)
+    else:
+        _nd_image.correlate(input, weights, output, code, cval, origins,
+                            workers)
     return return_value
 
 
 @docfiller
 def correlate(input, weights, output = None, mode = 'reflect', cval = 0.0,
-              origin = 0):
+              origin = 0, method = 'direct', tol = 1e-10, workers = None,
+              axes = None):
     """
     Multi-dimensional correlation.
 
@@ -525,19 +1490,39 @@ def correlate(input, weights, output = None, mode = 'reflect', cval = 0.0,
     origin : scalar, optional
         The ``origin`` parameter controls the placement of the filter.
         Default 0
+    method : {'direct', 'fft', 'separable', 'auto'}, optional
+        The ``method`` parameter selects how the correlation is
+        calculated. 'direct' sums the weighted neighbours of each
+        element, 'fft' multiplies Fourier transforms of tiles of the
+        input, which is much faster for large kernels, 'separable'
+        decomposes the weights into a sum of outer products of
+        one-dimensional kernels, that are applied along each axis in
+        turn, and 'auto' chooses the method that is expected to be
+        fastest, see `choose_correlate_method`. The 'fft' and
+        'separable' methods agree with 'direct' up to rounding errors.
+        'auto' only deviates from 'direct' for floating point output,
+        and uses 'direct' if the input contains NaN or infinite values.
+        Default is 'direct'.
+    tol : float, optional
+        Relative tolerance on the singular values of the weights, used
+        to find the separable decomposition. Default is 1e-10.
+    %(workers)s
+    %(axes)s
 
     See Also
     --------
     convolve : Convolve an image with a kernel.
+    choose_correlate_method : Method chosen in 'auto' mode.
 
     """
     return _correlate_or_convolve(input, weights, output, mode, cval,
-                                  origin, False)
+                                  origin, False, method, tol, workers, axes)
 
 
 @docfiller
 def convolve(input, weights, output = None, mode = 'reflect', cval = 0.0,
-             origin = 0):
+             origin = 0, method = 'direct', tol = 1e-10, workers = None,
+             axes = None):
     """
     Multi-dimensional convolution.
 
@@ -562,6 +1547,14 @@ def convolve(input, weights, output = None, mode = 'reflect', cval = 0.0,
     origin : scalar, optional
         The `origin` parameter controls the placement of the filter.
         Default is 0.
+    method : {'direct', 'fft', 'separable', 'auto'}, optional
+        The `method` parameter selects how the convolution is
+        calculated, see `correlate`. Default is 'direct'.
+    tol : float, optional
+        Relative tolerance on the singular values of the weights, used
+        to find the separable decomposition. Default is 1e-10.
+    %(workers)s
+    %(axes)s
 
     Returns
     -------
@@ -645,12 +1638,13 @@ def convolve(input, weights, output = None, mode = 'reflect', cval = 0.0,
 
     """
     return _correlate_or_convolve(input, weights, output, mode, cval,
-                                  origin, True)
+                                  origin, True, method, tol, workers, axes)
 
 
 @docfiller
 def uniform_filter1d(input, size, axis = -1, output = None,
-                     mode = "reflect", cval = 0.0, origin = 0):
+                     mode = "reflect", cval = 0.0, origin = 0,
+                     workers = None, precision = None, buffer_size = None):
     """Calculate a one-dimensional uniform filter along the given axis.
 
     The lines of the array along the given axis are filtered with a
@@ -666,6 +1660,9 @@ def uniform_filter1d(input, size, axis = -1, output = None,
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(precision)s
+    %(buffer_size)s
     """
     input = numpy.asarray(input)
     if numpy.iscomplexobj(input):
@@ -677,14 +1674,20 @@ def uniform_filter1d(input, size, axis = -1, output = None,
     if (size // 2 + origin < 0) or (size // 2 + origin > size):
         raise ValueError('invalid origin')
     mode = _ni_support._extend_mode_to_code(mode)
+    workers = _ni_support._get_workers(workers, default_workers)
+    single = _ni_support._get_single(precision)
+    buffer_size = _ni_support._get_buffer_size(buffer_size,
+                                               default_buffer_size)
     _nd_image.uniform_filter1d(input, size, axis, output, mode, cval,
-                               origin)
+                               origin, workers, single, buffer_size)
     return return_value
 
 
 @docfiller
 def uniform_filter(input, size = 3, output = None, mode = "reflect",
-                   cval = 0.0, origin = 0):
+                   cval = 0.0, origin = 0, workers = None, precision = None,
+                   mask = None, nan_policy = "propagate",
+                   return_weights = False, axes = None):
     """Multi-dimensional uniform filter.
 
     Parameters
@@ -698,6 +1701,14 @@ def uniform_filter(input, size = 3, output = None, mode = "reflect",
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(precision)s
+        In single precision, the filter is applied along one axis at a
+        time.
+    %(mask)s
+    %(nan_policy)s
+    %(return_weights)s
+    %(axes)s
 
     Notes
     -----
@@ -708,16 +1719,31 @@ def uniform_filter(input, size = 3, output = None, mode = "reflect",
     intermediate results may be stored with insufficient precision.
     """
     input = numpy.asarray(input)
-    output, return_value = _ni_support._get_output(output, input)
-    sizes = _ni_support._normalize_sequence(size, input.ndim)
-    origins = _ni_support._normalize_sequence(origin, input.ndim)
+    axes = _ni_support._check_axes(axes, input.ndim)
+    sizes = _ni_support._expand_sequence(size, axes, input.ndim, 1)
+    origins = _ni_support._expand_sequence(origin, axes, input.ndim, 0)
     axes = list(range(input.ndim))
     axes = [(axes[ii], sizes[ii], origins[ii])
                            for ii in range(len(axes)) if sizes[ii] > 1]
+    if _normalized(mask, nan_policy, return_weights):
+        passes = [(axis, [1.0 / size] * int(size), origin)
+                  for axis, size, origin in axes]
+        return _normalized_filter(input, passes, output, mask, nan_policy,
+                                  return_weights, mode, cval, workers, None)
+    output, return_value = _ni_support._get_output(output, input)
+    workers = _ni_support._get_workers(workers, default_workers)
+    # the running sums restart at each tile, and may round differently,
+    # which would change integer results:
+    if (not numpy.iscomplexobj(input) and output.dtype.kind == 'f' and
+        not _ni_support._get_single(precision)):
+        passes = [(axis, 'uniform', [1.0] * int(size), origin)
+                  for axis, size, origin in axes]
+        if _separable_filter(input, output, passes, mode, cval, workers):
+            return return_value
     if len(axes) > 0:
         for axis, size, origin in axes:
             uniform_filter1d(input, int(size), axis, output, mode,
-                             cval, origin)
+                             cval, origin, workers, precision)
             input = output
     else:
         output[...] = input[...]
@@ -726,7 +1752,8 @@ def uniform_filter(input, size = 3, output = None, mode = "reflect",
 
 @docfiller
 def minimum_filter1d(input, size, axis = -1, output = None,
-                     mode = "reflect", cval = 0.0, origin = 0):
+                     mode = "reflect", cval = 0.0, origin = 0,
+                     workers = None, precision = None, buffer_size = None):
     """Calculate a one-dimensional minimum filter along the given axis.
 
     The lines of the array along the given axis are filtered with a
@@ -742,6 +1769,9 @@ def minimum_filter1d(input, size, axis = -1, output = None,
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(precision)s
+    %(buffer_size)s
     """
     input = numpy.asarray(input)
     if numpy.iscomplexobj(input):
@@ -753,14 +1783,19 @@ def minimum_filter1d(input, size, axis = -1, output = None,
     if (size // 2 + origin < 0) or (size // 2 + origin > size):
         raise ValueError('invalid origin')
     mode = _ni_support._extend_mode_to_code(mode)
+    workers = _ni_support._get_workers(workers, default_workers)
+    single = _ni_support._get_single(precision)
+    buffer_size = _ni_support._get_buffer_size(buffer_size,
+                                               default_buffer_size)
     _nd_image.min_or_max_filter1d(input, size, axis, output, mode, cval,
-                                  origin, 1)
+                                  origin, 1, workers, single, buffer_size)
     return return_value
 
 
 @docfiller
 def maximum_filter1d(input, size, axis = -1, output = None,
-                     mode = "reflect", cval = 0.0, origin = 0):
+                     mode = "reflect", cval = 0.0, origin = 0,
+                     workers = None, precision = None, buffer_size = None):
     """Calculate a one-dimensional maximum filter along the given axis.
 
     The lines of the array along the given axis are filtered with a
@@ -776,6 +1811,9 @@ def maximum_filter1d(input, size, axis = -1, output = None,
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(precision)s
+    %(buffer_size)s
     """
     input = numpy.asarray(input)
     if numpy.iscomplexobj(input):
@@ -787,13 +1825,80 @@ def maximum_filter1d(input, size, axis = -1, output = None,
     if (size // 2 + origin < 0) or (size // 2 + origin > size):
         raise ValueError('invalid origin')
     mode = _ni_support._extend_mode_to_code(mode)
+    workers = _ni_support._get_workers(workers, default_workers)
+    single = _ni_support._get_single(precision)
+    buffer_size = _ni_support._get_buffer_size(buffer_size,
+                                               default_buffer_size)
     _nd_image.min_or_max_filter1d(input, size, axis, output, mode, cval,
-                                  origin, 0)
+                                  origin, 0, workers, single, buffer_size)
     return return_value
 
 
+def tune_buffer_size(shape = (256, 8192), sizes = None, repeat = 3):
+    """Time one-dimensional filters with a range of line buffer sizes,
+    and make the fastest the default.
+
+    The filters are applied along both axes of a float64 array of the
+    given shape, which should resemble the images to be filtered, with
+    ``default_workers`` threads. The fastest size is stored in
+    ``default_buffer_size``, where it applies to all later calls without
+    a ``buffer_size`` argument. To keep it across sessions, assign the
+    returned value to ``default_buffer_size`` at startup.
+
+    Parameters
+    ----------
+    shape : tuple of ints, optional
+        The shape of the test array. Default is (256, 8192).
+    sizes : sequence of ints, optional
+        The buffer sizes in bytes to try. Default is the powers of two
+        from 32 KiB up to 16 MiB, and the size derived from the caches.
+    repeat : int, optional
+        The number of timings of each size, of which the fastest is
+        used. Default is 3.
+
+    Returns
+    -------
+    buffer_size : int
+        The fastest buffer size.
+    """
+    global default_buffer_size
+    import timeit
+    if sizes is None:
+        sizes = [1 << ii for ii in range(15, 25)]
+        sizes.append(_nd_image.cache_buffer_size())
+    data = numpy.random.random(shape)
+    output = numpy.empty_like(data)
+    weights = numpy.ones(9) / 9.0
+    timings = []
+    for size in sorted(set(sizes)):
+        best = None
+        for ii in range(repeat):
+            start = timeit.default_timer()
+            for axis in range(data.ndim):
+                correlate1d(data, weights, axis, output, buffer_size=size)
+                minimum_filter1d(data, 9, axis, output, buffer_size=size)
+            elapsed = timeit.default_timer() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        timings.append((best, size))
+    default_buffer_size = min(timings)[1]
+    return default_buffer_size
+
+
 def _min_or_max_filter(input, size, footprint, structure, output, mode,
-                       cval, origin, minimum):
+                       cval, origin, minimum, workers=None, precision=None,
+                       axes=None):
+    input = numpy.asarray(input)
+    axes = _ni_support._check_axes(axes, input.ndim)
+    if structure is not None:
+        structure = _ni_support._expand_footprint(structure, axes,
+                                                  input.ndim)
+    if footprint is not None:
+        footprint = _ni_support._expand_footprint(footprint, axes,
+                                                  input.ndim)
+    elif size is not None:
+        size = _ni_support._expand_sequence(size, axes, input.ndim, 1)
+    origin = _ni_support._expand_sequence(origin, axes, input.ndim, 0)
     if structure is None:
         if footprint is None:
             if size is None:
@@ -820,6 +1925,7 @@ def _min_or_max_filter(input, size, footprint, structure, output, mode,
     if numpy.iscomplexobj(input):
         raise TypeError('Complex type not supported')
     output, return_value = _ni_support._get_output(output, input)
+    workers = _ni_support._get_workers(workers, default_workers)
     origins = _ni_support._normalize_sequence(origin, input.ndim)
     if separable:
         sizes = _ni_support._normalize_sequence(size, input.ndim)
@@ -830,9 +1936,16 @@ def _min_or_max_filter(input, size, footprint, structure, output, mode,
             filter_ = minimum_filter1d
         else:
             filter_ = maximum_filter1d
+        passes = [(axis, 'minimum' if minimum else 'maximum',
+                   [1.0] * int(size), origin)
+                  for axis, size, origin in axes]
+        if (not _ni_support._get_single(precision) and
+            _separable_filter(input, output, passes, mode, cval, workers)):
+            return return_value
         if len(axes) > 0:
             for axis, size, origin in axes:
-                filter_(input, int(size), axis, output, mode, cval, origin)
+                filter_(input, int(size), axis, output, mode, cval, origin,
+                        workers, precision)
                 input = output
         else:
             output[...] = input[...]
@@ -852,13 +1965,14 @@ def _min_or_max_filter(input, size, footprint, structure, output, mode,
                 structure = structure.copy()
         mode = _ni_support._extend_mode_to_code(mode)
         _nd_image.min_or_max_filter(input, footprint, structure, output,
-                                    mode, cval, origins, minimum)
+                                    mode, cval, origins, minimum, workers)
     return return_value
 
 
 @docfiller
 def minimum_filter(input, size = None, footprint = None, output = None,
-      mode = "reflect", cval = 0.0, origin = 0):
+      mode = "reflect", cval = 0.0, origin = 0, workers = None,
+      precision = None, axes = None):
     """Calculates a multi-dimensional minimum filter.
 
     Parameters
@@ -869,14 +1983,20 @@ def minimum_filter(input, size = None, footprint = None, output = None,
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(precision)s
+        It applies if the footprint is a box, in which case the filter
+        is applied along one axis at a time in single precision.
+    %(axes)s
     """
     return _min_or_max_filter(input, size, footprint, None, output, mode,
-                              cval, origin, 1)
+                              cval, origin, 1, workers, precision, axes)
 
 
 @docfiller
 def maximum_filter(input, size = None, footprint = None, output = None,
-      mode = "reflect", cval = 0.0, origin = 0):
+      mode = "reflect", cval = 0.0, origin = 0, workers = None,
+      precision = None, axes = None):
     """Calculates a multi-dimensional maximum filter.
 
     Parameters
@@ -887,25 +2007,34 @@ def maximum_filter(input, size = None, footprint = None, output = None,
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(precision)s
+        It applies if the footprint is a box, in which case the filter
+        is applied along one axis at a time in single precision.
+    %(axes)s
     """
     return _min_or_max_filter(input, size, footprint, None, output, mode,
-                              cval, origin, 0)
+                              cval, origin, 0, workers, precision, axes)
 
 
 @docfiller
 def _rank_filter(input, rank, size = None, footprint = None, output = None,
-     mode = "reflect", cval = 0.0, origin = 0, operation = 'rank'):
+     mode = "reflect", cval = 0.0, origin = 0, operation = 'rank',
+     workers = None, axes = None):
     input = numpy.asarray(input)
     if numpy.iscomplexobj(input):
         raise TypeError('Complex type not supported')
-    origins = _ni_support._normalize_sequence(origin, input.ndim)
+    axes = _ni_support._check_axes(axes, input.ndim)
+    origins = _ni_support._expand_sequence(origin, axes, input.ndim, 0)
     if footprint is None:
         if size is None:
             raise RuntimeError("no footprint or filter size provided")
-        sizes = _ni_support._normalize_sequence(size, input.ndim)
+        sizes = _ni_support._expand_sequence(size, axes, input.ndim, 1)
         footprint = numpy.ones(sizes, dtype=bool)
     else:
         footprint = numpy.asarray(footprint, dtype=bool)
+        footprint = _ni_support._expand_footprint(footprint, axes,
+                                                  input.ndim)
     fshape = [ii for ii in footprint.shape if ii > 0]
     if len(fshape) != input.ndim:
         raise RuntimeError('filter footprint array has incorrect shape.')
@@ -915,60 +2044,104 @@ def _rank_filter(input, rank, size = None, footprint = None, output = None,
     if not footprint.flags.contiguous:
         footprint = footprint.copy()
     filter_size = numpy.where(footprint, 1, 0).sum()
-    if operation == 'median':
-        rank = filter_size // 2
-    elif operation == 'percentile':
-        percentile = rank
-        if percentile < 0.0:
-            percentile += 100.0
-        if percentile < 0 or percentile > 100:
-            raise RuntimeError('invalid percentile')
-        if percentile == 100.0:
-            rank = filter_size - 1
-        else:
-            rank = int(float(filter_size) * percentile / 100.0)
-    if rank < 0:
-        rank += filter_size
-    if rank < 0  or rank >= filter_size:
-        raise RuntimeError('rank not within filter footprint size')
-    if rank == 0:
+    stacked = numpy.ndim(rank) > 0
+    ranks = []
+    for rank in numpy.atleast_1d(rank):
+        if operation == 'median':
+            rank = filter_size // 2
+        elif operation == 'percentile':
+            percentile = rank
+            if percentile < 0.0:
+                percentile += 100.0
+            if percentile < 0 or percentile > 100:
+                raise RuntimeError('invalid percentile')
+            if percentile == 100.0:
+                rank = filter_size - 1
+            else:
+                rank = int(float(filter_size) * percentile / 100.0)
+        rank = int(rank)
+        if rank < 0:
+            rank += filter_size
+        if rank < 0  or rank >= filter_size:
+            raise RuntimeError('rank not within filter footprint size')
+        ranks.append(rank)
+    if not stacked and ranks[0] == 0:
         return minimum_filter(input, None, footprint, output, mode, cval,
-                              origin)
-    elif rank == filter_size - 1:
+                              origins, workers)
+    elif not stacked and ranks[0] == filter_size - 1:
         return maximum_filter(input, None, footprint, output, mode, cval,
-                              origin)
+                              origins, workers)
+    if stacked:
+        shape = (len(ranks),) + input.shape
     else:
-        output, return_value = _ni_support._get_output(output, input)
-        mode = _ni_support._extend_mode_to_code(mode)
-        _nd_image.rank_filter(input, rank, footprint, output, mode, cval,
-                              origins)
-        return return_value
+        shape = input.shape
+    output, return_value = _ni_support._get_output(output, input,
+                                                   shape=shape)
+    if output.shape != shape:
+        raise RuntimeError('output shape not correct')
+    middle = []
+    if stacked:
+        # the extreme ranks are filtered separately, as for a single rank:
+        for kk, rank in enumerate(ranks):
+            if rank == 0:
+                minimum_filter(input, None, footprint, output[kk], mode,
+                               cval, origins, workers)
+            elif rank == filter_size - 1:
+                maximum_filter(input, None, footprint, output[kk], mode,
+                               cval, origins, workers)
+            else:
+                middle.append(kk)
+    workers = _ni_support._get_workers(workers, default_workers)
+    mode = _ni_support._extend_mode_to_code(mode)
+    ranks = numpy.asarray(ranks, dtype=numpy.intp)
+    steps = set(numpy.diff(middle))
+    if stacked and len(middle) > 0 and len(steps) <= 1:
+        # the ranks are selected together, each stored at its offset
+        # along the first axis of the output:
+        step = steps.pop() if steps else 0
+        _nd_image.rank_filter(input, ranks[middle], footprint,
+                              output[middle[0]], mode, cval, origins,
+                              workers, step * output.strides[0])
+    elif stacked and len(middle) > 0:
+        selected = numpy.zeros((len(middle),) + input.shape, output.dtype)
+        _nd_image.rank_filter(input, ranks[middle], footprint, selected[0],
+                              mode, cval, origins, workers,
+                              selected.strides[0])
+        output[middle] = selected
+    elif not stacked:
+        _nd_image.rank_filter(input, ranks, footprint, output, mode, cval,
+                              origins, workers)
+    return return_value
 
 
 @docfiller
 def rank_filter(input, rank, size = None, footprint = None, output = None,
-      mode = "reflect", cval = 0.0, origin = 0):
+      mode = "reflect", cval = 0.0, origin = 0, workers = None, axes = None):
     """Calculates a multi-dimensional rank filter.
 
     Parameters
     ----------
     %(input)s
-    rank : integer
+    rank : integer or sequence of integers
         The rank parameter may be less then zero, i.e., rank = -1
-        indicates the largest element.
+        indicates the largest element. If a sequence is given, all ranks
+        are selected from each neighbourhood at once, and the filtered
+        arrays are stacked along a new first axis of the output.
     %(size_foot)s
     %(output)s
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(axes)s
     """
     return _rank_filter(input, rank, size, footprint, output, mode, cval,
-                        origin, 'rank')
+                        origin, 'rank', workers, axes)
 
 
 @docfiller
 def median_filter(input, size = None, footprint = None, output = None,
-      mode = "reflect", cval = 0.0, origin = 0):
+      mode = "reflect", cval = 0.0, origin = 0, workers = None, axes = None):
     """
     Calculates a multi-dimensional median filter.
 
@@ -1002,37 +2175,46 @@ def median_filter(input, size = None, footprint = None, output = None,
     origin : scalar, optional
         The ``origin`` parameter controls the placement of the filter.
         Default 0
+    %(workers)s
+    %(axes)s
 
     """
     return _rank_filter(input, 0, size, footprint, output, mode, cval,
-                        origin, 'median')
+                        origin, 'median', workers, axes)
 
 
 @docfiller
 def percentile_filter(input, percentile, size = None, footprint = None,
-                 output = None, mode = "reflect", cval = 0.0, origin = 0):
+                 output = None, mode = "reflect", cval = 0.0, origin = 0,
+                 workers = None, axes = None):
     """Calculates a multi-dimensional percentile filter.
 
     Parameters
     ----------
     %(input)s
-    percentile : scalar
+    percentile : scalar or sequence of scalars
         The percentile parameter may be less then zero, i.e.,
-        percentile = -20 equals percentile = 80
+        percentile = -20 equals percentile = 80. If a sequence is given,
+        all percentiles are selected from each neighbourhood at once, and
+        the filtered arrays are stacked along a new first axis of the
+        output.
     %(size_foot)s
     %(output)s
     %(mode)s
     %(cval)s
     %(origin)s
+    %(workers)s
+    %(axes)s
     """
     return _rank_filter(input, percentile, size, footprint, output, mode,
-                                   cval, origin, 'percentile')
+                                   cval, origin, 'percentile', workers, axes)
 
 
 @docfiller
 def generic_filter1d(input, function, filter_size, axis = -1,
                  output = None, mode = "reflect", cval = 0.0, origin = 0,
-                 extra_arguments = (), extra_keywords = None):
+                 extra_arguments = (), extra_keywords = None,
+                 buffer_size = None, user_data = None):
     """Calculate a one-dimensional filter along the given axis.
 
     generic_filter1d iterates over the lines of the array, calling the
@@ -1046,7 +2228,17 @@ def generic_filter1d(input, function, filter_size, axis = -1,
     ----------
     %(input)s
     function : callable
-        function to apply along given axis
+        function to apply along given axis. It can also be a compiled
+        function, given as a ctypes or cffi function pointer, or as a
+        PyCapsule, with the signature::
+
+            int function(double *input_line, npy_intp input_length,
+                         double *output_line, npy_intp output_length,
+                         void *user_data)
+
+        It returns 1 on success or 0 on failure. A ctypes or cffi
+        function is called without the GIL, whereas a PyCapsule is called
+        holding it, so that it can use the Python C-API.
     filter_size : scalar
         length of the filter
     %(axis)s
@@ -1056,13 +2248,19 @@ def generic_filter1d(input, function, filter_size, axis = -1,
     %(origin)s
     %(extra_arguments)s
     %(extra_keywords)s
+    %(buffer_size)s
+    %(user_data)s
     """
     if extra_keywords is None:
         extra_keywords = {}
+    function, user_data = _ni_support._get_callback(function, user_data,
+                                                    True)
     input = numpy.asarray(input)
     if numpy.iscomplexobj(input):
         raise TypeError('Complex type not supported')
     output, return_value = _ni_support._get_output(output, input)
+    buffer_size = _ni_support._get_buffer_size(buffer_size,
+                                               default_buffer_size)
     if filter_size < 1:
         raise RuntimeError('invalid filter size')
     axis = _ni_support._check_axis(axis, input.ndim)
@@ -1071,25 +2269,44 @@ def generic_filter1d(input, function, filter_size, axis = -1,
         raise ValueError('invalid origin')
     mode = _ni_support._extend_mode_to_code(mode)
     _nd_image.generic_filter1d(input, function, filter_size, axis, output,
-                      mode, cval, origin, extra_arguments, extra_keywords)
+                      mode, cval, origin, extra_arguments, extra_keywords,
+                      buffer_size, user_data)
     return return_value
 
 
 @docfiller
 def generic_filter(input, function, size = None, footprint = None,
                    output = None, mode = "reflect", cval = 0.0, origin = 0,
-                   extra_arguments = (), extra_keywords = None):
+                   extra_arguments = (), extra_keywords = None,
+                   user_data = None, vectorized = False, chunk_size = None,
+                   axes = None):
     """Calculates a multi-dimensional filter using the given function.
 
     At each element the provided function is called. The input values
     within the filter footprint at that element are passed to the function
     as a 1D array of double values.
 
+    In vectorized mode the function is instead called once for each block
+    of up to `chunk_size` elements, with a 2D array of shape
+    ``(npix, footprint_size)`` that holds the input values within the
+    footprint of each element in its rows. It must return ``npix`` values,
+    one for each row, which allows functions such as ``numpy.median`` to
+    be applied along ``axis=1`` to a whole block at once.
+
     Parameters
     ----------
     %(input)s
     function : callable
-        function to apply at each element
+        function to apply at each element. It can also be a compiled
+        function, given as a ctypes or cffi function pointer, or as a
+        PyCapsule, with the signature::
+
+            int function(double *buffer, npy_intp filter_size,
+                         double *return_value, void *user_data)
+
+        It returns 1 on success or 0 on failure. A ctypes or cffi
+        function is called without the GIL, whereas a PyCapsule is called
+        holding it, so that it can use the Python C-API.
     %(size_foot)s
     %(output)s
     %(mode)s
@@ -1097,21 +2314,38 @@ def generic_filter(input, function, size = None, footprint = None,
     %(origin)s
     %(extra_arguments)s
     %(extra_keywords)s
+    %(user_data)s
+    vectorized : bool, optional
+        If True, the function is a Python function that is called with
+        blocks of neighbourhoods, as described above. Default is False.
+    chunk_size : int, optional
+        The maximum number of elements in a block in vectorized mode. By
+        default, blocks hold about 2**18 input values.
+    %(axes)s
     """
     if extra_keywords is None:
         extra_keywords = {}
+    if vectorized:
+        if user_data is not None or not callable(function):
+            raise RuntimeError(
+                'vectorized mode requires a Python function')
+    else:
+        function, user_data = _ni_support._get_callback(function, user_data)
     input = numpy.asarray(input)
     if numpy.iscomplexobj(input):
         raise TypeError('Complex type not supported')
-    origins = _ni_support._normalize_sequence(origin, input.ndim)
+    axes = _ni_support._check_axes(axes, input.ndim)
+    origins = _ni_support._expand_sequence(origin, axes, input.ndim, 0)
     if footprint is None:
         if size is None:
             raise RuntimeError("no footprint or filter size provided")
-        sizes = _ni_support._normalize_sequence(size, input.ndim)
+        sizes = _ni_support._expand_sequence(size, axes, input.ndim, 1)
         footprint = numpy.ones(sizes, dtype=bool)
     else:
         footprint = numpy.asarray(footprint)
         footprint = footprint.astype(bool)
+        footprint = _ni_support._expand_footprint(footprint, axes,
+                                                  input.ndim)
     fshape = [ii for ii in footprint.shape if ii > 0]
     if len(fshape) != input.ndim:
         raise RuntimeError('filter footprint array has incorrect shape.')
@@ -1122,6 +2356,14 @@ def generic_filter(input, function, size = None, footprint = None,
         footprint = footprint.copy()
     output, return_value = _ni_support._get_output(output, input)
     mode = _ni_support._extend_mode_to_code(mode)
+    if vectorized:
+        if chunk_size is None:
+            chunk_size = max(2**18 // max(footprint.sum(), 1), 1)
+        elif chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+    else:
+        chunk_size = 0
     _nd_image.generic_filter(input, function, footprint, output, mode,
-                         cval, origins, extra_arguments, extra_keywords)
+                         cval, origins, extra_arguments, extra_keywords,
+                         user_data, int(chunk_size))
     return return_value
@@ -33,12 +33,14 @@ import math
 import numpy
 from . import _ni_support
 from . import _nd_image
+from . import filters
 
 def _extend_mode_to_code(mode):
     mode = _ni_support._extend_mode_to_code(mode)
     return mode
 
-def spline_filter1d(input, order=3, axis=-1, output=numpy.float64):
+def spline_filter1d(input, order=3, axis=-1, output=numpy.float64,
+                    precision=None, buffer_size=None, workers=None):
     """
     Calculates a one-dimensional spline filter along the given axis.
 
@@ -57,6 +59,19 @@ def spline_filter1d(input, order=3, axis=-1, output=numpy.float64):
     output : ndarray or dtype, optional
         The array in which to place the output, or the dtype of the returned
         array. Default is `numpy.float64`.
+    precision : {None, 'single', 'double'}, optional
+        The precision in which the lines are buffered and filtered. In
+        single precision, half the memory is moved, while the sums of the
+        recursive filter are accumulated in double precision. Default is
+        None, which selects double precision.
+    buffer_size : int, optional
+        The size in bytes of the buffer holding the lines being filtered.
+        Default is `filters.default_buffer_size`, which is None to derive
+        the size from the caches of the processor.
+    workers : int, optional
+        The number of threads used to filter the lines, or -1 to use
+        one thread per processor. The result does not depend on the number
+        of threads. Default is ``filters.default_workers``, which is 1.
 
     Returns
     -------
@@ -75,15 +90,22 @@ def spline_filter1d(input, order=3, axis=-1, output=numpy.float64):
         output[...] = numpy.array(input)
     else:
         axis = _ni_support._check_axis(axis, input.ndim)
-        _nd_image.spline_filter1d(input, order, axis, output)
+        single = _ni_support._get_single(precision)
+        buffer_size = _ni_support._get_buffer_size(
+            buffer_size, filters.default_buffer_size)
+        workers = _ni_support._get_workers(workers, filters.default_workers)
+        _nd_image.spline_filter1d(input, order, axis, output, single,
+                                  buffer_size, workers)
     return return_value
 
 
-def spline_filter(input, order=3, output = numpy.float64):
+def spline_filter(input, order=3, output = numpy.float64, precision=None,
+                  buffer_size=None, axes=None, workers=None):
     """
     Multi-dimensional spline filter.
 
-    For more details, see `spline_filter1d`.
+    For more details, see `spline_filter1d`. The filter is applied along
+    the given `axes`, by default along all axes.
 
     See Also
     --------
@@ -104,18 +126,50 @@ def spline_filter(input, order=3, output = numpy.float64):
     if numpy.iscomplexobj(input):
         raise TypeError('Complex type not supported')
     output, return_value = _ni_support._get_output(output, input)
-    if order not in [0, 1] and input.ndim > 0:
-        for axis in range(input.ndim):
-            spline_filter1d(input, order, axis, output = output)
+    axes = _ni_support._check_axes(axes, input.ndim)
+    if order not in [0, 1] and len(axes) > 0:
+        for axis in axes:
+            spline_filter1d(input, order, axis, output = output,
+                            precision = precision, buffer_size = buffer_size,
+                            workers = workers)
             input = output
     else:
         output[...] = input[...]
     return return_value
 
+# the number of output points of which geometric_transform passes the
+# coordinates to a batch mapping at once:
+_BATCH_SIZE = 2 ** 16
+
+def _batch_transform(input, mapping, output, order, mode, cval,
+                     extra_arguments, extra_keywords, workers):
+    """Transform the input into the output in blocks of rows of the output,
+    mapping the coordinates of all points of a block with one call.
+    """
+    shape = output.shape
+    row = int(numpy.prod(shape[1:], dtype = numpy.intp))
+    rows = max(1, _BATCH_SIZE // max(row, 1))
+    orders = [order] * input.ndim
+    for start in range(0, shape[0], rows):
+        block = output[start:start + rows]
+        coordinates = numpy.indices(block.shape, dtype = numpy.float64)
+        coordinates[0] += start
+        coordinates = mapping(coordinates.reshape(output.ndim, -1),
+                              *extra_arguments, **extra_keywords)
+        coordinates = numpy.asarray(coordinates, dtype = numpy.float64)
+        if coordinates.shape != (input.ndim, block.size):
+            raise RuntimeError('mapping must return an array of shape '
+                               '(input rank, number of points)')
+        coordinates = coordinates.reshape((input.ndim,) + block.shape)
+        _nd_image.geometric_transform(input, None, coordinates, None, None,
+                                      block, orders, mode, cval, None, None,
+                                      workers)
+
 def geometric_transform(input, mapping, output_shape=None,
                         output=None, order=3,
                         mode='constant', cval=0.0, prefilter=True,
-                        extra_arguments=(), extra_keywords={}):
+                        extra_arguments=(), extra_keywords={}, workers=None,
+                        batch=False):
     """
     Apply an arbritrary geometric transform.
 
@@ -128,10 +182,12 @@ def geometric_transform(input, mapping, output_shape=None,
     ----------
     input : array_like
         The input array.
-    mapping : callable
+    mapping : callable or mapping
         A callable object that accepts a tuple of length equal to the output
         array rank, and returns the corresponding input coordinates as a tuple
-        of length equal to the input array rank.
+        of length equal to the input array rank. Alternatively, a mapping
+        returned by `polynomial_mapping` or `grid_mapping`, which is
+        evaluated in the transform loop, without calls into Python.
     output_shape : tuple of ints
         Shape tuple.
     output : ndarray or dtype, optional
@@ -156,6 +212,21 @@ def geometric_transform(input, mapping, output_shape=None,
         Extra arguments passed to `mapping`.
     extra_keywords : dict, optional
         Extra keywords passed to `mapping`.
+    workers : int, optional
+        The number of threads used to calculate the output, or -1 to use
+        one thread per processor. The result does not depend on the number
+        of threads. Default is ``filters.default_workers``, which is 1.
+        A Python `mapping`, or a PyCapsule other than the mappings of
+        `polynomial_mapping` and `grid_mapping`, is always called from a
+        single thread, holding the GIL.
+    batch : bool, optional
+        If True, `mapping` is called for blocks of output points at once.
+        It accepts an array of shape ``(output rank, n)`` of the coordinates
+        of n output points, and returns the corresponding input coordinates
+        as an array of shape ``(input rank, n)``, such that a vectorized
+        mapping is called a few times, instead of once per point. The
+        mappings of `polynomial_mapping` and `grid_mapping` cannot be
+        batched. Default is False.
 
     Returns
     -------
@@ -165,7 +236,8 @@ def geometric_transform(input, mapping, output_shape=None,
 
     See Also
     --------
-    map_coordinates, affine_transform, spline_filter1d
+    map_coordinates, affine_transform, spline_filter1d, polynomial_mapping,
+    grid_mapping
 
     Examples
     --------
@@ -179,6 +251,14 @@ def geometric_transform(input, mapping, output_shape=None,
            [ 0.   ,  4.812,  6.187],
            [ 0.   ,  8.263,  9.637]])
 
+    The same shift by a mapping of arrays of coordinates:
+
+    >>> sp.ndimage.geometric_transform(a, lambda c: c - 0.5, batch=True)
+    array([[ 0.   ,  0.   ,  0.   ],
+           [ 0.   ,  1.362,  2.738],
+           [ 0.   ,  4.812,  6.187],
+           [ 0.   ,  8.263,  9.637]])
+
     """
     if order < 0 or order > 5:
         raise RuntimeError('spline order not supported')
@@ -189,20 +269,167 @@ def geometric_transform(input, mapping, output_shape=None,
         output_shape = input.shape
     if input.ndim < 1 or len(output_shape) < 1:
         raise RuntimeError('input and output rank must be > 0')
+    if batch and not callable(mapping):
+        raise RuntimeError('a batch mapping must be callable')
     mode = _extend_mode_to_code(mode)
     if prefilter and order > 1:
-        filtered = spline_filter(input, order, output = numpy.float64)
+        filtered = spline_filter(input, order, output = numpy.float64,
+                                 workers = workers)
     else:
         filtered = input
     output, return_value = _ni_support._get_output(output, input,
                                                    shape=output_shape)
-    _nd_image.geometric_transform(filtered, mapping, None, None, None,
-               output, order, mode, cval, extra_arguments, extra_keywords)
+    workers = _ni_support._get_workers(workers, filters.default_workers)
+    if batch:
+        _batch_transform(filtered, mapping, output, order, mode, cval,
+                         extra_arguments, extra_keywords, workers)
+    else:
+        _nd_image.geometric_transform(filtered, mapping, None, None, None,
+                   output, [order] * input.ndim, mode, cval, extra_arguments,
+                   extra_keywords, workers)
     return return_value
 
 
+def polynomial_mapping(coefficients, exponents, origin=0.0):
+    """
+    A polynomial mapping of output to input coordinates.
+
+    The mapping is evaluated by `geometric_transform` in its transform
+    loop, for all output points, without calls into Python, and with the
+    given number of threads.
+
+    Parameters
+    ----------
+    coefficients : array_like
+        Array of shape ``(input rank, n)`` of the coefficients of the n terms
+        of the polynomial of each input coordinate.
+    exponents : array_like
+        Array of shape ``(n, output rank)`` of the non-negative integer
+        exponents of the output coordinates in each term.
+    origin : float or sequence, optional
+        The output coordinates at which the polynomials are centered, given
+        as a single value, or as a value for each output axis. Default is
+        0.0.
+
+    Returns
+    -------
+    mapping : PyCapsule
+        The mapping, to pass as the `mapping` of `geometric_transform`.
+
+    See Also
+    --------
+    geometric_transform, grid_mapping
+
+    Examples
+    --------
+    A shear, shifting the second axis by half of the first coordinate:
+
+    >>> a = np.arange(12.).reshape((4, 3))
+    >>> coefficients = [[1., 0.], [0.5, 1.]]
+    >>> exponents = [[1, 0], [0, 1]]
+    >>> mapping = sp.ndimage.polynomial_mapping(coefficients, exponents)
+    >>> sp.ndimage.geometric_transform(a, mapping, order=1)
+    array([[  0. ,   1. ,   2. ],
+           [  3.5,   4.5,   0. ],
+           [  7. ,   8. ,   0. ],
+           [ 10.5,   0. ,   0. ]])
+
+    """
+    coefficients = numpy.asarray(coefficients, dtype=numpy.float64)
+    exponents = numpy.asarray(exponents)
+    if coefficients.ndim != 2 or exponents.ndim != 2:
+        raise RuntimeError('coefficients and exponents must be 2-D')
+    if coefficients.shape[1] != exponents.shape[0]:
+        raise RuntimeError('coefficients and exponents have different '
+                           'numbers of terms')
+    if exponents.size > 0:
+        if exponents.dtype.kind not in 'iu':
+            raise ValueError('exponents must be integers')
+        if exponents.min() < 0:
+            raise ValueError('exponents must be non-negative')
+    exponents = numpy.ascontiguousarray(exponents, dtype=numpy.intp)
+    origin = _ni_support._normalize_sequence(origin, exponents.shape[1])
+    origin = numpy.asarray(origin, dtype=numpy.float64)
+    return _nd_image.polynomial_mapping(
+                            numpy.ascontiguousarray(coefficients), exponents,
+                            origin)
+
+
+def grid_mapping(grid, spacing=1.0, origin=0.0, order=1):
+    """
+    A mapping that interpolates input coordinates from a grid.
+
+    The input coordinates of a sparse grid of output points are
+    interpolated to each output point by spline interpolation, which is of
+    order 1 (bilinear) by default. Beyond the grid, the grid is extended
+    linearly, with the slope between the grid points at its edges. The
+    mapping is evaluated by `geometric_transform` in its transform loop,
+    for all output points, without calls into Python, and with the given
+    number of threads.
+
+    Parameters
+    ----------
+    grid : array_like
+        Array of shape ``(input rank,) + grid shape``, of the input
+        coordinates at the grid points, with a grid axis for each output
+        axis.
+    spacing : float or sequence, optional
+        The distance between the grid points along each output axis. Default
+        is 1.0.
+    origin : float or sequence, optional
+        The output coordinates of the first grid point. Default is 0.0.
+    order : int, optional
+        The order of the spline interpolation of the grid, in the range 1-5.
+        Default is 1.
+
+    Returns
+    -------
+    mapping : PyCapsule
+        The mapping, to pass as the `mapping` of `geometric_transform`.
+
+    See Also
+    --------
+    geometric_transform, polynomial_mapping
+
+    Examples
+    --------
+    The identity mapping, by a grid of the corners of the array:
+
+    >>> a = np.arange(12.).reshape((4, 3))
+    >>> grid = np.mgrid[0:4:3, 0:3:2].astype(float)
+    >>> mapping = sp.ndimage.grid_mapping(grid, spacing=(3, 2))
+    >>> sp.ndimage.geometric_transform(a, mapping, order=1)
+    array([[  0.,   1.,   2.],
+           [  3.,   4.,   5.],
+           [  6.,   7.,   8.],
+           [  9.,  10.,  11.]])
+
+    """
+    if order < 1 or order > 5:
+        raise RuntimeError('spline order not supported')
+    grid = numpy.asarray(grid)
+    if numpy.iscomplexobj(grid):
+        raise TypeError('Complex type not supported')
+    if grid.ndim < 2:
+        raise RuntimeError('grid rank must be > 1')
+    if grid.size < 1:
+        raise RuntimeError('grid must not be empty')
+    rank = grid.ndim - 1
+    spacing = numpy.asarray(_ni_support._normalize_sequence(spacing, rank),
+                            dtype=numpy.float64)
+    if (spacing <= 0).any():
+        raise ValueError('spacing must be positive')
+    origin = numpy.asarray(_ni_support._normalize_sequence(origin, rank),
+                           dtype=numpy.float64)
+    grid = numpy.array(grid, dtype=numpy.float64)
+    if order > 1:
+        for coordinates in grid:
+            spline_filter(coordinates, order, output=coordinates)
+    return _nd_image.grid_mapping(grid, origin, spacing, order)
+
+
 def map_coordinates(input, coordinates, output=None, order=3,
-                    mode='constant', cval=0.0, prefilter=True):
+                    mode='constant', cval=0.0, prefilter=True, workers=None):
     """
     Map the input array to new coordinates by interpolation.
 
@@ -240,6 +467,10 @@ def map_coordinates(input, coordinates, output=None, order=3,
         `spline_filter` before interpolation (necessary for spline
         interpolation of order > 1).  If False, it is assumed that the input is
         already filtered. Default is True.
+    workers : int, optional
+        The number of threads used to calculate the output, or -1 to use
+        one thread per processor. The result does not depend on the number
+        of threads. Default is ``filters.default_workers``, which is 1.
 
     Returns
     -------
@@ -290,19 +521,21 @@ def map_coordinates(input, coordinates, output=None, order=3,
         raise RuntimeError('invalid shape for coordinate array')
     mode = _extend_mode_to_code(mode)
     if prefilter and order > 1:
-        filtered = spline_filter(input, order, output = numpy.float64)
+        filtered = spline_filter(input, order, output = numpy.float64,
+                                 workers = workers)
     else:
         filtered = input
     output, return_value = _ni_support._get_output(output, input,
                                                    shape=output_shape)
+    workers = _ni_support._get_workers(workers, filters.default_workers)
     _nd_image.geometric_transform(filtered, None, coordinates, None, None,
-               output, order, mode, cval, None, None)
+               output, [order] * input.ndim, mode, cval, None, None, workers)
     return return_value
 
 
 def affine_transform(input, matrix, offset=0.0, output_shape=None,
                      output=None, order=3,
-                     mode='constant', cval=0.0, prefilter=True):
+                     mode='constant', cval=0.0, prefilter=True, workers=None):
     """
     Apply an affine transformation.
 
@@ -346,6 +579,10 @@ def affine_transform(input, matrix, offset=0.0, output_shape=None,
         `spline_filter` before interpolation (necessary for spline
         interpolation of order > 1).  If False, it is assumed that the input is
         already filtered. Default is True.
+    workers : int, optional
+        The number of threads used to calculate the output, or -1 to use
+        one thread per processor. The result does not depend on the number
+        of threads. Default is ``filters.default_workers``, which is 1.
 
     Returns
     -------
@@ -365,11 +602,13 @@ def affine_transform(input, matrix, offset=0.0, output_shape=None,
         raise RuntimeError('input and output rank must be > 0')
     mode = _extend_mode_to_code(mode)
     if prefilter and order > 1:
-        filtered = spline_filter(input, order, output = numpy.float64)
+        filtered = spline_filter(input, order, output = numpy.float64,
+                                 workers = workers)
     else:
         filtered = input
     output, return_value = _ni_support._get_output(output, input,
                                                    shape=output_shape)
+    workers = _ni_support._get_workers(workers, filters.default_workers)
     matrix = numpy.asarray(matrix, dtype = numpy.float64)
     if matrix.ndim not in [1, 2] or matrix.shape[0] < 1:
         raise RuntimeError('no proper affine matrix provided')
@@ -386,16 +625,17 @@ def affine_transform(input, matrix, offset=0.0, output_shape=None,
     if not offset.flags.contiguous:
         offset = offset.copy()
     if matrix.ndim == 1:
-        _nd_image.zoom_shift(filtered, matrix, offset, output, order,
-                             mode, cval)
+        _nd_image.zoom_shift(filtered, matrix, offset, output,
+                             [order] * input.ndim, mode, cval, workers)
     else:
         _nd_image.geometric_transform(filtered, None, None, matrix, offset,
-                            output, order, mode, cval, None, None)
+                            output, [order] * input.ndim, mode, cval, None,
+                            None, workers)
     return return_value
 
 
 def shift(input, shift, output=None, order=3, mode='constant', cval=0.0,
-          prefilter=True):
+          prefilter=True, axes=None, workers=None):
     """
     Shift an array.
 
@@ -428,6 +668,14 @@ def shift(input, shift, output=None, order=3, mode='constant', cval=0.0,
         `spline_filter` before interpolation (necessary for spline
         interpolation of order > 1).  If False, it is assumed that the input is
         already filtered. Default is True.
+    axes : int or sequence of ints, optional
+        The axes along which to interpolate. The shift is given for these
+        axes only, and the other axes are batch axes, which are copied
+        through without interpolation. Default is None, for all axes.
+    workers : int, optional
+        The number of threads used to calculate the output, or -1 to use
+        one thread per processor. The result does not depend on the number
+        of threads. Default is ``filters.default_workers``, which is 1.
 
     Returns
     -------
@@ -444,22 +692,27 @@ def shift(input, shift, output=None, order=3, mode='constant', cval=0.0,
     if input.ndim < 1:
         raise RuntimeError('input and output rank must be > 0')
     mode = _extend_mode_to_code(mode)
+    axes = _ni_support._check_axes(axes, input.ndim)
     if prefilter and order > 1:
-        filtered = spline_filter(input, order, output = numpy.float64)
+        filtered = spline_filter(input, order, output = numpy.float64,
+                                 axes = axes, workers = workers)
     else:
         filtered = input
     output, return_value = _ni_support._get_output(output, input)
-    shift = _ni_support._normalize_sequence(shift, input.ndim)
+    shift = _ni_support._expand_sequence(shift, axes, input.ndim, 0.0)
     shift = [-ii for ii in shift]
     shift = numpy.asarray(shift, dtype = numpy.float64)
     if not shift.flags.contiguous:
         shift = shift.copy()
-    _nd_image.zoom_shift(filtered, None, shift, output, order, mode, cval)
+    orders = _ni_support._expand_sequence(order, axes, input.ndim, 0)
+    workers = _ni_support._get_workers(workers, filters.default_workers)
+    _nd_image.zoom_shift(filtered, None, shift, output, orders, mode, cval,
+                         workers)
     return return_value
 
 
 def zoom(input, zoom, output=None, order=3, mode='constant', cval=0.0,
-         prefilter=True):
+         prefilter=True, axes=None, workers=None):
     """
     Zoom an array.
 
@@ -490,6 +743,14 @@ def zoom(input, zoom, output=None, order=3, mode='constant', cval=0.0,
         `spline_filter` before interpolation (necessary for spline
         interpolation of order > 1).  If False, it is assumed that the input is
         already filtered. Default is True.
+    axes : int or sequence of ints, optional
+        The axes along which to interpolate. The zoom factor is given for these
+        axes only, and the other axes are batch axes, which are copied
+        through without interpolation. Default is None, for all axes.
+    workers : int, optional
+        The number of threads used to calculate the output, or -1 to use
+        one thread per processor. The result does not depend on the number
+        of threads. Default is ``filters.default_workers``, which is 1.
 
     Returns
     -------
@@ -506,18 +767,26 @@ def zoom(input, zoom, output=None, order=3, mode='constant', cval=0.0,
     if input.ndim < 1:
         raise RuntimeError('input and output rank must be > 0')
     mode = _extend_mode_to_code(mode)
+    axes = _ni_support._check_axes(axes, input.ndim)
     if prefilter and order > 1:
-        filtered = spline_filter(input, order, output = numpy.float64)
+        filtered = spline_filter(input, order, output = numpy.float64,
+                                 axes = axes, workers = workers)
     else:
         filtered = input
-    zoom = _ni_support._normalize_sequence(zoom, input.ndim)
+    zoom = _ni_support._expand_sequence(zoom, axes, input.ndim, 1)
     output_shape = tuple([int(ii * jj) for ii, jj in zip(input.shape, zoom)])
     zoom = (numpy.array(input.shape)-1)/(numpy.array(output_shape,float)-1)
+    for axis in range(input.ndim):
+        if axis not in axes:
+            zoom[axis] = 1.0
     output, return_value = _ni_support._get_output(output, input,
                                                    shape=output_shape)
     zoom = numpy.asarray(zoom, dtype = numpy.float64)
     zoom = numpy.ascontiguousarray(zoom)
-    _nd_image.zoom_shift(filtered, zoom, None, output, order, mode, cval)
+    orders = _ni_support._expand_sequence(order, axes, input.ndim, 0)
+    workers = _ni_support._get_workers(workers, filters.default_workers)
+    _nd_image.zoom_shift(filtered, zoom, None, output, orders, mode, cval,
+                         workers)
     return return_value
 
 def _minmax(coor, minc, maxc):
@@ -533,7 +802,7 @@ def _minmax(coor, minc, maxc):
 
 def rotate(input, angle, axes=(1, 0), reshape=True,
            output=None, order=3,
-           mode='constant', cval=0.0, prefilter=True):
+           mode='constant', cval=0.0, prefilter=True, workers=None):
     """
     Rotate an array.
 
@@ -570,6 +839,10 @@ def rotate(input, angle, axes=(1, 0), reshape=True,
         `spline_filter` before interpolation (necessary for spline
         interpolation of order > 1).  If False, it is assumed that the input is
         already filtered. Default is True.
+    workers : int, optional
+        The number of threads used to calculate the output, or -1 to use
+        one thread per processor. The result does not depend on the number
+        of threads. Default is ``filters.default_workers``, which is 1.
 
     Returns
     -------
@@ -630,31 +903,157 @@ def rotate(input, angle, axes=(1, 0), reshape=True,
                                                    shape=output_shape)
     if input.ndim <= 2:
         affine_transform(input, matrix, offset, output_shape, output,
-                         order, mode, cval, prefilter)
+                         order, mode, cval, prefilter, workers)
     else:
-        coordinates = []
-        size = numpy.product(input.shape,axis=0)
-        size //= input.shape[axes[0]]
-        size //= input.shape[axes[1]]
-        for ii in range(input.ndim):
-            if ii not in axes:
-                coordinates.append(0)
-            else:
-                coordinates.append(slice(None, None, None))
-        iter_axes = list(range(input.ndim))
-        iter_axes.reverse()
-        iter_axes.remove(axes[0])
-        iter_axes.remove(axes[1])
-        os = (output_shape[axes[0]], output_shape[axes[1]])
-        for ii in range(size):
-            ia = input[tuple(coordinates)]
-            oa = output[tuple(coordinates)]
-            affine_transform(ia, matrix, offset, os, oa, order, mode,
-                             cval, prefilter)
-            for jj in iter_axes:
-                if coordinates[jj] < input.shape[jj] - 1:
-                    coordinates[jj] += 1
-                    break
-                else:
-                    coordinates[jj] = 0
+        # all planes are rotated in one transformation, that interpolates
+        # along the axes of the plane only:
+        if order < 0 or order > 5:
+            raise RuntimeError('spline order not supported')
+        if numpy.iscomplexobj(input):
+            raise TypeError('Complex type not supported')
+        axes = list(axes)
+        transform = numpy.identity(rank, dtype = numpy.float64)
+        transform[numpy.ix_(axes, axes)] = matrix
+        offsets = numpy.zeros((rank,), dtype = numpy.float64)
+        offsets[axes] = offset
+        if prefilter and order > 1:
+            filtered = spline_filter(input, order, output = numpy.float64,
+                                     axes = axes, workers = workers)
+        else:
+            filtered = input
+        orders = _ni_support._expand_sequence(order, axes, rank, 0)
+        workers = _ni_support._get_workers(workers, filters.default_workers)
+        _nd_image.geometric_transform(filtered, None, None, transform, offsets,
+                                      output, orders,
+                                      _extend_mode_to_code(mode), cval, None,
+                                      None, workers)
     return return_value
+
+
+# the functions that the methods of SplineInterpolator are named after:
+_shift = shift
+_zoom = zoom
+
+
+class SplineInterpolator(object):
+    """
+    Spline interpolation of an array at many sets of coordinates.
+
+    The array is pre-filtered with `spline_filter` once, and the spline
+    coefficients are kept, such that repeated resampling of the array,
+    at coordinates or by a shift, zoom or affine transformation, costs
+    only the evaluation of the spline.
+
+    Parameters
+    ----------
+    input : array_like
+        The input array.
+    order : int, optional
+        The order of the spline interpolation, default is 3.
+        The order has to be in the range 0-5.
+    mode : str, optional
+        Points outside the boundaries of the input are filled according
+        to the given mode ('constant', 'nearest', 'reflect' or 'wrap').
+        Default is 'constant'.
+    cval : scalar, optional
+        Value used for points outside the boundaries of the input if
+        ``mode='constant'``. Default is 0.0
+    dtype : {numpy.float64, numpy.float32}, optional
+        The data type in which the coefficients are kept. Coefficients in
+        float32 take half the memory, at the cost of their precision.
+        Default is numpy.float64.
+    workers : int, optional
+        The number of threads used to prefilter the array and to
+        evaluate the spline, or -1 to use one thread per processor. The
+        result does not depend on the number of threads. Default is
+        ``filters.default_workers``, which is 1.
+
+    Notes
+    -----
+    The results equal those of `map_coordinates`, `shift`, `zoom` and
+    `affine_transform` with the same order, mode and cval, if the
+    coefficients are kept in float64. The output has the data type of
+    the input, unless another is given.
+
+    Examples
+    --------
+    >>> from stsci import ndimage
+    >>> a = np.arange(12.).reshape((4, 3))
+    >>> interpolator = ndimage.SplineInterpolator(a, order=1)
+    >>> interpolator([[0.5, 2], [0.5, 1]])
+    array([ 2.,  7.])
+    >>> interpolator.shift([1, 0], output=np.float64)[:, 0]
+    array([ 0.,  0.,  3.,  6.])
+
+    """
+
+    def __init__(self, input, order = 3, mode = 'constant', cval = 0.0,
+                 dtype = numpy.float64, workers = None):
+        if order < 0 or order > 5:
+            raise RuntimeError('spline order not supported')
+        input = numpy.asarray(input)
+        if numpy.iscomplexobj(input):
+            raise TypeError('Complex type not supported')
+        if input.ndim < 1:
+            raise RuntimeError('input and output rank must be > 0')
+        dtype = numpy.dtype(dtype)
+        if dtype not in (numpy.dtype(numpy.float32),
+                         numpy.dtype(numpy.float64)):
+            raise RuntimeError('coefficients must be float32 or float64')
+        if order > 1:
+            self.coefficients = spline_filter(input, order, output = dtype,
+                                              workers = workers)
+        else:
+            self.coefficients = numpy.array(input, dtype = dtype)
+        self.shape = input.shape
+        self.ndim = input.ndim
+        self.dtype = input.dtype
+        self.order = order
+        self.mode = mode
+        self.cval = cval
+        self.workers = workers
+
+    def _output(self, output):
+        return self.dtype if output is None else output
+
+    def __call__(self, coordinates, output = None):
+        """
+        Evaluate the spline at the given coordinates, which are given along
+        the first axis as for `map_coordinates`. A single point, given by
+        one coordinate per axis, is evaluated to a scalar.
+        """
+        coordinates = numpy.asarray(coordinates)
+        if coordinates.ndim == 1 and output is None:
+            result = map_coordinates(self.coefficients, coordinates[:, None],
+                                     self.dtype, self.order, self.mode,
+                                     self.cval, False, self.workers)
+            return result[0]
+        return map_coordinates(self.coefficients, coordinates,
+                               self._output(output), self.order, self.mode,
+                               self.cval, False, self.workers)
+
+    def shift(self, shift, output = None):
+        """
+        Shift the array, as `shift`.
+        """
+        return _shift(self.coefficients, shift, self._output(output),
+                      self.order, self.mode, self.cval, False,
+                      workers = self.workers)
+
+    def zoom(self, zoom, output = None):
+        """
+        Zoom the array, as `zoom`.
+        """
+        return _zoom(self.coefficients, zoom, self._output(output),
+                     self.order, self.mode, self.cval, False,
+                     workers = self.workers)
+
+    def affine(self, matrix, offset = 0.0, output_shape = None,
+               output = None):
+        """
+        Apply an affine transformation to the array, as `affine_transform`.
+        """
+        return affine_transform(self.coefficients, matrix, offset,
+                                output_shape, self._output(output),
+                                self.order, self.mode, self.cval, False,
+                                self.workers)
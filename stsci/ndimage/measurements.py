@@ -1148,3 +1148,198 @@ def watershed_ift(input, markers, structure = None, output = None):
     output, return_value = _ni_support._get_output(output, input)
     _nd_image.watershed_ift(input, markers, structure, output)
     return return_value
+
+# the largest sum of an integral image of integers:
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _largest(counts):
+    return int(counts.max()) if counts.size > 0 else 0
+
+
+def _finite_mean(values):
+    mean = values.mean() if values.size > 0 else 0.0
+    return mean if numpy.isfinite(mean) else 0.0
+
+
+class IntegralImage(object):
+    """
+    Summed area table of an n-D image array, for sums, means and variances
+    over many rectangular boxes.
+
+    The table is calculated once, after which the sum over any box takes
+    a constant time, independent of its size. Integer and boolean arrays
+    are summed exactly in 64-bit integers, after subtracting their
+    minimum, and so are their squares if these fit. Floating point
+    arrays, and squares that do not fit, are summed in double precision
+    with compensated summation, after subtracting the mean to limit the
+    loss of precision in the differences between the large values of the
+    table.
+
+    Parameters
+    ----------
+    input : array_like
+        Nd-image data to process.
+    squares : bool, optional
+        If True, also calculate a table of the squared values, which is
+        needed by `box_variance`. Default is False.
+
+    Raises
+    ------
+    ValueError
+        If the sums of an integer array, relative to its minimum, do not
+        fit in 64-bit integers.
+
+    Notes
+    -----
+    Boxes are given by arrays `lows` and `highs` of their lower (inclusive)
+    and upper (exclusive) corners, with the coordinates along the last
+    axis, so that a box covers ``input[lows[0]:highs[0], lows[1]:highs[1],
+    ...]``. The corners are clipped to the array, and the results have the
+    shape of the arrays of corners without their last axis.
+
+    Examples
+    --------
+    >>> a = np.arange(12).reshape(3, 4)
+    >>> from stsci import ndimage
+    >>> table = ndimage.IntegralImage(a, squares=True)
+    >>> table.box_sum([[0, 0], [1, 1]], [[2, 2], [3, 4]])
+    array([10, 48])
+    >>> table.box_mean([0, 1], [3, 3])
+    5.5
+
+    """
+
+    def __init__(self, input, squares = False):
+        input = numpy.asarray(input)
+        if numpy.iscomplexobj(input):
+            raise TypeError('Complex type not supported')
+        self.shape = input.shape
+        self.ndim = input.ndim
+        # the mean of the values of the table, subtracted from them before
+        # they are squared into a table of floating point numbers:
+        self.mean = 0.0
+        if input.dtype.kind in 'biu':
+            values = self._integer_values(input)
+        else:
+            values = input.astype(numpy.float64)
+            self.offset = _finite_mean(values)
+            values -= self.offset
+        self.table = self._integrate(values)
+        if not squares:
+            self.squares = None
+        elif (values.dtype.kind == 'f' or
+              self.range ** 2 * values.size > _INT64_MAX):
+            values = values.astype(numpy.float64)
+            self.mean = _finite_mean(values)
+            values -= self.mean
+            self.squares = self._integrate(values * values)
+        else:
+            self.squares = self._integrate(values * values)
+
+    def _integer_values(self, input):
+        """Return the values of an integer array relative to its minimum,
+        which is kept as the offset, as 64-bit integers.
+        """
+        low = int(input.min()) if input.size > 0 else 0
+        high = int(input.max()) if input.size > 0 else 0
+        self.range = high - low
+        self.largest = max(abs(low), abs(high))
+        if self.range * input.size > _INT64_MAX:
+            raise ValueError('the sums of the integer array do not fit in '
+                             '64-bit integers')
+        self.offset = low
+        if input.dtype.kind == 'u':
+            return (input - input.dtype.type(low)).astype(numpy.int64)
+        return input.astype(numpy.int64) - low
+
+    def _integrate(self, values):
+        table = numpy.zeros([ii + 1 for ii in self.shape], values.dtype)
+        table[(slice(1, None),) * self.ndim] = values
+        _nd_image.integral_image(table)
+        return table
+
+    def _boxes(self, lows, highs):
+        lows, highs = numpy.broadcast_arrays(
+            numpy.asarray(lows, dtype=numpy.intp),
+            numpy.asarray(highs, dtype=numpy.intp))
+        if lows.ndim == 0 or lows.shape[-1] != self.ndim:
+            raise RuntimeError('box corners must have one coordinate per axis')
+        shape = lows.shape[:-1]
+        size = (int(numpy.prod(shape, dtype=numpy.intp)), self.ndim)
+        limits = numpy.array(self.shape, dtype=numpy.intp)
+        lows = numpy.clip(lows, 0, limits).reshape(size)
+        highs = numpy.clip(highs, 0, limits).reshape(size)
+        highs = numpy.maximum(highs, lows)
+        counts = numpy.prod(highs - lows, axis=-1)
+        return (numpy.ascontiguousarray(lows),
+                numpy.ascontiguousarray(highs), counts, shape)
+
+    def _sums(self, table, lows, highs):
+        output = numpy.zeros(len(lows), table.dtype)
+        _nd_image.box_sums(table, lows, highs, output)
+        return output
+
+    def _result(self, values, shape):
+        values = values.reshape(shape)
+        return values[()] if shape == () else values
+
+    def box_sum(self, lows, highs):
+        """
+        Calculate the sums of the values in the given boxes. Exact sums of
+        integers that do not fit in 64-bit integers are returned as
+        Python integers, in an array of objects.
+        """
+        lows, highs, counts, shape = self._boxes(lows, highs)
+        sums = self._sums(self.table, lows, highs)
+        if self.offset and sums.dtype.kind == 'f':
+            sums += self.offset * counts
+        elif self.offset:
+            if self.largest * _largest(counts) > _INT64_MAX:
+                sums = sums.astype(object)
+                counts = counts.astype(object)
+            sums += self.offset * counts
+        return self._result(sums, shape)
+
+    def box_mean(self, lows, highs):
+        """
+        Calculate the means of the values in the given boxes. The mean of an
+        empty box is nan.
+        """
+        lows, highs, counts, shape = self._boxes(lows, highs)
+        sums = self._sums(self.table, lows, highs)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts.astype(numpy.float64) + self.offset
+        return self._result(means, shape)
+
+    def box_variance(self, lows, highs):
+        """
+        Calculate the variances of the values in the given boxes, which
+        requires the table of squares. The variance of an empty box is nan.
+        """
+        if self.squares is None:
+            raise RuntimeError('integral image has no table of squares')
+        lows, highs, counts, shape = self._boxes(lows, highs)
+        sums = self._sums(self.table, lows, highs)
+        squares = self._sums(self.squares, lows, highs)
+        empty = counts == 0
+        if squares.dtype.kind == 'f':
+            counts = counts.astype(numpy.float64)
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                means = sums / counts - self.mean
+                variances = numpy.maximum(squares / counts - means * means,
+                                          0.0)
+        else:
+            # the variances of integers are calculated exactly, as
+            # (n * sum(x**2) - sum(x)**2) / n**2, in 64-bit integers if
+            # these cannot overflow, or else in Python integers:
+            if (self.range * _largest(counts)) ** 2 > _INT64_MAX:
+                sums = sums.astype(object)
+                squares = squares.astype(object)
+                counts = counts.astype(object)
+            numerators = counts * squares - sums * sums
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                variances = (numerators.astype(numpy.float64) /
+                             (counts * counts).astype(numpy.float64))
+        variances[empty] = numpy.nan
+        return self._result(variances, shape)
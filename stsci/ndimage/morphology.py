@@ -216,6 +216,17 @@ def generate_binary_structure(rank, connectivity):
     return numpy.asarray(output <= connectivity, dtype = bool)
 
 
+def _axes_structure(input, structure, origin, axes):
+    """Return the structure and origins of a binary operation along the
+    given axes, expanded to all axes of the input.
+    """
+    axes = _ni_support._check_axes(axes, input.ndim)
+    if structure is None:
+        structure = generate_binary_structure(len(axes), 1)
+    structure = _ni_support._expand_footprint(structure, axes, input.ndim)
+    origin = _ni_support._expand_sequence(origin, axes, input.ndim, 0)
+    return structure, origin
+
 def _binary_erosion(input, structure, iterations, mask, output,
                     border_value, origin, invert, brute_force):
     input = numpy.asarray(input)
@@ -291,7 +302,8 @@ def _binary_erosion(input, structure, iterations, mask, output,
 
 
 def binary_erosion(input, structure = None, iterations = 1, mask = None,
-        output = None, border_value = 0, origin = 0, brute_force = False):
+        output = None, border_value = 0, origin = 0, brute_force = False,
+        axes = None):
     """
     Multi-dimensional binary erosion with a given structuring element.
 
@@ -329,6 +341,11 @@ def binary_erosion(input, structure = None, iterations = 1, mask = None,
     border_value: int (cast to 0 or 1)
         Value at the border in the output array.
 
+    axes : int or sequence of ints, optional
+        The axes along which to operate. The structuring element, and the
+        size, footprint and origin, are given for these axes only, and the
+        other axes are processed independently. Default is None, for all
+        axes.
 
     Returns
     -------
@@ -391,11 +408,14 @@ def binary_erosion(input, structure = None, iterations = 1, mask = None,
            [0, 0, 0, 0, 0, 0, 0]])
 
     """
+    input = numpy.asarray(input)
+    structure, origin = _axes_structure(input, structure, origin, axes)
     return _binary_erosion(input, structure, iterations, mask,
                            output, border_value, origin, 0, brute_force)
 
 def binary_dilation(input, structure = None, iterations = 1, mask = None,
-        output = None, border_value = 0, origin = 0, brute_force = False):
+        output = None, border_value = 0, origin = 0, brute_force = False,
+        axes = None):
     """
     Multi-dimensional binary dilation with the given structuring element.
 
@@ -432,6 +452,11 @@ def binary_dilation(input, structure = None, iterations = 1, mask = None,
     border_value : int (cast to 0 or 1)
         Value at the border in the output array.
 
+    axes : int or sequence of ints, optional
+        The axes along which to operate. The structuring element, and the
+        size, footprint and origin, are given for these axes only, and the
+        other axes are processed independently. Default is None, for all
+        axes.
 
     Returns
     -------
@@ -519,10 +544,7 @@ def binary_dilation(input, structure = None, iterations = 1, mask = None,
 
     """
     input = numpy.asarray(input)
-    if structure is None:
-        structure = generate_binary_structure(input.ndim, 1)
-    origin = _ni_support._normalize_sequence(origin, input.ndim)
-    structure = numpy.asarray(structure)
+    structure, origin = _axes_structure(input, structure, origin, axes)
     structure = structure[tuple([slice(None, None, -1)] *
                                 structure.ndim)]
     for ii in range(len(origin)):
@@ -534,7 +556,7 @@ def binary_dilation(input, structure = None, iterations = 1, mask = None,
 
 
 def binary_opening(input, structure = None, iterations = 1, output = None,
-                   origin = 0):
+                   origin = 0, axes = None):
     """
     Multi-dimensional binary opening with the given structuring element.
 
@@ -568,6 +590,12 @@ def binary_opening(input, structure = None, iterations = 1, output = None,
     origin : int or tuple of ints, optional
         Placement of the filter, by default 0.
 
+    axes : int or sequence of ints, optional
+        The axes along which to operate. The structuring element, and the
+        size, footprint and origin, are given for these axes only, and the
+        other axes are processed independently. Default is None, for all
+        axes.
+
     Returns
     -------
 
@@ -640,9 +668,7 @@ def binary_opening(input, structure = None, iterations = 1, output = None,
 
     """
     input = numpy.asarray(input)
-    if structure is None:
-        rank = input.ndim
-        structure = generate_binary_structure(rank, 1)
+    structure, origin = _axes_structure(input, structure, origin, axes)
     tmp = binary_erosion(input, structure, iterations, None, None, 0,
                          origin)
     return binary_dilation(tmp, structure, iterations, None, output, 0,
@@ -650,7 +676,7 @@ def binary_opening(input, structure = None, iterations = 1, output = None,
 
 
 def binary_closing(input, structure = None, iterations = 1, output = None,
-                   origin = 0):
+                   origin = 0, axes = None):
     """
     Multi-dimensional binary closing with the given structuring element.
 
@@ -684,6 +710,12 @@ def binary_closing(input, structure = None, iterations = 1, output = None,
     origin : int or tuple of ints, optional
         Placement of the filter, by default 0.
 
+    axes : int or sequence of ints, optional
+        The axes along which to operate. The structuring element, and the
+        size, footprint and origin, are given for these axes only, and the
+        other axes are processed independently. Default is None, for all
+        axes.
+
     Returns
     -------
 
@@ -779,9 +811,7 @@ def binary_closing(input, structure = None, iterations = 1, output = None,
 
     """
     input = numpy.asarray(input)
-    if structure is None:
-        rank = input.ndim
-        structure = generate_binary_structure(rank, 1)
+    structure, origin = _axes_structure(input, structure, origin, axes)
     tmp = binary_dilation(input, structure, iterations, None, None, 0,
                           origin)
     return binary_erosion(tmp, structure, iterations, None, output, 0,
@@ -1140,7 +1170,8 @@ def binary_fill_holes(input, structure = None, output = None, origin = 0):
         return output
 
 def grey_erosion(input,  size = None, footprint = None, structure = None,
-                 output = None, mode = "reflect", cval = 0.0, origin = 0):
+                 output = None, mode = "reflect", cval = 0.0, origin = 0,
+                 axes = None):
     """
     Calculate a greyscale erosion, using either a structuring element,
     or a footprint corresponding to a flat structuring element.
@@ -1184,6 +1215,11 @@ def grey_erosion(input,  size = None, footprint = None, structure = None,
         The `origin` parameter controls the placement of the filter.
         Default 0
 
+    axes : int or sequence of ints, optional
+        The axes along which to operate. The structuring element, and the
+        size, footprint and origin, are given for these axes only, and the
+        other axes are processed independently. Default is None, for all
+        axes.
 
     Returns
     -------
@@ -1260,11 +1296,13 @@ def grey_erosion(input,  size = None, footprint = None, structure = None,
 
     """
     return filters._min_or_max_filter(input, size, footprint, structure,
-                                      output, mode, cval, origin, 1)
+                                      output, mode, cval, origin, 1,
+                                      axes=axes)
 
 
 def grey_dilation(input,  size = None, footprint = None, structure = None,
-                 output = None, mode = "reflect", cval = 0.0, origin = 0):
+                 output = None, mode = "reflect", cval = 0.0, origin = 0,
+                 axes = None):
     """
     Calculate a greyscale dilation, using either a structuring element,
     or a footprint corresponding to a flat structuring element.
@@ -1308,6 +1346,11 @@ def grey_dilation(input,  size = None, footprint = None, structure = None,
         The `origin` parameter controls the placement of the filter.
         Default 0
 
+    axes : int or sequence of ints, optional
+        The axes along which to operate. The structuring element, and the
+        size, footprint and origin, are given for these axes only, and the
+        other axes are processed independently. Default is None, for all
+        axes.
 
     Returns
     -------
@@ -1399,16 +1442,21 @@ def grey_dilation(input,  size = None, footprint = None, structure = None,
            [1, 1, 1, 1, 1, 1, 1]])
 
     """
+    input = numpy.asarray(input)
+    axes = _ni_support._check_axes(axes, input.ndim)
     if structure is not None:
-        structure = numpy.asarray(structure)
+        structure = _ni_support._expand_footprint(structure, axes,
+                                                  input.ndim)
         structure = structure[tuple([slice(None, None, -1)] *
                                     structure.ndim)]
     if footprint is not None:
-        footprint = numpy.asarray(footprint)
+        footprint = _ni_support._expand_footprint(footprint, axes,
+                                                  input.ndim)
         footprint = footprint[tuple([slice(None, None, -1)] *
                                     footprint.ndim)]
-    input = numpy.asarray(input)
-    origin = _ni_support._normalize_sequence(origin, input.ndim)
+    elif size is not None:
+        size = _ni_support._expand_sequence(size, axes, input.ndim, 1)
+    origin = _ni_support._expand_sequence(origin, axes, input.ndim, 0)
     for ii in range(len(origin)):
         origin[ii] = -origin[ii]
         if footprint is not None:
@@ -1422,7 +1470,8 @@ def grey_dilation(input,  size = None, footprint = None, structure = None,
 
 
 def grey_opening(input, size = None, footprint = None, structure = None,
-                 output = None, mode = "reflect", cval = 0.0, origin = 0):
+                 output = None, mode = "reflect", cval = 0.0, origin = 0,
+                 axes = None):
     """
     Multi-dimensional greyscale opening.
 
@@ -1463,6 +1512,12 @@ def grey_opening(input, size = None, footprint = None, structure = None,
         The `origin` parameter controls the placement of the filter.
         Default 0
 
+    axes : int or sequence of ints, optional
+        The axes along which to operate. The structuring element, and the
+        size, footprint and origin, are given for these axes only, and the
+        other axes are processed independently. Default is None, for all
+        axes.
+
     Returns
     -------
 
@@ -1511,13 +1566,14 @@ def grey_opening(input, size = None, footprint = None, structure = None,
 
     """
     tmp = grey_erosion(input, size, footprint, structure, None, mode,
-                       cval, origin)
+                       cval, origin, axes)
     return grey_dilation(tmp, size, footprint, structure, output, mode,
-                         cval, origin)
+                         cval, origin, axes)
 
 
 def grey_closing(input, size = None, footprint = None, structure = None,
-                 output = None, mode = "reflect", cval = 0.0, origin = 0):
+                 output = None, mode = "reflect", cval = 0.0, origin = 0,
+                 axes = None):
     """
     Multi-dimensional greyscale closing.
 
@@ -1558,6 +1614,12 @@ def grey_closing(input, size = None, footprint = None, structure = None,
         The `origin` parameter controls the placement of the filter.
         Default 0
 
+    axes : int or sequence of ints, optional
+        The axes along which to operate. The structuring element, and the
+        size, footprint and origin, are given for these axes only, and the
+        other axes are processed independently. Default is None, for all
+        axes.
+
     Returns
     -------
 
@@ -1606,9 +1668,9 @@ def grey_closing(input, size = None, footprint = None, structure = None,
 
     """
     tmp = grey_dilation(input, size, footprint, structure, None, mode,
-                        cval, origin)
+                        cval, origin, axes)
     return grey_erosion(tmp, size, footprint, structure, output, mode,
-                        cval, origin)
+                        cval, origin, axes)
 
 
 def morphological_gradient(input, size = None, footprint = None,
@@ -1,6 +1,6 @@
 from numpy.testing import assert_, assert_array_almost_equal, assert_equal, \
                           assert_almost_equal, assert_array_equal, \
-                          run_module_suite, TestCase
+                          assert_raises, run_module_suite, TestCase
 import numpy as np
 
 import stsci.ndimage as ndimage
@@ -926,5 +926,51 @@ def test_histogram03():
     assert_array_almost_equal(output[0], expected1)
     assert_array_almost_equal(output[1], expected2)
 
+def test_integral_image01():
+    "integral image box sums, means and variances"
+    for type in types:
+        input = np.arange(60).reshape(3, 4, 5).astype(type)
+        table = ndimage.IntegralImage(input, squares=True)
+        lows = [[0, 0, 0], [1, 2, 1], [-1, 3, 2], [2, 2, 2]]
+        highs = [[3, 4, 5], [3, 4, 4], [2, 9, 3], [2, 4, 4]]
+        for ii in range(4):
+            region = input[tuple(slice(max(lo, 0), hi)
+                                 for lo, hi in zip(lows[ii], highs[ii]))]
+            region = region.astype(np.float64)
+            assert_almost_equal(table.box_sum(lows[ii], highs[ii]),
+                                region.sum())
+            if region.size > 0:
+                assert_almost_equal(table.box_mean(lows[ii], highs[ii]),
+                                    region.mean())
+                assert_almost_equal(table.box_variance(lows[ii], highs[ii]),
+                                    region.var())
+        assert_equal(table.box_sum(lows, highs).shape, (4,))
+        assert_(np.isnan(table.box_mean(lows, highs)[3]))
+
+def test_integral_image02():
+    "integral image precision"
+    input = 1e8 + np.arange(1000.0)
+    table = ndimage.IntegralImage(input, squares=True)
+    assert_almost_equal(table.box_mean([500], [502]), 1e8 + 500.5)
+    assert_almost_equal(table.box_variance([0], [1000]), input.var(), 5)
+
+def test_integral_image03():
+    "integral image of integers near the limits of their types"
+    input = np.arange(3500000000, 4000000000, 7812500,
+                      dtype=np.uint32).reshape(4, 4, 4)
+    table = ndimage.IntegralImage(input, squares=True)
+    assert_almost_equal(table.box_variance([0, 0, 0], [4, 4, 4]) / 1e16,
+                        input.astype(np.float64).var() / 1e16)
+    input = np.array([2 ** 64 - 1, 2 ** 64 - 4, 2 ** 64 - 7], np.uint64)
+    table = ndimage.IntegralImage(input, squares=True)
+    assert_equal(table.box_sum([0], [2]), 2 ** 65 - 5)
+    assert_equal(table.box_variance([0], [3]), 6.0)
+    input = 10 ** 8 + np.arange(1000) % 10
+    table = ndimage.IntegralImage(input, squares=True)
+    assert_equal(table.box_sum([0], [1000]), input.sum())
+    assert_almost_equal(table.box_variance([0], [1000]), 8.25)
+    assert_raises(ValueError, ndimage.IntegralImage,
+                  np.array([13, 2 ** 64 - 1], np.uint64))
+
 if __name__ == "__main__":
     run_module_suite()
@@ -33,7 +33,7 @@ import numpy
 import numpy as np
 from numpy import fft
 from numpy.testing import assert_, assert_equal, assert_array_equal, \
-        TestCase, run_module_suite, \
+        TestCase, run_module_suite, assert_raises, \
         assert_array_almost_equal, assert_almost_equal
 import stsci.ndimage as ndimage
 
@@ -42,6 +42,28 @@ eps = 1e-12
 def sumsq(a, b):
     return math.sqrt(((a - b)**2).sum())
 
+def _brute_min_or_max_1d(arr, size, mode, cval, origin, func):
+    # reference running extremum using explicitly extended lines
+    pad = 2 * size + 2 * len(arr)
+    n = len(arr)
+    idx = numpy.arange(-pad, n + pad)
+    if mode == 'constant':
+        ext = numpy.zeros(n + 2 * pad) + cval
+        ext[pad:pad + n] = arr
+    elif mode == 'nearest':
+        ext = arr[numpy.clip(idx, 0, n - 1)]
+    elif mode == 'wrap':
+        ext = arr[idx % n]
+    elif mode == 'reflect':
+        ii = idx % (2 * n)
+        ext = arr[numpy.where(ii < n, ii, 2 * n - 1 - ii)]
+    elif mode == 'mirror':
+        ii = idx % (2 * n - 2)
+        ext = arr[numpy.where(ii < n, ii, 2 * n - 2 - ii)]
+    start = pad - (size // 2 + origin)
+    return numpy.array([func(ext[start + i:start + i + size])
+                        for i in range(n)])
+
 class TestNdimage:
 
     def setUp(self):
@@ -441,6 +463,89 @@ class TestNdimage:
                              mode='nearest', output=output, origin=1)
                 assert_array_almost_equal(output, tcov)
 
+    def test_correlate26(self):
+        "correlation 26"
+        # the FFT method must handle all boundary modes and origins like the
+        # direct method, also when the input is split in several tiles
+        from stsci.ndimage import filters
+        numpy.random.seed(4)
+        arr = numpy.random.random((23, 17)) * 10
+        weights = numpy.random.random((6, 9))
+        tile_size = filters._FFT_TILE_SIZE
+        try:
+            for size in [tile_size, 200]:
+                filters._FFT_TILE_SIZE = size
+                for mode in self.modes:
+                    for origin in [0, (-3, 1), (2, 4)]:
+                        for func in [ndimage.correlate, ndimage.convolve]:
+                            ref = func(arr, weights, mode=mode, cval=1.5,
+                                       origin=origin)
+                            res = func(arr, weights, mode=mode, cval=1.5,
+                                       origin=origin, method='fft')
+                            assert_almost_equal(res, ref)
+        finally:
+            filters._FFT_TILE_SIZE = tile_size
+        # integer results are truncated like the direct method does
+        arr = numpy.random.randint(0, 100, (12, 15))
+        weights = numpy.random.randint(-3, 4, (7, 5)) / 2.0
+        assert_equal(ndimage.correlate(arr, weights, method='fft'),
+                     ndimage.correlate(arr, weights))
+        assert_almost_equal(ndimage.convolve(arr * 1.0, weights,
+                                             method='auto'),
+                            ndimage.convolve(arr * 1.0, weights))
+        assert_raises(RuntimeError, ndimage.correlate, arr, weights,
+                      method='x')
+
+    def test_correlate27(self):
+        "correlation 27"
+        # kernels of low rank can be applied as one-dimensional correlations
+        numpy.random.seed(5)
+        arr = numpy.random.random((13, 11, 9)) * 10
+        u = numpy.random.random(5)
+        v = numpy.random.random(4)
+        w = numpy.random.random(3)
+        kernels = [numpy.einsum('i,j,k', u, v, w),
+                   numpy.einsum('i,j,k', u, v, w) +
+                   numpy.einsum('i,j,k', u[::-1], v - 0.5, w ** 2)]
+        for weights in kernels:
+            for mode in self.modes:
+                for func in [ndimage.correlate, ndimage.convolve]:
+                    ref = func(arr, weights, mode=mode, cval=2.5, origin=1)
+                    res = func(arr, weights, mode=mode, cval=2.5, origin=1,
+                               method='separable')
+                    assert_almost_equal(res, ref)
+        for dtype in [numpy.float64, numpy.int32]:
+            empty = numpy.zeros((0, 5), dtype)
+            assert_equal(ndimage.correlate(empty, kernels[0][0],
+                                           method='separable'),
+                         ndimage.correlate(empty, kernels[0][0]))
+        gauss = numpy.exp(-numpy.arange(-7, 8) ** 2 / 8.0)
+        arr = numpy.random.random((200, 200))
+        method = ndimage.choose_correlate_method
+        assert_equal(method(arr, numpy.outer(gauss, gauss)), 'separable')
+        assert_equal(method(arr, numpy.ones((3, 3))), 'direct')
+        assert_equal(method(arr, numpy.ones((15, 15)), output=numpy.int32),
+                     'direct')
+
+    def test_correlate28(self):
+        "correlation 28"
+        # in 'auto' mode, non-finite values only spread over the elements
+        # they are correlated with, like in the direct method
+        numpy.random.seed(6)
+        arr = numpy.random.random((60, 70))
+        arr[10, 20] = numpy.nan
+        arr[40, 5] = numpy.inf
+        method = ndimage.choose_correlate_method
+        gauss = numpy.exp(-numpy.arange(-7, 8) ** 2 / 8.0)
+        for weights in [numpy.random.random((25, 25)),
+                        numpy.outer(gauss, gauss)]:
+            assert_equal(method(arr, weights), 'direct')
+            assert_equal(method(numpy.nan_to_num(arr), weights) != 'direct',
+                         True)
+            for func in [ndimage.correlate, ndimage.convolve]:
+                assert_equal(func(arr, weights, method='auto'),
+                             func(arr, weights))
+
     def test_gauss01(self):
         "gaussian filter 1"
         input = numpy.array([[1, 2, 3],
@@ -503,6 +608,77 @@ class TestNdimage:
                                                             output=otype)
         assert_array_almost_equal(output1, output2)
 
+    def test_gauss07(self):
+        "gaussian filter 7"
+        # the recursive approximation must stay close to the direct filter for
+        # all orders and boundary modes
+        numpy.random.seed(6)
+        arr = numpy.random.random((40, 60))
+        for sigma in [0.3, 1.5, 4.0, 10.0]:
+            for order in [0, 1, 2, 3]:
+                for mode in self.modes:
+                    ref = ndimage.gaussian_filter1d(arr, sigma, order=order,
+                                                    mode=mode, cval=0.5)
+                    res = ndimage.gaussian_filter1d(arr, sigma, order=order,
+                                                    mode=mode, cval=0.5,
+                                                    method='recursive')
+                    assert_almost_equal(res, ref, decimal=3)
+        ref = ndimage.gaussian_filter(arr, (3, 8), order=(0, 1))
+        res = ndimage.gaussian_filter(arr, (3, 8), order=(0, 1),
+                                      method='recursive')
+        assert_almost_equal(res, ref, decimal=3)
+        # the documented bounds of the errors of the impulse responses,
+        # relative to the peak of the kernel of each order:
+        for order, bound in enumerate([6e-4, 4e-3, 6e-3, 2e-2]):
+            for sigma in [3.0, 5.0, 30.0, 100.0]:
+                impulse = numpy.zeros(int(20 * sigma) + 41)
+                impulse[impulse.size // 2] = 1.0
+                ref = ndimage.gaussian_filter1d(impulse, sigma, order=order,
+                                                mode='constant')
+                res = ndimage.gaussian_filter1d(impulse, sigma, order=order,
+                                                mode='constant',
+                                                method='recursive')
+                assert_(numpy.abs(res - ref).max() <
+                        bound * numpy.abs(ref).max())
+
+    def test_gaussian_filter_bank01(self):
+        "gaussian filter bank 1"
+        data = numpy.arange(9 * 11 * 10, dtype=numpy.float64)
+        data = (data * 7 % 23).reshape(9, 11, 10)
+        orders = [0, (1, 0, 0), (0, 1, 0), (2, 0, 0), (1, 1, 0), (0, 1, 2)]
+        for method in ['direct', 'recursive']:
+            bank = ndimage.gaussian_filter_bank(data, [1, 2, 3], orders,
+                                                mode='nearest', method=method)
+            assert_equal(bank.shape, (len(orders),) + data.shape)
+            for out, order in zip(bank, orders):
+                expected = ndimage.gaussian_filter(data, [1, 2, 3], order,
+                                                   mode='nearest',
+                                                   method=method)
+                assert_array_almost_equal(out, expected)
+        bank = ndimage.gaussian_filter_bank(numpy.arange(12).reshape(3, 4), 1,
+                                            [0])
+        assert_equal(bank.dtype, numpy.float64)
+        assert_raises(ValueError, ndimage.gaussian_filter_bank, data, 1, [4])
+
+    def test_hessian01(self):
+        "hessian and structure tensor 1"
+        data = numpy.arange(12 * 14, dtype=numpy.float64)
+        data = (data * 7 % 23).reshape(12, 14)
+        hessian = ndimage.hessian(data, 1.5)
+        gradient = [ndimage.gaussian_filter(data, 1.5, order)
+                    for order in [(1, 0), (0, 1)]]
+        tensor = ndimage.structure_tensor(data, 1.5, 2.0)
+        for ii in range(2):
+            for jj in range(2):
+                order = [0, 0]
+                order[ii] += 1
+                order[jj] += 1
+                assert_almost_equal(hessian[ii, jj],
+                                    ndimage.gaussian_filter(data, 1.5, order))
+                assert_almost_equal(tensor[ii, jj],
+                                    ndimage.gaussian_filter(gradient[ii] *
+                                                            gradient[jj], 2.0))
+
     def test_prewitt01(self):
         "prewitt filter 1"
         for type in self.types:
@@ -687,6 +863,42 @@ class TestNdimage:
             numpy.sqrt(expected, expected)
             assert_array_almost_equal(expected, output)
 
+    def test_gaussian_gradient_magnitude03(self):
+        "gaussian gradient magnitude filter 3"
+        # the root of an integer output is taken in floating point, whether
+        # or not the derivatives are filtered from the same tiles
+        from stsci.ndimage import filters
+        numpy.random.seed(13)
+        def derivatives(data, axis, output, mode):
+            order = [0] * data.ndim
+            order[axis] = 1
+            return ndimage.gaussian_filter(data, 1.0, order, output, mode)
+        def check(data, mode):
+            for function, derivative in [
+                    (ndimage.gaussian_gradient_magnitude, derivatives),
+                    (ndimage.generic_gradient_magnitude, ndimage.sobel)]:
+                squares = numpy.zeros(data.shape, numpy.int32)
+                for axis in range(data.ndim):
+                    term = numpy.zeros(data.shape, numpy.int32)
+                    derivative(data, axis, term, mode)
+                    squares += term * term
+                expected = numpy.sqrt(squares).astype(numpy.int32)
+                if function is ndimage.gaussian_gradient_magnitude:
+                    result = function(data, 1.0, numpy.int32, mode)
+                else:
+                    result = function(data, ndimage.sobel, numpy.int32, mode)
+                assert_equal(result, expected)
+        for shape in [(9, 12, 15), (24, 33)]:
+            data = (numpy.random.random(shape) * 100).astype(numpy.int32)
+            for mode in ['reflect', 'constant']:
+                check(data, mode)
+        min_size = filters._SEPARABLE_MIN_SIZE
+        try:
+            filters._SEPARABLE_MIN_SIZE = 0
+            check(data, 'reflect')
+        finally:
+            filters._SEPARABLE_MIN_SIZE = min_size
+
     def test_generic_gradient_magnitude01(self):
         "generic gradient magnitude 1"
         array = numpy.array([[3, 2, 5, 1, 4],
@@ -705,6 +917,49 @@ class TestNdimage:
                 extra_keywords={'b': 2.0})
         assert_array_almost_equal(tmp1, tmp2)
 
+    def test_fused_derivatives01(self):
+        "fused derivatives 1"
+        # the derivatives are filtered from the same tiles, which is also
+        # done for small arrays here
+        from stsci.ndimage import filters
+        def gaussian_terms(data, order, mode):
+            terms = []
+            for axis in range(data.ndim):
+                orders = [0] * data.ndim
+                orders[axis] = order
+                terms.append(ndimage.gaussian_filter(data, 1.5, orders,
+                                                     mode=mode))
+            return terms
+        def check(data, mode):
+            terms = [ndimage.correlate1d(data, [1, -2, 1], axis, mode=mode)
+                     for axis in range(data.ndim)]
+            assert_almost_equal(ndimage.laplace(data, mode=mode), sum(terms))
+            terms = gaussian_terms(data, 2, mode)
+            assert_almost_equal(ndimage.gaussian_laplace(data, 1.5,
+                                                         mode=mode),
+                                sum(terms))
+            terms = gaussian_terms(data, 1, mode)
+            result = ndimage.gaussian_gradient_magnitude(data, 1.5, mode=mode)
+            assert_almost_equal(result,
+                                numpy.sqrt(sum([tt ** 2 for tt in terms])))
+            for derivative in [ndimage.sobel, ndimage.prewitt]:
+                terms = [derivative(data, axis, mode=mode)
+                         for axis in range(data.ndim)]
+                result = ndimage.generic_gradient_magnitude(data, derivative,
+                                                            mode=mode)
+                assert_almost_equal(result,
+                                    numpy.sqrt(sum([tt ** 2 for tt in terms])))
+        state = numpy.random.RandomState(10)
+        min_size = filters._SEPARABLE_MIN_SIZE
+        try:
+            filters._SEPARABLE_MIN_SIZE = 0
+            for shape in [(31,), (24, 33), (9, 12, 15)]:
+                data = state.rand(*shape) * 100
+                for mode in ['reflect', 'constant', 'wrap']:
+                    check(data, mode)
+        finally:
+            filters._SEPARABLE_MIN_SIZE = min_size
+
     def test_uniform01(self):
         "uniform filter 1"
         array = numpy.array([2, 4, 6])
@@ -840,6 +1095,68 @@ class TestNdimage:
                               [5, 5, 3, 3, 1],
                               [5, 3, 3, 1, 1]], output)
 
+    def test_minimum_filter10(self):
+        "minimum filter 10"
+        # the running extremum engine is used for larger filters, it must
+        # give the same results as a direct scan of the window
+        numpy.random.seed(1)
+        arr = numpy.random.randint(0, 50, 23).astype(numpy.float64)
+        for size in [4, 5, 8, 23, 40]:
+            for origin in [-(size // 2), 0, (size - 1) // 2]:
+                for mode in self.modes:
+                    out = ndimage.minimum_filter1d(arr, size, mode=mode,
+                                                   cval=-3.0, origin=origin)
+                    assert_array_equal(out, _brute_min_or_max_1d(arr, size,
+                                           mode, -3.0, origin, numpy.min))
+
+    def test_minimum_filter11(self):
+        "minimum filter 11"
+        # as the comparisons of a direct scan, a window gives NaN if its
+        # first value is NaN, and otherwise ignores NaN values
+        from stsci.ndimage import filters
+        numpy.random.seed(2)
+        arr = numpy.random.randint(0, 50, 23).astype(numpy.float64)
+        arr[[0, 3, 4, 11, 12, 13, 14, 15, 16, 17, 18]] = numpy.nan
+        def first_or(func):
+            return lambda window: (window[0] if numpy.isnan(window[0])
+                                   else func(window))
+        for size in [2, 4, 5, 8, 23]:
+            for origin in [-(size // 2), 0, (size - 1) // 2]:
+                for mode in self.modes:
+                    for dtype in [numpy.float64, numpy.float32]:
+                        data = arr.astype(dtype)
+                        out = ndimage.minimum_filter1d(data, size, mode=mode,
+                                                       origin=origin)
+                        expected = _brute_min_or_max_1d(data, size, mode, 0.0,
+                                                        origin,
+                                                        first_or(numpy.nanmin))
+                        assert_array_equal(out, expected)
+                        out = ndimage.maximum_filter1d(data, size, mode=mode,
+                                                       origin=origin)
+                        expected = _brute_min_or_max_1d(data, size, mode, 0.0,
+                                                        origin,
+                                                        first_or(numpy.nanmax))
+                        assert_array_equal(out, expected)
+        # tiles of separable filters are filtered alike
+        data = numpy.random.random((40, 45))
+        data[numpy.random.random(data.shape) < 0.2] = numpy.nan
+        tile_size = filters._SEPARABLE_TILE_SIZE
+        min_size = filters._SEPARABLE_MIN_SIZE
+        try:
+            filters._SEPARABLE_MIN_SIZE = 0
+            filters._SEPARABLE_TILE_SIZE = 800
+            for size in [(2, 3), (5, 4), (9, 6)]:
+                assert_equal(filters._separable_tile_shape(data.shape, size,
+                                                           [3, 3]),
+                             [20, 23])
+                expected = ndimage.minimum_filter1d(data, size[0], 0)
+                expected = ndimage.minimum_filter1d(expected, size[1], 1)
+                assert_array_equal(ndimage.minimum_filter(data, size),
+                                   expected)
+        finally:
+            filters._SEPARABLE_TILE_SIZE = tile_size
+            filters._SEPARABLE_MIN_SIZE = min_size
+
     def test_maximum_filter01(self):
         "maximum filter 1"
         array = numpy.array([1, 2, 3, 4, 5])
@@ -927,6 +1244,20 @@ class TestNdimage:
                               [7, 9, 8, 9, 7],
                               [8, 8, 8, 7, 7]], output)
 
+    def test_maximum_filter10(self):
+        "maximum filter 10"
+        # the running extremum engine is used for larger filters, it must
+        # give the same results as a direct scan of the window
+        numpy.random.seed(1)
+        arr = numpy.random.randint(0, 50, 23).astype(numpy.float64)
+        for size in [4, 5, 8, 23, 40]:
+            for origin in [-(size // 2), 0, (size - 1) // 2]:
+                for mode in self.modes:
+                    out = ndimage.maximum_filter1d(arr, size, mode=mode,
+                                                   cval=60.0, origin=origin)
+                    assert_array_equal(out, _brute_min_or_max_1d(arr, size,
+                                           mode, 60.0, origin, numpy.max))
+
     def test_rank01(self):
         "rank filter 1"
         array = numpy.array([1, 2, 3, 4, 5])
@@ -1113,6 +1444,103 @@ class TestNdimage:
                                   footprint=footprint, origin=[-1, 0])
             assert_array_almost_equal(expected, output)
 
+    def test_rank15(self):
+        "rank filter 15"
+        # uint8 and uint16 data with box footprints use a sliding histogram,
+        # which must agree with the rank selection used for other types
+        numpy.random.seed(2)
+        for dtype, high in [(numpy.uint8, 256), (numpy.uint16, 65536),
+                            (numpy.uint16, 300)]:
+            arr = numpy.random.randint(0, high, (9, 11)).astype(dtype)
+            for size, origin in [((3, 3), 0), ((5, 1), (1, 0)),
+                                 ((2, 7), (0, -2)), ((1, 25), 0)]:
+                for mode in self.modes:
+                    for rank in [1, 2, -2]:
+                        out = ndimage.rank_filter(arr, rank, size, mode=mode,
+                                                  cval=7, origin=origin)
+                        expected = ndimage.rank_filter(arr.astype(numpy.int32),
+                                                       rank, size, mode=mode,
+                                                       cval=7, origin=origin)
+                        assert_array_equal(out, expected)
+                    out = ndimage.median_filter(arr.T, size, mode=mode)
+                    expected = ndimage.median_filter(
+                                    arr.T.astype(numpy.int32), size, mode=mode)
+                    assert_array_equal(out, expected)
+
+    def test_rank16(self):
+        "rank filter 16"
+        # floating point data is ranked in heaps that are updated while the
+        # footprint slides, the result must not depend on that
+        numpy.random.seed(3)
+        disk = numpy.array([[0, 1, 1, 1, 0],
+                            [1, 1, 1, 1, 1],
+                            [1, 1, 1, 1, 1],
+                            [0, 1, 1, 1, 0]], bool)
+        holed = numpy.ones((3, 9), bool)
+        holed[1, 4] = False
+        for dtype in [numpy.float32, numpy.float64]:
+            for arr in [numpy.random.permutation(99).reshape(9, 11),
+                        numpy.random.randint(0, 4, (9, 11))]:
+                for footprint, origin in [(disk, 0), (disk, (1, -2)),
+                                          (holed, (-1, 0)),
+                                          (numpy.ones((1, 9), bool), (0, 3))]:
+                    for mode in self.modes:
+                        for rank in [1, 6, -2]:
+                            res = ndimage.rank_filter(arr.astype(dtype), rank,
+                                                      footprint=footprint,
+                                                      mode=mode, cval=5,
+                                                      origin=origin)
+                            ref = ndimage.rank_filter(arr, rank,
+                                                      footprint=footprint,
+                                                      mode=mode, cval=5,
+                                                      origin=origin)
+                            assert_equal(res, ref)
+
+    def test_rank17(self):
+        "rank filter 17"
+        state = numpy.random.RandomState(9)
+        footprint = state.rand(4, 5) > 0.4
+        for dtype in [numpy.uint8, numpy.uint16, numpy.float32,
+                      numpy.float64, numpy.int32]:
+            data = (state.rand(20, 23) * 250).astype(dtype)
+            for keywords in [{'size': (5, 7)}, {'size': (1, 15)},
+                             {'footprint': footprint}]:
+                for percentiles in [[84, 16, 50, 16], [100, 30, 0, 50, 60],
+                                    [0, 50, 100]]:
+                    result = ndimage.percentile_filter(data, percentiles,
+                                                       mode='wrap', **keywords)
+                    assert_equal(result.shape,
+                                 (len(percentiles),) + data.shape)
+                    for filtered, percentile in zip(result, percentiles):
+                        expected = ndimage.percentile_filter(data, percentile,
+                                                             mode='wrap',
+                                                             **keywords)
+                        assert_equal(filtered, expected)
+        result = ndimage.rank_filter(data, [0, -1], size=3,
+                                     output=numpy.float64)
+        assert_equal(result, [ndimage.minimum_filter(data, 3),
+                              ndimage.maximum_filter(data, 3)])
+        assert_raises(RuntimeError, ndimage.rank_filter, data, [1, 2], size=3,
+                      output=numpy.zeros(data.shape))
+
+    def test_rank18(self):
+        "rank filter 18"
+        # stacked ranks with a footprint longer than the array, run on
+        # several threads
+        numpy.random.seed(11)
+        footprint = numpy.ones((1, 7, 3), bool)
+        footprint[0, 1, 1:] = False
+        data = (numpy.random.random((2, 6, 5)) * 1000).astype(numpy.uint16)
+        for mode in ['nearest', 'reflect', 'constant']:
+            expected = [ndimage.rank_filter(data, rank, footprint=footprint,
+                                            mode=mode)
+                        for rank in [1, 4, 14]]
+            for workers in [1, 3]:
+                result = ndimage.rank_filter(data, [1, 4, 14],
+                                             footprint=footprint, mode=mode,
+                                             workers=workers)
+                assert_equal(result, expected)
+
     def test_generic_filter1d01(self):
         "generic 1d filter 1"
         weights = numpy.array([1.1, 2.2, 3.3])
@@ -1150,6 +1578,99 @@ class TestNdimage:
                             extra_keywords={'total': cf.sum()})
             assert_array_almost_equal(r1, r2)
 
+    def test_generic_filter02(self):
+        "generic filter 2"
+        def function(*args):
+            raise ValueError('error in callback')
+        arr = numpy.ones((5, 6))
+        assert_raises(ValueError, ndimage.generic_filter, arr, function, 3)
+        assert_raises(ValueError, ndimage.generic_filter1d, arr, function, 3)
+        assert_raises(ValueError, ndimage.geometric_transform, arr, function)
+
+    def test_generic_filter03(self):
+        "generic filter 3"
+        # ctypes function pointers are called as compiled functions, with the
+        # user data passed by address
+        import ctypes
+        doubles = ctypes.POINTER(ctypes.c_double)
+        intp = numpy.ctypeslib.c_intp
+        cint, voidp = ctypes.c_int, ctypes.c_void_p
+        @ctypes.CFUNCTYPE(cint, doubles, intp, doubles, voidp)
+        def scaled_sum(buffer, filter_size, return_value, user_data):
+            scale = ctypes.cast(user_data, doubles)[0] if user_data else 1.0
+            return_value[0] = scale * sum(buffer[ii]
+                                          for ii in range(filter_size))
+            return 1
+        @ctypes.CFUNCTYPE(cint, doubles, intp, doubles, intp, voidp)
+        def difference(iline, ilength, oline, olength, user_data):
+            for ii in range(olength):
+                oline[ii] = iline[ii + 1] - iline[ii]
+            return 1
+        @ctypes.CFUNCTYPE(cint, doubles, intp, doubles, voidp)
+        def failure(buffer, filter_size, return_value, user_data):
+            return 0
+        data = numpy.arange(20.0).reshape(4, 5) ** 2
+        expected = ndimage.generic_filter(data, numpy.sum, 3)
+        out = ndimage.generic_filter(data, scaled_sum, 3)
+        assert_almost_equal(out, expected)
+        scale = ctypes.c_double(0.5)
+        out = ndimage.generic_filter(data, scaled_sum, 3, user_data=scale)
+        assert_almost_equal(out, 0.5 * expected)
+        out = ndimage.generic_filter(data, scaled_sum, 3,
+                                     user_data=ctypes.pointer(scale))
+        assert_almost_equal(out, 0.5 * expected)
+        assert_almost_equal(ndimage.generic_filter1d(data, difference, 2),
+                            ndimage.correlate1d(data, [-1, 1]))
+        assert_raises(RuntimeError, ndimage.generic_filter, data, failure, 3)
+        assert_raises(ValueError, ndimage.generic_filter1d, data,
+                      scaled_sum, 2)
+        assert_raises(ValueError, ndimage.generic_filter, data, numpy.sum, 3,
+                      user_data=scale)
+        # capsules are called holding the GIL, and from a single thread
+        capsule = ctypes.pythonapi.PyCapsule_New
+        capsule.restype = ctypes.py_object
+        capsule.argtypes = [voidp, ctypes.c_char_p, voidp]
+        out = ndimage.generic_filter(data, capsule(
+                  ctypes.cast(scaled_sum, voidp), None, None), 3)
+        assert_almost_equal(out, expected)
+        @ctypes.CFUNCTYPE(cint, ctypes.POINTER(intp), doubles, cint, cint,
+                          voidp)
+        def shifted(ocoor, icoor, orank, irank, user_data):
+            icoor[0] = ocoor[0] - 0.5
+            icoor[1] = ocoor[1] * 0.5
+            return 1
+        out = ndimage.geometric_transform(data, capsule(
+                  ctypes.cast(shifted, voidp), None, None), workers=3)
+        assert_almost_equal(out, ndimage.geometric_transform(data,
+                                     lambda c: (c[0] - 0.5, c[1] * 0.5)))
+
+    def test_generic_filter04(self):
+        "generic filter 4"
+        data = numpy.arange(13 * 17) * 37 % 100
+        data = data.reshape(13, 17).astype(numpy.int16)
+        footprint = [[0, 1, 0], [1, 1, 1], [0, 1, 1]]
+        for mode in self.modes:
+            expected = ndimage.generic_filter(data, numpy.median,
+                                              footprint=footprint, mode=mode,
+                                              cval=5)
+            for chunk_size in [None, 1, 10, 1000]:
+                out = ndimage.generic_filter(data, numpy.median,
+                                             footprint=footprint, mode=mode,
+                                             cval=5, vectorized=True,
+                                             chunk_size=chunk_size,
+                                             extra_keywords={'axis': 1})
+                assert_array_equal(out, expected)
+        def first(block, c):
+            return block[:, 0] + c
+        out = ndimage.generic_filter(data, first, size=2, vectorized=True,
+                                     extra_arguments=(2.0,))
+        expected = ndimage.generic_filter(data, lambda x: x[0] + 2, 2)
+        assert_array_equal(out, expected)
+        assert_raises(ValueError, ndimage.generic_filter, data, numpy.sum, 3,
+                      vectorized=True)
+        assert_raises(ValueError, ndimage.generic_filter, data, numpy.mean, 3,
+                      vectorized=True, chunk_size=0)
+
     def test_extend01(self):
         "line extension 1"
         array = numpy.array([1, 2, 3])
@@ -1334,6 +1855,369 @@ class TestNdimage:
                                                            cval=-1,mode=mode,
                                                            output_shape=(4,)))
 
+    def test_separable_tiles01(self):
+        "separable filter tiles 1"
+        # filtering tile by tile along all axes must match the separate
+        # one-dimensional filters
+        from stsci.ndimage import filters
+        numpy.random.seed(7)
+        arr = numpy.random.random((23, 17, 19)) * 100
+        def run(data, mode):
+            return [ndimage.gaussian_filter(data, 1.5, mode=mode, cval=3.0),
+                    ndimage.maximum_filter(data, (2, 5, 3), mode=mode,
+                                           cval=3.0, origin=(0, 1, -1)),
+                    ndimage.minimum_filter(data, 4, mode=mode, cval=3.0),
+                    ndimage.uniform_filter(data, (5, 1, 3), mode=mode,
+                                           cval=3.0)]
+        tile_size = filters._SEPARABLE_TILE_SIZE
+        min_size = filters._SEPARABLE_MIN_SIZE
+        try:
+            filters._SEPARABLE_MIN_SIZE = 0
+            for size in [tile_size, 600]:
+                for mode in self.modes:
+                    for dtype in [numpy.float64, numpy.int16]:
+                        data = arr.astype(dtype)
+                        filters._SEPARABLE_TILE_SIZE = 0
+                        refs = run(data, mode)
+                        filters._SEPARABLE_TILE_SIZE = size
+                        res = run(data, mode)
+                        for rr, ref in zip(res[:3], refs[:3]):
+                            assert_equal(rr, ref)
+                        # the running sums of the uniform filter restart at
+                        # each tile, which only changes the rounding of floats
+                        if dtype == numpy.float64:
+                            assert_almost_equal(res[3], refs[3])
+                        else:
+                            assert_equal(res[3], refs[3])
+        finally:
+            filters._SEPARABLE_TILE_SIZE = tile_size
+            filters._SEPARABLE_MIN_SIZE = min_size
+
+    def test_separable_tiles02(self):
+        "separable filter tiles 2"
+        # arrays of three dimensions are tiled along their outer axes,
+        # keeping whole lines along the last axis
+        from stsci.ndimage import filters
+        numpy.random.seed(12)
+        arr = numpy.random.random((40, 44, 48)) * 100
+        tile = filters._separable_tile_shape((128, 128, 128), [9] * 3,
+                                             [9] * 3)
+        assert_equal(tile[2], 128)
+        assert_equal(tile[0] * tile[1] < 128 * 128, True)
+        def run(data, mode):
+            return [ndimage.gaussian_filter(data, 0.5, mode=mode, cval=3.0),
+                    ndimage.gaussian_gradient_magnitude(data, 0.5, mode=mode,
+                                                        cval=3.0),
+                    ndimage.gaussian_laplace(data, 0.5, mode=mode, cval=3.0),
+                    ndimage.maximum_filter(data, (2, 5, 3), mode=mode,
+                                           cval=3.0, origin=(0, 1, -1))]
+        tile_size = filters._SEPARABLE_TILE_SIZE
+        min_size = filters._SEPARABLE_MIN_SIZE
+        try:
+            filters._SEPARABLE_MIN_SIZE = 0
+            filters._SEPARABLE_TILE_SIZE = 4000
+            tile = filters._separable_tile_shape(arr.shape, [5] * 3,
+                                                 [5] * 3)
+            assert_equal(tile[2], arr.shape[2])
+            assert_equal(tile[0] * tile[1] < arr.shape[0] * arr.shape[1],
+                         True)
+            for mode in self.modes:
+                for dtype in [numpy.float64, numpy.int16]:
+                    data = arr.astype(dtype)
+                    filters._SEPARABLE_TILE_SIZE = 0
+                    refs = run(data, mode)
+                    filters._SEPARABLE_TILE_SIZE = 4000
+                    for rr, ref in zip(run(data, mode), refs):
+                        assert_equal(rr, ref)
+        finally:
+            filters._SEPARABLE_TILE_SIZE = tile_size
+            filters._SEPARABLE_MIN_SIZE = min_size
+
+    def test_workers01(self):
+        "workers 1"
+        # the result must not depend on the number of threads
+        from stsci.ndimage import filters
+        numpy.random.seed(8)
+        arr = numpy.random.random((23, 17, 19)) * 100
+        footprint = numpy.array([[[1, 0, 1], [0, 1, 1]],
+                                 [[1, 1, 0], [0, 1, 0]]])
+        def run(data, workers):
+            return [ndimage.correlate1d(data, [1, 3, -2], 1, workers=workers),
+                    ndimage.correlate(data, footprint * 1.5, mode='constant',
+                                      workers=workers),
+                    ndimage.uniform_filter1d(data, 4, 0, workers=workers),
+                    ndimage.uniform_filter(data, 3, workers=workers),
+                    ndimage.minimum_filter1d(data, 5, 2, workers=workers),
+                    ndimage.maximum_filter(data, 3, mode='wrap',
+                                           workers=workers),
+                    ndimage.minimum_filter(data, footprint=footprint,
+                                           workers=workers),
+                    ndimage.median_filter(data, 4, workers=workers),
+                    ndimage.rank_filter(data, 2, footprint=footprint,
+                                        workers=workers),
+                    ndimage.percentile_filter(data, 30, (1, 3, 9),
+                                              workers=workers),
+                    ndimage.gaussian_filter(data, 1.5, workers=workers),
+                    ndimage.gaussian_filter1d(data, 2.0, 1, 1,
+                                              method='recursive',
+                                              workers=workers)]
+        tile_size = filters._SEPARABLE_TILE_SIZE
+        min_size = filters._SEPARABLE_MIN_SIZE
+        try:
+            filters._SEPARABLE_MIN_SIZE = 0
+            for size in [tile_size, 600]:
+                filters._SEPARABLE_TILE_SIZE = size
+                for data in [arr, arr.astype(numpy.uint8),
+                             arr.astype(numpy.int16)]:
+                    refs = run(data, 1)
+                    for workers in [3, 4, -1]:
+                        for rr, ref in zip(run(data, workers), refs):
+                            assert_equal(rr, ref)
+        finally:
+            filters._SEPARABLE_TILE_SIZE = tile_size
+            filters._SEPARABLE_MIN_SIZE = min_size
+
+    def test_workers02(self):
+        "workers 2"
+        for workers in [0, -2]:
+            assert_raises(ValueError, ndimage.uniform_filter,
+                          numpy.ones((4, 4)), 3, workers=workers)
+
+    def test_workers03(self):
+        "workers 3"
+        # footprints longer than the array, with a number of lines that
+        # does not divide evenly between the threads
+        numpy.random.seed(10)
+        footprint = numpy.ones((7, 3), bool)
+        footprint[1, 1:] = False
+        def run(data, footprint, mode, workers):
+            return [ndimage.correlate(data, footprint * 1.5, mode=mode,
+                                      workers=workers),
+                    ndimage.minimum_filter(data, footprint=footprint,
+                                           mode=mode, workers=workers),
+                    ndimage.rank_filter(data, 4, footprint=footprint,
+                                        mode=mode, workers=workers)]
+        arr = numpy.random.random((6, 5)) * 100
+        for mode in ['reflect', 'constant', 'nearest']:
+            expected = run(arr, footprint, mode, 1)
+            for workers in [2, 3]:
+                assert_array_almost_equal(run(arr, footprint, mode, workers),
+                                          expected)
+        for shape in [(2, 6, 5), (8, 6, 5)]:
+            arr = (numpy.random.random(shape) * 100).astype(numpy.int32)
+            assert_equal(run(arr, footprint[None], 'reflect', 3),
+                         run(arr, footprint[None], 'reflect', 1))
+
+    def test_python_threads01(self):
+        "python threads 1"
+        # calls that release the GIL, with and without Python callbacks,
+        # must give the same results when run from several threads at once
+        import threading
+        numpy.random.seed(9)
+        arr = numpy.random.random((40, 30))
+        def run():
+            return [ndimage.generic_filter(arr, numpy.mean, 3),
+                    ndimage.geometric_transform(arr,
+                                                lambda c: (c[0] * 0.9, c[1])),
+                    ndimage.median_filter(arr, 5),
+                    ndimage.label(arr > 0.5)[0],
+                    ndimage.distance_transform_edt(arr > 0.3),
+                    ndimage.binary_erosion(arr > 0.3, iterations=0)]
+        refs = run()
+        results = [None] * 4
+        def work(index):
+            results[index] = run()
+        threads = [threading.Thread(target=work, args=(ii,))
+                   for ii in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for result in results:
+            for rr, ref in zip(result, refs):
+                assert_equal(rr, ref)
+
+    def test_precision01(self):
+        "precision 1"
+        # the single precision path must agree with the double precision
+        # path to float32 accuracy, also for borders longer than the lines,
+        # and is only used when it is selected
+        numpy.random.seed(10)
+        data = numpy.random.random((5, 3, 40)).astype(numpy.float32)
+        weights = numpy.random.random(41)
+        for mode in self.modes:
+            for axis in range(3):
+                for function, args in [(ndimage.correlate1d, (weights,)),
+                                       (ndimage.uniform_filter1d, (9,)),
+                                       (ndimage.minimum_filter1d, (7,)),
+                                       (ndimage.maximum_filter1d, (2,))]:
+                    ref = function(data, *args, axis=axis, mode=mode, cval=0.5,
+                                   precision='double')
+                    assert_equal(function(data, *args, axis=axis, mode=mode,
+                                          cval=0.5), ref)
+                    out = function(data, *args, axis=axis, mode=mode, cval=0.5,
+                                   precision='single')
+                    assert_equal(out.dtype, numpy.float32)
+                    assert_almost_equal(out, ref, decimal=5)
+                    out = function(data.astype(numpy.float64), *args,
+                                   axis=axis, mode=mode, cval=0.5,
+                                   precision='single')
+                    assert_almost_equal(out, ref, decimal=5)
+        for order in range(2, 6):
+            ref = ndimage.spline_filter(data, order, numpy.float32,
+                                        precision='double')
+            assert_equal(ndimage.spline_filter(data, order, numpy.float32),
+                         ref)
+            out = ndimage.spline_filter(data, order, numpy.float32,
+                                        precision='single')
+            assert_almost_equal(out, ref, decimal=5)
+        for function, args in [(ndimage.gaussian_filter, (2.0,)),
+                               (ndimage.uniform_filter, (9,))]:
+            assert_equal(function(data, *args),
+                         function(data, *args, precision='double'))
+        assert_raises(ValueError, ndimage.uniform_filter1d, data, 3,
+                      precision='half')
+
+    def test_buffer_size01(self):
+        "buffer size 1"
+        # the results must not depend on the number of lines buffered
+        from stsci.ndimage import filters
+        numpy.random.seed(11)
+        data = numpy.random.random((7, 9, 33))
+        def difference(iline, oline):
+            oline[...] = iline[1:] - iline[:-1]
+        def run(size):
+            return [ndimage.correlate1d(data, [1, 2, 3], 1, buffer_size=size),
+                    ndimage.uniform_filter1d(data, 4, 0, buffer_size=size),
+                    ndimage.minimum_filter1d(data, 5, 2, buffer_size=size),
+                    ndimage.gaussian_filter1d(data, 3.0, 1, method='recursive',
+                                              buffer_size=size),
+                    ndimage.generic_filter1d(data, difference, 2, 1,
+                                             buffer_size=size),
+                    ndimage.spline_filter(data, buffer_size=size)]
+        refs = run(None)
+        for buffer_size in [1, 300, 10000]:
+            for rr, ref in zip(run(buffer_size), refs):
+                assert_equal(rr, ref)
+        assert_raises(ValueError, ndimage.uniform_filter1d, data, 3,
+                      buffer_size=0)
+        default = filters.default_buffer_size
+        try:
+            best = filters.tune_buffer_size((8, 20), [1000, 2000], repeat=1)
+            assert_(best in [1000, 2000])
+            assert_equal(filters.default_buffer_size, best)
+            for rr, ref in zip(run(None), refs):
+                assert_equal(rr, ref)
+        finally:
+            filters.default_buffer_size = default
+
+    def test_normalized01(self):
+        "normalized filters 1"
+        data = numpy.random.RandomState(5).rand(15, 17)
+        mask = numpy.random.RandomState(6).rand(15, 17) > 0.3
+        weights = mask.astype(numpy.float64)
+        for mode in ['reflect', 'constant', 'wrap']:
+            result = ndimage.gaussian_filter(data, [2, 1], mode=mode,
+                                             cval=0.5, mask=mask)
+            num = ndimage.gaussian_filter(data * weights, [2, 1], mode=mode,
+                                          cval=0.5)
+            den = ndimage.gaussian_filter(weights, [2, 1], mode=mode,
+                                          cval=1.0)
+            assert_almost_equal(result, num / den)
+            result, filtered = ndimage.uniform_filter(data, 3, mode=mode,
+                                                      mask=mask,
+                                                      return_weights=True)
+            den = ndimage.uniform_filter(weights, 3, mode=mode, cval=1.0)
+            assert_almost_equal(filtered, den)
+            num = ndimage.uniform_filter(data * weights, 3, mode=mode)
+            assert_almost_equal(result * filtered, num)
+        result = ndimage.correlate1d(data, [1, 2, 1], 0,
+                                     mask=numpy.ones(data.shape))
+        expected = ndimage.correlate1d(data, [0.25, 0.5, 0.25], 0)
+        assert_almost_equal(result, expected)
+        nans = numpy.where(mask, data, numpy.nan)
+        result = ndimage.gaussian_filter(nans, 2, nan_policy='ignore')
+        assert_almost_equal(result,
+                            ndimage.gaussian_filter(data, 2, mask=mask))
+        assert_equal(numpy.isnan(ndimage.uniform_filter(numpy.zeros(5), 3,
+                                                        mask=numpy.zeros(5))),
+                     [True] * 5)
+        assert_raises(ValueError, ndimage.gaussian_filter, data, 1, 1,
+                      mask=mask)
+        assert_raises(ValueError, ndimage.uniform_filter, data, 3,
+                      nan_policy='omit')
+
+    def test_axes01(self):
+        "filter axes 1"
+        data = numpy.random.RandomState(7).rand(4, 9, 10)
+        structure = numpy.array([[0, 1, 1], [1, 1, 0]], bool)
+
+        def frames(func, *args, **kwargs):
+            return numpy.array([func(frame, *args, **kwargs)
+                                for frame in data])
+
+        result = ndimage.gaussian_filter(data, [1.0, 2.0], axes=(1, 2))
+        assert_almost_equal(result,
+                            frames(ndimage.gaussian_filter, [1.0, 2.0]))
+        result = ndimage.median_filter(data, footprint=structure,
+                                       axes=(1, 2))
+        assert_equal(result,
+                     frames(ndimage.median_filter, footprint=structure))
+        result = ndimage.binary_erosion(data > 0.3, structure, axes=(2, 1))
+        expected = numpy.array([ndimage.binary_erosion(frame > 0.3,
+                                                       structure.T)
+                                for frame in data])
+        assert_equal(result, expected)
+        result = ndimage.grey_dilation(data, size=(2, 3), axes=(1, 2))
+        assert_equal(result, frames(ndimage.grey_dilation, size=(2, 3)))
+        result = ndimage.zoom(data, [1.5, 0.5], axes=(1, 2))
+        assert_almost_equal(result, frames(ndimage.zoom, [1.5, 0.5]))
+        assert_almost_equal(ndimage.gaussian_filter(data, 1.0, axes=-1),
+                            ndimage.gaussian_filter1d(data, 1.0, -1))
+        assert_raises(ValueError, ndimage.uniform_filter, data, 3,
+                      axes=(1, -2))
+
+    def test_tiled_filter01(self):
+        "tiled filter 1"
+        data = numpy.random.RandomState(8).rand(23, 19).astype(numpy.float32)
+        cases = [(ndimage.gaussian_filter, {'sigma': 1.5}),
+                 (ndimage.median_filter, {'size': (5, 3), 'origin': (1, 0)}),
+                 (ndimage.uniform_filter, {'size': 4, 'mode': 'wrap'}),
+                 (ndimage.grey_closing, {'size': 3}),
+                 (ndimage.sobel, {'axis': 0})]
+        for function, keywords in cases:
+            expected = function(data, **keywords)
+            for tile_shape in [None, (4, 7)]:
+                for workers in [1, 3]:
+                    result = ndimage.tiled_filter(function, data,
+                                                  tile_shape=tile_shape,
+                                                  memory=8000, workers=workers,
+                                                  extra_keywords=keywords)
+                    assert_equal(result, expected)
+        mask = data > 0.5
+        result = ndimage.tiled_filter(ndimage.binary_dilation, mask,
+                                      memory=2000,
+                                      extra_keywords={'iterations': 2})
+        assert_equal(result, ndimage.binary_dilation(mask, iterations=2))
+        assert_raises(RuntimeError, ndimage.tiled_filter,
+                      ndimage.binary_fill_holes, mask)
+        assert_raises(RuntimeError, ndimage.tiled_filter, lambda x: x, data)
+        assert_raises(RuntimeError, ndimage.tiled_filter,
+                      ndimage.gaussian_filter, data,
+                      extra_keywords={'sigma': 2, 'method': 'recursive'})
+        # the tiles of a Fortran-ordered array span its leading axis:
+        data = numpy.asfortranarray(data)
+        shapes = []
+
+        def record(tile):
+            shapes.append(tile.shape)
+            return ndimage.gaussian_filter(tile, 1.5)
+
+        result = ndimage.tiled_filter(record, data, halo=6, memory=8000)
+        assert_equal(result, ndimage.gaussian_filter(data, 1.5))
+        assert_equal(len(shapes) > 1, True)
+        assert_equal([shape[0] for shape in shapes], [23] * len(shapes))
+
     def test_fourier_gaussian_real01(self):
         "gaussian fourier filter for real transforms 1"
         for shape in [(32, 16), (31, 15)]:
@@ -1490,6 +2374,71 @@ class TestNdimage:
                                            [1, 1, 1, 1],
                                            [1, 1, 1, 1]])
 
+    def test_spline06(self):
+        "spline filter 6"
+        data = numpy.arange(9 * 11 * 13, dtype=numpy.float64)
+        data = (data * 7 % 23).reshape(9, 11, 13)
+        for order in range(2, 6):
+            out = ndimage.spline_filter(data, order)
+            for workers in [2, 5, -1]:
+                assert_array_equal(ndimage.spline_filter(data, order,
+                                                         workers=workers),
+                                   out)
+
+    def test_spline_interpolator01(self):
+        "spline interpolator 1"
+        data = numpy.array([[4, 1, 3, 2],
+                               [7, 6, 8, 5],
+                               [3, 5, 3, 6]], numpy.float64)
+        idx = numpy.indices(data.shape, numpy.float64) * 1.3 - 0.7
+        for order in range(0, 6):
+            for mode in self.modes:
+                interpolator = ndimage.SplineInterpolator(data, order, mode,
+                                                          2.0)
+                out1 = interpolator(idx)
+                out2 = ndimage.map_coordinates(data, idx, order=order,
+                                               mode=mode, cval=2.0)
+                assert_array_equal(out1, out2)
+                out1 = interpolator(idx[:, 1, 2])
+                assert_array_equal(out1, out2[1, 2])
+
+    def test_spline_interpolator02(self):
+        "spline interpolator 2"
+        data = numpy.array([[4, 1, 3, 2],
+                               [7, 6, 8, 5],
+                               [3, 5, 3, 6]], numpy.float64)
+        for order in range(0, 6):
+            for mode in self.modes:
+                interpolator = ndimage.SplineInterpolator(data, order, mode,
+                                                          2.0)
+                kwargs = {'order': order, 'mode': mode, 'cval': 2.0}
+                assert_array_equal(interpolator.shift([1.5, -0.3]),
+                                   ndimage.shift(data, [1.5, -0.3],
+                                                 **kwargs))
+                assert_array_equal(interpolator.zoom(1.5),
+                                   ndimage.zoom(data, 1.5, **kwargs))
+                assert_array_equal(interpolator.affine([[0.9, 0.2],
+                                                        [-0.1, 1.1]],
+                                                       1.0, (5, 5)),
+                                   ndimage.affine_transform(data,
+                                       [[0.9, 0.2], [-0.1, 1.1]], 1.0,
+                                       (5, 5), **kwargs))
+
+    def test_spline_interpolator03(self):
+        "spline interpolator 3"
+        data = numpy.array([[4, 1, 3, 2],
+                               [7, 6, 8, 5],
+                               [3, 5, 3, 6]], numpy.float64)
+        idx = numpy.indices(data.shape, numpy.float64) * 1.3 - 0.7
+        for order in range(0, 6):
+            interpolator = ndimage.SplineInterpolator(data, order,
+                                                      dtype=numpy.float32)
+            out = ndimage.map_coordinates(data, idx, order=order)
+            assert_array_almost_equal(interpolator(idx), out, 4)
+        assert_raises(RuntimeError, ndimage.SplineInterpolator, data, 6)
+        assert_raises(RuntimeError, ndimage.SplineInterpolator, data,
+                      dtype=numpy.int32)
+
     def test_geometric_transform01(self):
         "geometric transform 1"
         data = numpy.array([1])
@@ -1751,6 +2700,108 @@ class TestNdimage:
                                 extra_keywords={'b': 2})
             assert_array_almost_equal(out, [5, 7])
 
+    def test_geometric_transform25(self):
+        "geometric transform 25"
+        data = numpy.arange(9 * 11 * 13, dtype=numpy.float64)
+        data = (data * 7 % 23).reshape(9, 11, 13)
+        def mapping(x):
+            return (x[0], x[1] * 0.9, x[2] + 0.5)
+        for order in range(0, 6):
+            out = ndimage.geometric_transform(data, mapping, order=order)
+            for workers in [2, 5, -1]:
+                assert_array_equal(ndimage.geometric_transform(data,
+                                       mapping, order=order,
+                                       workers=workers), out)
+
+    def test_geometric_transform26(self):
+        "geometric transform 26"
+        data = numpy.arange(23 * 31, dtype=numpy.float64)
+        data = (data * 7 % 29).reshape(23, 31)
+        def mapping(x, shift, scale=1.0):
+            return (x[0] * 0.9 + shift, x[1] + 0.01 * scale * x[0] * x[1])
+        def batch_mapping(x, shift, scale=1.0):
+            return numpy.array(mapping(x, shift, scale))
+        for order in range(0, 6):
+            for shape in [(23, 31), (40, 7)]:
+                out1 = ndimage.geometric_transform(data, mapping, shape,
+                                order=order, extra_arguments=(0.3,),
+                                extra_keywords={'scale': 2.0})
+                out2 = ndimage.geometric_transform(data, batch_mapping,
+                                shape, order=order, extra_arguments=(0.3,),
+                                extra_keywords={'scale': 2.0}, batch=True)
+                assert_array_equal(out1, out2)
+        assert_raises(RuntimeError, ndimage.geometric_transform, data,
+                      lambda x: x[:1], batch=True)
+
+    def test_geometric_transform27(self):
+        "geometric transform 27"
+        data = numpy.arange(23 * 31, dtype=numpy.float64)
+        data = (data * 7 % 29).reshape(23, 31)
+        coefficients = numpy.array([[1.5, 0.9, 0.01, 0.002],
+                                    [-2.0, 0.05, 1.1, 0.001]])
+        exponents = [[0, 0], [1, 0], [0, 1], [1, 1]]
+        def mapping(x):
+            y0, y1 = x[0] - 3.0, x[1] + 2.0
+            return tuple(numpy.dot(coefficients, [1.0, y0, y1, y0 * y1]))
+        polynomial = ndimage.polynomial_mapping(coefficients, exponents,
+                                                (3, -2))
+        for order in range(0, 6):
+            out = ndimage.geometric_transform(data, mapping, order=order)
+            for workers in [1, 3]:
+                assert_array_almost_equal(ndimage.geometric_transform(data,
+                                              polynomial, order=order,
+                                              workers=workers), out)
+        assert_raises(ValueError, ndimage.polynomial_mapping, coefficients,
+                      [[0, 0], [1, 0], [0, -1], [1, 1]])
+
+    def test_geometric_transform28(self):
+        "geometric transform 28"
+        data = numpy.arange(23 * 31, dtype=numpy.float64)
+        data = (data * 7 % 29).reshape(23, 31)
+        grid = numpy.mgrid[0:24:6, 0:31:10].astype(numpy.float64)
+        grid += (numpy.arange(32).reshape(2, 4, 4) * 5 % 7) * 0.4
+        idx = numpy.mgrid[0:19, 0:31] / numpy.array([6.0, 10.0])[:, None, None]
+        for order in range(1, 6):
+            coordinates = [ndimage.map_coordinates(grid[ii], idx, order=order,
+                                                   mode='nearest')
+                           for ii in range(2)]
+            out = ndimage.geometric_transform(data,
+                      ndimage.grid_mapping(grid, (6, 10), order=order),
+                      (19, 31))
+            assert_array_almost_equal(out, ndimage.map_coordinates(data,
+                                                                 coordinates))
+        # beyond the grid, a linear grid is extended linearly:
+        grid = numpy.mgrid[0:3, 0:3] * 2.0 + 1.0
+        out = ndimage.geometric_transform(data[:20, :20],
+                                          ndimage.grid_mapping(grid, 5, 10))
+        def mapping(x):
+            return (x[0] * 0.4 - 3.0, x[1] * 0.4 - 3.0)
+        assert_array_almost_equal(out, ndimage.geometric_transform(
+                                           data[:20, :20], mapping))
+        assert_raises(RuntimeError, ndimage.grid_mapping, grid, order=0)
+
+    def test_geometric_transform29(self):
+        "geometric transform 29"
+        data = numpy.arange(20, dtype=numpy.float64)
+        # far beyond the grid, a linear grid is extended linearly:
+        for order in range(1, 6):
+            mapping = ndimage.grid_mapping([[0.0, 5.0]], 10, order=order)
+            out = ndimage.geometric_transform(data, mapping, (36,), order=1)
+            assert_array_almost_equal(out[[25, 30, 35]], [12.5, 15, 17.5])
+            mapping = ndimage.grid_mapping([[17.5, 20.0]], 10, 30,
+                                           order=order)
+            out = ndimage.geometric_transform(data, mapping, (10,), order=1)
+            assert_array_almost_equal(out[[0, 5]], [10.0, 11.25])
+        polynomial = ndimage.polynomial_mapping([[1.0, 0.0], [0.0, 1.0]],
+                                                [[1, 0], [0, 1]])
+        assert_raises(RuntimeError, ndimage.geometric_transform, data,
+                      polynomial)
+        assert_raises(RuntimeError, ndimage.geometric_transform,
+                      data.reshape(4, 5), polynomial, batch=True)
+        mapping = ndimage.grid_mapping([[0.0, 5.0]], 10)
+        assert_raises(RuntimeError, ndimage.geometric_transform,
+                      data.reshape(4, 5), mapping)
+
     def test_map_coordinates01(self):
         "map coordinates 1"
         data = numpy.array([[4, 1, 3, 2],
@@ -1777,6 +2828,17 @@ class TestNdimage:
                                                      order=order)
             assert_array_almost_equal(out1, out2)
 
+    def test_map_coordinates03(self):
+        "map coordinates 3"
+        data = numpy.arange(9 * 11 * 13, dtype=numpy.float64)
+        data = (data * 7 % 23).reshape(9, 11, 13)
+        idx = numpy.indices((8, 7, 6), numpy.float64) * 1.7 - 1.0
+        for order in range(0, 6):
+            out = ndimage.map_coordinates(data, idx, order=order)
+            for workers in [2, 5, -1]:
+                assert_array_equal(ndimage.map_coordinates(data, idx,
+                                       order=order, workers=workers), out)
+
     def test_affine_transform01(self):
         "affine_transform 1"
         data = numpy.array([1])
@@ -2006,6 +3068,20 @@ class TestNdimage:
                                                      (2,), order=order)
             assert_array_almost_equal(out, [1, 9])
 
+    def test_affine_transform22(self):
+        "affine transform 22"
+        data = numpy.arange(9 * 11 * 13, dtype=numpy.float64)
+        data = (data * 7 % 23).reshape(9, 11, 13)
+        for matrix in [[[0.9, 0.2, 0.0], [-0.1, 1.1, 0.1], [0.0, 0.1, 1.0]],
+                       [0.8, 1.2, 1.0]]:
+            for order in range(0, 6):
+                out = ndimage.affine_transform(data, matrix, 0.5,
+                                               order=order)
+                for workers in [2, 5, -1]:
+                    assert_array_equal(ndimage.affine_transform(data,
+                                           matrix, 0.5, order=order,
+                                           workers=workers), out)
+
     def test_shift01(self):
         "shift 1"
         data = numpy.array([1])
@@ -2096,6 +3172,16 @@ class TestNdimage:
                                        [0, 4, 1, 3],
                                        [0, 7, 6, 8]])
 
+    def test_shift10(self):
+        "shift 10"
+        data = numpy.arange(9 * 11 * 13, dtype=numpy.float64)
+        data = (data * 7 % 23).reshape(9, 11, 13)
+        for order in range(0, 6):
+            out = ndimage.shift(data, [0.5, -1.2, 2.3], order=order)
+            for workers in [2, 5, -1]:
+                assert_array_equal(ndimage.shift(data, [0.5, -1.2, 2.3],
+                                       order=order, workers=workers), out)
+
     def test_zoom1(self):
         "zoom 1"
         for order in range(0,6):
@@ -2115,6 +3201,16 @@ class TestNdimage:
         out = ndimage.zoom(ndimage.zoom(arr,2),0.5)
         assert_array_equal(out,arr)
 
+    def test_zoom3(self):
+        "zoom 3"
+        data = numpy.arange(9 * 11 * 13, dtype=numpy.float64)
+        data = (data * 7 % 23).reshape(9, 11, 13)
+        for order in range(0, 6):
+            out = ndimage.zoom(data, 1.3, order=order)
+            for workers in [2, 5, -1]:
+                assert_array_equal(ndimage.zoom(data, 1.3, order=order,
+                                                workers=workers), out)
+
     def test_zoom_affine01(self):
         "zoom by affine transformation 1"
         data = [[1, 2, 3, 4],
@@ -2244,6 +3340,33 @@ class TestNdimage:
                                            reshape=False)
             assert_array_almost_equal(out, expected)
 
+    def test_rotate09(self):
+        "rotate 9"
+        data = numpy.arange(6 * 5 * 7 * 3, dtype=numpy.float64)
+        data = (data * 7 % 19).reshape(6, 5, 7, 3)
+        for order in range(0, 6):
+            for reshape in [True, False]:
+                out = ndimage.rotate(data, 25, (2, 0), reshape,
+                                     order=order, mode='nearest')
+                for ii in range(data.shape[1]):
+                    for jj in range(data.shape[3]):
+                        expected = ndimage.rotate(data[:, ii, :, jj], 25,
+                                                  (1, 0), reshape,
+                                                  order=order,
+                                                  mode='nearest')
+                        assert_array_almost_equal(out[:, ii, :, jj],
+                                                  expected)
+
+    def test_rotate10(self):
+        "rotate 10"
+        data = numpy.arange(9 * 11 * 13, dtype=numpy.float64)
+        data = (data * 7 % 23).reshape(9, 11, 13)
+        for order in range(0, 6):
+            out = ndimage.rotate(data, 30, (2, 0), order=order)
+            for workers in [2, 5, -1]:
+                assert_array_equal(ndimage.rotate(data, 30, (2, 0),
+                                       order=order, workers=workers), out)
+
     def test_watershed_ift01(self):
         "watershed_ift 1"
         data = numpy.array([[0, 0, 0, 0, 0, 0, 0],
@@ -0,0 +1,321 @@
+"""Out-of-core execution of filters over arrays in tiles.
+
+The arrays are processed in tiles that are read in the order of the
+elements in memory, C or Fortran, each extended by the halo that the filter needs, so
+that memory-mapped arrays larger than the memory can be filtered into a
+memory-mapped output within a bounded memory budget.
+"""
+
+from __future__ import division
+import itertools
+import threading
+import numpy
+from . import _ni_support
+from . import filters
+
+try:
+    from inspect import getfullargspec as _getargspec
+except ImportError:
+    from inspect import getargspec as _getargspec
+
+__all__ = ['tiled_filter']
+
+# the default memory budget in bytes of the tiles of tiled_filter:
+default_memory = 2 ** 28
+
+# the bytes per element of the intermediate results of the filters, in
+# addition to the input and output tiles:
+_WORK_BYTES = 16
+
+# filters that reach one element along all axes:
+_NEIGHBOUR_FILTERS = ('laplace', 'prewitt', 'sobel')
+
+# operations that apply their footprint twice:
+_COMPOSED_FILTERS = ('binary_opening', 'binary_closing', 'grey_opening',
+                     'grey_closing', 'white_tophat', 'black_tophat')
+
+# operations that depend on the whole input:
+_GLOBAL_FILTERS = ('binary_fill_holes', 'binary_propagation')
+
+
+def _arguments(function, extra_arguments, extra_keywords):
+    """Return the arguments of a call of the function, by name, including
+    the defaults of the arguments that are not given.
+    """
+    try:
+        spec = _getargspec(function)
+    except TypeError:
+        return dict(extra_keywords)
+    names = spec.args[1:]
+    defaults = spec.defaults or ()
+    arguments = dict(zip(names[len(names) - len(defaults):], defaults))
+    arguments.update(zip(names, extra_arguments))
+    arguments.update(extra_keywords)
+    return arguments
+
+
+def _filter_reach(function, rank, arguments):
+    """Return the number of elements along each axis that the function
+    reads beyond an element, as derived from its arguments.
+    """
+    name = getattr(function, '__name__', '')
+    if name in _GLOBAL_FILTERS:
+        raise RuntimeError('%s cannot be tiled' % name)
+    if arguments.get('method') == 'recursive':
+        # the recursive filters reach the whole input:
+        raise RuntimeError('the recursive method cannot be tiled without '
+                           'a halo')
+    if arguments.get('axis') is not None and name not in _NEIGHBOUR_FILTERS:
+        axes = _ni_support._check_axes(arguments['axis'], rank)
+    else:
+        axes = _ni_support._check_axes(arguments.get('axes'), rank)
+    reach = None
+    for key in ('footprint', 'structure', 'structure1', 'structure2',
+                'weights'):
+        if arguments.get(key) is None:
+            continue
+        footprint = numpy.asarray(arguments[key])
+        if footprint.ndim == 1 and len(axes) == 1:
+            sizes = [1] * rank
+            sizes[axes[0]] = footprint.shape[0]
+        else:
+            sizes = _ni_support._expand_footprint(footprint, axes,
+                                                  rank).shape
+            if len(sizes) != rank:
+                raise RuntimeError('footprint rank must equal input rank')
+        if reach is None:
+            reach = [0] * rank
+        reach = [max(rr, size // 2) for rr, size in zip(reach, sizes)]
+    size = arguments.get('size', arguments.get('filter_size'))
+    if reach is None:
+        if size is not None:
+            sizes = _ni_support._expand_sequence(size, axes, rank, 1)
+            reach = [int(ss) // 2 for ss in sizes]
+        elif arguments.get('sigma') is not None:
+            sigmas = _ni_support._expand_sequence(arguments['sigma'], axes,
+                                                  rank, 0.0)
+            reach = [int(4.0 * float(sigma) + 0.5) for sigma in sigmas]
+        elif name in _NEIGHBOUR_FILTERS:
+            reach = [1] * rank
+        elif name.startswith('binary_'):
+            # the default structure has a connectivity of one:
+            reach = _ni_support._expand_sequence(1, axes, rank, 0)
+        else:
+            raise RuntimeError('the halo of %s cannot be derived from its '
+                               'arguments, a halo must be given' %
+                               (name or 'the function'))
+    origins = arguments.get('origin')
+    if origins is not None:
+        origins = _ni_support._expand_sequence(origins, axes, rank, 0)
+        reach = [rr + abs(int(oo)) for rr, oo in zip(reach, origins)]
+    iterations = arguments.get('iterations')
+    if iterations is not None:
+        if iterations < 1:
+            raise RuntimeError('iterations until convergence cannot be '
+                               'tiled')
+        reach = [rr * int(iterations) for rr in reach]
+    if name in _COMPOSED_FILTERS:
+        reach = [2 * rr for rr in reach]
+    return reach
+
+
+def _memory_axes(array):
+    """Return the axes of an array from the slowest to the fastest varying
+    in memory.
+    """
+    return sorted(range(array.ndim), key = lambda axis:
+                  -abs(array.strides[axis]))
+
+
+def _tile_shape(shape, reach, itemsize, memory, axes):
+    """Return the shape of the tiles of an array of the given shape, for
+    tiles that fit in memory with their halos. Tiles extend over the whole
+    axes that vary fastest in memory, given last in axes, such that they
+    are read in the order of the elements.
+    """
+    tile = list(shape)
+    for axis in axes:
+        size = itemsize
+        for ii in range(len(shape)):
+            if ii != axis:
+                size *= min(tile[ii] + 2 * reach[ii], shape[ii])
+        length = memory // size - 2 * reach[axis]
+        if length >= 1:
+            tile[axis] = min(length, shape[axis])
+            break
+        tile[axis] = 1
+    return tile
+
+
+def _tiles(shape, tile, axes):
+    """Generate the ranges of the tiles along each axis, in the order of
+    the elements, with the axes from the slowest to the fastest varying.
+    """
+    starts = [range(0, shape[axis], tile[axis]) for axis in axes]
+    for start in itertools.product(*starts):
+        ranges = [None] * len(shape)
+        for axis, ss in zip(axes, start):
+            ranges[axis] = (ss, min(ss + tile[axis], shape[axis]))
+        yield ranges
+
+
+def _read_tile(input, ranges, reach, wrap):
+    """Read a tile with its halo. The halo is clipped at the edges of the
+    input, where the filter applies its own boundary mode, except in the
+    'wrap' mode, where it is read from the opposite edge.
+    """
+    slices, core = [], []
+    for (start, stop), rr, length in zip(ranges, reach, input.shape):
+        if wrap and (start - rr < 0 or stop + rr > length):
+            slices.append(filters._extend_indices(start - rr, stop + rr,
+                                                  length, 'wrap'))
+            core.append(slice(rr, rr + stop - start))
+        else:
+            low, high = max(start - rr, 0), min(stop + rr, length)
+            slices.append(slice(low, high))
+            core.append(slice(start - low, stop - low))
+    tile = input[tuple([ss if isinstance(ss, slice) else slice(None)
+                        for ss in slices])]
+    for axis, ss in enumerate(slices):
+        if not isinstance(ss, slice):
+            tile = tile.take(ss, axis)
+    return numpy.array(tile), tuple(core)
+
+
+def tiled_filter(function, input, output = None, halo = None,
+                 tile_shape = None, memory = None, workers = None,
+                 extra_arguments = (), extra_keywords = None):
+    """Apply a filter to an array in tiles.
+
+    The array, typically a `numpy.memmap`, is processed in tiles that are
+    read in the order of the elements in memory. Each tile is extended by
+    the halo that the filter reads beyond it, filtered by calling
+    ``function(tile, *extra_arguments, **extra_keywords)``, and the part
+    of the result within the tile is written into the output. Only the
+    tiles of the threads are held in memory.
+
+    Parameters
+    ----------
+    function : callable
+        A filter, or morphology function, that returns an array of the
+        shape of its input, such as `gaussian_filter` or `median_filter`.
+    input : array_like
+        Input array to filter.
+    output : ndarray, dtype or str, optional
+        The array in which to place the output, or the dtype of the
+        returned array. If a file name is given, the output is written
+        into a new `numpy.memmap` of that file, with the dtype and memory
+        order of the input, which is returned.
+    halo : int or sequence of ints, optional
+        The number of elements that the filter reads beyond an element,
+        along each axis. By default, the halo is derived from the
+        ``footprint``, ``structure``, ``weights``, ``size`` or ``sigma``,
+        and the ``origin``, ``iterations``, ``axis`` and ``axes`` among
+        the arguments of the filter, or from its defaults. A halo must be
+        given for the 'recursive' method of the Gaussian filters, whose
+        reach is not bounded.
+    tile_shape : sequence of ints, optional
+        The shape of the tiles, without the halos. By default, the tiles
+        extend over the whole axes that vary fastest in memory, the
+        trailing axes of a C-ordered array or the leading axes of a
+        Fortran-ordered array, and are as large as the memory budget
+        allows.
+    memory : int, optional
+        The memory budget in bytes of the tiles, including the halos and
+        the intermediate results of the filter. Default is
+        ``default_memory``, which is 256 MB.
+    workers : int, optional
+        The number of threads that filter tiles concurrently, sharing the
+        memory budget. The tiles are still read one at a time, in order.
+        Default is 1.
+    extra_arguments : sequence, optional
+        Sequence of extra positional arguments to pass to the filter.
+    extra_keywords : dict, optional
+        dict of extra keyword arguments to pass to the filter.
+
+    Returns
+    -------
+    tiled_filter : ndarray or None
+        The filtered input. If `output` is given as an array, None is
+        returned.
+
+    Notes
+    -----
+    The result equals that of filtering the whole array, provided that
+    the halo covers the reach of the filter. At the edges of the input
+    the filter applies its own boundary mode; in the 'wrap' mode the halo
+    is read from the opposite edge instead. Filters that iterate until
+    convergence, or that do not return an array of the shape of their
+    input, cannot be tiled.
+    """
+    if extra_keywords is None:
+        extra_keywords = {}
+    input = numpy.asarray(input)
+    if input.ndim < 1:
+        raise RuntimeError('input rank must be > 0')
+    arguments = _arguments(function, extra_arguments, extra_keywords)
+    if halo is None:
+        reach = _filter_reach(function, input.ndim, arguments)
+    else:
+        reach = [int(hh) for hh in
+                 _ni_support._normalize_sequence(halo, input.ndim)]
+        if min(reach) < 0:
+            raise ValueError('halo must be non-negative')
+    wrap = arguments.get('mode') == 'wrap'
+    axes = _memory_axes(input)
+    if isinstance(output, str):
+        fortran = input.flags.f_contiguous and not input.flags.c_contiguous
+        output = numpy.memmap(output, dtype = input.dtype, mode = 'w+',
+                              shape = input.shape,
+                              order = 'F' if fortran else 'C')
+        return_value = output
+    else:
+        output, return_value = _ni_support._get_output(output, input)
+    workers = _ni_support._get_workers(workers, 1)
+    if memory is None:
+        memory = default_memory
+    if tile_shape is None:
+        itemsize = input.itemsize + output.itemsize + _WORK_BYTES
+        tile_shape = _tile_shape(input.shape, reach, itemsize,
+                                 memory // workers, axes)
+    else:
+        tile_shape = _ni_support._normalize_sequence(tile_shape, input.ndim)
+        if min(tile_shape) < 1:
+            raise ValueError('tile_shape must be positive')
+    tiles = _tiles(input.shape, tile_shape, axes)
+    lock = threading.Lock()
+    errors = []
+
+    def run():
+        while not errors:
+            # the tiles are read one at a time, in the order of the
+            # elements:
+            try:
+                with lock:
+                    ranges = next(tiles, None)
+                    if ranges is None:
+                        return
+                    tile, core = _read_tile(input, ranges, reach, wrap)
+                result = function(tile, *extra_arguments, **extra_keywords)
+                result = numpy.asarray(result)
+                if result.shape != tile.shape:
+                    raise RuntimeError('function must return an array of '
+                                       'the shape of its input')
+                output[tuple([slice(start, stop) for start, stop in
+                              ranges])] = result[core]
+            except Exception as error:
+                errors.append(error)
+
+    if workers > 1:
+        threads = [threading.Thread(target = run) for ii in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        run()
+    if errors:
+        raise errors[0]
+    if isinstance(output, numpy.memmap):
+        output.flush()
+    return return_value